@@ -0,0 +1,89 @@
+"""Add daily rollup tables for sales and production reporting
+
+Revision ID: 094_add_daily_rollups
+Revises: 093_final_graph_consolidation
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '094_add_daily_rollups'
+down_revision = '093_final_graph_consolidation'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sales_daily_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('sale_channel', sa.String(length=20), nullable=False),
+        sa.Column('sold_by_user_id', sa.Integer(), nullable=False),
+        sa.Column('sale_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_quantity', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_amount', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('day', 'product_id', 'sale_channel', 'sold_by_user_id', name='uq_sales_daily_rollups_key'),
+    )
+    op.create_index('ix_sales_daily_rollups_day', 'sales_daily_rollups', ['day'])
+    op.create_index('ix_sales_daily_rollups_product_day', 'sales_daily_rollups', ['product_id', 'day'])
+    op.create_index('ix_sales_daily_rollups_user_day', 'sales_daily_rollups', ['sold_by_user_id', 'day'])
+
+    op.create_table(
+        'production_daily_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('finished_product_id', sa.Integer(), nullable=False),
+        sa.Column('batch_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_produced', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_expected', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_waste', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('waste_batch_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('yield_sum', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('yield_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('day', 'finished_product_id', name='uq_production_daily_rollups_key'),
+    )
+    op.create_index('ix_production_daily_rollups_day', 'production_daily_rollups', ['day'])
+    op.create_index('ix_production_daily_rollups_product_day', 'production_daily_rollups', ['finished_product_id', 'day'])
+
+    # Seed rollups from existing history so reports stay correct right after deploy.
+    # Days are bucketed in UTC, matching app/services/rollups.py.
+    op.execute("""
+        INSERT INTO sales_daily_rollups
+            (day, product_id, sale_channel, sold_by_user_id, sale_count, total_quantity, total_amount)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, product_id, sale_channel::text, sold_by_user_id,
+               COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total_amount), 0)
+        FROM sales
+        WHERE is_reversed = false AND created_at IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """)
+    op.execute("""
+        INSERT INTO production_daily_rollups
+            (day, finished_product_id, batch_count, total_produced, total_expected,
+             total_waste, waste_batch_count, yield_sum, yield_count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, finished_product_id,
+               COUNT(*),
+               COALESCE(SUM(quantity_produced), 0),
+               COALESCE(SUM(COALESCE(expected_quantity, quantity_produced)), 0),
+               COALESCE(SUM(COALESCE(actual_waste_quantity, 0)), 0),
+               SUM(CASE WHEN actual_waste_quantity > 0 THEN 1 ELSE 0 END),
+               COALESCE(SUM(yield_efficiency), 0),
+               COUNT(yield_efficiency)
+        FROM processing_batches
+        WHERE status = 'completed' AND created_at IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_production_daily_rollups_product_day', table_name='production_daily_rollups')
+    op.drop_index('ix_production_daily_rollups_day', table_name='production_daily_rollups')
+    op.drop_table('production_daily_rollups')
+    op.drop_index('ix_sales_daily_rollups_user_day', table_name='sales_daily_rollups')
+    op.drop_index('ix_sales_daily_rollups_product_day', table_name='sales_daily_rollups')
+    op.drop_index('ix_sales_daily_rollups_day', table_name='sales_daily_rollups')
+    op.drop_table('sales_daily_rollups')
@@ -0,0 +1,87 @@
+"""Promote product_id / raw_material_id out of ai_recommendations.data_refs
+
+Revision ID: 095_ai_recommendation_entity_columns
+Revises: 094_add_daily_rollups
+Create Date: 2026-10-18 00:00:00.000000
+
+Recommendation deduplication matches on (type, product_id) and
+(type, raw_material_id). Storing those ids as indexed columns lets the
+recommender load all active keys in one query instead of parsing JSON
+per candidate.
+"""
+import json
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '095_ai_recommendation_entity_columns'
+down_revision = '094_add_daily_rollups'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+BACKFILL_BATCH_SIZE = 1000
+ENTITY_KEYS = ('product_id', 'raw_material_id')
+
+
+def _entity_ids(data_refs):
+    """Integer entity ids from one data_refs blob (as recommender.entity_refs); None when unusable."""
+    try:
+        refs = json.loads(data_refs)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(refs, dict):
+        return None
+    ids = {}
+    for key in ENTITY_KEYS:
+        value = refs.get(key)
+        ids[key] = value if isinstance(value, int) and not isinstance(value, bool) else None
+    return ids if any(ids.values()) else None
+
+
+def upgrade():
+    op.add_column('ai_recommendations', sa.Column('product_id', sa.Integer(), nullable=True))
+    op.add_column('ai_recommendations', sa.Column('raw_material_id', sa.Integer(), nullable=True))
+    op.create_index('ix_ai_recommendations_type_product_id', 'ai_recommendations', ['type', 'product_id'])
+    op.create_index('ix_ai_recommendations_type_raw_material_id', 'ai_recommendations', ['type', 'raw_material_id'])
+
+    # Backfill from the JSON blob in keyset batches, parsed row by row so a
+    # malformed blob or a non-integer id leaves that row's columns NULL
+    # instead of aborting the migration
+    bind = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, data_refs FROM ai_recommendations "
+        "WHERE id > :after_id AND data_refs IS NOT NULL "
+        "ORDER BY id LIMIT :limit"
+    )
+    update_row = sa.text(
+        "UPDATE ai_recommendations SET product_id = :product_id, raw_material_id = :raw_material_id "
+        "WHERE id = :id"
+    )
+    after_id, skipped = 0, 0
+    while True:
+        rows = bind.execute(select_batch, {'after_id': after_id, 'limit': BACKFILL_BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, data_refs in rows:
+            ids = _entity_ids(data_refs)
+            if ids is None:
+                skipped += 1
+                continue
+            updates.append({'id': row_id, **ids})
+        if updates:
+            bind.execute(update_row, updates)
+        after_id = rows[-1][0]
+    if skipped:
+        logger.info(f"ai_recommendations backfill: {skipped} rows without integer entity ids left NULL")
+
+
+def downgrade():
+    op.drop_index('ix_ai_recommendations_type_raw_material_id', table_name='ai_recommendations')
+    op.drop_index('ix_ai_recommendations_type_product_id', table_name='ai_recommendations')
+    op.drop_column('ai_recommendations', 'raw_material_id')
+    op.drop_column('ai_recommendations', 'product_id')
@@ -0,0 +1,46 @@
+"""Add scheduler leader lease and persistent job state tables
+
+Revision ID: 096_add_scheduler_coordination
+Revises: 095_ai_recommendation_entity_columns
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '096_add_scheduler_coordination'
+down_revision = '095_ai_recommendation_entity_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(length=64), primary_key=True),
+        sa.Column('owner', sa.String(length=128), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_table(
+        'scheduled_job_states',
+        sa.Column('job_id', sa.String(length=64), primary_key=True),
+        sa.Column('last_fire_time', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_duration_ms', sa.Float(), nullable=True),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('last_run_by', sa.String(length=128), nullable=True),
+        sa.Column('run_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('running_owner', sa.String(length=128), nullable=True),
+        sa.Column('running_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('trigger_requested_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('trigger_requested_by_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table('scheduled_job_states')
+    op.drop_table('scheduler_leases')
@@ -0,0 +1,33 @@
+"""Ensure the order-root partial unique index exists on every database
+
+Revision ID: 097_order_root_unique_index
+Revises: 096_add_scheduler_coordination
+Create Date: 2026-10-18 00:00:00.000000
+
+The index used to be (re)created at runtime on every order creation.
+Databases that only ever got it from that runtime DDL, or from a non-Postgres
+run of 049/050, get it here instead.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '097_order_root_unique_index'
+down_revision = '096_add_scheduler_coordination'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    root_flag = "is_order_root = true" if bind.dialect.name == "postgresql" else "is_order_root = 1"
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_order_root_per_order "
+        f"ON automation_tasks (related_order_id) WHERE {root_flag}"
+    )
+
+
+def downgrade():
+    # 049 owns the index on Postgres; only drop it where this revision added it
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.execute("DROP INDEX IF EXISTS uq_order_root_per_order")
@@ -0,0 +1,42 @@
+"""Add user workload counters and the claim queue index
+
+Revision ID: 098_add_user_workloads
+Revises: 097_order_root_unique_index
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '098_add_user_workloads'
+down_revision = '097_order_root_unique_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_workloads',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('open_assignments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    # Backfill from existing assignments
+    op.execute(
+        "INSERT INTO user_workloads (user_id, open_assignments) "
+        "SELECT user_id, COUNT(*) FROM task_assignments "
+        "WHERE user_id IS NOT NULL AND status IN ('pending', 'in_progress') "
+        "GROUP BY user_id"
+    )
+    op.create_index(
+        'ix_automation_tasks_claim_queue',
+        'automation_tasks',
+        ['required_role', 'related_order_id', 'created_at'],
+        postgresql_where=sa.text("status = 'open' AND claimed_by_user_id IS NULL"),
+        sqlite_where=sa.text("status = 'open' AND claimed_by_user_id IS NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_automation_tasks_claim_queue', table_name='automation_tasks')
+    op.drop_table('user_workloads')
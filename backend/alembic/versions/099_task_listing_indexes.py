@@ -0,0 +1,32 @@
+"""Add task board listing and assignment lookup indexes
+
+Revision ID: 099_task_listing_indexes
+Revises: 098_add_user_workloads
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '099_task_listing_indexes'
+down_revision = '098_add_user_workloads'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_automation_tasks_listing',
+        'automation_tasks',
+        [sa.text('related_order_id DESC'), 'created_at', 'id'],
+    )
+    op.create_index(
+        'ix_task_assignments_user_task',
+        'task_assignments',
+        ['user_id', 'task_id'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_task_assignments_user_task', table_name='task_assignments')
+    op.drop_index('ix_automation_tasks_listing', table_name='automation_tasks')
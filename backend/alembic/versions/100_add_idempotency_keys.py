@@ -0,0 +1,41 @@
+"""Add idempotency_keys store and backfill it from sales
+
+Revision ID: 100_add_idempotency_keys
+Revises: 099_task_listing_indexes
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '100_add_idempotency_keys'
+down_revision = '099_task_listing_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('scope', sa.String(50), nullable=False),
+        sa.Column('actor_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('key', sa.String(255), nullable=False),
+        sa.Column('fingerprint', sa.String(64), nullable=True),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('scope', 'actor_id', 'key', name='uq_idempotency_scope_actor_key'),
+    )
+    op.create_index('ix_idempotency_keys_id', 'idempotency_keys', ['id'])
+    # Existing sale keys (first sale wins; no fingerprint to compare against)
+    op.execute(
+        "INSERT INTO idempotency_keys (scope, actor_id, key, resource_id) "
+        "SELECT 'sale', sold_by_user_id, idempotency_key, MIN(id) FROM sales "
+        "WHERE idempotency_key IS NOT NULL "
+        "GROUP BY sold_by_user_id, idempotency_key"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_id', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,50 @@
+"""Add daily inventory ledger snapshots and backfill them from the ledger
+
+Revision ID: 101_add_inventory_snapshots
+Revises: 100_add_idempotency_keys
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '101_add_inventory_snapshots'
+down_revision = '100_add_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'inventory_daily_snapshots',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('inventory_item_id', sa.Integer(), sa.ForeignKey('inventory.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('net_change', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('transaction_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('closing_balance', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('inventory_item_id', 'day', name='uq_inventory_daily_snapshots_key'),
+    )
+    op.create_index('ix_inventory_daily_snapshots_day', 'inventory_daily_snapshots', ['day'])
+
+    # Seed snapshots from the existing ledger; closing balance is the running
+    # sum per item. Days are bucketed in UTC, matching app/services/inventory_snapshots.py.
+    op.execute("""
+        INSERT INTO inventory_daily_snapshots
+            (inventory_item_id, day, net_change, transaction_count, closing_balance)
+        SELECT inventory_item_id, day, net_change, transaction_count,
+               SUM(net_change) OVER (PARTITION BY inventory_item_id ORDER BY day)
+        FROM (
+            SELECT inventory_item_id, (created_at AT TIME ZONE 'UTC')::date AS day,
+                   COALESCE(SUM(change), 0) AS net_change, COUNT(*) AS transaction_count
+            FROM inventory_transactions
+            WHERE created_at IS NOT NULL
+            GROUP BY 1, 2
+        ) AS daily
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_inventory_daily_snapshots_day', table_name='inventory_daily_snapshots')
+    op.drop_table('inventory_daily_snapshots')
@@ -0,0 +1,28 @@
+"""Add a partial index on deleted messages for admin stats
+
+Revision ID: 102_add_messages_deleted_index
+Revises: 101_add_inventory_snapshots
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '102_add_messages_deleted_index'
+down_revision = '101_add_inventory_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_messages_deleted',
+        'messages',
+        ['id'],
+        postgresql_where=sa.text("is_deleted"),
+        sqlite_where=sa.text("is_deleted"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_messages_deleted', table_name='messages')
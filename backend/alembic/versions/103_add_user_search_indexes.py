@@ -0,0 +1,32 @@
+"""Add pg_trgm indexes for user search
+
+Revision ID: 103_add_user_search_indexes
+Revises: 102_add_messages_deleted_index
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '103_add_user_search_indexes'
+down_revision = '102_add_messages_deleted_index'
+branch_labels = None
+depends_on = None
+
+_COLUMNS = ('username', 'email', 'display_name')
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in _COLUMNS:
+        op.create_index(
+            f'ix_users_{column}_trgm',
+            'users',
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade():
+    for column in _COLUMNS:
+        op.drop_index(f'ix_users_{column}_trgm', table_name='users')
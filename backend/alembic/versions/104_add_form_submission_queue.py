@@ -0,0 +1,40 @@
+"""Add async processing columns and queue index to form_submissions
+
+Revision ID: 104_add_form_submission_queue
+Revises: 103_add_user_search_indexes
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '104_add_form_submission_queue'
+down_revision = '103_add_user_search_indexes'
+branch_labels = None
+depends_on = None
+
+QUEUE_PREDICATE = "status = 'pending' AND queued_at IS NOT NULL"
+
+
+def upgrade():
+    op.add_column('form_submissions', sa.Column('queued_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('form_submissions', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('form_submissions', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('form_submissions', sa.Column('started_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('form_submissions', sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        'ix_form_submissions_queue',
+        'form_submissions',
+        ['service_target', 'next_attempt_at'],
+        postgresql_where=sa.text(QUEUE_PREDICATE),
+        sqlite_where=sa.text(QUEUE_PREDICATE),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_form_submissions_queue', table_name='form_submissions')
+    op.drop_column('form_submissions', 'processed_at')
+    op.drop_column('form_submissions', 'started_at')
+    op.drop_column('form_submissions', 'next_attempt_at')
+    op.drop_column('form_submissions', 'attempts')
+    op.drop_column('form_submissions', 'queued_at')
@@ -0,0 +1,46 @@
+"""Add event_outbox for durable event bus delivery
+
+Revision ID: 105_add_event_outbox
+Revises: 104_add_form_submission_queue
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '105_add_event_outbox'
+down_revision = '104_add_form_submission_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'event_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('event_id', sa.String(length=32), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('subscriber', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_event_outbox_id', 'event_outbox', ['id'])
+    op.create_index(
+        'ix_event_outbox_due',
+        'event_outbox',
+        ['next_attempt_at'],
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_event_outbox_due', table_name='event_outbox')
+    op.drop_index('ix_event_outbox_id', table_name='event_outbox')
+    op.drop_table('event_outbox')
@@ -0,0 +1,37 @@
+"""Add automation_rules for rule engine rules managed at runtime
+
+Revision ID: 106_add_automation_rules
+Revises: 105_add_event_outbox
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '106_add_automation_rules'
+down_revision = '105_add_event_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'automation_rules',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(length=100), nullable=False, unique=True),
+        sa.Column('event', sa.String(length=100), nullable=False),
+        sa.Column('conditions', sa.Text(), nullable=False, server_default='{}'),
+        sa.Column('actions', sa.Text(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default='true'),
+        sa.Column('created_by_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_automation_rules_id', 'automation_rules', ['id'])
+    op.create_index('ix_automation_rules_event', 'automation_rules', ['event'])
+
+
+def downgrade():
+    op.drop_index('ix_automation_rules_event', table_name='automation_rules')
+    op.drop_index('ix_automation_rules_id', table_name='automation_rules')
+    op.drop_table('automation_rules')
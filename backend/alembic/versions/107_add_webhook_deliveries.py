@@ -0,0 +1,51 @@
+"""Add webhook_deliveries outbox for outbound webhooks
+
+Revision ID: 107_add_webhook_deliveries
+Revises: 106_add_automation_rules
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '107_add_webhook_deliveries'
+down_revision = '106_add_automation_rules'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'webhook_deliveries',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('target', sa.String(length=50), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('event_id', sa.String(length=64), nullable=False),
+        sa.Column('event', sa.String(length=100), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_status_code', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('target', 'event_id', name='uq_webhook_deliveries_target_event'),
+    )
+    op.create_index('ix_webhook_deliveries_id', 'webhook_deliveries', ['id'])
+    op.create_index(
+        'ix_webhook_deliveries_due',
+        'webhook_deliveries',
+        ['next_attempt_at'],
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+    op.create_index('ix_webhook_deliveries_finished', 'webhook_deliveries', ['status', 'finished_at'])
+
+
+def downgrade():
+    op.drop_index('ix_webhook_deliveries_finished', table_name='webhook_deliveries')
+    op.drop_index('ix_webhook_deliveries_due', table_name='webhook_deliveries')
+    op.drop_index('ix_webhook_deliveries_id', table_name='webhook_deliveries')
+    op.drop_table('webhook_deliveries')
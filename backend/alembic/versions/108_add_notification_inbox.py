@@ -0,0 +1,76 @@
+"""Add notification inbox counters, inbox indexes and notifications_archive
+
+Revision ID: 108_add_notification_inbox
+Revises: 107_add_webhook_deliveries
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '108_add_notification_inbox'
+down_revision = '107_add_webhook_deliveries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'notification_inboxes',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    # Backfill the counters from the existing notifications
+    op.execute(sa.text(
+        "INSERT INTO notification_inboxes (user_id, unread_count, total_count) "
+        "SELECT user_id, SUM(CASE WHEN is_read = false THEN 1 ELSE 0 END), COUNT(*) "
+        "FROM notifications GROUP BY user_id"
+    ))
+
+    op.create_index('ix_notifications_user_id_id', 'notifications', ['user_id', 'id'])
+    op.create_index(
+        'ix_notifications_user_unread',
+        'notifications',
+        ['user_id', 'id'],
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0'),
+    )
+    op.create_index(
+        'ix_notifications_read_created_at',
+        'notifications',
+        ['created_at'],
+        postgresql_where=sa.text('is_read = true'),
+        sqlite_where=sa.text('is_read = 1'),
+    )
+
+    op.create_table(
+        'notifications_archive',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('channel_id', sa.Integer(), nullable=True),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('sender_id', sa.Integer(), nullable=True),
+        sa.Column('task_id', sa.Integer(), nullable=True),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('inventory_id', sa.Integer(), nullable=True),
+        sa.Column('sale_id', sa.Integer(), nullable=True),
+        sa.Column('extra_data', sa.Text(), nullable=True),
+        sa.Column('is_read', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_notifications_archive_user_id_id', 'notifications_archive', ['user_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_notifications_archive_user_id_id', table_name='notifications_archive')
+    op.drop_table('notifications_archive')
+    op.drop_index('ix_notifications_read_created_at', table_name='notifications')
+    op.drop_index('ix_notifications_user_unread', table_name='notifications')
+    op.drop_index('ix_notifications_user_id_id', table_name='notifications')
+    op.drop_table('notification_inboxes')
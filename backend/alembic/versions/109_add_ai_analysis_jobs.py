@@ -0,0 +1,46 @@
+"""Add ai_analysis_jobs
+
+Revision ID: 109_add_ai_analysis_jobs
+Revises: 108_add_notification_inbox
+Create Date: 2026-10-19 00:00:00.000000
+
+Analysis job state moves out of process memory so every worker can serve
+GET /api/ai/jobs/{id}; the partial unique index allows one active job per
+generation mode across the cluster.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '109_add_ai_analysis_jobs'
+down_revision = '108_add_notification_inbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ai_analysis_jobs',
+        sa.Column('id', sa.String(length=32), primary_key=True),
+        sa.Column('mode', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('requested_by_id', sa.Integer(), nullable=True),
+        sa.Column('modules', sa.Text(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_ai_analysis_jobs_created_at', 'ai_analysis_jobs', ['created_at'])
+    op.create_index(
+        'uq_ai_analysis_jobs_active_mode', 'ai_analysis_jobs', ['mode'], unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+        sqlite_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade():
+    op.drop_index('uq_ai_analysis_jobs_active_mode', table_name='ai_analysis_jobs')
+    op.drop_index('ix_ai_analysis_jobs_created_at', table_name='ai_analysis_jobs')
+    op.drop_table('ai_analysis_jobs')
@@ -34,6 +34,13 @@ from app.ai.engine import (
     AIAnalysisError,
 )
 
+from app.ai.jobs import (
+    # Analysis job runner
+    start_analysis_job,
+    get_analysis_job,
+    list_analysis_jobs,
+)
+
 from app.ai.scheduler import (
     # Scheduler hooks (stubs)
     run_nightly_analysis,
@@ -80,6 +87,10 @@ __all__ = [
     "clear_old_recommendations",
     "AIEngineError",
     "AIAnalysisError",
+    # Jobs
+    "start_analysis_job",
+    "get_analysis_job",
+    "list_analysis_jobs",
     # Scheduler
     "run_nightly_analysis",
     "run_weekly_cleanup",
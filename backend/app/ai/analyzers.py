@@ -33,12 +33,14 @@ from sqlalchemy import select, func, and_, or_, case
 from sqlalchemy.orm import selectinload
 
 from app.db.models import (
-    Sale, Inventory, RawMaterial, RawMaterialTransaction,
+    Inventory, RawMaterial, RawMaterialTransaction,
     ProcessingBatch, ProcessingRecipe, AIRecommendation
 )
 from app.db.enums import (
-    AIRecommendationType, AIRecommendationScope, AIGenerationMode, ProductType
+    AIRecommendationType, AIRecommendationScope, AIGenerationMode
 )
+from app.services.rollups import aggregate_sales
+from app.ai.forecasting import DEFAULT_HORIZON_DAYS, DEFAULT_LOOKBACK_DAYS, forecast_products
 
 logger = logging.getLogger(__name__)
 
@@ -99,36 +101,14 @@ async def analyze_sales_velocity(
     
     insights = []
     
-    # Get recent sales grouped by product
-    recent_sales_query = (
-        select(
-            Sale.product_id,
-            func.count(Sale.id).label('sale_count'),
-            func.sum(Sale.quantity).label('total_qty')
-        )
-        .where(Sale.created_at >= recent_start)
-        .group_by(Sale.product_id)
-    )
-    recent_result = await session.execute(recent_sales_query)
-    recent_sales = {row.product_id: {'count': row.sale_count, 'qty': row.total_qty or 0} 
-                    for row in recent_result.all()}
-    
-    # Get previous period sales
-    previous_sales_query = (
-        select(
-            Sale.product_id,
-            func.count(Sale.id).label('sale_count'),
-            func.sum(Sale.quantity).label('total_qty')
-        )
-        .where(and_(
-            Sale.created_at >= previous_start,
-            Sale.created_at < recent_start
-        ))
-        .group_by(Sale.product_id)
-    )
-    previous_result = await session.execute(previous_sales_query)
-    previous_sales = {row.product_id: {'count': row.sale_count, 'qty': row.total_qty or 0} 
-                      for row in previous_result.all()}
+    # Recent and previous period sales per product (from daily rollups)
+    recent_result = await aggregate_sales(session, recent_start, None, group_by=("product_id",))
+    recent_sales = {pid: {'count': v['sale_count'], 'qty': v['total_quantity']}
+                    for (pid,), v in recent_result.items()}
+    
+    previous_result = await aggregate_sales(session, previous_start, recent_start, group_by=("product_id",))
+    previous_sales = {pid: {'count': v['sale_count'], 'qty': v['total_quantity']}
+                      for (pid,), v in previous_result.items()}
     
     # Get product names
     all_product_ids = set(recent_sales.keys()) | set(previous_sales.keys())
@@ -211,12 +191,15 @@ async def analyze_sales_velocity(
 
 async def analyze_inventory_coverage(
     session: AsyncSession,
-    lookback_days: int = 14,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
 ) -> List[Dict[str, Any]]:
     """
     Calculate inventory coverage days for each finished good.
     
-    Coverage Days = Current Stock / Average Daily Sales
+    Coverage Days = Current Stock / Forecast Daily Demand
+    
+    Demand comes from the batched forecasting engine (EW velocity,
+    weekday seasonality, stockout days excluded) - see app/ai/forecasting.py.
     
     Reports:
     - Products with low coverage (<7 days)
@@ -224,51 +207,29 @@ async def analyze_inventory_coverage(
     """
     logger.info(f"[Analyzer] Analyzing inventory coverage (lookback={lookback_days}d)")
     
-    now = datetime.utcnow()
-    lookback_start = now - timedelta(days=lookback_days)
-    
     insights = []
     
-    # Get all finished goods
-    inventory_query = (
-        select(Inventory)
-        .where(Inventory.product_type == ProductType.finished_good)
-    )
-    inv_result = await session.execute(inventory_query)
-    finished_goods = list(inv_result.scalars().all())
+    forecasts = await forecast_products(session, lookback_days=lookback_days)
     
-    if not finished_goods:
+    if not forecasts:
         logger.info("[Analyzer] No finished goods found for coverage analysis")
         return insights
     
-    # Get sales velocity for each product
-    for product in finished_goods:
-        sales_query = (
-            select(func.sum(Sale.quantity).label('total_qty'))
-            .where(and_(
-                Sale.product_id == product.product_id,
-                Sale.created_at >= lookback_start
-            ))
-        )
-        sales_result = await session.execute(sales_query)
-        total_sales = sales_result.scalar() or 0
+    for fc in forecasts.values():
+        daily_avg = fc.velocity
+        stock = fc.current_stock
         
-        daily_avg = total_sales / lookback_days if lookback_days > 0 else 0
+        # None = demand never exhausts stock within the forecast horizon
+        coverage_days = fc.coverage_days if fc.coverage_days is not None else float('inf')
         
-        # Calculate coverage days
-        if daily_avg > 0:
-            coverage_days = product.total_stock / daily_avg
-        else:
-            coverage_days = float('inf') if product.total_stock > 0 else 0
-        
-        product_name = product.product_name or f"Product {product.product_id}"
+        product_name = fc.product_name
         
         # Generate insight based on coverage
-        if coverage_days == float('inf') and product.total_stock > 0:
+        if daily_avg == 0 and stock > 0:
             # No sales but have stock
-            summary = f"{product_name}: No recent sales, {product.total_stock} units in stock"
+            summary = f"{product_name}: No recent sales, {stock} units in stock"
             explanation = [
-                f"Current stock: {product.total_stock} units",
+                f"Current stock: {stock} units",
                 f"No sales recorded in the past {lookback_days} days",
                 "Coverage days: Unlimited (no demand)"
             ]
@@ -277,35 +238,42 @@ async def analyze_inventory_coverage(
             # Low coverage - critical
             summary = f"{product_name}: Only {coverage_days:.0f} days of stock remaining"
             explanation = [
-                f"Current stock: {product.total_stock} units",
-                f"Average daily sales: {daily_avg:.1f} units/day",
-                f"At current rate, stock depletes in ~{coverage_days:.0f} days"
+                f"Current stock: {stock} units",
+                f"Forecast daily demand: {daily_avg:.1f} units/day",
+                f"At forecast rate, stock depletes in ~{coverage_days:.0f} days"
             ]
-            confidence = calculate_confidence(int(daily_avg * lookback_days))
-        elif coverage_days > 30 and product.total_stock > 0:
+            confidence = calculate_confidence(fc.units_sold)
+        elif coverage_days > 30 and stock > 0:
             # High coverage - potential overstock
-            summary = f"{product_name}: {coverage_days:.0f} days of stock (potential overstock)"
+            days_text = f"{coverage_days:.0f}" if coverage_days != float('inf') else f"{DEFAULT_HORIZON_DAYS}+"
+            summary = f"{product_name}: {days_text} days of stock (potential overstock)"
             explanation = [
-                f"Current stock: {product.total_stock} units",
-                f"Average daily sales: {daily_avg:.1f} units/day",
-                f"Stock covers ~{coverage_days:.0f} days of demand"
+                f"Current stock: {stock} units",
+                f"Forecast daily demand: {daily_avg:.1f} units/day",
+                f"Stock covers ~{days_text} days of demand"
             ]
-            confidence = calculate_confidence(int(daily_avg * lookback_days))
+            confidence = calculate_confidence(fc.units_sold)
         else:
             # Normal coverage - skip
             continue
         
+        if fc.stockout_days:
+            explanation.append(f"{fc.stockout_days} stocked-out day(s) excluded from demand")
+        
         insights.append({
             "type": AIRecommendationType.demand_forecast,  # Using demand_forecast for coverage insights
             "summary": summary,
             "explanation": explanation,
             "confidence": confidence,
             "data_refs": {
-                "product_id": product.product_id,
+                "product_id": fc.product_id,
                 "product_name": product_name,
-                "current_stock": product.total_stock,
+                "current_stock": stock,
                 "daily_average_sales": round(daily_avg, 2),
                 "coverage_days": round(coverage_days, 1) if coverage_days != float('inf') else None,
+                "forecast_demand_7d": round(fc.demand_7d, 1),
+                "forecast_demand_28d": round(fc.demand_28d, 1),
+                "stockout_days": fc.stockout_days,
             }
         })
     
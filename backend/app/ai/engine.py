@@ -42,6 +42,7 @@ from sqlalchemy import select, delete
 from app.db.models import AIRecommendation
 from app.db.enums import AIRecommendationType, AIRecommendationScope, AIGenerationMode
 from app.ai.analyzers import run_all_analyzers
+from app.ai.recommender import entity_refs
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +91,7 @@ async def save_insights_to_db(
             summary=insight["summary"],
             explanation=json.dumps(insight.get("explanation", [])),
             data_refs=json.dumps(insight.get("data_refs", {})),
+            **entity_refs(insight.get("data_refs")),
             generated_by=mode,
             expires_at=datetime.utcnow() + timedelta(days=7),  # Insights expire in 7 days
         )
@@ -103,10 +105,55 @@ async def save_insights_to_db(
     return saved
 
 
+async def _run_analyzers(
+    session: AsyncSession,
+    label: str,
+    analyzers: List[tuple],
+    partial: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Run (name, analyzer) pairs in order and combine their insights.
+    
+    Failures are logged; unless `partial`, AIAnalysisError is raised once
+    every analyzer has run, so a caller replacing a module's stored
+    insights keeps the previous ones instead of a partial set.
+    """
+    insights = []
+    failed = []
+    for name, analyzer in analyzers:
+        try:
+            insights.extend(await analyzer(session))
+        except Exception as e:
+            logger.error(f"[{label}] {name} failed: {e}")
+            failed.append(name)
+    if failed and not partial:
+        raise AIAnalysisError(f"{label} analyzers failed: {', '.join(failed)}")
+    return insights
+
+
 # ============================================================================
 # AI-1: Demand Forecasting (Now with insights)
 # ============================================================================
 
+async def collect_demand_insights(session: AsyncSession, partial: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compute AI-1 insights (sales velocity, coverage, burn rate) without saving.
+    
+    Raises AIAnalysisError if an analyzer fails, unless `partial`.
+    """
+    from app.ai.analyzers import (
+        analyze_sales_velocity,
+        analyze_inventory_coverage,
+        analyze_raw_material_burn_rate
+    )
+    
+    return await _run_analyzers(session, "AI-1", [
+        ("Sales velocity", analyze_sales_velocity),
+        ("Inventory coverage", analyze_inventory_coverage),
+        ("Burn rate analysis", analyze_raw_material_burn_rate),
+    ], partial=partial)
+
+
 async def run_demand_forecast(
     session: AsyncSession,
     mode: AIGenerationMode = AIGenerationMode.auto,
@@ -125,34 +172,8 @@ async def run_demand_forecast(
     """
     logger.info("[AI-1] Running demand forecast analysis")
     
-    from app.ai.analyzers import (
-        analyze_sales_velocity,
-        analyze_inventory_coverage,
-        analyze_raw_material_burn_rate
-    )
-    
-    insights = []
-    
-    # Sales velocity insights
-    try:
-        velocity = await analyze_sales_velocity(session)
-        insights.extend(velocity)
-    except Exception as e:
-        logger.error(f"[AI-1] Sales velocity failed: {e}")
-    
-    # Inventory coverage insights  
-    try:
-        coverage = await analyze_inventory_coverage(session)
-        insights.extend(coverage)
-    except Exception as e:
-        logger.error(f"[AI-1] Inventory coverage failed: {e}")
-    
-    # Raw material burn rate
-    try:
-        burn_rate = await analyze_raw_material_burn_rate(session)
-        insights.extend(burn_rate)
-    except Exception as e:
-        logger.error(f"[AI-1] Burn rate analysis failed: {e}")
+    # Insights are only added here, so whatever the working analyzers found is kept
+    insights = await collect_demand_insights(session, partial=True)
     
     # Save insights to database
     saved = await save_insights_to_db(session, insights, mode)
@@ -164,6 +185,11 @@ async def run_demand_forecast(
 # AI-2: Production Planning Advisor (STUB - Phase 9.2)
 # ============================================================================
 
+async def collect_production_insights(session: AsyncSession) -> List[Dict[str, Any]]:
+    """Compute AI-2 insights. Phase 9.1: none yet."""
+    return []
+
+
 async def run_production_advisor(
     session: AsyncSession,
     mode: AIGenerationMode = AIGenerationMode.auto,
@@ -187,6 +213,20 @@ async def run_production_advisor(
 # AI-3: Waste & Yield Intelligence (Now with insights)
 # ============================================================================
 
+async def collect_waste_insights(session: AsyncSession, partial: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compute AI-3 insights (yield averages, waste baselines) without saving.
+    
+    Raises AIAnalysisError if an analyzer fails, unless `partial`.
+    """
+    from app.ai.analyzers import analyze_production_yields, analyze_waste_baselines
+    
+    return await _run_analyzers(session, "AI-3", [
+        ("Yield analysis", analyze_production_yields),
+        ("Waste analysis", analyze_waste_baselines),
+    ], partial=partial)
+
+
 async def run_waste_analysis(
     session: AsyncSession,
     mode: AIGenerationMode = AIGenerationMode.auto,
@@ -205,23 +245,7 @@ async def run_waste_analysis(
     """
     logger.info("[AI-3] Running waste & yield analysis")
     
-    from app.ai.analyzers import analyze_production_yields, analyze_waste_baselines
-    
-    insights = []
-    
-    # Production yield insights
-    try:
-        yields = await analyze_production_yields(session)
-        insights.extend(yields)
-    except Exception as e:
-        logger.error(f"[AI-3] Yield analysis failed: {e}")
-    
-    # Waste baseline insights
-    try:
-        waste = await analyze_waste_baselines(session)
-        insights.extend(waste)
-    except Exception as e:
-        logger.error(f"[AI-3] Waste analysis failed: {e}")
+    insights = await collect_waste_insights(session, partial=True)
     
     # Save insights to database
     saved = await save_insights_to_db(session, insights, mode)
@@ -233,6 +257,11 @@ async def run_waste_analysis(
 # AI-4: Sales & Agent Intelligence (STUB - Phase 9.2)
 # ============================================================================
 
+async def collect_sales_insights(session: AsyncSession) -> List[Dict[str, Any]]:
+    """Compute AI-4 insights. Sales velocity is covered by AI-1."""
+    return []
+
+
 async def run_sales_intelligence(
     session: AsyncSession,
     mode: AIGenerationMode = AIGenerationMode.auto,
@@ -261,66 +290,47 @@ async def run_all_analysis(
     mode: AIGenerationMode = AIGenerationMode.auto,
 ) -> Dict[str, Any]:
     """
-    Run all AI analysis modules.
+    Run all AI analysis modules and wait for them to finish.
     
     Called by:
     - Nightly cron job (mode=auto)
-    - Manual "Run AI Analysis" button (mode=on_demand)
+    
+    Modules run concurrently on their own sessions (bound to the same
+    engine as `session`) and each swaps in its insights atomically; see
+    app/ai/jobs.py. The HTTP endpoint starts a job instead of waiting.
     
     Phase 9.1: Generates INSIGHTS (facts only)
     Phase 9.2: Will add RECOMMENDATIONS (advice)
     
     Returns summary of generated insights.
     """
+    from app.ai.jobs import create_analysis_job, run_analysis_job, session_factory_for
+    
     logger.info(f"[AI Engine] Running all analysis (mode={mode.value})")
     
+    session_factory = session_factory_for(session)
+    async with session_factory() as job_session:
+        job = await create_analysis_job(job_session, mode)
+    if job is None:
+        logger.info(f"[AI Engine] A {mode.value} analysis job is already running; skipped")
+        return {"mode": mode.value, "status": "skipped", "error": "An analysis job for this mode is already running"}
+    await run_analysis_job(job, session_factory)
+    
     results = {
         "mode": mode.value,
-        "started_at": datetime.utcnow().isoformat(),
-        "modules": {},
-        "total_recommendations": 0,
-        "insights_generated": 0,
+        "job_id": job.id,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "modules": {name: m["insights"] for name, m in job.modules.items()},
+        "module_timings_ms": {name: m["duration_ms"] for name, m in job.modules.items()},
+        "total_recommendations": job.insights_generated,
+        "insights_generated": job.insights_generated,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "status": job.status,
     }
+    if job.error:
+        results["error"] = job.error
     
-    try:
-        # Clear old insights from this run type to avoid duplicates
-        # Only clear non-dismissed insights
-        await session.execute(
-            delete(AIRecommendation).where(
-                AIRecommendation.is_dismissed == False,
-                AIRecommendation.generated_by == mode
-            )
-        )
-        await session.commit()
-        
-        # Run each module
-        demand_recs = await run_demand_forecast(session, mode)
-        results["modules"]["demand_forecast"] = len(demand_recs)
-        
-        production_recs = await run_production_advisor(session, mode)
-        results["modules"]["production_advisor"] = len(production_recs)
-        
-        waste_recs = await run_waste_analysis(session, mode)
-        results["modules"]["waste_analysis"] = len(waste_recs)
-        
-        sales_recs = await run_sales_intelligence(session, mode)
-        results["modules"]["sales_intelligence"] = len(sales_recs)
-        
-        # Calculate total
-        all_recs = demand_recs + production_recs + waste_recs + sales_recs
-        results["total_recommendations"] = len(all_recs)
-        results["insights_generated"] = len(all_recs)
-        
-        results["completed_at"] = datetime.utcnow().isoformat()
-        results["status"] = "completed"
-        
-        logger.info(f"[AI Engine] Analysis complete: {results['total_recommendations']} recommendations")
-        
-    except Exception as e:
-        logger.exception(f"[AI Engine] Error during analysis: {e}")
-        results["status"] = "error"
-        results["error"] = str(e)
-    
+    logger.info(f"[AI Engine] Analysis complete: {results['total_recommendations']} recommendations")
     return results
 
 
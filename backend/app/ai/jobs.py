@@ -0,0 +1,396 @@
+"""
+AI Analysis Job Runner
+
+Runs the analysis modules (AI-1..AI-4) as a tracked job:
+- Modules execute concurrently, each on its own session
+- Each module swaps in its insights atomically: the previous insights of
+  that module (same generation mode, not dismissed) are deleted and the new
+  ones inserted in ONE transaction, so readers never see an empty module;
+  if any of its analyzers fails, the module errors and keeps them
+- A job id is returned immediately; status, progress and per-module timing
+  can be polled while it runs
+
+Job state lives in ai_analysis_jobs, like the scheduler state in
+app/ai/scheduler_store.py, so any worker can report on any job:
+- A partial unique index allows one active (queued/running) job per mode
+  cluster-wide; a second start returns the active job instead
+- The running worker saves progress as modules start and finish; an active
+  job not saved for JOB_TIMEOUT was abandoned and may be taken over
+- The most recent MAX_TRACKED_JOBS jobs are kept
+
+SAFETY GUARANTEE:
+- Writes ONLY to ai_recommendations
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, select, update, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import AIRecommendation, AIAnalysisJob
+from app.db.enums import AIRecommendationType, AIGenerationMode
+from app.ai.engine import (
+    collect_demand_insights,
+    collect_production_insights,
+    collect_waste_insights,
+    collect_sales_insights,
+    save_insights_to_db,
+)
+from app.ai.scheduler_store import as_naive_utc
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Module Registry
+# ============================================================================
+
+@dataclass(frozen=True)
+class AnalysisModule:
+    """An analysis module and the insight types it owns."""
+    name: str
+    collect: Callable[[AsyncSession], Awaitable[List[Dict[str, Any]]]]
+    types: tuple
+
+
+ANALYSIS_MODULES: List[AnalysisModule] = [
+    AnalysisModule(
+        "demand_forecast", collect_demand_insights,
+        (AIRecommendationType.sales_insight, AIRecommendationType.demand_forecast),
+    ),
+    AnalysisModule(
+        "production_advisor", collect_production_insights,
+        (AIRecommendationType.production_plan,),
+    ),
+    AnalysisModule(
+        "waste_analysis", collect_waste_insights,
+        (AIRecommendationType.yield_insight, AIRecommendationType.waste_alert),
+    ),
+    AnalysisModule(
+        "sales_intelligence", collect_sales_insights,
+        (AIRecommendationType.agent_insight,),
+    ),
+]
+
+MAX_TRACKED_JOBS = 50
+ACTIVE_STATUSES = ("queued", "running")
+JOB_TIMEOUT = timedelta(hours=1)
+
+
+# ============================================================================
+# Job State
+# ============================================================================
+
+@dataclass
+class AnalysisJob:
+    """Status of one analysis run."""
+    id: str
+    mode: AIGenerationMode
+    requested_by_id: Optional[int] = None
+    status: str = "queued"  # queued, running, completed, partial, error
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    error: Optional[str] = None
+    modules: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Serializes progress writes of the worker running the job
+    _save_lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+    @classmethod
+    def from_row(cls, row: AIAnalysisJob) -> "AnalysisJob":
+        return cls(
+            id=row.id,
+            mode=AIGenerationMode(row.mode),
+            requested_by_id=row.requested_by_id,
+            status=row.status,
+            created_at=as_naive_utc(row.created_at),
+            started_at=as_naive_utc(row.started_at),
+            completed_at=as_naive_utc(row.completed_at),
+            error=row.error,
+            modules=json.loads(row.modules),
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "partial", "error")
+
+    @property
+    def progress(self) -> float:
+        if not self.modules:
+            return 1.0 if self.finished else 0.0
+        done = sum(1 for m in self.modules.values() if m["status"] in ("completed", "error"))
+        return round(done / len(self.modules), 2)
+
+    @property
+    def insights_generated(self) -> int:
+        return sum(m["insights"] for m in self.modules.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "mode": self.mode.value,
+            "status": self.status,
+            "progress": self.progress,
+            "requested_by_id": self.requested_by_id,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "insights_generated": self.insights_generated,
+            "modules": {name: dict(m) for name, m in self.modules.items()},
+            "error": self.error,
+        }
+
+
+# Background tasks of jobs started by this worker (keeps them referenced)
+_job_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def create_analysis_job(
+    session: AsyncSession,
+    mode: AIGenerationMode,
+    requested_by_id: Optional[int] = None,
+) -> Optional[AnalysisJob]:
+    """
+    Register a new queued job.
+
+    Returns None if another job for `mode` is active on any worker. An
+    active job past its expires_at is marked as errored first.
+    """
+    now = datetime.utcnow()
+    await session.execute(
+        update(AIAnalysisJob)
+        .where(and_(
+            AIAnalysisJob.mode == mode.value,
+            AIAnalysisJob.status.in_(ACTIVE_STATUSES),
+            AIAnalysisJob.expires_at < now,
+        ))
+        .values(status="error", error="Abandoned: no progress within the job timeout", completed_at=now)
+    )
+    await session.commit()
+
+    job = AnalysisJob(id=uuid.uuid4().hex, mode=mode, requested_by_id=requested_by_id, created_at=now)
+    job.modules = {
+        module.name: {"status": "pending", "insights": 0, "duration_ms": None, "error": None}
+        for module in ANALYSIS_MODULES
+    }
+    session.add(AIAnalysisJob(
+        id=job.id,
+        mode=mode.value,
+        status=job.status,
+        requested_by_id=requested_by_id,
+        modules=json.dumps(job.modules),
+        created_at=now,
+        expires_at=now + JOB_TIMEOUT,
+    ))
+    try:
+        await session.commit()
+    except IntegrityError:
+        # uq_ai_analysis_jobs_active_mode: a job for this mode is active
+        await session.rollback()
+        return None
+
+    await _prune_jobs(session)
+    return job
+
+
+async def _prune_jobs(session: AsyncSession) -> None:
+    """Drop finished jobs beyond the most recent MAX_TRACKED_JOBS."""
+    old_ids = (await session.execute(
+        select(AIAnalysisJob.id)
+        .order_by(AIAnalysisJob.created_at.desc())
+        .offset(MAX_TRACKED_JOBS)
+    )).scalars().all()
+    if not old_ids:
+        return
+    await session.execute(
+        delete(AIAnalysisJob).where(and_(
+            AIAnalysisJob.id.in_(old_ids),
+            AIAnalysisJob.status.notin_(ACTIVE_STATUSES),
+        ))
+    )
+    await session.commit()
+
+
+async def get_analysis_job(session: AsyncSession, job_id: str) -> Optional[AnalysisJob]:
+    """Look up a tracked job."""
+    row = await session.get(AIAnalysisJob, job_id, populate_existing=True)
+    return AnalysisJob.from_row(row) if row is not None else None
+
+
+async def list_analysis_jobs(session: AsyncSession, limit: int = 20) -> List[AnalysisJob]:
+    """Most recent jobs first."""
+    rows = (await session.execute(
+        select(AIAnalysisJob).order_by(AIAnalysisJob.created_at.desc()).limit(limit)
+    )).scalars().all()
+    return [AnalysisJob.from_row(row) for row in rows]
+
+
+async def get_active_job(session: AsyncSession, mode: AIGenerationMode) -> Optional[AnalysisJob]:
+    """The unfinished, not abandoned job for a mode, if any."""
+    row = (await session.execute(
+        select(AIAnalysisJob).where(and_(
+            AIAnalysisJob.mode == mode.value,
+            AIAnalysisJob.status.in_(ACTIVE_STATUSES),
+            AIAnalysisJob.expires_at >= datetime.utcnow(),
+        ))
+    )).scalar_one_or_none()
+    return AnalysisJob.from_row(row) if row is not None else None
+
+
+async def _save_job(job: AnalysisJob, session_factory) -> None:
+    """Write the job's progress and extend its expiry; failures are logged."""
+    async with job._save_lock:
+        try:
+            async with session_factory() as session:
+                await session.execute(
+                    update(AIAnalysisJob)
+                    .where(AIAnalysisJob.id == job.id)
+                    .values(
+                        status=job.status,
+                        modules=json.dumps(job.modules),
+                        error=job.error,
+                        started_at=job.started_at,
+                        completed_at=job.completed_at,
+                        expires_at=datetime.utcnow() + JOB_TIMEOUT,
+                    )
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"[AI Jobs] Could not save progress of job {job.id}: {e}")
+
+
+def session_factory_for(session: AsyncSession) -> async_sessionmaker:
+    """Session factory on the same engine as an existing session."""
+    return async_sessionmaker(session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+# ============================================================================
+# Execution
+# ============================================================================
+
+async def replace_module_insights(
+    session: AsyncSession,
+    module: AnalysisModule,
+    insights: List[Dict[str, Any]],
+    mode: AIGenerationMode,
+) -> List[AIRecommendation]:
+    """
+    Swap a module's insights in one transaction.
+
+    Deletes the module's previous non-dismissed insights for `mode` and
+    inserts the new ones; save_insights_to_db commits both together.
+    """
+    await session.execute(
+        delete(AIRecommendation).where(and_(
+            AIRecommendation.is_dismissed == False,
+            AIRecommendation.generated_by == mode,
+            AIRecommendation.type.in_(module.types),
+        ))
+    )
+    saved = await save_insights_to_db(session, insights, mode)
+    if not saved:
+        await session.commit()
+    return saved
+
+
+async def _run_module(job: AnalysisJob, module: AnalysisModule, session_factory) -> None:
+    state = job.modules[module.name]
+    state["status"] = "running"
+    await _save_job(job, session_factory)
+    started = time.perf_counter()
+    try:
+        async with session_factory() as session:
+            try:
+                insights = await module.collect(session)
+                saved = await replace_module_insights(session, module, insights, job.mode)
+            except Exception:
+                await session.rollback()
+                raise
+        state["insights"] = len(saved)
+        state["status"] = "completed"
+    except Exception as e:
+        logger.exception(f"[AI Jobs] Module {module.name} failed in job {job.id}: {e}")
+        state["status"] = "error"
+        state["error"] = str(e)
+    finally:
+        state["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    await _save_job(job, session_factory)
+
+
+async def run_analysis_job(job: AnalysisJob, session_factory=None) -> AnalysisJob:
+    """
+    Execute a job created by create_analysis_job to completion.
+
+    Modules run concurrently; one module failing does not affect the
+    others (status becomes "partial"). Progress is saved to the job's row.
+    """
+    if session_factory is None:
+        from app.db.database import async_session as session_factory
+
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    await _save_job(job, session_factory)
+    logger.info(f"[AI Jobs] Job {job.id} started (mode={job.mode.value})")
+
+    try:
+        await asyncio.gather(*(_run_module(job, module, session_factory) for module in ANALYSIS_MODULES))
+        failed = [name for name, m in job.modules.items() if m["status"] == "error"]
+        if not failed:
+            job.status = "completed"
+        elif len(failed) == len(job.modules):
+            job.status = "error"
+            job.error = "All analysis modules failed"
+        else:
+            job.status = "partial"
+            job.error = f"Failed modules: {', '.join(failed)}"
+    except Exception as e:
+        logger.exception(f"[AI Jobs] Job {job.id} failed: {e}")
+        job.status = "error"
+        job.error = str(e)
+    finally:
+        job.completed_at = datetime.utcnow()
+        await _save_job(job, session_factory)
+
+    timings = ", ".join(f"{name}={m['duration_ms']}ms" for name, m in job.modules.items())
+    logger.info(f"[AI Jobs] Job {job.id} {job.status}: {job.insights_generated} insights ({timings})")
+    return job
+
+
+async def start_analysis_job(
+    session: AsyncSession,
+    mode: AIGenerationMode,
+    requested_by_id: Optional[int] = None,
+    session_factory=None,
+    wait: bool = False,
+) -> AnalysisJob:
+    """
+    Start a job in the background and return it immediately, or run it to
+    completion first if `wait` is set.
+
+    If a job for the same mode is active on any worker, that job is
+    returned instead of starting a second one.
+    """
+    for _ in range(3):
+        job = await create_analysis_job(session, mode, requested_by_id)
+        if job is not None:
+            break
+        active = await get_active_job(session, mode)
+        if active is not None:
+            return active
+        # The active job finished in between; try again
+    else:
+        raise RuntimeError(f"Could not start a {mode.value} analysis job")
+
+    if wait:
+        return await run_analysis_job(job, session_factory)
+    task = asyncio.create_task(run_analysis_job(job, session_factory))
+    _job_tasks[job.id] = task
+    task.add_done_callback(lambda _: _job_tasks.pop(job.id, None))
+    return job
@@ -30,6 +30,7 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 import logging
 import json
+import math
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_
@@ -56,6 +57,7 @@ INVENTORY_COVERAGE_WARNING_DAYS = 14  # Warning threshold
 RAW_MATERIAL_COVERAGE_CRITICAL_DAYS = 10  # Raw material alert
 SALES_INCREASE_THRESHOLD_PCT = 15  # Minimum sales increase to trigger production recommendation
 MIN_CONFIDENCE_FOR_RECOMMENDATION = 0.4  # Don't recommend if confidence below this
+REORDER_TARGET_COVERAGE_DAYS = 28  # Reorders aim to cover forecast demand for this long
 
 
 # ============================================================================
@@ -295,6 +297,7 @@ async def generate_reorder_recommendations(
         product_id = data_refs.get("product_id")
         current_stock = data_refs.get("current_stock", 0)
         daily_avg = data_refs.get("daily_average_sales", 0)
+        forecast_demand = data_refs.get("forecast_demand_28d")
         
         # Skip if coverage is sufficient
         if coverage_days is None or coverage_days >= INVENTORY_COVERAGE_WARNING_DAYS:
@@ -310,6 +313,15 @@ async def generate_reorder_recommendations(
             f"Stock will deplete in ~{coverage_days:.0f} days at current rate",
         ]
         
+        # Size the reorder from the seasonal forecast when the insight carries one
+        suggested_quantity = None
+        if forecast_demand is not None:
+            suggested_quantity = max(int(math.ceil(forecast_demand - current_stock)), 0)
+            reasoning.append(
+                f"Forecast demand next {REORDER_TARGET_COVERAGE_DAYS} days: {forecast_demand:.0f} units "
+                f"(suggested order: ~{suggested_quantity} units)"
+            )
+        
         # Determine urgency
         if coverage_days < INVENTORY_COVERAGE_CRITICAL_DAYS:
             urgency = "urgent"
@@ -335,6 +347,7 @@ async def generate_reorder_recommendations(
                 "coverage_days": coverage_days,
                 "current_stock": current_stock,
                 "daily_average_sales": daily_avg,
+                "suggested_quantity": suggested_quantity,
                 "urgency": urgency,
                 "insight_ids": [insight.id],
                 "recommendation_type": "reorder",
@@ -430,6 +443,44 @@ async def generate_procurement_recommendations(
 # Deduplication Logic (Phase 4.2)
 # ============================================================================
 
+def entity_refs(data_refs: Optional[Dict[str, Any]]) -> Dict[str, Optional[int]]:
+    """
+    Extract the promoted entity columns from a data_refs dict.
+
+    Returns {"product_id": ..., "raw_material_id": ...}; non-integer
+    values are ignored.
+    """
+    data_refs = data_refs or {}
+    promoted = {}
+    for key in ("product_id", "raw_material_id"):
+        value = data_refs.get(key)
+        promoted[key] = value if isinstance(value, int) and not isinstance(value, bool) else None
+    return promoted
+
+
+def _dedup_keys(rec_type, product_id: Optional[int], raw_material_id: Optional[int]) -> List[tuple]:
+    """Keys a recommendation is matched on: (type, entity kind, entity id)."""
+    keys = []
+    if product_id:
+        keys.append((rec_type, "product", product_id))
+    if raw_material_id:
+        keys.append((rec_type, "raw_material", raw_material_id))
+    return keys
+
+
+def _active_recommendations_filter(max_age_days: int):
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    return and_(
+        AIRecommendation.generated_by == AIGenerationMode.recommendation,
+        AIRecommendation.is_dismissed == False,
+        AIRecommendation.status.notin_([
+            AIRecommendationStatus.rejected,
+            AIRecommendationStatus.expired,
+        ]),
+        AIRecommendation.created_at >= cutoff,
+    )
+
+
 async def find_duplicate_recommendation(
     session: AsyncSession,
     rec_type: AIRecommendationType,
@@ -448,43 +499,54 @@ async def find_duplicate_recommendation(
     
     Returns existing duplicate or None.
     """
-    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    entity_match = []
+    if product_id:
+        entity_match.append(AIRecommendation.product_id == product_id)
+    if raw_material_id:
+        entity_match.append(AIRecommendation.raw_material_id == raw_material_id)
+    if not entity_match:
+        return None
     
-    # Build base query
     query = (
         select(AIRecommendation)
         .where(and_(
             AIRecommendation.type == rec_type,
-            AIRecommendation.generated_by == AIGenerationMode.recommendation,
-            AIRecommendation.is_dismissed == False,
-            AIRecommendation.status.notin_([
-                AIRecommendationStatus.rejected,
-                AIRecommendationStatus.expired,
-            ]),
-            AIRecommendation.created_at >= cutoff,
+            or_(*entity_match),
+            _active_recommendations_filter(max_age_days),
         ))
-        .limit(50)  # Check recent recommendations only
+        .limit(1)
     )
-    
     result = await session.execute(query)
-    candidates = list(result.scalars().all())
+    return result.scalars().first()
+
+
+async def load_active_recommendation_keys(
+    session: AsyncSession,
+    rec_types: List[AIRecommendationType],
+    max_age_days: int = 7,
+) -> set:
+    """
+    Load the dedup keys of all active recommendations of the given types.
+
+    One query over the promoted entity columns; no JSON parsing.
+    """
+    if not rec_types:
+        return set()
     
-    # Check each candidate for matching entity
-    for candidate in candidates:
-        try:
-            cand_refs = json.loads(candidate.data_refs) if candidate.data_refs else {}
-        except:
-            continue
-        
-        # Match by product_id
-        if product_id and cand_refs.get("product_id") == product_id:
-            return candidate
-        
-        # Match by raw_material_id
-        if raw_material_id and cand_refs.get("raw_material_id") == raw_material_id:
-            return candidate
+    query = (
+        select(AIRecommendation.type, AIRecommendation.product_id, AIRecommendation.raw_material_id)
+        .where(and_(
+            AIRecommendation.type.in_(rec_types),
+            or_(AIRecommendation.product_id.isnot(None), AIRecommendation.raw_material_id.isnot(None)),
+            _active_recommendations_filter(max_age_days),
+        ))
+    )
+    result = await session.execute(query)
     
-    return None
+    keys = set()
+    for rec_type, product_id, raw_material_id in result.all():
+        keys.update(_dedup_keys(rec_type, product_id, raw_material_id))
+    return keys
 
 
 async def deduplicate_recommendations(
@@ -494,30 +556,28 @@ async def deduplicate_recommendations(
     """
     Filter out recommendations that already exist in the database.
     
+    Existing keys are loaded once and matched in memory; candidates that
+    repeat a key earlier in the same batch are dropped too.
+    
     Returns only new, non-duplicate recommendations.
     """
     logger.info(f"[Deduplication] Checking {len(recommendations)} recommendations for duplicates")
     
+    rec_types = list({rec["type"] for rec in recommendations})
+    seen = await load_active_recommendation_keys(session, rec_types)
+    
     unique = []
     duplicate_count = 0
     
     for rec in recommendations:
-        data_refs = rec.get("data_refs", {})
-        product_id = data_refs.get("product_id")
-        raw_material_id = data_refs.get("raw_material_id")
-        
-        # Check for existing duplicate
-        duplicate = await find_duplicate_recommendation(
-            session,
-            rec["type"],
-            product_id=product_id,
-            raw_material_id=raw_material_id,
-        )
+        refs = entity_refs(rec.get("data_refs"))
+        keys = _dedup_keys(rec["type"], refs["product_id"], refs["raw_material_id"])
         
-        if duplicate:
+        if any(key in seen for key in keys):
             logger.debug(f"[Deduplication] Skipping duplicate: {rec['summary'][:50]}...")
             duplicate_count += 1
         else:
+            seen.update(keys)
             unique.append(rec)
     
     logger.info(f"[Deduplication] Filtered {duplicate_count} duplicates, {len(unique)} unique recommendations")
@@ -619,6 +679,7 @@ async def run_recommendation_engine(
                 summary=rec["summary"],
                 explanation=json.dumps(rec.get("explanation", [])),
                 data_refs=json.dumps(rec.get("data_refs", {})),
+                **entity_refs(rec.get("data_refs")),
                 generated_by=AIGenerationMode.recommendation,  # Mark as recommendation
                 status=AIRecommendationStatus.pending,  # Start as pending
                 expires_at=datetime.utcnow() + timedelta(days=7),
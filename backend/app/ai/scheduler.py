@@ -6,13 +6,30 @@ Provides automated scheduling for AI analysis:
 - Weekly cleanup of old recommendations
 - Auto-expiry of expired recommendations
 
+and for maintenance jobs (MAINTENANCE_JOBS), which also run when the AI
+jobs are off (setup_scheduler(ai_jobs=False), MAINTENANCE_JOBS_ENABLED):
+- Notification archive (retention)
+- Inventory snapshot reconciliation
+
 Uses APScheduler for background task management.
 
-SAFETY: All scheduled jobs only read and write to ai_recommendations table.
+Cluster-safe: every worker runs a short coordination tick, but only the
+holder of the leader lease executes jobs, and each cron fire time is
+claimed once in the persistent job store (app/ai/scheduler_store.py).
+Fire times missed while no leader was up are caught up (coalesced) within
+a per-job window. Manual triggers on non-leaders are routed to the leader.
+
+SAFETY: All AI jobs only read and write to ai_recommendations table.
 """
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, Awaitable, Callable
 
 try:
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -31,6 +48,18 @@ from sqlalchemy import select, update, delete, and_
 from app.db.models import AIRecommendation
 from app.db.enums import AIRecommendationStatus, AIGenerationMode
 from app.core.config import settings
+from app.ai.scheduler_store import (
+    as_naive_utc,
+    claim_job_run,
+    ensure_job_state,
+    get_job_state,
+    record_job_result,
+    release_lease,
+    request_job_trigger,
+    serialize_job_state,
+    set_baseline_fire_time,
+    try_acquire_lease,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -44,16 +73,34 @@ _last_auto_run: Optional[datetime] = None
 _last_expiry_check: Optional[datetime] = None
 _last_cleanup: Optional[datetime] = None
 _scheduler_enabled: bool = False
+_is_leader: bool = False
+_scheduled_jobs: Dict[str, "ScheduledJob"] = {}
+_running_tasks: Dict[str, asyncio.Task] = {}
+
+# Identifies this worker in the leader lease and job store
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+SCHEDULER_TICK_SECONDS = 30
+LEADER_LEASE_SECONDS = 90  # must exceed the tick so the leader renews in time
+TRIGGER_WAIT_SECONDS = 60.0  # how long a routed manual trigger waits for the leader
+TRIGGER_POLL_SECONDS = 1.0
+
+# Start of interval triggers, so every worker computes the same fire times
+INTERVAL_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+# Jobs that don't depend on the AI engine
+MAINTENANCE_JOBS = ("notification_archive", "inventory_reconciliation")
 
 
 def get_scheduler_status() -> dict:
-    """Get current scheduler status."""
+    """Get current scheduler status (this worker's view)."""
     global _scheduler
     
     jobs = []
     if _scheduler and _scheduler.running:
-        for job in _scheduler.get_jobs():
-            next_run = job.next_run_time
+        now = datetime.now(timezone.utc)
+        for job in _scheduled_jobs.values():
+            next_run = job.trigger.get_next_fire_time(None, now)
             jobs.append({
                 "id": job.id,
                 "name": job.name,
@@ -63,6 +110,8 @@ def get_scheduler_status() -> dict:
     return {
         "enabled": _scheduler_enabled,
         "running": _scheduler.running if _scheduler else False,
+        "worker_id": WORKER_ID,
+        "is_leader": _is_leader,
         "last_auto_run": _last_auto_run.isoformat() if _last_auto_run else None,
         "last_expiry_check": _last_expiry_check.isoformat() if _last_expiry_check else None,
         "last_cleanup": _last_cleanup.isoformat() if _last_cleanup else None,
@@ -311,6 +360,188 @@ async def run_weekly_cleanup() -> Dict[str, Any]:
         }
 
 
+# ============================================================================
+# Daily Sales Summary Job
+# ============================================================================
+
+async def run_daily_sales_summary() -> Dict[str, Any]:
+    """Run daily sales summary job: generate summary and post to Sales HQ channel."""
+    logger.info("[AI Scheduler] Running daily sales summary")
+    session_factory = _get_session_factory()
+    try:
+        async with session_factory() as session:
+            from app.services.sales import generate_daily_sales_summary
+            from app.services.sales_hq import ensure_sales_hq_channel, post_system_message
+
+            md = await generate_daily_sales_summary(session)
+            ch = await ensure_sales_hq_channel(session)
+            if ch and md:
+                await post_system_message(session, ch.id, md)
+        return {"status": "completed", "message": "daily summary posted"}
+    except Exception as e:
+        logger.exception(f"[AI Scheduler] Daily sales summary failed: {e}")
+        return {"status": "error", "error": str(e)}
+
+
+# ============================================================================
+# Notification Archive Job
+# ============================================================================
+
+async def run_notification_archive() -> Dict[str, Any]:
+    """Move read notifications past retention to notifications_archive (daily)."""
+    logger.info("[AI Scheduler] Running notification archive")
+    session_factory = _get_session_factory()
+    try:
+        async with session_factory() as session:
+            from app.services.notification_inbox import archive_read
+
+            archived = await archive_read(session)
+        return {"status": "completed", "archived": archived}
+    except Exception as e:
+        logger.exception(f"[AI Scheduler] Notification archive failed: {e}")
+        return {"status": "error", "error": str(e)}
+
+
+# ============================================================================
+# Inventory Snapshot Reconciliation Job
+# ============================================================================
+
+async def run_inventory_reconciliation() -> Dict[str, Any]:
+    """Check daily inventory snapshots against the ledger and rebuild drifted items (daily)."""
+    logger.info("[AI Scheduler] Running inventory snapshot reconciliation")
+    session_factory = _get_session_factory()
+    try:
+        async with session_factory() as session:
+            from app.services.inventory_snapshots import check_snapshot_consistency
+
+            report = await check_snapshot_consistency(session, repair=True)
+        return {
+            "status": "completed",
+            "consistent": report["consistent"],
+            "snapshot_mismatches": report["snapshot_mismatch_count"],
+            "stock_mismatches": report["stock_mismatch_count"],
+            "repaired": report["repaired"],
+        }
+    except Exception as e:
+        logger.exception(f"[AI Scheduler] Inventory reconciliation failed: {e}")
+        return {"status": "error", "error": str(e)}
+
+
+JOB_FUNCTIONS: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]] = {
+    "nightly_analysis": run_nightly_analysis,
+    "weekly_cleanup": run_weekly_cleanup,
+    "expiry_check": run_expiry_check,
+    "daily_sales_summary": run_daily_sales_summary,
+    "notification_archive": run_notification_archive,
+    "inventory_reconciliation": run_inventory_reconciliation,
+}
+
+
+# ============================================================================
+# Cluster Coordination (leader lease + persistent job store)
+# ============================================================================
+
+@dataclass
+class ScheduledJob:
+    """A job definition: cron or interval trigger, catch-up window and run-lock timeout."""
+    id: str
+    name: str
+    trigger: Any
+    catchup_window: timedelta
+    max_runtime: timedelta
+
+
+def latest_fire_time(trigger, since: datetime, now: datetime) -> Optional[datetime]:
+    """
+    Most recent fire time of `trigger` in (since, now], as naive UTC.
+
+    Missed occurrences are coalesced: only the latest one is returned.
+    """
+    tz = trigger.timezone
+    cursor = since.replace(tzinfo=timezone.utc).astimezone(tz)
+    end = now.replace(tzinfo=timezone.utc).astimezone(tz)
+    latest = None
+    fire = trigger.get_next_fire_time(None, cursor + timedelta(microseconds=1))
+    while fire is not None and fire <= end:
+        latest = fire
+        fire = trigger.get_next_fire_time(fire, fire + timedelta(microseconds=1))
+    return as_naive_utc(latest) if latest else None
+
+
+def _spawn(job_id: str, coro) -> None:
+    task = asyncio.create_task(coro)
+    _running_tasks[job_id] = task
+    task.add_done_callback(lambda _: _running_tasks.pop(job_id, None))
+
+
+async def _execute_claimed(job_id: str) -> Dict[str, Any]:
+    """Run a job this worker has claimed and record the outcome."""
+    started_at = datetime.utcnow()
+    try:
+        result = await JOB_FUNCTIONS[job_id]()
+    except Exception as e:
+        logger.exception(f"[AI Scheduler] Job {job_id} raised: {e}")
+        result = {"status": "error", "error": str(e)}
+
+    try:
+        async with _get_session_factory()() as session:
+            await record_job_result(session, job_id, WORKER_ID, started_at, result)
+    except Exception as e:
+        logger.warning(f"[AI Scheduler] Failed to record result of {job_id}: {e}")
+    return result
+
+
+async def scheduler_tick() -> None:
+    """
+    Coordination tick, run periodically in every worker.
+
+    1. Acquire or renew the leader lease
+    2. On the leader only: run queued manual triggers, then the latest due
+       (or missed, within the catch-up window) fire time of each job
+    """
+    global _is_leader
+
+    session_factory = _get_session_factory()
+    try:
+        async with session_factory() as session:
+            leader = await try_acquire_lease(session, WORKER_ID, LEADER_LEASE_SECONDS)
+    except Exception as e:
+        logger.warning(f"[AI Scheduler] Leader lease check failed: {e}")
+        leader = False
+
+    if leader != _is_leader:
+        logger.info(f"[AI Scheduler] Worker {WORKER_ID} {'became' if leader else 'is no longer'} leader")
+    _is_leader = leader
+    if not leader:
+        return
+
+    now = datetime.utcnow()
+    for job in list(_scheduled_jobs.values()):
+        try:
+            async with session_factory() as session:
+                state = await ensure_job_state(session, job.id)
+
+                if state.trigger_requested_at is not None:
+                    if await claim_job_run(session, job.id, WORKER_ID, job.max_runtime, clear_trigger_request=True):
+                        logger.info(f"[AI Scheduler] Running {job.id} (manual trigger)")
+                        _spawn(job.id, _execute_claimed(job.id))
+                    continue
+
+                last_fire = as_naive_utc(state.last_fire_time)
+                if last_fire is None:
+                    # First time this job is scheduled: past fire times are not missed runs
+                    await set_baseline_fire_time(session, job.id, latest_fire_time(job.trigger, now - job.catchup_window, now) or now)
+                    continue
+
+                due = latest_fire_time(job.trigger, max(last_fire, now - job.catchup_window), now)
+                if due and await claim_job_run(session, job.id, WORKER_ID, job.max_runtime, fire_time=due):
+                    late = (now - due).total_seconds()
+                    logger.info(f"[AI Scheduler] Running {job.id} for {due.isoformat()}" + (f" (catch-up, {late:.0f}s late)" if late > 2 * SCHEDULER_TICK_SECONDS else ""))
+                    _spawn(job.id, _execute_claimed(job.id))
+        except Exception as e:
+            logger.warning(f"[AI Scheduler] Tick failed for {job.id}: {e}")
+
+
 # ============================================================================
 # Scheduler Setup & Shutdown
 # ============================================================================
@@ -321,16 +552,24 @@ def setup_scheduler(
     cleanup_day: str = "sun",
     cleanup_hour: int = 3,
     expiry_interval_hours: int = 1,
+    ai_jobs: bool = True,
 ):
     """
     Initialize the AI scheduler.
     
+    Every worker runs a coordination tick; only the worker holding the
+    leader lease executes jobs, and each fire time is claimed once in the
+    job store, so jobs run once cluster-wide.
+    
+    With ai_jobs=False only MAINTENANCE_JOBS are scheduled.
+    
     Args:
         nightly_hour: Hour to run nightly analysis (0-23)
         nightly_minute: Minute to run nightly analysis (0-59)
         cleanup_day: Day of week for cleanup (mon, tue, wed, thu, fri, sat, sun)
         cleanup_hour: Hour to run weekly cleanup (0-23)
         expiry_interval_hours: How often to check for expired recommendations
+        ai_jobs: Schedule the AI jobs too (not just MAINTENANCE_JOBS)
     """
     global _scheduler, _scheduler_enabled
     
@@ -338,55 +577,65 @@ def setup_scheduler(
         logger.warning("[AI Scheduler] Scheduler already running")
         return
     
-    logger.info("[AI Scheduler] Setting up scheduler...")
+    if AsyncIOScheduler is None:
+        raise RuntimeError("APScheduler is not installed")
+    
+    logger.info(f"[AI Scheduler] Setting up scheduler (worker {WORKER_ID})...")
+    
+    _scheduled_jobs.clear()
+    for job in (
+        # Nightly analysis job (2:00 AM by default)
+        ScheduledJob("nightly_analysis", "Nightly AI Analysis",
+                     CronTrigger(hour=nightly_hour, minute=nightly_minute),
+                     catchup_window=timedelta(hours=12), max_runtime=timedelta(hours=2)),
+        # Weekly cleanup job (Sunday 3:00 AM by default)
+        ScheduledJob("weekly_cleanup", "Weekly Recommendation Cleanup",
+                     CronTrigger(day_of_week=cleanup_day, hour=cleanup_hour, minute=0),
+                     catchup_window=timedelta(days=1), max_runtime=timedelta(minutes=30)),
+        # Daily sales summary job (21:00 server time)
+        ScheduledJob("daily_sales_summary", "Daily Sales Summary",
+                     CronTrigger(hour=21, minute=0),
+                     catchup_window=timedelta(hours=3), max_runtime=timedelta(minutes=30)),
+        # Notification retention (4:30 AM)
+        ScheduledJob("notification_archive", "Notification Archive",
+                     CronTrigger(hour=4, minute=30),
+                     catchup_window=timedelta(hours=12), max_runtime=timedelta(hours=1)),
+        # Inventory snapshot reconciliation (4:00 AM, after the day's ledger is closed)
+        ScheduledJob("inventory_reconciliation", "Inventory Snapshot Reconciliation",
+                     CronTrigger(hour=4, minute=0),
+                     catchup_window=timedelta(hours=12), max_runtime=timedelta(hours=1)),
+        # Expiry check job (every hour by default)
+        ScheduledJob("expiry_check", "Recommendation Expiry Check",
+                     IntervalTrigger(hours=expiry_interval_hours, start_date=INTERVAL_EPOCH),
+                     catchup_window=timedelta(hours=expiry_interval_hours), max_runtime=timedelta(minutes=30)),
+    ):
+        if ai_jobs or job.id in MAINTENANCE_JOBS:
+            _scheduled_jobs[job.id] = job
     
     _scheduler = AsyncIOScheduler()
-    
-    # Nightly analysis job (2:00 AM by default)
-    _scheduler.add_job(
-        run_nightly_analysis,
-        CronTrigger(hour=nightly_hour, minute=nightly_minute),
-        id="nightly_analysis",
-        name="Nightly AI Analysis",
-        replace_existing=True,
-    )
-    
-    # Weekly cleanup job (Sunday 3:00 AM by default)
-    _scheduler.add_job(
-        run_weekly_cleanup,
-        CronTrigger(day_of_week=cleanup_day, hour=cleanup_hour, minute=0),
-        id="weekly_cleanup",
-        name="Weekly Recommendation Cleanup",
-        replace_existing=True,
-    )
-
-    # Daily sales summary job (21:00 server time)
     _scheduler.add_job(
-        run_daily_sales_summary,
-        CronTrigger(hour=21, minute=0),
-        id="daily_sales_summary",
-        name="Daily Sales Summary",
-        replace_existing=True,
-    )
-    
-    # Expiry check job (every hour by default)
-    _scheduler.add_job(
-        run_expiry_check,
-        IntervalTrigger(hours=expiry_interval_hours),
-        id="expiry_check",
-        name="Recommendation Expiry Check",
+        scheduler_tick,
+        IntervalTrigger(seconds=SCHEDULER_TICK_SECONDS),
+        id="scheduler_tick",
+        name="Scheduler Coordination Tick",
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True,
         replace_existing=True,
     )
     
     _scheduler.start()
     _scheduler_enabled = True
     
+    if not ai_jobs:
+        logger.info(f"[AI Scheduler] Started with maintenance jobs only: {', '.join(_scheduled_jobs)}")
+        return
     logger.info(f"[AI Scheduler] Started with jobs: nightly at {nightly_hour:02d}:{nightly_minute:02d}, cleanup on {cleanup_day} at {cleanup_hour:02d}:00, expiry check every {expiry_interval_hours}h")
 
 
 def shutdown_scheduler():
     """Shutdown the AI scheduler gracefully."""
-    global _scheduler, _scheduler_enabled
+    global _scheduler, _scheduler_enabled, _is_leader
     
     if _scheduler is not None:
         _scheduler.shutdown(wait=False)
@@ -394,44 +643,72 @@ def shutdown_scheduler():
     
     _scheduler = None
     _scheduler_enabled = False
+    _is_leader = False
 
 
-async def run_daily_sales_summary() -> Dict[str, Any]:
-    """Run daily sales summary job: generate summary and post to Sales HQ channel."""
-    logger.info("[AI Scheduler] Running daily sales summary")
-    session_factory = _get_session_factory()
+async def release_leadership() -> None:
+    """Give up the leader lease (call on shutdown) so another worker takes over immediately."""
+    if not _is_leader:
+        return
     try:
-        async with session_factory() as session:
-            from app.services.sales import generate_daily_sales_summary
-            from app.services.sales_hq import ensure_sales_hq_channel, post_system_message
-
-            md = await generate_daily_sales_summary(session)
-            ch = await ensure_sales_hq_channel(session)
-            if ch and md:
-                await post_system_message(session, ch.id, md)
-        return {"status": "completed", "message": "daily summary posted"}
+        async with _get_session_factory()() as session:
+            await release_lease(session, WORKER_ID)
+        logger.info(f"[AI Scheduler] Worker {WORKER_ID} released leadership")
     except Exception as e:
-        logger.exception(f"[AI Scheduler] Daily sales summary failed: {e}")
-        return {"status": "error", "error": str(e)}
+        logger.warning(f"[AI Scheduler] Failed to release leadership: {e}")
 
 
-async def trigger_job(job_id: str) -> Dict[str, Any]:
+async def trigger_job(
+    job_id: str,
+    requested_by_id: Optional[int] = None,
+    wait_seconds: float = TRIGGER_WAIT_SECONDS,
+) -> Dict[str, Any]:
     """
     Manually trigger a scheduled job.
     
     Args:
-        job_id: One of "nightly_analysis", "weekly_cleanup", "expiry_check"
+        job_id: A key of JOB_FUNCTIONS (e.g. "nightly_analysis", "inventory_reconciliation")
+        requested_by_id: User requesting the run (recorded on routed requests)
+        wait_seconds: How long to wait for the leader to finish a routed run
+    
+    When the cluster scheduler is running on another worker (and schedules
+    this job), the request is queued in the job store for the leader, and
+    this call waits up to `wait_seconds` for the outcome. Otherwise the job
+    runs here, under the same run lock the leader uses.
     
     Returns:
         Job result
     """
-    if job_id == "nightly_analysis":
-        return await run_nightly_analysis()
-    elif job_id == "weekly_cleanup":
-        return await run_weekly_cleanup()
-    elif job_id == "expiry_check":
-        return await run_expiry_check()
-    elif job_id == "daily_sales_summary":
-        return await run_daily_sales_summary()
-    else:
-        return {"status": "error", "message": f"Unknown job: {job_id}"}
\ No newline at end of file
+    if job_id not in JOB_FUNCTIONS:
+        return {"status": "error", "message": f"Unknown job: {job_id}"}
+    
+    session_factory = _get_session_factory()
+    
+    if _scheduler_enabled and not _is_leader and job_id in _scheduled_jobs:
+        # Route to the leader through the job store
+        async with session_factory() as session:
+            requested_at = await request_job_trigger(session, job_id, requested_by_id)
+        deadline = time.monotonic() + wait_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(TRIGGER_POLL_SECONDS)
+            async with session_factory() as session:
+                state = await get_job_state(session, job_id)
+            finished = as_naive_utc(state.last_finished_at) if state else None
+            if finished and finished >= requested_at:
+                return {**serialize_job_state(state), "status": state.last_status, "routed_to_leader": True}
+        return {"status": "queued", "job_id": job_id, "routed_to_leader": True,
+                "message": "Job queued for the scheduler leader"}
+    
+    job = _scheduled_jobs.get(job_id)
+    max_runtime = job.max_runtime if job else timedelta(minutes=30)
+    try:
+        async with session_factory() as session:
+            claimed = await claim_job_run(session, job_id, WORKER_ID, max_runtime)
+    except Exception as e:
+        # Job store unavailable (e.g. before migrations): run unlocked
+        logger.warning(f"[AI Scheduler] Job store unavailable, running {job_id} without run lock: {e}")
+        return await JOB_FUNCTIONS[job_id]()
+    
+    if not claimed:
+        return {"status": "skipped", "job_id": job_id, "message": "Job is already running"}
+    return await _execute_claimed(job_id)
@@ -0,0 +1,258 @@
+"""
+Scheduler Coordination Store
+
+Database-backed primitives that make scheduled jobs run once cluster-wide:
+- Leader lease: one worker at a time holds a named, time-limited lease
+- Job state: last fire time / run / duration / outcome per job
+- Fire-time claims: a cron fire time is claimed by exactly one worker
+- Run lock: the same job never runs twice concurrently
+- Trigger requests: manual triggers from any worker are queued for the leader
+
+All claims are single conditional UPDATEs, so they are race-free on any
+backend without advisory locks. Times are naive UTC.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, or_, and_, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import SchedulerLease, ScheduledJobState
+
+logger = logging.getLogger(__name__)
+
+
+LEADER_LEASE_NAME = "ai_scheduler_leader"
+MAX_ERROR_LENGTH = 2000
+
+
+def as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize DB datetimes (aware on Postgres, naive on SQLite) to naive UTC."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# ============================================================================
+# Leader Lease
+# ============================================================================
+
+async def try_acquire_lease(
+    session: AsyncSession,
+    owner: str,
+    ttl_seconds: int,
+    name: str = LEADER_LEASE_NAME,
+) -> bool:
+    """
+    Acquire or renew a lease. Returns True if `owner` holds it afterwards.
+
+    Succeeds when the lease is free, expired, or already held by `owner`.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+
+    result = await session.execute(
+        update(SchedulerLease)
+        .where(and_(
+            SchedulerLease.name == name,
+            or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now),
+        ))
+        .values(
+            acquired_at=case((SchedulerLease.owner == owner, SchedulerLease.acquired_at), else_=now),
+            owner=owner,
+            expires_at=expires_at,
+        )
+    )
+    if result.rowcount:
+        await session.commit()
+        return True
+
+    existing = await session.get(SchedulerLease, name)
+    if existing is not None:
+        await session.rollback()
+        return False
+
+    session.add(SchedulerLease(name=name, owner=owner, acquired_at=now, expires_at=expires_at))
+    try:
+        await session.commit()
+        return True
+    except IntegrityError:
+        # Another worker inserted it first
+        await session.rollback()
+        return False
+
+
+async def release_lease(session: AsyncSession, owner: str, name: str = LEADER_LEASE_NAME) -> None:
+    """Expire a lease held by `owner` so another worker can take over at once."""
+    await session.execute(
+        update(SchedulerLease)
+        .where(and_(SchedulerLease.name == name, SchedulerLease.owner == owner))
+        .values(expires_at=datetime.utcnow())
+    )
+    await session.commit()
+
+
+async def get_lease(session: AsyncSession, name: str = LEADER_LEASE_NAME) -> Optional[SchedulerLease]:
+    """Current lease row (may be expired)."""
+    result = await session.execute(select(SchedulerLease).where(SchedulerLease.name == name))
+    return result.scalar_one_or_none()
+
+
+# ============================================================================
+# Job State
+# ============================================================================
+
+async def get_job_state(session: AsyncSession, job_id: str) -> Optional[ScheduledJobState]:
+    result = await session.execute(
+        select(ScheduledJobState)
+        .where(ScheduledJobState.job_id == job_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def ensure_job_state(session: AsyncSession, job_id: str) -> ScheduledJobState:
+    """Get the state row for a job, creating it if needed."""
+    state = await get_job_state(session, job_id)
+    if state is not None:
+        return state
+    session.add(ScheduledJobState(job_id=job_id, run_count=0))
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+    return await get_job_state(session, job_id)
+
+
+async def set_baseline_fire_time(session: AsyncSession, job_id: str, fire_time: Optional[datetime]) -> None:
+    """
+    Record a fire time as seen without running it.
+
+    Used the first time a job is scheduled, so past fire times are not
+    treated as missed runs.
+    """
+    await session.execute(
+        update(ScheduledJobState)
+        .where(and_(ScheduledJobState.job_id == job_id, ScheduledJobState.last_fire_time.is_(None)))
+        .values(last_fire_time=fire_time or datetime.utcnow())
+    )
+    await session.commit()
+
+
+async def claim_job_run(
+    session: AsyncSession,
+    job_id: str,
+    owner: str,
+    max_runtime: timedelta,
+    fire_time: Optional[datetime] = None,
+    clear_trigger_request: bool = False,
+) -> bool:
+    """
+    Atomically take the run lock for a job.
+
+    With `fire_time`, the claim also requires that fire time to be newer
+    than the last claimed one, so each scheduled occurrence runs once.
+    Returns True if this worker should run the job.
+    """
+    await ensure_job_state(session, job_id)
+    now = datetime.utcnow()
+
+    conditions = [
+        ScheduledJobState.job_id == job_id,
+        or_(ScheduledJobState.running_until.is_(None), ScheduledJobState.running_until < now),
+    ]
+    values: Dict[str, Any] = {"running_owner": owner, "running_until": now + max_runtime}
+    if fire_time is not None:
+        conditions.append(or_(
+            ScheduledJobState.last_fire_time.is_(None),
+            ScheduledJobState.last_fire_time < fire_time,
+        ))
+        values["last_fire_time"] = fire_time
+    if clear_trigger_request:
+        conditions.append(ScheduledJobState.trigger_requested_at.isnot(None))
+        values["trigger_requested_at"] = None
+        values["trigger_requested_by_id"] = None
+
+    result = await session.execute(update(ScheduledJobState).where(and_(*conditions)).values(**values))
+    await session.commit()
+    return bool(result.rowcount)
+
+
+async def record_job_result(
+    session: AsyncSession,
+    job_id: str,
+    owner: str,
+    started_at: datetime,
+    result: Dict[str, Any],
+) -> None:
+    """
+    Store the outcome of a run and release the run lock.
+
+    Only the lock holder can do this: a run that overran max_runtime may
+    have lost the lock to another worker, whose run must stay locked.
+    """
+    finished_at = datetime.utcnow()
+    error = result.get("error") or (result.get("message") if result.get("status") == "error" else None)
+    outcome = await session.execute(
+        update(ScheduledJobState)
+        .where(and_(ScheduledJobState.job_id == job_id, ScheduledJobState.running_owner == owner))
+        .values(
+            last_started_at=started_at,
+            last_finished_at=finished_at,
+            last_duration_ms=round((finished_at - started_at).total_seconds() * 1000, 1),
+            last_status=str(result.get("status") or "completed")[:20],
+            last_error=str(error)[:MAX_ERROR_LENGTH] if error else None,
+            last_run_by=owner,
+            run_count=ScheduledJobState.run_count + 1,
+            running_owner=None,
+            running_until=None,
+        )
+    )
+    await session.commit()
+    if not outcome.rowcount:
+        logger.warning(
+            f"[SchedulerStore] {owner} no longer holds the run lock of {job_id} "
+            f"(run exceeded its max runtime); result {result.get('status')!r} not recorded"
+        )
+
+
+async def request_job_trigger(session: AsyncSession, job_id: str, requested_by_id: Optional[int] = None) -> datetime:
+    """Queue a manual run for the leader. Returns the request time."""
+    await ensure_job_state(session, job_id)
+    requested_at = datetime.utcnow()
+    await session.execute(
+        update(ScheduledJobState)
+        .where(ScheduledJobState.job_id == job_id)
+        .values(trigger_requested_at=requested_at, trigger_requested_by_id=requested_by_id)
+    )
+    await session.commit()
+    return requested_at
+
+
+def serialize_job_state(state: ScheduledJobState) -> Dict[str, Any]:
+    def iso(value):
+        value = as_naive_utc(value)
+        return value.isoformat() if value else None
+
+    return {
+        "job_id": state.job_id,
+        "last_fire_time": iso(state.last_fire_time),
+        "last_started_at": iso(state.last_started_at),
+        "last_finished_at": iso(state.last_finished_at),
+        "last_duration_ms": state.last_duration_ms,
+        "last_status": state.last_status,
+        "last_error": state.last_error,
+        "last_run_by": state.last_run_by,
+        "run_count": state.run_count,
+        "running": state.running_until is not None and as_naive_utc(state.running_until) > datetime.utcnow(),
+        "running_owner": state.running_owner,
+        "trigger_pending": state.trigger_requested_at is not None,
+    }
+
+
+async def load_job_states(session: AsyncSession) -> List[Dict[str, Any]]:
+    """All job states, serialized for the status API."""
+    result = await session.execute(select(ScheduledJobState).order_by(ScheduledJobState.job_id))
+    return [serialize_job_state(s) for s in result.scalars().all()]
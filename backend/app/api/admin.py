@@ -8,14 +8,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.db.database import get_db
-from app.db.models import User, Channel, Message, Team, TeamMember, AuditLog, UserRole, ChannelType, UserOperationalRole
+from app.db.models import User, Channel, Message, TeamMember, AuditLog, UserRole, ChannelType, UserOperationalRole
 from app.core.security import (
     get_current_user, 
     require_admin, 
     require_permission,
     Permission,
-    get_password_hash
 )
+from app.core.passwords import hash_password
 from app.services.audit import (
     log_audit as audit_log_service,
     log_audit_from_user,
@@ -23,6 +23,8 @@ from app.services.audit import (
     AuditActions,
     AuditTargetTypes,
 )
+from app.services import admin_stats
+from app.services.user_directory import filter_criteria, list_users_page
 import json
 import logging
 
@@ -77,6 +79,8 @@ class AdminStatsResponse(BaseModel):
     archived_channels: int
     total_messages: int
     total_teams: int
+    messages_approximate: bool = False
+    computed_at: Optional[str] = None
 
 
 class AuditLogEntry(BaseModel):
@@ -107,39 +111,30 @@ class AuditLogResponse(BaseModel):
 
 @router.get("/stats", response_model=AdminStatsResponse)
 async def get_admin_stats(
+    refresh: bool = Query(False, description="Recompute instead of serving the cached snapshot"),
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get admin dashboard statistics"""
+    """Get admin dashboard statistics (cached snapshot, see app/services/admin_stats.py)"""
     user = await require_admin(db, current_user)
     
-    # User stats
-    total_users = await db.scalar(select(func.count(User.id)))
-    active_users = await db.scalar(select(func.count(User.id)).where(User.is_active == True))
-    banned_users = await db.scalar(select(func.count(User.id)).where(User.is_banned == True))
-    muted_users = await db.scalar(select(func.count(User.id)).where(User.is_muted == True))
+    stats = await admin_stats.get_stats(db, refresh=refresh)
     
-    # Channel stats
-    total_channels = await db.scalar(select(func.count(Channel.id)))
-    archived_channels = await db.scalar(select(func.count(Channel.id)).where(Channel.is_archived == True))
-    
-    # Message stats
-    total_messages = await db.scalar(select(func.count(Message.id)).where(Message.is_deleted == False))
-    
-    # Team stats
-    total_teams = await db.scalar(select(func.count(Team.id)))
-    
-    await log_audit(db, user.id, "admin.view_stats", "system", None, None)
+    # Dashboards poll; audit the view once per interval rather than per refresh
+    if admin_stats.should_audit_view(user.id):
+        await log_audit(db, user.id, "admin.view_stats", "system", None, None)
     
     return AdminStatsResponse(
-        total_users=total_users or 0,
-        active_users=active_users or 0,
-        banned_users=banned_users or 0,
-        muted_users=muted_users or 0,
-        total_channels=total_channels or 0,
-        archived_channels=archived_channels or 0,
-        total_messages=total_messages or 0,
-        total_teams=total_teams or 0
+        total_users=stats["users"]["total"],
+        active_users=stats["users"]["active"],
+        banned_users=stats["users"]["banned"],
+        muted_users=stats["users"]["muted"],
+        total_channels=stats["channels"]["total"],
+        archived_channels=stats["channels"]["archived"],
+        total_messages=stats["messages"]["total"],
+        total_teams=stats["teams"]["total"],
+        messages_approximate=stats["messages"]["approximate"],
+        computed_at=stats["computed_at"],
     )
 
 
@@ -262,47 +257,26 @@ async def list_users(
     search: Optional[str] = None,
     role: Optional[str] = None,
     status: Optional[str] = None,  # active, banned, muted
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides skip)"),
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """List all users with filters"""
     await require_permission(Permission.VIEW_USERS, db, current_user)
     
-    query = select(User)
-    
-    # Apply filters
-    if search:
-        query = query.where(
-            or_(
-                User.username.ilike(f"%{search}%"),
-                User.email.ilike(f"%{search}%"),
-                User.display_name.ilike(f"%{search}%")
-            )
+    if status not in ("active", "banned", "muted"):
+        status = None
+    try:
+        user_page = await list_users_page(
+            db,
+            filter_criteria(search=search, role=role, status=status, include_deleted=True),
+            limit=limit,
+            offset=skip,
+            cursor=cursor,
         )
-    
-    if role:
-        try:
-            role_enum = UserRole(role)
-            query = query.where(User.role == role_enum)
-        except ValueError:
-            pass
-    
-    if status == "banned":
-        query = query.where(User.is_banned == True)
-    elif status == "muted":
-        query = query.where(User.is_muted == True)
-    elif status == "active":
-        query = query.where(and_(User.is_active == True, User.is_banned == False))
-    
-    # Get total count
-    count_query = select(func.count()).select_from(query.subquery())
-    total = await db.scalar(count_query)
-    
-    # Apply pagination and ordering
-    query = query.order_by(User.created_at.desc()).offset(skip).limit(limit)
-    
-    result = await db.execute(query)
-    users = result.scalars().all()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    users = user_page.users
     
     return {
         "users": [
@@ -326,9 +300,10 @@ async def list_users(
             }
             for u in users
         ],
-        "total": total,
+        "total": user_page.total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": user_page.next_cursor,
     }
 
 
@@ -418,7 +393,7 @@ async def create_user(
     user = User(
         username=request.username,
         email=request.email,
-        hashed_password=get_password_hash(request.password),
+        hashed_password=await hash_password(request.password),
         display_name=request.display_name or request.username,
         role=role_value,
         is_system_admin=is_sys_admin
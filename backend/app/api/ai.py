@@ -3,7 +3,8 @@ AI Advisory API Endpoints
 
 Provides:
 - GET /api/ai/recommendations - List AI recommendations
-- POST /api/ai/run - Trigger on-demand AI analysis
+- POST /api/ai/run - Start on-demand AI analysis (returns a job id)
+- GET /api/ai/jobs/{job_id} - Poll analysis job status and progress
 - POST /api/ai/recommendations/{id}/dismiss - Dismiss a recommendation
 - GET /api/ai/status - Get AI engine status and badge count
 - GET /api/ai/scheduler/status - Get scheduler status (Phase 4.2)
@@ -21,19 +22,21 @@ import json
 
 from app.core.security import get_current_user
 from app.db.database import get_db
+from app.permissions.engine import rbac
 from app.db.models import User, AIRecommendation
 from app.db.enums import (
     AIRecommendationType, AIRecommendationScope, AIGenerationMode, AIRecommendationStatus,
     AIRecommendationPriority, AIRecommendationCategory, AIRiskLevel  # Phase 5.1
 )
 from app.ai import (
-    run_all_analysis,
     get_recommendations,
     get_recommendation_count,
     dismiss_recommendation,
     run_recommendation_engine,  # Phase 9.2
 )
 from app.ai.scheduler import get_scheduler_status, trigger_job  # Phase 4.2
+from app.ai.scheduler_store import get_lease, load_job_states, as_naive_utc
+from app.ai.jobs import start_analysis_job, get_analysis_job, list_analysis_jobs, get_active_job
 from app.ai.safety import get_ai_safety_status  # Phase 5.1 - AI write safety
 from sqlalchemy import select
 
@@ -46,12 +49,8 @@ router = APIRouter()
 
 async def _check_admin(db: AsyncSession, user_id: int) -> bool:
     """Check if user is admin (system_admin or team_admin)."""
-    q = select(User.is_system_admin, User.role).where(User.id == user_id)
-    result = await db.execute(q)
-    row = result.one_or_none()
-    if not row:
-        return False
-    return row[0] or row[1] in ('system_admin', 'team_admin')
+    grants = await rbac.grants(db, user_id)
+    return bool(grants and grants.is_team_admin)
 
 
 def _serialize_recommendation(rec: AIRecommendation) -> dict:
@@ -152,7 +151,7 @@ async def get_ai_status(
     return {
         "active_recommendations": count,
         "has_new_insights": count > 0,
-        "engine_status": "ready",  # STUB: Always ready for now
+        "engine_status": "running" if await get_active_job(db, AIGenerationMode.on_demand) else "ready",
         "last_auto_run": None,  # STUB: No tracking yet
     }
 
@@ -269,31 +268,69 @@ async def list_recommendations(
 
 @router.post("/run")
 async def run_ai_analysis(
+    wait: bool = Query(False, description="Block until the analysis finishes"),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Trigger on-demand AI analysis.
-    Runs all AI modules and generates new recommendations.
+    
+    Starts an analysis job (modules run concurrently in the background) and
+    returns its job id immediately; poll GET /api/ai/jobs/{job_id}.
+    If an on-demand job is already running on any worker, that job is
+    returned.
     Admin only.
     """
     user_id = current_user.get('user_id')
     if not await _check_admin(db, user_id):
         raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
     
-    result = await run_all_analysis(db, mode=AIGenerationMode.on_demand)
+    job = await start_analysis_job(db, AIGenerationMode.on_demand, requested_by_id=user_id, wait=wait)
     
     return {
-        "status": result.get("status", "unknown"),
-        "mode": "on_demand",
-        "modules": result.get("modules", {}),
-        "total_recommendations": result.get("total_recommendations", 0),
-        "started_at": result.get("started_at"),
-        "completed_at": result.get("completed_at"),
-        "message": "AI analysis completed (no recommendations yet - AI logic not implemented)",
+        **job.to_dict(),
+        "message": "AI analysis completed" if job.finished else "AI analysis started",
     }
 
 
+@router.get("/jobs")
+async def list_ai_jobs(
+    limit: int = Query(20, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List recent analysis jobs (most recent first).
+    Admin only.
+    """
+    user_id = current_user.get('user_id')
+    if not await _check_admin(db, user_id):
+        raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
+    
+    return {"jobs": [job.to_dict() for job in await list_analysis_jobs(db, limit)]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_ai_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get status, progress and per-module timing of an analysis job.
+    Admin only.
+    """
+    user_id = current_user.get('user_id')
+    if not await _check_admin(db, user_id):
+        raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
+    
+    job = await get_analysis_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail={"error": "not_found", "message": "Analysis job not found"})
+    
+    return job.to_dict()
+
+
 @router.post("/recommendations/run")
 async def run_ai_recommendations(
     current_user: dict = Depends(get_current_user),
@@ -599,6 +636,7 @@ async def get_scheduler_status_endpoint(
     - Whether scheduler is enabled/running
     - Last run times for each job
     - List of scheduled jobs with next run times
+    - Cluster leader and persistent job store (last run/duration/outcome)
     
     Admin only.
     """
@@ -606,7 +644,15 @@ async def get_scheduler_status_endpoint(
     if not await _check_admin(db, user_id):
         raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
     
-    return get_scheduler_status()
+    status = get_scheduler_status()
+    lease = await get_lease(db)
+    status["leader"] = {
+        "worker_id": lease.owner,
+        "acquired_at": as_naive_utc(lease.acquired_at).isoformat(),
+        "expires_at": as_naive_utc(lease.expires_at).isoformat(),
+    } if lease else None
+    status["job_store"] = await load_job_states(db)
+    return status
 
 
 @router.post("/scheduler/trigger/{job_id}")
@@ -622,6 +668,8 @@ async def trigger_scheduler_job(
     - nightly_analysis: Run full AI analysis and recommendation generation
     - weekly_cleanup: Clean up old dismissed/expired recommendations
     - expiry_check: Check and mark expired recommendations
+    - notification_archive: Move old read notifications to the archive
+    - inventory_reconciliation: Check inventory snapshots against the ledger, rebuild drifted items
     
     Admin only.
     """
@@ -629,15 +677,15 @@ async def trigger_scheduler_job(
     if not await _check_admin(db, user_id):
         raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
     
-    valid_jobs = ["nightly_analysis", "weekly_cleanup", "expiry_check", "daily_sales_summary"]
+    valid_jobs = ["nightly_analysis", "weekly_cleanup", "expiry_check", "daily_sales_summary", "notification_archive", "inventory_reconciliation"]
     if job_id not in valid_jobs:
         raise HTTPException(status_code=400, detail={
             "error": "invalid_job",
             "message": f"Invalid job ID. Valid jobs: {', '.join(valid_jobs)}",
         })
     
-    # Trigger the requested job directly (daily_sales_summary is handled by trigger_job -> run_daily_sales_summary)
-    result = await trigger_job(job_id)
+    # Runs here, or is routed to the scheduler leader when one is running elsewhere
+    result = await trigger_job(job_id, requested_by_id=user_id)
     return result
 
 
@@ -658,7 +706,7 @@ async def run_expiry_check_endpoint(
     if not await _check_admin(db, user_id):
         raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
     
-    result = await trigger_job("expiry_check")
+    result = await trigger_job("expiry_check", requested_by_id=user_id)
     return result
 
 
@@ -8,7 +8,8 @@ import logging
 
 from app.db.database import get_db
 from app.db.models import User, UserOperationalRole
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import create_access_token
+from app.core.passwords import hash_password, verify_and_update, verify_password
 # Use the lightweight JWT dependency from security and resolve to DB User via app.api.deps.get_current_user
 from app.api.deps import get_current_user
 # Use lower-level JWT dependency here to catch and handle unexpected errors during user resolution
@@ -81,7 +82,10 @@ async def login(
     result = await db.execute(query)
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(request.password, user.hashed_password):
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_and_update(request.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username/email or password",
@@ -97,8 +101,10 @@ async def login(
     from datetime import datetime, timezone as dt_timezone
     is_first_login = user.last_login_at is None
     
-    # Update last login timestamp
+    # Update last login timestamp (and upgrade a hash made with an older cost)
     user.last_login_at = datetime.now(dt_timezone.utc)
+    if new_hash:
+        user.hashed_password = new_hash
     db.add(user)
     await db.commit()
     
@@ -189,7 +195,7 @@ async def register(
     user = User(
         username=request.username,
         email=request.email,
-        hashed_password=get_password_hash(request.password),
+        hashed_password=await hash_password(request.password),
         display_name=request.display_name or request.username,
         role=user_role,
     )
@@ -401,14 +407,14 @@ async def change_password(
     from datetime import datetime, timezone as dt_timezone
     
     # Verify current password
-    if not verify_password(request.current_password, current_user.hashed_password):
+    if not await verify_password(request.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect",
         )
     
     # Update password
-    current_user.hashed_password = get_password_hash(request.new_password)
+    current_user.hashed_password = await hash_password(request.new_password)
     current_user.must_change_password = False
     current_user.password_changed_at = datetime.now(dt_timezone.utc)
     
@@ -2,20 +2,23 @@
 Automation Engine API Endpoints (Phase 6.1)
 Task management endpoints for the new automation engine.
 """
-from typing import Optional, Union
+import json
+from typing import Literal, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.db.models import TaskAssignment, UserOperationalRole
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import get_current_user
 from app.core.logging import automation_logger
 from app.db.database import get_db
-from app.db.models import User
+from app.db.models import AutomationRule, User
 from app.db.enums import AutomationTaskType, AutomationTaskStatus
 from app.automation.service import AutomationService, ClaimConflictError, ClaimPermissionError, ClaimInvalidStateError, ClaimNotFoundError
+from app.services.dispatch import DispatchError, dispatch_task, queue_depths
 from app.automation.schemas import (
     TaskCreate,
     TaskResponse,
@@ -25,7 +28,11 @@ from app.automation.schemas import (
     AssignmentComplete,
     TaskEventResponse,
     ClaimRequest,
+    RuleCreate,
+    RuleUpdate,
+    RuleResponse,
 )
+from app.automation.rule_engine import compile_rule, rule_engine
 
 router = APIRouter(prefix="/automation", tags=["Automation"])
 
@@ -190,6 +197,8 @@ async def list_tasks(
     task_type: Optional[AutomationTaskType] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    view: Literal["full", "slim"] = "full",
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
@@ -197,6 +206,9 @@ async def list_tasks(
     List automation tasks with optional filters.
     
     System admins see all tasks; regular users see only their own.
+    Page with `cursor` (from next_cursor) rather than `offset`.
+    view=slim returns list columns only: no description, metadata,
+    assignments or order details.
     """
     user_id = current_user["user_id"]
     user = await _get_user(db, user_id)
@@ -204,15 +216,28 @@ async def list_tasks(
     # Filter by creator unless system admin
     created_by_id = None if user.is_system_admin else user_id
     
-    tasks = await AutomationService.list_tasks(
-        db=db,
-        status=status,
-        task_type=task_type,
-        created_by_id=created_by_id,
-        limit=limit,
-        offset=offset,
-        current_user=user,
-    )
+    try:
+        page = await AutomationService.list_tasks_page(
+            db=db,
+            status=status,
+            task_type=task_type,
+            created_by_id=created_by_id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            current_user=user,
+            slim=view == "slim",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    tasks = page.tasks
+
+    if view == "slim":
+        return TaskListResponse(
+            tasks=[_task_to_slim_response(t) for t in tasks],
+            total=page.total,
+            next_cursor=page.next_cursor,
+        )
 
     # Enrich tasks with order details when present (best-effort)
     enriched = []
@@ -359,7 +384,8 @@ async def list_tasks(
 
     return TaskListResponse(
         tasks=enriched,
-        total=len(enriched),
+        total=page.total,
+        next_cursor=page.next_cursor,
     )
 
 
@@ -376,6 +402,40 @@ async def available_tasks(
     return TaskListResponse(tasks=[_task_to_response(t) for t in tasks], total=len(tasks))
 
 
+@router.get("/dispatch/queues")
+async def dispatch_queues(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Claim queue depth per role, with active staff and the open assignments they carry."""
+    return {"roles": await queue_depths(db)}
+
+
+@router.post("/tasks/{task_id}/dispatch", response_model=TaskResponse)
+async def dispatch_task_endpoint(
+    task_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Admin-only: claim a role task for the least-loaded member of its role."""
+    user = await _get_user(db, current_user["user_id"])
+    if not user.is_system_admin:
+        raise HTTPException(status_code=403, detail="Only system admins can dispatch tasks")
+
+    try:
+        task = await dispatch_task(db, task_id)
+    except ClaimNotFoundError:
+        raise HTTPException(status_code=404, detail="Task not found")
+    except DispatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ClaimConflictError:
+        raise HTTPException(status_code=409, detail="Task already claimed")
+    except ClaimInvalidStateError:
+        raise HTTPException(status_code=400, detail="Task is not open for claim")
+
+    return _task_to_response(task)
+
+
 @router.get("/tasks/{task_id}", response_model=TaskResponse)
 async def get_task(
     task_id: int,
@@ -1100,6 +1160,122 @@ async def get_my_assignments(
     return [_assignment_to_response(a) for a in assignments]
 
 
+# ---------------------- Rules ----------------------
+
+async def _require_admin(db: AsyncSession, current_user: dict) -> User:
+    user = await _get_user(db, current_user["user_id"])
+    if not user.is_system_admin:
+        raise HTTPException(status_code=403, detail="Only system admins can manage automation rules")
+    return user
+
+
+def _rule_to_response(rule: AutomationRule) -> RuleResponse:
+    return RuleResponse(
+        id=rule.id,
+        name=rule.name,
+        event=rule.event,
+        conditions=json.loads(rule.conditions or "{}"),
+        actions=json.loads(rule.actions or "[]"),
+        is_active=rule.is_active,
+        created_by_id=rule.created_by_id,
+        created_at=rule.created_at,
+        updated_at=rule.updated_at,
+    )
+
+
+async def _get_rule(db: AsyncSession, rule_id: int) -> AutomationRule:
+    rule = await db.get(AutomationRule, rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return rule
+
+
+@router.get("/rules")
+async def list_rules(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Admin-only: stored rules, plus every loaded rule (code and stored) with its counters."""
+    await _require_admin(db, current_user)
+    rows = (await db.execute(select(AutomationRule).order_by(AutomationRule.id))).scalars().all()
+    await rule_engine.ensure_loaded(db)
+    return {"rules": [_rule_to_response(r) for r in rows], "engine": rule_engine.stats()}
+
+
+@router.post("/rules", response_model=RuleResponse, status_code=status.HTTP_201_CREATED)
+async def create_rule(
+    payload: RuleCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Admin-only: add a rule; active on every pod once committed."""
+    user = await _require_admin(db, current_user)
+    try:
+        compile_rule(payload.model_dump(), source="db")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rule = AutomationRule(
+        name=payload.name,
+        event=payload.event,
+        conditions=json.dumps(payload.conditions),
+        actions=json.dumps(payload.actions),
+        is_active=payload.is_active,
+        created_by_id=user.id,
+    )
+    db.add(rule)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=f"A rule named {payload.name!r} already exists")
+    await db.refresh(rule)
+    return _rule_to_response(rule)
+
+
+@router.patch("/rules/{rule_id}", response_model=RuleResponse)
+async def update_rule(
+    rule_id: int,
+    payload: RuleUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Admin-only: change a stored rule's event, conditions, actions or active flag."""
+    await _require_admin(db, current_user)
+    rule = await _get_rule(db, rule_id)
+    changes = payload.model_dump(exclude_unset=True)
+    merged = {
+        "name": rule.name,
+        "event": changes.get("event") or rule.event,
+        "conditions": changes["conditions"] if changes.get("conditions") is not None else json.loads(rule.conditions or "{}"),
+        "actions": changes.get("actions") or json.loads(rule.actions or "[]"),
+    }
+    try:
+        compile_rule(merged, source="db")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rule.event = merged["event"]
+    rule.conditions = json.dumps(merged["conditions"])
+    rule.actions = json.dumps(merged["actions"])
+    if changes.get("is_active") is not None:
+        rule.is_active = changes["is_active"]
+    await db.commit()
+    await db.refresh(rule)
+    return _rule_to_response(rule)
+
+
+@router.delete("/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_rule(
+    rule_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Admin-only: remove a stored rule."""
+    await _require_admin(db, current_user)
+    rule = await _get_rule(db, rule_id)
+    await db.delete(rule)
+    await db.commit()
+
+
 # ---------------------- Response Helpers ----------------------
 
 def _task_to_response(task) -> TaskResponse:
@@ -1165,6 +1341,22 @@ def _task_to_response(task) -> TaskResponse:
     )
 
 
+def _task_to_slim_response(task) -> TaskResponse:
+    """Convert a slim-loaded task (list columns only) to a response schema."""
+    return TaskResponse(
+        id=task.id,
+        task_type=task.task_type.name.upper() if hasattr(task.task_type, 'name') else str(task.task_type).upper(),
+        status=task.status,
+        title=task.title,
+        description=None,
+        created_by_id=task.created_by_id,
+        related_order_id=task.related_order_id,
+        metadata=None,
+        created_at=task.created_at,
+        updated_at=task.updated_at,
+    )
+
+
 def _assignment_to_response(assignment) -> AssignmentResponse:
     """Convert assignment model to response schema."""
     from app.automation.schemas import UserBrief
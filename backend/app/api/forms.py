@@ -14,16 +14,19 @@ import json
 from typing import Optional, List
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from pydantic import BaseModel, Field
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.db.database import get_db
-from app.db.models import Form, FormField, FormVersion, FormSubmission, User, Inventory, RawMaterial
+from app.db.models import Form, FormField, FormVersion, FormSubmission, User
 from app.db.enums import FormFieldType, FormCategory, UserRole
 from app.core.security import get_current_user, require_admin
+from app.core.config import settings
+from app.services.form_queue import form_queue
+from app.services.form_registry import CompiledForm, form_registry
 
 
 router = APIRouter(prefix="/forms", tags=["Forms"])
@@ -165,6 +168,8 @@ class FormVersionResponse(BaseModel):
 
 class FormSubmissionCreate(BaseModel):
     data: dict = Field(..., description="Form field values")
+    idempotency_key: Optional[str] = Field(None, max_length=255, description="Retries with the same key return the first submission")
+    process_async: bool = Field(False, description="Acknowledge as pending (202) and process in the background")
 
 
 class FormSubmissionResponse(BaseModel):
@@ -176,6 +181,11 @@ class FormSubmissionResponse(BaseModel):
     result_type: Optional[str]
     error_message: Optional[str]
     created_at: Optional[datetime]
+    # Async processing progress (queued submissions only)
+    attempts: int = 0
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -228,25 +238,12 @@ def _field_to_response(field: FormField) -> FormFieldResponse:
 
 
 async def _resolve_dynamic_options(db: AsyncSession, fields: List[FormFieldResponse]):
-    """Resolve options_source fields by querying the database for live data."""
+    """Resolve options_source fields from the cached live option lists."""
     for field in fields:
-        if field.options_source == "products":
-            query = select(Inventory).order_by(Inventory.product_name)
-            result = await db.execute(query)
-            items = result.scalars().all()
-            field.options = [
-                {"label": item.product_name, "value": item.product_id}
-                for item in items
-                if item.product_name
-            ]
-        elif field.options_source == "raw_materials":
-            query = select(RawMaterial).order_by(RawMaterial.name)
-            result = await db.execute(query)
-            items = result.scalars().all()
-            field.options = [
-                {"label": f"{item.name} ({item.current_stock} {item.unit})", "value": item.id}
-                for item in items
-            ]
+        if field.options_source:
+            options = await form_registry.options(db, field.options_source)
+            if options is not None:
+                field.options = options
 
 
 def _form_to_response(form: Form, include_fields: bool = True) -> FormResponse:
@@ -272,6 +269,25 @@ def _form_to_response(form: Form, include_fields: bool = True) -> FormResponse:
     )
 
 
+def _compiled_to_response(form: CompiledForm, fields) -> FormResponse:
+    """Build the response for a compiled form with the given (visible) fields."""
+    return FormResponse(
+        id=form.id,
+        slug=form.slug,
+        name=form.name,
+        description=form.description,
+        category=form.category,
+        allowed_roles=list(form.allowed_roles) if form.allowed_roles else None,
+        service_target=form.service_target,
+        field_mapping=dict(form.field_mapping) if form.field_mapping is not None else None,
+        is_active=form.is_active,
+        current_version=form.current_version,
+        created_at=form.created_at,
+        updated_at=form.updated_at,
+        fields=[FormFieldResponse(**f.as_dict()) for f in fields],
+    )
+
+
 async def _create_version_snapshot(db: AsyncSession, form: Form, user_id: int, change_notes: str = None):
     """Create a version snapshot of the current form state."""
     # Build snapshot
@@ -319,6 +335,24 @@ async def _create_version_snapshot(db: AsyncSession, form: Form, user_id: int, c
     db.add(version)
 
 
+def _submission_to_response(submission: FormSubmission) -> FormSubmissionResponse:
+    """Convert FormSubmission model to response schema."""
+    return FormSubmissionResponse(
+        id=submission.id,
+        form_id=submission.form_id,
+        form_version=submission.form_version,
+        status=submission.status,
+        result_id=submission.result_id,
+        result_type=submission.result_type,
+        error_message=submission.error_message,
+        created_at=submission.created_at,
+        attempts=submission.attempts or 0,
+        queued_at=submission.queued_at,
+        started_at=submission.started_at,
+        processed_at=submission.processed_at,
+    )
+
+
 def _check_role_access(user_role: str, allowed_roles: List[str]) -> bool:
     """Check if user's role is in the allowed roles list."""
     if not allowed_roles:
@@ -331,27 +365,6 @@ def _check_role_access(user_role: str, allowed_roles: List[str]) -> bool:
     return user_role in allowed_roles
 
 
-def _filter_fields_by_role(fields: List[FormFieldResponse], user_role: str) -> List[FormFieldResponse]:
-    """Filter fields based on user's role visibility."""
-    filtered = []
-    for field in fields:
-        # If no role visibility set, field is visible to all
-        if not field.role_visibility:
-            filtered.append(field)
-            continue
-        
-        # Admin sees all
-        if user_role in ['system_admin', 'admin']:
-            filtered.append(field)
-            continue
-        
-        # Check if user's role is in visibility list
-        if user_role in field.role_visibility:
-            filtered.append(field)
-    
-    return filtered
-
-
 # ============================================================================
 # Admin CRUD Endpoints
 # ============================================================================
@@ -1130,23 +1143,19 @@ async def get_form_by_slug(
     Returns fields filtered by user's role.
     Public endpoint (authenticated).
     """
-    query = select(Form).options(selectinload(Form.fields)).where(Form.slug == slug, Form.is_active == True)
-    result = await db.execute(query)
-    form = result.scalar_one_or_none()
+    # Compiled definition: one version probe when cached
+    form = await form_registry.get(db, slug)
     
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     
     # Check role access
-    allowed_roles = _parse_json_field(form.allowed_roles)
     user_role = current_user.get("role", "member")
     
-    if not _check_role_access(user_role, allowed_roles):
+    if not form.can_access(user_role):
         raise HTTPException(status_code=403, detail="You don't have permission to access this form")
     
-    # Get full response then filter fields
-    response = _form_to_response(form)
-    response.fields = _filter_fields_by_role(response.fields, user_role)
+    response = _compiled_to_response(form, form.fields_for(user_role))
 
     # Resolve dynamic options (e.g. products from inventory)
     await _resolve_dynamic_options(db, response.fields)
@@ -1200,6 +1209,7 @@ async def list_available_forms(
 async def submit_form(
     slug: str,
     payload: FormSubmissionCreate,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
@@ -1213,36 +1223,49 @@ async def submit_form(
     4. Recorded for audit
     
     Returns the submission record with result from the target service.
+    With process_async, steps 3-4 run in the background (app/services/form_queue.py):
+    the pending submission is returned with 202 and progress is pushed as
+    form:submission_status.
     """
     from app.services.form_submission import FormSubmissionService
     
-    # Get form with fields
-    query = select(Form).options(selectinload(Form.fields)).where(Form.slug == slug, Form.is_active == True)
-    result = await db.execute(query)
-    form = result.scalar_one_or_none()
+    # Compiled definition: one version probe when cached
+    form = await form_registry.get(db, slug)
     
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     
     # Check role access
-    allowed_roles = _parse_json_field(form.allowed_roles)
     user_role = current_user.get("role", "member")
     
-    if not _check_role_access(user_role, allowed_roles):
+    if not form.can_access(user_role):
         raise HTTPException(status_code=403, detail="You don't have permission to submit this form")
     
     # Validate required fields
-    missing = FormSubmissionService.validate_required_fields(form, payload.data)
+    missing = form.missing_required(payload.data)
     if missing:
         raise HTTPException(
             status_code=400, 
             detail=f"Missing required fields: {', '.join(missing)}"
         )
     
+    # Idempotent retry: return the submission this key already produced
+    from app.services.idempotency import IdempotencyConflictError
+    try:
+        submission = await FormSubmissionService.find_duplicate(
+            db, form, payload.data, int(current_user["user_id"]), payload.idempotency_key,
+        )
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if submission is not None:
+        if submission.status == "failed":
+            raise HTTPException(status_code=400, detail=submission.error_message or "Form submission failed")
+        return _submission_to_response(submission)
+
     # Create submission record
     submission = FormSubmission(
         form_id=form.id,
-        form_version=form.current_version or 1,
+        form_version=form.current_version,
         data=json.dumps(payload.data),
         service_target=form.service_target,
         status="pending",
@@ -1250,6 +1273,17 @@ async def submit_form(
     )
     db.add(submission)
     await db.flush()
+
+    # Async mode: acknowledge now, the form queue worker runs the handler
+    if payload.process_async and form.service_target and settings.FORM_QUEUE_ENABLED:
+        FormSubmissionService.enqueue(
+            db, form, payload.data, int(current_user["user_id"]), submission, payload.idempotency_key,
+        )
+        await db.commit()
+        await db.refresh(submission)
+        form_queue.notify()
+        response.status_code = status.HTTP_202_ACCEPTED
+        return _submission_to_response(submission)
     
     # Route to service
     status_result, result_id, error_message = await FormSubmissionService.submit(
@@ -1258,6 +1292,7 @@ async def submit_form(
         data=payload.data,
         user_id=current_user["user_id"],
         submission=submission,
+        idempotency_key=payload.idempotency_key,
     )
     
     # Update submission record
@@ -1272,21 +1307,13 @@ async def submit_form(
     if status_result == "failed":
         raise HTTPException(status_code=400, detail=error_message or "Form submission failed")
     
-    return FormSubmissionResponse(
-        id=submission.id,
-        form_id=submission.form_id,
-        form_version=submission.form_version,
-        status=submission.status,
-        result_id=submission.result_id,
-        result_type=submission.result_type,
-        error_message=submission.error_message,
-        created_at=submission.created_at,
-    )
+    return _submission_to_response(submission)
 
 
 @router.get("/{slug}/submissions", response_model=List[FormSubmissionResponse])
 async def list_submissions(
     slug: str,
+    status_filter: Optional[str] = Query(None, alias="status", description="pending | processing | processed | failed"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
     db: AsyncSession = Depends(get_db),
@@ -1306,30 +1333,15 @@ async def list_submissions(
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     
-    query = (
-        select(FormSubmission)
-        .where(FormSubmission.form_id == form.id)
-        .order_by(FormSubmission.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    )
+    query = select(FormSubmission).where(FormSubmission.form_id == form.id)
+    if status_filter:
+        query = query.where(FormSubmission.status == status_filter)
+    query = query.order_by(FormSubmission.created_at.desc()).limit(limit).offset(offset)
     
     result = await db.execute(query)
     submissions = result.scalars().all()
     
-    return [
-        FormSubmissionResponse(
-            id=s.id,
-            form_id=s.form_id,
-            form_version=s.form_version,
-            status=s.status,
-            result_id=s.result_id,
-            result_type=s.result_type,
-            error_message=s.error_message,
-            created_at=s.created_at,
-        )
-        for s in submissions
-    ]
+    return [_submission_to_response(s) for s in submissions]
 
 
 @router.get("/{slug}/submissions/{submission_id}")
@@ -1375,4 +1387,8 @@ async def get_submission(
         "error_message": submission.error_message,
         "submitted_by_id": submission.submitted_by_id,
         "created_at": submission.created_at,
+        "attempts": submission.attempts or 0,
+        "queued_at": submission.queued_at,
+        "started_at": submission.started_at,
+        "processed_at": submission.processed_at,
     }
@@ -6,12 +6,13 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from typing import Optional
 
 from app.core.security import get_current_user
 from app.core.logging import inventory_logger
 from app.db.database import get_db
+from app.permissions.engine import rbac
 from app.db.models import User, InventoryTransaction, Inventory, Sale
 from app.services.inventory import (
     list_inventory,
@@ -24,6 +25,8 @@ from app.services.inventory import (
     get_inventory_summary,
     update_low_stock_threshold,
 )
+from app.services.rollups import reverse_sale_rollup
+from app.services.inventory_snapshots import record_ledger_change, stock_as_of
 from app.services.task_engine import emit_event
 from app.core.events import EventType
 
@@ -32,13 +35,8 @@ router = APIRouter()
 
 async def _check_can_manage_inventory(db: AsyncSession, user_id: int) -> bool:
     """Check if user can manage inventory (create, restock, adjust)."""
-    q = select(User.is_system_admin, User.role).where(User.id == user_id)
-    result = await db.execute(q)
-    row = result.one_or_none()
-    if not row:
-        return False
-    is_admin = row[0] or row[1] == 'system_admin'
-    return is_admin or row[1] == 'team_admin'
+    grants = await rbac.grants(db, user_id)
+    return bool(grants and grants.is_team_admin)
 
 
 @router.get("/")
@@ -160,7 +158,6 @@ async def create_inventory(
     
     try:
         # Enforce operational permissions for creating inventory
-        from app.db.models import User
         q = select(User).where(User.id == user_id)
         result = await db.execute(q)
         db_user = result.scalar_one_or_none()
@@ -287,6 +284,43 @@ async def get_inventory_by_product(
     }
 
 
+@router.get("/product/{product_id}/stock-as-of")
+async def get_stock_as_of(
+    product_id: int,
+    at: str = Query(..., description="Date YYYY-MM-DD (end of day) or ISO datetime (UTC)"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get a product's ledger stock as of a date or point in time.
+
+    Served from daily ledger snapshots plus the partial day's transactions.
+
+    Permissions: Admin only
+    """
+    if not await _check_can_manage_inventory(db, current_user['user_id']):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        if len(at) == 10:
+            at_dt = datetime.combine(date.fromisoformat(at), time.max)
+        else:
+            at_dt = datetime.fromisoformat(at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid 'at' format")
+
+    item = await get_inventory_item(db, product_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Inventory item not found")
+
+    return {
+        "product_id": item.product_id,
+        "inventory_item_id": item.id,
+        "at": at_dt.isoformat(),
+        "stock": await stock_as_of(db, item.id, at_dt),
+    }
+
+
 @router.post("/product/{product_id}/restock")
 async def restock_product(
     product_id: int,
@@ -301,7 +335,6 @@ async def restock_product(
     """
     user_id = current_user['user_id']
     # Enforce operational permission for inventory update (restock)
-    from app.db.models import User
     q = select(User).where(User.id == user_id)
     result = await db.execute(q)
     db_user = result.scalar_one_or_none()
@@ -391,7 +424,6 @@ async def adjust_product_inventory(
     """
     user_id = current_user['user_id']
     # Enforce operational permission for inventory update (adjust)
-    from app.db.models import User
     q = select(User).where(User.id == user_id)
     result = await db.execute(q)
     db_user = result.scalar_one_or_none()
@@ -643,6 +675,7 @@ async def reverse_transaction(
         notes=f"Reversal of transaction #{original.id}",
     )
     db.add(reversal)
+    await record_ledger_change(db, original.inventory_item_id, new_change)
 
     # Mark related sale as reversed when reversing a sale transaction
     reversed_sale = None
@@ -655,6 +688,15 @@ async def reverse_transaction(
             sale.reversed_by_id = int(current_user["user_id"])
             sale.reversed_at = datetime.utcnow()
             reversed_sale = sale
+            await reverse_sale_rollup(db, sale)
+
+    # Event joins the transaction (the reversal alert is a durable subscriber)
+    await db.flush()
+    await emit_event(EventType.TRANSACTION_REVERSED, {
+        'original_transaction_id': original.id,
+        'reversal_id': reversal.id,
+        'user_id': int(current_user['user_id']),
+    }, session=db)
 
     await db.commit()
     await db.refresh(reversal)
@@ -668,13 +710,6 @@ async def reverse_transaction(
             "order_id": reversed_sale.related_order_id,
         }))
 
-    # Emit event for real-time listeners
-    await emit_event(EventType.TRANSACTION_REVERSED, {
-        'original_transaction_id': original.id,
-        'reversal_id': reversal.id,
-        'user_id': int(current_user['user_id']),
-    })
-
     return {
         "id": reversal.id,
         "inventory_item_id": reversal.inventory_item_id,
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, and_, or_
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
@@ -9,6 +8,7 @@ from datetime import datetime
 from app.db.database import get_db
 from app.db.models import Notification, NotificationType, User, Channel, Message
 from app.core.security import get_current_user
+from app.services import notification_inbox
 
 router = APIRouter()
 
@@ -45,24 +45,20 @@ class NotificationCountResponse(BaseModel):
 async def list_notifications(
     limit: int = 50,
     unread_only: bool = False,
+    before_id: Optional[int] = None,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get notifications for the current user"""
-    query = select(Notification).where(Notification.user_id == current_user["user_id"])
-    
-    if unread_only:
-        query = query.where(Notification.is_read == False)
-    
-    query = query.order_by(Notification.created_at.desc()).limit(limit)
-    query = query.options(selectinload(Notification.sender))
-    
-    result = await db.execute(query)
-    notifications = result.scalars().all()
+    """Get notifications for the current user (newest first; pass the last id as before_id for the next page)"""
+    notifications = await notification_inbox.list_inbox(
+        db, current_user["user_id"], unread_only=unread_only, limit=limit, before_id=before_id
+    )
+    senders = await notification_inbox.senders(db, (n.sender_id for n in notifications))
     
     response = []
     for n in notifications:
         n_type = n.type.value if hasattr(n.type, 'value') else n.type
+        sender = senders.get(n.sender_id)
         response.append(NotificationResponse(
             id=n.id,
             type=n_type,
@@ -71,8 +67,8 @@ async def list_notifications(
             channel_id=n.channel_id,
             message_id=n.message_id,
             sender_id=n.sender_id,
-            sender_username=n.sender.username if n.sender else None,
-            sender_display_name=n.sender.display_name if n.sender else None,
+            sender_username=sender.username if sender else None,
+            sender_display_name=sender.display_name if sender else None,
             task_id=n.task_id,
             order_id=n.order_id,
             inventory_id=n.inventory_id,
@@ -91,24 +87,8 @@ async def get_notification_count(
     db: AsyncSession = Depends(get_db)
 ):
     """Get unread and total notification count"""
-    # Get unread count
-    unread_query = select(func.count(Notification.id)).where(
-        and_(
-            Notification.user_id == current_user["user_id"],
-            Notification.is_read == False
-        )
-    )
-    unread_result = await db.execute(unread_query)
-    unread_count = unread_result.scalar() or 0
-    
-    # Get total count
-    total_query = select(func.count(Notification.id)).where(
-        Notification.user_id == current_user["user_id"]
-    )
-    total_result = await db.execute(total_query)
-    total_count = total_result.scalar() or 0
-    
-    return NotificationCountResponse(unread=unread_count, total=total_count)
+    counts = await notification_inbox.get_counts(db, current_user["user_id"])
+    return NotificationCountResponse(unread=counts.unread, total=counts.total)
 
 
 @router.post("/{notification_id}/read")
@@ -118,19 +98,19 @@ async def mark_notification_read(
     db: AsyncSession = Depends(get_db)
 ):
     """Mark a notification as read"""
-    query = select(Notification).where(
-        and_(
-            Notification.id == notification_id,
-            Notification.user_id == current_user["user_id"]
+    ids = await notification_inbox.mark_read(db, current_user["user_id"], Notification.id == notification_id)
+    if not ids:
+        # Already read, or not this user's
+        exists = await db.execute(
+            select(Notification.id).where(
+                and_(
+                    Notification.id == notification_id,
+                    Notification.user_id == current_user["user_id"]
+                )
+            )
         )
-    )
-    result = await db.execute(query)
-    notification = result.scalar_one_or_none()
-    
-    if not notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
-    
-    notification.is_read = True
+        if exists.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
     await db.commit()
     
     return {"success": True}
@@ -142,14 +122,7 @@ async def mark_all_notifications_read(
     db: AsyncSession = Depends(get_db)
 ):
     """Mark all notifications as read"""
-    stmt = update(Notification).where(
-        and_(
-            Notification.user_id == current_user["user_id"],
-            Notification.is_read == False
-        )
-    ).values(is_read=True)
-    
-    await db.execute(stmt)
+    await notification_inbox.mark_read(db, current_user["user_id"])
     await db.commit()
     
     return {"success": True}
@@ -198,7 +171,7 @@ async def mark_notifications_read_filtered(
     This endpoint supports marking a subset of notifications as read, e.g. when a user opens
     a DM or channel or views a thread.
     """
-    conditions = [Notification.user_id == current_user["user_id"], Notification.is_read == False]
+    conditions = []
 
     # Apply filters
     if request.channel_id is not None:
@@ -219,23 +192,20 @@ async def mark_notifications_read_filtered(
     if request.types:
         conditions.append(Notification.type.in_(request.types))
 
-    stmt = update(Notification).where(*conditions).values(is_read=True)
-    result = await db.execute(stmt)
+    updated = await notification_inbox.mark_read(db, current_user["user_id"], *conditions)
     await db.commit()
 
     # Emit updated unread count for the user
-    unread_query = select(func.count(Notification.id)).where(Notification.user_id == current_user["user_id"], Notification.is_read == False)
-    unread_res = await db.execute(unread_query)
-    unread_count = unread_res.scalar() or 0
+    counts = await notification_inbox.get_counts(db, current_user["user_id"])
 
     try:
         from app.services.notification_emitter import emit_notification_count_update
-        await emit_notification_count_update(current_user["user_id"], unread_count)
+        await emit_notification_count_update(current_user["user_id"], counts.unread)
     except Exception:
         # Non-fatal
         pass
 
-    return {"updated": result.rowcount}
+    return {"updated": len(updated)}
 
 # Helper function to create notifications (used by other modules)
 async def create_notification(
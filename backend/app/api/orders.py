@@ -7,7 +7,9 @@ from sqlalchemy.orm import selectinload
 from app.db.database import get_db
 from pydantic import BaseModel
 from app.services.task_engine import create_order
+from app.services.idempotency import IdempotencyConflictError
 from app.automation.order_triggers import OrderAutomationTriggers
+from app.services.role_directory import role_directory
 from app.core.logging import orders_logger
 from typing import Optional, List, Any
 from datetime import datetime
@@ -33,7 +35,7 @@ async def list_orders(
     Admin/storekeeper → all orders.
     Everyone else → only orders they created.
     """
-    from app.db.models import User, Sale, UserOperationalRole
+    from app.db.models import User, Sale
     from sqlalchemy import exists
 
     user_id = current_user["user_id"]
@@ -45,10 +47,7 @@ async def list_orders(
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    op_result = await db.execute(
-        select(UserOperationalRole).where(UserOperationalRole.user_id == user_id)
-    )
-    user_roles = {r.role for r in op_result.scalars().all()}
+    user_roles = set(await role_directory.roles_for_user(db, user_id))
     is_admin = db_user.is_system_admin or db_user.role == "system_admin"
     print("OPERATIONAL ROLES:", user_roles)
 
@@ -107,13 +106,15 @@ class CreateOrderRequest(BaseModel):
     customer_phone: Optional[str] = None
     payment_method: Optional[str] = None  # cash, card, transfer, credit
     internal_comment: Optional[str] = None
+    # Retries with the same key return the order already created
+    idempotency_key: Optional[str] = None
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_order_endpoint(request: CreateOrderRequest, current_user: dict = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     user_id = current_user["user_id"]
     # Fetch DB user and ensure permission to create orders
-    from app.db.models import User, UserOperationalRole
+    from app.db.models import User
     # Attach operational role onto a lightweight user-like object for permission resolution
     q = select(User).where(User.id == user_id)
     result = await db.execute(q)
@@ -122,10 +123,7 @@ async def create_order_endpoint(request: CreateOrderRequest, current_user: dict
         raise HTTPException(status_code=404, detail="User not found")
 
     # Attach operational role info onto db_user for permission resolution (read-only runtime)
-    op_result = await db.execute(
-        select(UserOperationalRole).where(UserOperationalRole.user_id == user_id)
-    )
-    op_roles = [r.role for r in op_result.scalars().all()]
+    op_roles = sorted(await role_directory.roles_for_user(db, user_id))
     print("OPERATIONAL ROLES:", op_roles)
     # Shadow SA relationship with plain string list (bypasses instrumentation)
     object.__setattr__(db_user, 'operational_roles', op_roles)
@@ -202,6 +200,7 @@ async def create_order_endpoint(request: CreateOrderRequest, current_user: dict
             customer_phone=request.customer_phone,
             payment_method=request.payment_method,
             internal_comment=request.internal_comment,
+            idempotency_key=request.idempotency_key,
         )
         orders_logger.info(
             "Order created successfully",
@@ -215,6 +214,8 @@ async def create_order_endpoint(request: CreateOrderRequest, current_user: dict
             await log_audit(db, db_user, action="create", resource="orders", resource_id=order.id, success=True)
         except Exception:
             pass
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         orders_logger.warning(
             "Order creation failed - validation error",
@@ -406,17 +407,14 @@ async def get_fulfill_payload(
     user_id = current_user["user_id"]
 
     # Check admin/storekeeper/sales_agent role via user_operational_roles
-    from app.db.models import User, UserOperationalRole
+    from app.db.models import User
     q = select(User).where(User.id == user_id)
     result = await db.execute(q)
     db_user = result.scalar_one_or_none()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    op_result = await db.execute(
-        select(UserOperationalRole).where(UserOperationalRole.user_id == user_id)
-    )
-    user_roles = {r.role for r in op_result.scalars().all()}
+    user_roles = set(await role_directory.roles_for_user(db, user_id))
     is_admin = db_user.is_system_admin or db_user.role == "system_admin"
 
     print("[FULFILL] user_id:", user_id, "is_system_admin:", db_user.is_system_admin, "user_roles:", user_roles)
@@ -546,7 +544,7 @@ async def record_sales_from_order(
     Convert an order into one or more sales atomically.
     Idempotent — calling twice with the same order returns existing sales.
     """
-    from app.db.models import User, UserOperationalRole
+    from app.db.models import User
     from app.services.sales import record_sale
 
     user_id = current_user["user_id"]
@@ -558,10 +556,7 @@ async def record_sales_from_order(
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    op_result = await db.execute(
-        select(UserOperationalRole).where(UserOperationalRole.user_id == user_id)
-    )
-    user_roles_rs = {r.role for r in op_result.scalars().all()}
+    user_roles_rs = set(await role_directory.roles_for_user(db, user_id))
     is_admin_rs = db_user.is_system_admin or db_user.role == "system_admin"
 
     print("[RECORD-SALES] user_id:", user_id, "is_system_admin:", db_user.is_system_admin, "user_roles:", user_roles_rs)
@@ -611,20 +606,27 @@ async def record_sales_from_order(
                 detail=f"Each item must have product_id, quantity, unit_price: {exc}",
             )
 
-        sale = await record_sale(
-            session=db,
-            product_id=product_id,
-            quantity=quantity,
-            unit_price=unit_price,
-            sold_by_user_id=user_id,
-            sale_channel=sale_channel,
-            related_order_id=order.id,
-            customer_name=order.customer_name,
-            customer_phone=order.customer_phone,
-            payment_method=order.payment_method,
-            reference=order.reference,
-            idempotency_key=f"order-{order.id}-{product_id}",
-        )
+        try:
+            sale = await record_sale(
+                session=db,
+                product_id=product_id,
+                quantity=quantity,
+                unit_price=unit_price,
+                sold_by_user_id=user_id,
+                sale_channel=sale_channel,
+                related_order_id=order.id,
+                customer_name=order.customer_name,
+                customer_phone=order.customer_phone,
+                payment_method=order.payment_method,
+                reference=order.reference,
+                # Retries return the sale already recorded for this order line
+                idempotency_key=f"order-{order.id}-{product_id}",
+            )
+        except IdempotencyConflictError:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Sale for product {product_id} was already recorded for this order with different values",
+            )
         sale_ids.append(sale.id)
 
     # Fire-and-forget: notify connected clients that order was converted
@@ -3,7 +3,8 @@ Processing API Endpoints (Agriculture Phase)
 
 Handles:
 - Recipe management (CRUD)
-- Processing batches (manufacturing runs)
+- Processing batches (manufacturing runs), single or a whole schedule
+- What-if production calculator (capacity and plan requirements)
 - Production analytics (admin-only)
 
 All processing operations are admin-only.
@@ -11,12 +12,12 @@ All processing operations are admin-only.
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Dict, Optional, List
+from pydantic import BaseModel, Field
 
 from app.core.security import get_current_user
 from app.db.database import get_db
-from app.db.models import User
+from app.permissions.engine import rbac
 from app.services.processing import (
     # Recipe management
     get_recipe,
@@ -26,6 +27,10 @@ from app.services.processing import (
     # Processing operations
     calculate_raw_material_requirements,
     process_batch,
+    plan_production,
+    process_batches,
+    production_calculator,
+    MAX_BATCHES_PER_PLAN,
     get_batch,
     list_batches,
     # Analytics
@@ -53,12 +58,23 @@ router = APIRouter()
 
 async def _check_admin(db: AsyncSession, user_id: int) -> bool:
     """Check if user is admin (system_admin or team_admin)."""
-    q = select(User.is_system_admin, User.role).where(User.id == user_id)
-    result = await db.execute(q)
-    row = result.one_or_none()
-    if not row:
-        return False
-    return row[0] or row[1] in ('system_admin', 'team_admin')
+    grants = await rbac.grants(db, user_id)
+    return bool(grants and grants.is_team_admin)
+
+
+def _serialize_batch(batch) -> dict:
+    return {
+        "batch_id": batch.id,
+        "batch_reference": batch.batch_reference,
+        "finished_product_id": batch.finished_product_id,
+        "quantity_produced": batch.quantity_produced,
+        "expected_quantity": batch.expected_quantity,
+        "actual_waste_quantity": batch.actual_waste_quantity,
+        "yield_efficiency": batch.yield_efficiency,
+        "status": batch.status,
+        "created_at": batch.created_at.isoformat() if batch.created_at else None,
+        "completed_at": batch.completed_at.isoformat() if batch.completed_at else None,
+    }
 
 
 # ============================================================================
@@ -91,6 +107,15 @@ class ProcessBatchRequest(BaseModel):
     waste_notes: Optional[str] = None  # Notes about waste cause
 
 
+class ProductionPlanRequest(BaseModel):
+    batches: List[ProcessBatchRequest] = Field(..., min_length=1, max_length=MAX_BATCHES_PER_PLAN)
+
+
+class ProductionCalculatorRequest(BaseModel):
+    plan: List[ProcessBatchRequest] = Field(default_factory=list, max_length=MAX_BATCHES_PER_PLAN)
+    stock_overrides: Dict[int, int] = Field(default_factory=dict)  # raw_material_id -> hypothetical stock
+
+
 # ============================================================================
 # Recipe Endpoints
 # ============================================================================
@@ -345,18 +370,7 @@ async def execute_batch(
             waste_notes=payload.waste_notes,
         )
         
-        return {
-            "batch_id": batch.id,
-            "batch_reference": batch.batch_reference,
-            "finished_product_id": batch.finished_product_id,
-            "quantity_produced": batch.quantity_produced,
-            "expected_quantity": batch.expected_quantity,
-            "actual_waste_quantity": batch.actual_waste_quantity,
-            "yield_efficiency": batch.yield_efficiency,
-            "status": batch.status,
-            "created_at": batch.created_at.isoformat() if batch.created_at else None,
-            "completed_at": batch.completed_at.isoformat() if batch.completed_at else None,
-        }
+        return _serialize_batch(batch)
     except RecipeNotFoundError as e:
         raise HTTPException(status_code=404, detail={"error": "no_recipe", "message": str(e)})
     except InsufficientRawMaterialError as e:
@@ -369,6 +383,100 @@ async def execute_batch(
         raise HTTPException(status_code=getattr(e, 'http_code', 500), detail={"error": "processing_error", "message": str(e)})
 
 
+@router.post("/batches/plan")
+async def plan_batches(
+    payload: ProductionPlanRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Feasibility plan for a production schedule (many batches, any products).
+    Does NOT execute - returns combined raw material requirements, the
+    shortfall per material and which batches fit in input order.
+    """
+    user_id = current_user.get('user_id')
+    if not await _check_admin(db, user_id):
+        raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
+    
+    try:
+        return await plan_production(db, [b.model_dump() for b in payload.batches])
+    except RecipeNotFoundError as e:
+        raise HTTPException(status_code=404, detail={"error": "no_recipe", "message": str(e)})
+    except ProductNotFoundError as e:
+        raise HTTPException(status_code=404, detail={"error": "not_found", "message": str(e)})
+    except ProcessingValidationError as e:
+        raise HTTPException(status_code=400, detail={"error": "validation_error", "message": str(e)})
+
+
+@router.post("/batches/bulk")
+async def execute_batches(
+    payload: ProductionPlanRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Post a whole production schedule in one atomic transaction.
+    
+    Either every batch is recorded or none is. When raw materials are
+    short, the 409 response includes the feasibility plan.
+    """
+    user_id = current_user.get('user_id')
+    if not await _check_admin(db, user_id):
+        raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
+    
+    try:
+        batches = await process_batches(db, [b.model_dump() for b in payload.batches], processed_by_id=user_id)
+        return {"count": len(batches), "batches": [_serialize_batch(b) for b in batches]}
+    except RecipeNotFoundError as e:
+        raise HTTPException(status_code=404, detail={"error": "no_recipe", "message": str(e)})
+    except InsufficientRawMaterialError as e:
+        detail = {"error": "insufficient_materials", "message": str(e)}
+        if e.plan is not None:
+            detail["plan"] = e.plan
+        raise HTTPException(status_code=409, detail=detail)
+    except ProductNotFoundError as e:
+        raise HTTPException(status_code=404, detail={"error": "not_found", "message": str(e)})
+    except ProcessingValidationError as e:
+        raise HTTPException(status_code=400, detail={"error": "validation_error", "message": str(e)})
+    except ProcessingError as e:
+        raise HTTPException(status_code=getattr(e, 'http_code', 500), detail={"error": "processing_error", "message": str(e)})
+
+
+@router.post("/calculator")
+async def calculator(
+    payload: ProductionCalculatorRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    What-if production calculator for every product in one call.
+    Does NOT execute.
+    
+    - capacity: units of each product current stock allows, and the
+      limiting raw material
+    - plan: combined requirements and shortfall for the given schedule
+    
+    stock_overrides replaces the stock of any raw material for the
+    calculation only.
+    """
+    user_id = current_user.get('user_id')
+    if not await _check_admin(db, user_id):
+        raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": "Admin access required"})
+    
+    try:
+        return await production_calculator(
+            db,
+            plan=[b.model_dump() for b in payload.plan],
+            stock_overrides=payload.stock_overrides,
+        )
+    except RecipeNotFoundError as e:
+        raise HTTPException(status_code=404, detail={"error": "no_recipe", "message": str(e)})
+    except ProductNotFoundError as e:
+        raise HTTPException(status_code=404, detail={"error": "not_found", "message": str(e)})
+    except ProcessingValidationError as e:
+        raise HTTPException(status_code=400, detail={"error": "validation_error", "message": str(e)})
+
+
 @router.get("/batches/{batch_id}")
 async def get_batch_endpoint(
     batch_id: int,
@@ -12,6 +12,7 @@ from typing import Optional
 from app.core.security import get_current_user
 from app.core.logging import sales_logger
 from app.db.database import get_db
+from app.permissions.engine import rbac
 from app.services.sales import (
     record_sale, 
     get_sales_summary, 
@@ -19,6 +20,7 @@ from app.services.sales import (
     classify_sale,
     get_sale,
 )
+from app.services.rollups import aggregate_sales
 from app.db.models import Sale, Inventory, User
 from app.db.enums import SaleChannel, UserRole
 
@@ -26,14 +28,11 @@ router = APIRouter()
 
 
 async def _get_user_info(db: AsyncSession, user_id: int) -> tuple:
-    """Get user's admin status and username from DB. Returns (is_system_admin, role, username)."""
-    from sqlalchemy import select
-    q = select(User.is_system_admin, User.role, User.username).where(User.id == user_id)
-    result = await db.execute(q)
-    row = result.one_or_none()
-    if not row:
+    """Get user's admin status and username from the RBAC cache. Returns (is_system_admin, role, username)."""
+    grants = await rbac.grants(db, user_id)
+    if not grants:
         return (False, 'member', '')
-    return (row[0], row[1], row[2] or '')
+    return (grants.is_system_admin, grants.role, grants.username)
 
 
 def _get_effective_role(is_admin: bool, db_role: str, username: str) -> str:
@@ -196,6 +195,7 @@ async def create_sale(
         PermissionDeniedError,
         SalesError,
     )
+    from app.services.idempotency import IdempotencyConflictError
 
     user_id = current_user['user_id']
 
@@ -340,6 +340,12 @@ async def create_sale(
             status_code=getattr(e, 'http_code', 400), 
             detail={"error": "sales_error", "message": str(e)}
         )
+    except IdempotencyConflictError as e:
+        sales_logger.warning("Sale failed - idempotency key reused", error=str(e), user_id=user_id)
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "idempotency_conflict", "message": str(e)}
+        )
     except Exception as e:
         sales_logger.error("Sale failed - unexpected error", error=str(e), user_id=user_id)
         # Ensure rollback happened (belt and suspenders)
@@ -387,6 +393,108 @@ async def create_sale(
     return resp
 
 
+@router.post("/batch")
+async def create_sales_batch(
+    payload: dict,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Record many sales at once (offline sync).
+
+    Body: {"sales": [<create_sale payload>, ...]}. Same permissions as
+    POST /api/sales. Valid items are recorded in one transaction; each item
+    gets a result (created / duplicate / rejected with an error code). An
+    idempotency_key reused with different sale values is rejected with
+    idempotency_conflict rather than reported as a duplicate.
+    """
+    from app.services.sales import (
+        record_sales_batch,
+        PermissionDeniedError,
+        SalesError,
+    )
+    from app.db.models import UserOperationalRole
+    from app.audit.logger import log_audit
+
+    user_id = current_user['user_id']
+    db_user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    op_result = await db.execute(
+        select(UserOperationalRole.role).where(UserOperationalRole.user_id == user_id)
+    )
+    user_op_roles = set(op_result.scalars().all())
+    is_admin = db_user.is_system_admin or db_user.role == "system_admin"
+    allowed_sales_roles = {"admin", "storekeeper", "sales_agent"}
+    if not (is_admin or user_op_roles.intersection(allowed_sales_roles)):
+        await log_audit(db, db_user, action="create", resource="sales", success=False, reason="permission_denied")
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "permission_denied", "message": "Insufficient permissions to create sales"}
+        )
+    if not await _check_can_record_sale(db, user_id, SaleChannel.direct.value):
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "permission_denied", "message": "Not authorized to record this type of sale"}
+        )
+
+    items = payload.get('sales') if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "validation_error", "message": "Invalid payload: 'sales' must be a list"}
+        )
+
+    is_admin_flag, db_role, username = await _get_user_info(db, user_id)
+    effective_role = _get_effective_role(is_admin_flag, db_role, username)
+
+    try:
+        results = await record_sales_batch(db, items, user_id, caller_role=effective_role)
+    except PermissionDeniedError as e:
+        raise HTTPException(status_code=403, detail={"error": "permission_denied", "message": str(e)})
+    except SalesError as e:
+        sales_logger.warning("Sale batch failed", error=str(e), user_id=user_id, size=len(items))
+        raise HTTPException(
+            status_code=getattr(e, 'http_code', 400),
+            detail={"error": "sales_error", "message": str(e)}
+        )
+
+    created = [r.sale_id for r in results if r.status == "created"]
+    sales_logger.info("Sale batch recorded", user_id=user_id, size=len(items), created=len(created))
+    if created:
+        try:
+            await log_audit(db, db_user, action="create", resource="sales", resource_id=created[0], success=True)
+        except Exception:
+            pass
+
+        # Fire-and-forget: one notification for the whole batch
+        from app.core.realtime import ops_manager
+        asyncio.create_task(ops_manager.broadcast({
+            "type": "SALE_CREATED",
+            "sale_id": created[-1],
+            "sale_ids": created,
+        }))
+
+    return {
+        "results": [
+            {
+                "index": r.index,
+                "status": r.status,
+                "sale_id": r.sale_id,
+                "product_id": r.product_id,
+                "quantity": r.quantity,
+                "error": r.error,
+                "message": r.message,
+            }
+            for r in results
+        ],
+        "created": len(created),
+        "duplicates": sum(1 for r in results if r.status == "duplicate"),
+        "rejected": sum(1 for r in results if r.status == "rejected"),
+    }
+
+
 @router.get("/summary")
 async def sales_summary(
     start_date: Optional[str] = Query(None, description="Start date YYYY-MM-DD"),
@@ -480,12 +588,9 @@ async def daily_sales_totals(
     start = datetime(d.year, d.month, d.day)
     end = start + timedelta(days=1)
 
-    q = select(
-        func.coalesce(func.sum(Sale.total_amount), 0), 
-        func.coalesce(func.sum(Sale.quantity), 0)
-    ).where(Sale.created_at >= start, Sale.created_at < end)
-    res = await db.execute(q)
-    total_amount, total_quantity = res.one()
+    totals = (await aggregate_sales(db, start, end)).get((), {})
+    total_amount = totals.get("total_amount", 0)
+    total_quantity = totals.get("total_quantity", 0)
     is_admin = await _is_admin_user(db, current_user['user_id'])
     total_amt_out = float(total_amount) if is_admin else None
     return {
@@ -17,7 +17,7 @@ Phase 8.5.2 - Role & Permission Management:
 - System role protection (cannot delete/demote)
 - Last-admin protection across role changes
 """
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
@@ -33,9 +33,12 @@ from app.db.enums import UserRole
 from app.core.security import (
     get_current_user,
     require_admin,
-    get_password_hash,
     ROLE_PERMISSIONS,
 )
+from app.core.passwords import hash_password, password_hasher
+from app.services.form_queue import form_queue
+from app.core.event_bus import event_bus
+from app.integrations.webhook_dispatcher import webhook_dispatcher
 from app.core.config import settings
 from app.permissions.constants import Permission
 from app.core.rate_limit_config import (
@@ -131,6 +134,7 @@ class UserListResponse(BaseModel):
     total: int
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 class UserUpdateRequest(BaseModel):
@@ -364,48 +368,24 @@ async def list_system_users(
     search: Optional[str] = None,
     role: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides page)"),
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(require_manage_user_permission),
 ):
     """List all users with filters for system management."""
-    query = select(User)
+    from app.services.user_directory import filter_criteria, list_users_page
     
-    # Apply filters
-    if search:
-        query = query.where(
-            (User.username.ilike(f"%{search}%")) |
-            (User.email.ilike(f"%{search}%")) |
-            (User.display_name.ilike(f"%{search}%"))
+    try:
+        user_page = await list_users_page(
+            db,
+            filter_criteria(search=search, role=role, status=status),
+            limit=limit,
+            offset=(page - 1) * limit,
+            cursor=cursor,
         )
-    
-    if role:
-        try:
-            role_enum = UserRole(role)
-            query = query.where(User.role == role_enum)
-        except ValueError:
-            pass
-    
-    if status == "deleted":
-        query = query.where(User.deleted_at.is_not(None))
-    else:
-        query = query.where(User.deleted_at.is_(None))
-        if status == "active":
-            query = query.where(User.is_active == True, User.is_banned == False)
-        elif status == "inactive":
-            query = query.where(User.is_active == False)
-        elif status == "banned":
-            query = query.where(User.is_banned == True)
-    
-    # Get total count
-    count_result = await db.execute(select(func.count()).select_from(query.subquery()))
-    total = count_result.scalar() or 0
-    
-    # Apply pagination
-    offset = (page - 1) * limit
-    query = query.order_by(User.created_at.desc()).offset(offset).limit(limit)
-    
-    result = await db.execute(query)
-    users = result.scalars().all()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    users = user_page.users
     
     # Fetch operational roles for all users in batch
     user_ids = [u.id for u in users]
@@ -435,9 +415,10 @@ async def list_system_users(
                 created_at=u.created_at,
             ) for u in users
         ],
-        total=total,
+        total=user_page.total,
         page=page,
         limit=limit,
+        next_cursor=user_page.next_cursor,
     )
 
 
@@ -574,7 +555,7 @@ async def create_system_user(
     
     # 4. Generate secure temporary password (12-16 chars, no symbols)
     temp_password = generate_temp_password(14)
-    hashed_password = get_password_hash(temp_password)
+    hashed_password = await hash_password(temp_password)
     
     # 5. Determine the UserRole enum value based on role name or is_system_admin
     if request.is_system_admin:
@@ -1227,7 +1208,7 @@ async def reset_user_password(
     
     # Generate secure temporary password (16 chars, URL-safe)
     temp_password = secrets.token_urlsafe(12)
-    user.hashed_password = get_password_hash(temp_password)
+    user.hashed_password = await hash_password(temp_password)
     
     # Force password change on next login
     from datetime import datetime, timezone as dt_timezone
@@ -2382,58 +2363,34 @@ async def get_audit_target_types(
 
 @router.get("/stats")
 async def get_system_stats(
+    refresh: bool = Query(False, description="Recompute instead of serving the cached snapshot"),
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(require_system_admin),
 ):
-    """Get system-wide statistics."""
-    from app.db.models import Channel, Message, Team
-    
-    # User stats
-    total_users = await db.scalar(select(func.count(User.id)))
-    active_users = await db.scalar(
-        select(func.count(User.id)).where(User.is_active == True, User.is_banned == False)
-    )
-    admin_users = await db.scalar(
-        select(func.count(User.id)).where(User.is_system_admin == True)
-    )
-    banned_users = await db.scalar(
-        select(func.count(User.id)).where(User.is_banned == True)
-    )
+    """Get system-wide statistics (cached snapshot shared with /api/admin/stats)."""
+    from app.services import admin_stats
     
-    # Channel stats
-    total_channels = await db.scalar(select(func.count(Channel.id)))
-    
-    # Message stats
-    total_messages = await db.scalar(
-        select(func.count(Message.id)).where(Message.is_deleted == False)
-    )
-    
-    # Team stats
-    total_teams = await db.scalar(select(func.count(Team.id)))
-    
-    # Audit stats (last 24 hours)
-    yesterday = datetime.utcnow() - timedelta(days=1)
-    recent_actions = await db.scalar(
-        select(func.count(AuditLog.id)).where(AuditLog.created_at >= yesterday)
-    )
+    stats = await admin_stats.get_stats(db, refresh=refresh)
     
     return {
         "users": {
-            "total": total_users or 0,
-            "active": active_users or 0,
-            "admins": admin_users or 0,
-            "banned": banned_users or 0,
+            "total": stats["users"]["total"],
+            "active": stats["users"]["active_unbanned"],
+            "admins": stats["users"]["admins"],
+            "banned": stats["users"]["banned"],
         },
         "channels": {
-            "total": total_channels or 0,
-        },
-        "messages": {
-            "total": total_messages or 0,
+            "total": stats["channels"]["total"],
         },
+        "messages": stats["messages"],
         "teams": {
-            "total": total_teams or 0,
-        },
-        "audit": {
-            "last_24h": recent_actions or 0,
+            "total": stats["teams"]["total"],
         },
+        "audit": stats["audit"],
+        "computed_at": stats["computed_at"],
+        # Per-process, not cached: queue depth of this worker's hashing pool
+        "password_hashing": password_hasher.stats(),
+        "form_queue": form_queue.stats(),
+        "event_bus": event_bus.stats(),
+        "webhooks": webhook_dispatcher.stats(),
     }
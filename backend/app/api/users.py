@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 from typing import Optional, List
 
 from app.db.database import get_db
-from app.db.models import User, UserStatus, UserRole as UserRoleModel, Role, RolePermission
+from app.db.models import User, UserStatus
 from app.core.security import get_current_user
+from app.permissions.engine import current_grants
+from app.services.user_directory import MAX_AUTOCOMPLETE_RESULTS, mention_directory
 
 router = APIRouter()
 
@@ -174,14 +175,31 @@ def _serialize_user(user: User) -> dict:
     }
 
 
+@router.get("/autocomplete")
+async def autocomplete_users(
+    q: str = Query("", max_length=100, description="Username or display name prefix (leading @ ignored)"),
+    limit: int = Query(10, ge=1, le=MAX_AUTOCOMPLETE_RESULTS),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Active users for @mention pickers, served from the in-memory user directory."""
+    entries = await mention_directory.autocomplete(db, q, limit=limit)
+    return {"users": [e.as_dict() for e in entries]}
+
+
 @router.get("/", response_model=List[UserResponse])
 async def list_users(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = Query(None, description="Keyset paging: return users with id greater than this"),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    query = select(User).where(User.is_active == True).offset(skip).limit(limit)
+    query = select(User).where(User.is_active == True).order_by(User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    else:
+        query = query.offset(skip)
     result = await db.execute(query)
     users = result.scalars().all()
     return [_serialize_user(u) for u in users]
@@ -213,17 +231,10 @@ async def get_current_user_permissions(
     Get the current user's permissions based on their assigned roles.
     System admins get all permissions.
     """
-    user_id = current_user["user_id"]
-    
-    # Fetch user to check is_system_admin
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    grants = await current_grants(db, current_user)
     
     # System admins have all permissions
-    if user.is_system_admin:
+    if grants.is_system_admin:
         return {
             "is_system_admin": True,
             "permissions": [
@@ -240,30 +251,10 @@ async def get_current_user_permissions(
             ]
         }
     
-    # Get permissions from user's assigned roles
-    permissions = set()
-    
-    # Query user's roles with their permissions
-    result = await db.execute(
-        select(UserRoleModel)
-        .options(
-            selectinload(UserRoleModel.role)
-            .selectinload(Role.permissions)
-            .selectinload(RolePermission.permission)
-        )
-        .where(UserRoleModel.user_id == user_id)
-    )
-    user_roles = result.scalars().all()
-    
-    for user_role in user_roles:
-        if user_role.role and user_role.role.permissions:
-            for rp in user_role.role.permissions:
-                if rp.permission and rp.permission.key:
-                    permissions.add(rp.permission.key)
-    
+    # Permissions from the user's assigned roles, compiled by the RBAC engine
     return {
         "is_system_admin": False,
-        "permissions": sorted(list(permissions))
+        "permissions": sorted(grants.permission_keys)
     }
 
 
@@ -9,10 +9,9 @@ import asyncio
 import re
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.db.database import async_session
-from app.db.models import Message, User, Channel, ChannelMember, MessageReaction, FileAttachment, AuditLog, Notification, NotificationType
+from app.db.models import Message, Channel, ChannelMember, MessageReaction, FileAttachment, AuditLog, Notification, NotificationType
 from app.db.enums import UserStatus
 from app.core.redis import RedisClient
 import logging
@@ -314,17 +313,16 @@ async def create_mention_notifications(
     if not mentions:
         return
     
-    # Get mentioned users
+    # Resolve all mentioned users with one query
+    from app.services.user_directory import resolve_usernames
+    user_ids = await resolve_usernames(session, mentions)
+    
     for username in mentions:
-        result = await session.execute(
-            select(User).where(User.username == username)
-        )
-        user = result.scalar_one_or_none()
-        
-        if user and user.id != sender_id:
+        user_id = user_ids.get(username)
+        if user_id and user_id != sender_id:
             # Create notification
             notification = Notification(
-                user_id=user.id,
+                user_id=user_id,
                 type=NotificationType.mention.value,
                 title=f"@{sender_username} mentioned you",
                 content=content[:100] + ("..." if len(content) > 100 else ""),
@@ -336,7 +334,7 @@ async def create_mention_notifications(
             await session.flush()  # Get the notification ID
             
             # Send real-time WebSocket notification
-            await notify_to_user(user.id, {
+            await notify_to_user(user_id, {
                 "notification_id": notification.id,
                 "notification_type": "mention",
                 "title": notification.title,
@@ -13,7 +13,7 @@ from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.db.models import Order, AutomationTask, TaskAssignment, User, UserOperationalRole
+from app.db.models import Order, AutomationTask, TaskAssignment, TaskEvent, User
 from app.db.enums import (
     OrderType, 
     OrderStatus,
@@ -23,6 +23,10 @@ from app.db.enums import (
     TaskEventType,
 )
 from app.automation.service import AutomationService
+from app.automation.payloads import build_task_created_payload
+from app.integrations.make_webhook import emit_make_webhook
+from app.services.dispatch import pick_assignee
+from app.services.role_directory import role_directory
 from app.core.config import logger
 
 
@@ -85,6 +89,13 @@ ORDER_TASK_TEMPLATES = {
 }
 
 
+# Roles that get their own claimable task instead of a template assignment
+OPERATIONAL_ROLES = ("foreman", "delivery")
+
+# Order types whose workflow ends with the requester confirming receipt
+REQUESTER_ORDER_TYPES = (OrderType.agent_restock.value, OrderType.store_keeper_restock.value)
+
+
 # ============================================================================
 # ORDER STATUS CHANGE HANDLERS
 # ============================================================================
@@ -115,168 +126,188 @@ class OrderAutomationTriggers:
         db: AsyncSession,
         order: Order,
         created_by_id: int,
-    ) -> Optional[AutomationTask]:
+    ) -> list[AutomationTask]:
         """
         Trigger automation when a new order is created.
-        Creates an AutomationTask linked to the order with appropriate assignments.
-        
+        Creates the order-root AutomationTask, one OPEN role-scoped task per
+        operational role, their events and the template assignments.
+
+        Runs inside the caller's transaction: everything is added in one
+        flush and nothing is committed or notified here. The caller commits,
+        then calls emit_order_tasks_created() for the side effects.
+
         Args:
             db: Database session
-            order: The newly created Order
+            order: The newly created Order (flushed, not yet committed)
             created_by_id: ID of the user who created the order
-            
+
         Returns:
-            The created AutomationTask or None if no template exists
+            The created AutomationTasks, order-root first (empty if no template exists)
         """
         order_type = order.order_type
         if isinstance(order_type, OrderType):
             order_type = order_type.value
-            
+
         template = ORDER_TASK_TEMPLATES.get(order_type)
         if not template:
             logger.debug(f"[OrderAutomation] No template for order type: {order_type}")
-            return None
-        
-        # Create automation task
+            return []
+
+        title = template["title_template"].format(order_id=order.id)
+        description = template["description_template"].format(order_id=order.id)
+        task_type = template["task_type"]
+
+        # Extract order_items from meta.form_payload (source of truth for form-submitted orders)
+        order_items = []
         try:
-            title = template["title_template"].format(order_id=order.id)
-            description = template["description_template"].format(order_id=order.id)
-            
-            # Determine initial required role for claim-based workflow (first operational role)
-            initial_required_role = None
-            for a in template.get("assignments", []):
-                rh = a.get("role_hint")
-                if rh and rh != "requester":
-                    initial_required_role = rh
-                    break
-
-            # Ensure a single global/root automation task exists for the order
-            # Create a partial unique index on is_order_root at runtime to prevent duplicates
-            try:
-                from sqlalchemy import text
-                await db.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_order_root_per_order ON automation_tasks (related_order_id) WHERE is_order_root = true;"))
-                await db.commit()
-            except Exception as e:
-                logger.warning(f"[OrderAutomation] Failed to ensure uq_order_root_per_order index: {e}")
-
-            # Extract order_items from meta.form_payload (source of truth for form-submitted orders)
-            _order_items = []
-            try:
-                # order object attributes are expired after session.commit() in task_engine.
-                # We must refresh to reload order.meta from DB before accessing it.
-                await db.refresh(order)
-                _meta = order.meta
-                print("RAW order.meta at trigger:", _meta, type(_meta))
-                if isinstance(_meta, str):
-                    _meta = json.loads(_meta)
-                if isinstance(_meta, dict):
-                    _fp = _meta.get("form_payload") or {}
-                    print("FORM PAYLOAD at trigger:", _fp)
-                    _pid = _fp.get("product_id")
-                    _qty = _fp.get("quantity")
-                    if _pid and _qty:
-                        _order_items = [{"product_id": int(_pid), "quantity": int(_qty)}]
-            except Exception as _e:
-                logger.warning(f"[OrderAutomation] Failed to extract order_items from form_payload: {_e}")
-                import traceback
-                traceback.print_exc()
-            print("SAVING ORDER ITEMS:", _order_items)
-
-            # Create the global order-root automation task (explicitly NOT role-scoped)
-            root_task = await AutomationService.create_task(
-                db=db,
-                task_type=template["task_type"],
+            meta = json.loads(order.meta) if isinstance(order.meta, str) else order.meta
+            if isinstance(meta, dict):
+                form_payload = meta.get("form_payload") or {}
+                pid = form_payload.get("product_id")
+                qty = form_payload.get("quantity")
+                if pid and qty:
+                    order_items = [{"product_id": int(pid), "quantity": int(qty)}]
+        except Exception as e:
+            logger.warning(f"[OrderAutomation] Failed to extract order_items from form_payload: {e}")
+
+        def new_task(**kwargs) -> AutomationTask:
+            task = AutomationTask(
+                task_type=task_type,
                 title=title,
                 created_by_id=created_by_id,
-                description=description,
                 related_order_id=order.id,
-                metadata={
-                    "order_type": order_type,
-                    "triggered_by": "order_created",
-                    "order_items": _order_items,
-                },
-                required_role=None,
-                is_order_root=True,
+                **kwargs,
+            )
+            task.events.append(TaskEvent(
+                user_id=created_by_id,
+                event_type=TaskEventType.created,
+                event_metadata=json.dumps({"title": title, "task_type": task_type.value}),
+            ))
+            return task
+
+        # The global order-root task (explicitly NOT role-scoped);
+        # uq_order_root_per_order guarantees there is only one per order
+        root_task = new_task(
+            description=description,
+            task_metadata=json.dumps({
+                "order_type": order_type,
+                "triggered_by": "order_created",
+                "order_items": order_items,
+            }),
+            status=AutomationTaskStatus.open,
+            required_role=None,
+            is_order_root=True,
+        )
+        tasks = [root_task]
+
+        # Separate OPEN role-scoped tasks for operational roles (foreman, delivery), ready for claiming
+        role_hints = [a.get("role_hint") for a in template.get("assignments", [])]
+        for rh in dict.fromkeys(rh for rh in role_hints if rh in OPERATIONAL_ROLES):
+            role_task = new_task(
+                description=f"{rh.title()} task for {description}",
+                task_metadata=json.dumps({"order_type": order_type, "triggered_by": "order_created_role_task", "role": rh}),
                 status=AutomationTaskStatus.open,
+                required_role=rh,
+                is_order_root=False,
             )
+            role_task.events.append(TaskEvent(
+                user_id=created_by_id,
+                event_type=TaskEventType.task_opened,
+                event_metadata=json.dumps({"required_role": rh}),
+            ))
+            tasks.append(role_task)
+
+        # Requester/non-operational assignments go on every task of the order
+        planned = OrderAutomationTriggers._plan_template_assignments(template, order_type, created_by_id)
+        for task in tasks:
+            for role_hint, user_id in planned:
+                task.assignments.append(TaskAssignment(
+                    user_id=user_id,
+                    role_hint=role_hint,
+                    status=AssignmentStatus.pending,
+                ))
+                task.events.append(TaskEvent(
+                    user_id=created_by_id,
+                    event_type=TaskEventType.assigned,
+                    event_metadata=json.dumps({"assigned_user_id": user_id, "role_hint": role_hint}),
+                ))
+                # A concrete assignee moves the order-root task to IN_PROGRESS;
+                # role-scoped tasks stay OPEN so they can be claimed
+                if user_id and not task.required_role:
+                    task.status = AutomationTaskStatus.in_progress
+
+        db.add_all(tasks)
+        await db.flush()
+
+        logger.info(
+            f"[OrderAutomation] Created order-root automation task {root_task.id} and "
+            f"{len(tasks) - 1} role-scoped task(s) for order {order.id}"
+        )
+        return tasks
 
-            # Ensure the order-root task is OPEN so it can accept non-operational assignments
-            if root_task.status != AutomationTaskStatus.open:
-                root_task.status = AutomationTaskStatus.open
-                root_task.claimed_by_user_id = None
-                db.add(root_task)
-                await db.commit()
-                await db.refresh(root_task)
-
-            logger.info(f"[OrderAutomation] Created order-root automation task {root_task.id} for order {order.id}")
+    @staticmethod
+    async def emit_order_tasks_created(
+        db: AsyncSession,
+        tasks: list[AutomationTask],
+        created_by_id: Optional[int],
+    ) -> None:
+        """
+        Side effects of on_order_created, to run AFTER the order is committed.
 
-            # Create requester/non-operational assignments on the root task
-            await OrderAutomationTriggers._create_template_assignments(
-                db=db,
-                task=root_task,
-                template=template,
-                created_by_id=created_by_id,
-            )
+        Creates the task_opened notifications for all role-scoped tasks with
+        one batched recipient lookup (flushed; the caller commits) and emits
+        the Make.com task.created webhooks.
+        """
+        try:
+            from app.services.notifications import notify_tasks_opened
+            await notify_tasks_opened(db, tasks)
+        except Exception as e:
+            logger.warning(f"[OrderAutomation] Failed to notify on task.opened: {e}")
 
-            # Create separate role-scoped tasks for operational roles (foreman, delivery)
-            for assignment_cfg in template.get("assignments", []):
-                rh = assignment_cfg.get("role_hint")
-                if rh in ("foreman", "delivery"):
-                    # Skip creating duplicate active role tasks for the same order & role
-                    existing_q = select(AutomationTask).where(
-                        AutomationTask.related_order_id == order.id,
-                        AutomationTask.required_role == rh,
-                        AutomationTask.status.in_([
-                            AutomationTaskStatus.open,
-                            AutomationTaskStatus.claimed,
-                            AutomationTaskStatus.pending,
-                            AutomationTaskStatus.in_progress,
-                        ])
-                    ).limit(1)
-                    existing_res = await db.execute(existing_q)
-                    existing_task = existing_res.scalar_one_or_none()
-                    if existing_task:
-                        logger.info(f"[OrderAutomation] Skipping creation of duplicate role task for {rh} on order {order.id} (existing task {existing_task.id})")
-                        continue
-
-                    role_task = await AutomationService.create_task(
-                        db=db,
-                        task_type=template["task_type"],
-                        title=title,
-                        created_by_id=created_by_id,
-                        description=f"{rh.title()} task for {description}",
-                        related_order_id=order.id,
-                        metadata={"order_type": order_type, "triggered_by": "order_created_role_task", "role": rh},
-                        required_role=rh,
-                        is_order_root=False,
-                    )
-
-                    # Ensure role-scoped tasks start OPEN for claiming
-                    if role_task.required_role and role_task.status != AutomationTaskStatus.open:
-                        role_task.status = AutomationTaskStatus.open
-                        db.add(role_task)
-                        await db.commit()
-                        await db.refresh(role_task)
-
-                    logger.info(f"[OrderAutomation] Created role-scoped automation task {role_task.id} (role={rh}) for order {order.id}")
-
-            # Phase 6.4: Send order created notification
-            try:
-                from app.automation.notification_hooks import on_order_created
-                await on_order_created(db, order, notify_admins=True)
-            except Exception as e:
-                logger.error(f"[OrderAutomation] Failed to send order notification: {e}")
+        try:
+            creator = await db.get(User, created_by_id) if created_by_id else None
+            for task in tasks:
+                await emit_make_webhook(build_task_created_payload(
+                    task_id=task.id,
+                    title=task.title,
+                    related_order_id=task.related_order_id,
+                    actor_user_id=created_by_id,
+                    actor_username=creator.username if creator else None,
+                ))
         except Exception as e:
-            import traceback, sys
-            # Debug output to investigate NameError issues seen in test runs
-            print("[OrderAutomation] Exception in on_order_created", file=sys.stderr)
-            print("globals keys:", list(globals().keys()), file=sys.stderr)
-            print("locals keys:", list(locals().keys()), file=sys.stderr)
-            traceback.print_exc()
-            raise
-        
-        return task
-    
+            logger.warning(f"[OrderAutomation] Failed to emit task.created webhook: {e}")
+
+    @staticmethod
+    def _plan_template_assignments(
+        template: dict,
+        order_type: str,
+        created_by_id: int,
+    ) -> list[tuple[str, Optional[int]]]:
+        """
+        (role_hint, user_id) pairs a template assigns on a new task.
+
+        Operational roles (foreman, delivery) are never pre-assigned; they are
+        claimed. The requester is assigned to the order creator, and only for
+        order types that end with a requester confirmation step.
+        """
+        planned = []
+        for assignment_cfg in template.get("assignments", []):
+            role_hint = assignment_cfg.get("role_hint")
+            if role_hint in OPERATIONAL_ROLES:
+                continue
+
+            user_id = created_by_id if assignment_cfg.get("auto_assign_user") == "order_creator" else None
+            # Special-case mappings where order creator should be assigned
+            if not user_id and role_hint in ("agent", "store_keeper", "sales", "requester"):
+                user_id = created_by_id
+
+            if role_hint == "requester":
+                if order_type in REQUESTER_ORDER_TYPES:
+                    planned.append((role_hint, user_id))
+            elif user_id is not None:
+                planned.append((role_hint, user_id))
+        return planned
+
     @staticmethod
     async def _create_template_assignments(
         db: AsyncSession,
@@ -285,148 +316,67 @@ class OrderAutomationTriggers:
         created_by_id: int,
     ) -> list[TaskAssignment]:
         """
-        Create assignments for a task based on template configuration.
-
-        Resolves concrete users for roles (foreman, delivery) when possible.
-        If no active user is found for a role, still create a TaskAssignment with
-        user_id = None and log a warning.
+        Create template assignments on an existing order-linked task.
 
-        Note: If `task.required_role` is set (claim-based workflow), this helper
-        will skip creating any template assignments to ensure claiming is the
-        first assignment operation.
+        Used for tasks created outside on_order_created (e.g. via the API);
+        see _plan_template_assignments for which assignments are made.
         """
-        # For claim-based tasks we should not create operational role assignments (foreman/delivery),
-        # but we still allow creating non-operational assignments like 'requester'.
-        # The loop below will skip operational role_hints explicitly.
+        order_type = None
+        if getattr(task, 'related_order_id', None):
+            ord_res = await db.execute(select(Order.order_type).where(Order.id == task.related_order_id))
+            order_type = ord_res.scalar_one_or_none()
+            if isinstance(order_type, OrderType):
+                order_type = order_type.value
 
         assignments = []
-        
-        for assignment_cfg in template.get("assignments", []):
-            role_hint = assignment_cfg.get("role_hint")
-            auto_assign_role = assignment_cfg.get("auto_assign_role")
-            auto_assign_user = assignment_cfg.get("auto_assign_user")
-            
-            # Only create requester assignment for new tasks. Skip operational roles (foreman, delivery).
-            if role_hint in ("foreman", "delivery"):
-                logger.info(f"[OrderAutomation] Skipping creation of operational role assignment for {role_hint} on task {task.id}")
+        for role_hint, user_id in OrderAutomationTriggers._plan_template_assignments(template, order_type, created_by_id):
+            assignment = await AutomationService.assign_user_to_task(
+                db=db,
+                task_id=task.id,
+                user_id=user_id,
+                role_hint=role_hint,
+                assigned_by_id=created_by_id,
+            )
+            if not assignment:
+                logger.debug(f"[OrderAutomation] Assignment not created (maybe duplicate): task={task.id}, role={role_hint}, user_id={user_id}")
                 continue
+            assignments.append(assignment)
+            logger.info(f"[OrderAutomation] Assigned user {user_id} to task {task.id} (role={role_hint})")
+
+            # Only advance non-operational tasks to IN_PROGRESS; tasks with a
+            # required_role stay OPEN so they can be claimed.
+            if user_id and task.status != AutomationTaskStatus.in_progress and not task.required_role:
+                task.status = AutomationTaskStatus.in_progress
+                db.add(task)
+                await db.commit()
+                await db.refresh(task)
 
-            # Determine who to assign (may be None)
-            user_id = None
-            
-            if auto_assign_user == "order_creator":
-                # Assign to the order creator (requester)
-                user_id = created_by_id
-                logger.info(f"[OrderAutomation] Assigning order creator {user_id} as {role_hint}")
-            elif auto_assign_role:
-                # For non-operational mappings, we do not auto-create operational assignments.
-                # Keep behavior minimal: do not attempt to resolve auto_assign_role for new tasks.
-                logger.debug(f"[OrderAutomation] Not auto-resolving role {auto_assign_role} for new task {task.id}")
-                user_id = None
-
-            # Special-case mappings where order creator should be assigned
-            if not user_id and role_hint in ("agent", "store_keeper", "sales", "requester"):
-                user_id = created_by_id
-                logger.info(f"[OrderAutomation] Fallback assign to order creator {user_id} for role {role_hint}")
-            
-            # Create assignment only for requester and similar roles
-            create_requester = True
-            if role_hint == 'requester':
-                create_requester = False
-                try:
-                    # Determine order type for this task
-                    if getattr(task, 'related_order_id', None):
-                        from app.db.models import Order
-                        from app.db.enums import OrderType
-                        ord_res = await db.execute(select(Order).where(Order.id == task.related_order_id))
-                        order_row = ord_res.scalar_one_or_none()
-                        if order_row:
-                            ot = order_row.order_type.value if isinstance(order_row.order_type, OrderType) else order_row.order_type
-                            # Only create requester assignment for these order types
-                            if ot in (OrderType.agent_restock.value, OrderType.store_keeper_restock.value):
-                                create_requester = True
-                except Exception as e:
-                    logger.warning(f"[OrderAutomation] Failed to determine whether to create requester assignment: {e}")
-
-            if (role_hint == "requester" and not create_requester):
-                logger.info(f"[OrderAutomation] Skipping requester assignment for role_hint=requester on task {task.id} (order type does not require requester)")
-            elif role_hint == "requester" or user_id is not None:
-                assignment = await AutomationService.assign_user_to_task(
-                    db=db,
-                    task_id=task.id,
-                    user_id=user_id,
-                    role_hint=role_hint,
-                    assigned_by_id=created_by_id,
-                )
-                if assignment:
-                    assignments.append(assignment)
-                    logger.info(f"[OrderAutomation] Assigned user {user_id} to task {task.id} (role={role_hint})")
-
-                    # If a concrete user was assigned (e.g., requester assigned to order creator),
-                    # ensure the automation task progresses to IN_PROGRESS so order status can reflect activity.
-                    try:
-                        # Only advance the task to IN_PROGRESS for non-operational tasks.
-                        # Operational tasks (with a required_role) should remain OPEN so they can be claimed.
-                        if user_id and task.status != AutomationTaskStatus.in_progress and not task.required_role:
-                            task.status = AutomationTaskStatus.in_progress
-                            db.add(task)
-                            await db.commit()
-                            await db.refresh(task)
-                    except Exception as e:
-                        logger.warning(f"[OrderAutomation] Failed to set task {task.id} in_progress after assignment: {e}")
-                else:
-                    logger.debug(f"[OrderAutomation] Assignment not created (maybe duplicate): task={task.id}, role={role_hint}, user_id={user_id}")
-            else:
-                logger.debug(f"[OrderAutomation] Not creating assignment for role {role_hint} on task {task.id}")
-        
         return assignments
-    
+
     @staticmethod
     async def _find_user_by_role(
         db: AsyncSession,
         role_name: str,
+        loads: Optional[dict[int, int]] = None,
     ) -> Optional[int]:
         """
-        Find a user with a specific role by username pattern.
-        Looks for users whose username starts with the role name.
-        
-        Role mappings:
-        - foreman -> users starting with 'foreman' (e.g., foreman1)
-        - delivery -> users starting with 'delivery' (e.g., delivery1)
-        - storekeeper -> users starting with 'storekeeper' (e.g., storekeeper1)
-        - agent -> users starting with 'agent' (e.g., agent1)
-        """
-        # Map a role alias to canonical role values used in User.role
-        role_map = {
-            "foreman": "foreman",
-            "delivery": "delivery",
-            "delivery_driver": "delivery",
-            "warehouse_staff": "foreman",  # warehouse staff treated as foreman
-            "storekeeper": "storekeeper",
-            "store_keeper": "storekeeper",
-            "agent": "agent",
-            "sales_rep": "agent",
-        }
-
-        canonical_role = role_map.get(role_name, role_name)
-
-        # Find first active user with matching operational role (strict - no admin fallback)
-        result = await db.execute(
-            select(User)
-            .join(UserOperationalRole, User.id == UserOperationalRole.user_id)
-            .where(User.is_active == True)
-            .where(UserOperationalRole.role == canonical_role)
-            .order_by(User.id.asc())
-            .limit(1)
-        )
-        user = result.scalar_one_or_none()
-
-        if user:
-            logger.debug(f"[OrderAutomation] Found user {user.id} (username={user.username}) for role '{role_name}'")
-            return user.id
+        Pick an active user holding an operational role.
 
-        logger.debug(f"[OrderAutomation] No active user found for role '{role_name}'")
-        return None
+        Served from the role directory (no role-table query); aliases such as
+        delivery_driver/warehouse_staff/store_keeper/sales_rep map to their
+        canonical role. The least-loaded user wins, round-robin among equals;
+        load comes from the user_workloads counters unless `loads`
+        (user id -> open work) is given. Strict: there is no admin fallback.
+        """
+        if loads is None:
+            user_id = await pick_assignee(db, role_name)
+        else:
+            user_id = await role_directory.pick_assignee(db, role_name, loads=loads)
+        if user_id is None:
+            logger.debug(f"[OrderAutomation] No active user found for role '{role_name}'")
+        else:
+            logger.debug(f"[OrderAutomation] Picked user {user_id} for role '{role_name}'")
+        return user_id
     
     @staticmethod
     async def on_order_status_changed(
@@ -1,98 +1,292 @@
 """
 Rule Engine for configurable automation (Phase 6.5).
 
-Simple, code-based rules that match events and execute actions.
-No DB storage yet — rules are registered at import time.
+Rules match events and execute actions. They come from two places:
+- Code: register_rule() at import time (defaults at the bottom of this file)
+- Database: automation_rules rows, managed through /automation/rules and
+  reloaded after any commit that touches the table (other pods hear about
+  it on the "cache:rule_engine" Redis channel, see
+  app/core/cache_invalidation.py)
+
+Each rule is compiled once: condition keys are parsed and thresholds
+coerced up front into predicates, and rules are indexed by event name, so
+an event only looks at its own rules. Actions of all matching rules run
+concurrently, each with its own session and payload copy. Per-rule
+evaluation, match, failure and latency counters are in stats().
 """
+import asyncio
+import json
 import logging
-from typing import Any
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import cache_invalidation
+from app.db import database
+from app.db.models import AutomationRule
+
 logger = logging.getLogger(__name__)
 
+# Cache invalidation channel (Redis: "cache:rule_engine")
+INVALIDATION_CHANNEL = "rule_engine"
+
+# Reload database rules at least this often even without invalidations
+MAX_AGE_SECONDS = 300
+
+_OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    "gt": lambda value, threshold: value > threshold,
+    "lt": lambda value, threshold: value < threshold,
+    "gte": lambda value, threshold: value >= threshold,
+    "lte": lambda value, threshold: value <= threshold,
+    "eq": lambda value, threshold: value == threshold,
+}
+
+Predicate = Callable[[dict], bool]
+
+
+def _parse_condition_key(key: str) -> Tuple[str, str]:
+    """Parse 'quantity_gt' → ('quantity', 'gt')."""
+    for suffix in ("_gte", "_lte", "_gt", "_lt", "_eq"):
+        if key.endswith(suffix):
+            return key[: -len(suffix)], suffix[1:]
+    # No operator suffix — default to equality
+    return key, "eq"
+
+
+def _compile_condition(key: str, threshold: Any) -> Predicate:
+    field_name, op = _parse_condition_key(key)
+    compare = _OPERATORS[op]
+    try:
+        limit = float(threshold)
+    except (TypeError, ValueError):
+        raise ValueError(f"Condition {key!r} needs a numeric threshold, got {threshold!r}")
+
+    def predicate(payload: dict) -> bool:
+        value = payload.get(field_name)
+        if value is None:
+            return False
+        try:
+            return compare(float(value), limit)
+        except (TypeError, ValueError):
+            return False
+
+    return predicate
+
+
+def compile_conditions(conditions: Optional[dict]) -> Tuple[Predicate, ...]:
+    """Predicates for a {"field_op": threshold} mapping; ValueError if malformed."""
+    if not conditions:
+        return ()
+    if not isinstance(conditions, dict):
+        raise ValueError("Conditions must be an object of {field_op: threshold}")
+    return tuple(_compile_condition(key, threshold) for key, threshold in conditions.items())
+
+
+@dataclass
+class CompiledRule:
+    """A registered rule with its compiled predicates and counters."""
+    name: str
+    event: str
+    conditions: dict
+    actions: Tuple[str, ...]
+    source: str  # "code" or "db"
+    predicates: Tuple[Predicate, ...] = field(repr=False, default=())
+    evaluations: int = 0
+    matches: int = 0
+    failures: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def matches_payload(self, payload: dict) -> bool:
+        self.evaluations += 1
+        return all(predicate(payload) for predicate in self.predicates)
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        if failed:
+            self.failures += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "event": self.event,
+            "source": self.source,
+            "conditions": self.conditions,
+            "actions": list(self.actions),
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "failures": self.failures,
+            "avg_ms": round(self.total_seconds / self.matches * 1000, 1) if self.matches else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+
+
+def compile_rule(rule: dict, source: str = "code") -> CompiledRule:
+    """Validate and compile a rule dict: {event, conditions, actions[, name]}."""
+    event_name = rule.get("event")
+    if not event_name:
+        raise ValueError("Rule needs an event")
+    actions = tuple(rule.get("actions") or ())
+    if not actions:
+        raise ValueError("Rule needs at least one action")
+    unknown = [a for a in actions if a not in _ACTION_REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown action(s): {', '.join(unknown)}")
+    conditions = dict(rule.get("conditions") or {})
+    return CompiledRule(
+        name=rule.get("name") or f"{event_name}:{','.join(actions)}:{json.dumps(conditions, sort_keys=True)}",
+        event=event_name,
+        conditions=conditions,
+        actions=actions,
+        source=source,
+        predicates=compile_conditions(conditions),
+    )
+
 
 class RuleEngine:
     """Lightweight event→condition→action rule processor."""
 
     def __init__(self):
-        self.rules: list[dict] = []
+        self._code_rules: List[CompiledRule] = []
+        self._db_rules: List[CompiledRule] = []
+        self._index: Dict[str, Tuple[CompiledRule, ...]] = {}
+        self.version = 0
+        self._loaded: Optional[Tuple[int, float]] = None  # (version, monotonic) of the DB rules
+        self._lock = asyncio.Lock()
 
     def register_rule(self, rule: dict):
-        """Register a rule dict: {event, conditions, actions}."""
-        self.rules.append(rule)
+        """Register a code rule dict: {event, conditions, actions}."""
+        self._code_rules.append(compile_rule(rule))
+        self._rebuild_index()
         logger.info("[RuleEngine] Registered rule: event=%s actions=%s", rule.get("event"), rule.get("actions"))
 
-    # ------------------------------------------------------------------
-    # Core loop
-    # ------------------------------------------------------------------
+    @property
+    def rules(self) -> List[CompiledRule]:
+        return self._code_rules + self._db_rules
 
-    async def process(self, event_name: str, payload: dict, db: AsyncSession):
-        """Evaluate all rules that match *event_name* against *payload*."""
+    def _rebuild_index(self) -> None:
+        index: Dict[str, List[CompiledRule]] = {}
         for rule in self.rules:
-            if rule["event"] != event_name:
-                continue
+            index.setdefault(rule.event, []).append(rule)
+        self._index = {name: tuple(rules) for name, rules in index.items()}
 
-            if not self._check_conditions(rule.get("conditions") or {}, payload):
-                continue
+    # ------------------------------------------------------------------
+    # Database rules
+    # ------------------------------------------------------------------
 
-            logger.info(
-                "[RuleEngine] Rule matched: event=%s conditions=%s",
-                event_name, rule.get("conditions"),
-            )
-            await self._execute_actions(rule["actions"], payload, db)
+    def invalidate(self, broadcast: bool = True) -> None:
+        """Reload database rules on next use; with `broadcast`, on the other pods too."""
+        self.version += 1
+        if broadcast:
+            cache_invalidation.publish(INVALIDATION_CHANNEL)
+
+    def _fresh(self) -> bool:
+        return (
+            self._loaded is not None
+            and self._loaded[0] == self.version
+            and time.monotonic() - self._loaded[1] <= MAX_AGE_SECONDS
+        )
+
+    def wants(self, event_name: str) -> bool:
+        """Whether processing *event_name* can do anything (cheap; no I/O)."""
+        return not self._fresh() or event_name in self._index
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self._fresh():
+            return
+        async with self._lock:
+            if self._fresh():
+                return
+            version = self.version
+            rows = (await db.execute(
+                select(AutomationRule)
+                .where(AutomationRule.is_active == True)  # noqa: E712
+                .order_by(AutomationRule.id)
+            )).scalars().all()
+            previous = {rule.name: rule for rule in self._db_rules}
+            compiled = []
+            for row in rows:
+                try:
+                    rule = compile_rule({
+                        "name": row.name,
+                        "event": row.event,
+                        "conditions": json.loads(row.conditions or "{}"),
+                        "actions": json.loads(row.actions or "[]"),
+                    }, source="db")
+                except ValueError as e:
+                    logger.warning("[RuleEngine] Skipping rule %s: %s", row.name, e)
+                    continue
+                old = previous.get(rule.name)
+                if old is not None:
+                    # Keep counters across reloads
+                    rule.evaluations, rule.matches, rule.failures = old.evaluations, old.matches, old.failures
+                    rule.total_seconds, rule.max_seconds = old.total_seconds, old.max_seconds
+                compiled.append(rule)
+            self._db_rules = compiled
+            self._rebuild_index()
+            self._loaded = (version, time.monotonic())
 
     # ------------------------------------------------------------------
-    # Condition evaluators
+    # Core loop
     # ------------------------------------------------------------------
 
-    def _check_conditions(self, conditions: dict, payload: dict) -> bool:
-        """Return True if every condition passes."""
-        for key, threshold in conditions.items():
-            field, op = self._parse_condition_key(key)
-            value = payload.get(field)
-            if value is None:
-                return False
-            try:
-                value = float(value)
-                threshold = float(threshold)
-            except (TypeError, ValueError):
-                return False
-            if op == "gt" and not (value > threshold):
-                return False
-            if op == "lt" and not (value < threshold):
-                return False
-            if op == "gte" and not (value >= threshold):
-                return False
-            if op == "lte" and not (value <= threshold):
-                return False
-            if op == "eq" and not (value == threshold):
-                return False
-        return True
-
-    @staticmethod
-    def _parse_condition_key(key: str) -> tuple[str, str]:
-        """Parse 'quantity_gt' → ('quantity', 'gt')."""
-        for suffix in ("_gte", "_lte", "_gt", "_lt", "_eq"):
-            if key.endswith(suffix):
-                return key[: -len(suffix)], suffix[1:]
-        # No operator suffix — default to equality
-        return key, "eq"
+    async def process(self, event_name: str, payload: dict, db: AsyncSession):
+        """Evaluate the rules of *event_name* against *payload* and run the matches' actions."""
+        await self.ensure_loaded(db)
+        matched = [rule for rule in self._index.get(event_name, ()) if rule.matches_payload(payload)]
+        if not matched:
+            return
+        for rule in matched:
+            rule.matches += 1
+            logger.info("[RuleEngine] Rule matched: %s event=%s conditions=%s", rule.name, event_name, rule.conditions)
+
+        jobs = [(rule, action) for rule in matched for action in rule.actions]
+        if len(jobs) == 1:
+            rule, action = jobs[0]
+            await self._run_rule_action(rule, action, payload, db)
+            return
+        await asyncio.gather(*(self._run_rule_action(rule, action, payload) for rule, action in jobs))
+
+    async def _run_rule_action(self, rule: CompiledRule, action: str, payload: dict,
+                               db: Optional[AsyncSession] = None):
+        started = time.perf_counter()
+        failed = True
+        try:
+            if db is not None:
+                failed = not await self._execute_action(action, dict(payload), db)
+            else:
+                # Concurrent actions can't share one session
+                async with database.async_session() as action_db:
+                    failed = not await self._execute_action(action, dict(payload), action_db)
+        finally:
+            rule.record(time.perf_counter() - started, failed)
 
     # ------------------------------------------------------------------
     # Action executors
     # ------------------------------------------------------------------
 
-    async def _execute_actions(self, actions: list[str], payload: dict, db: AsyncSession):
-        for action in actions:
-            try:
-                handler = _ACTION_REGISTRY.get(action)
-                if handler:
-                    await handler(payload, db)
-                else:
-                    logger.warning("[RuleEngine] Unknown action: %s", action)
-            except Exception as e:
-                logger.error("[RuleEngine] Action '%s' failed: %s", action, e)
+    async def _execute_action(self, action: str, payload: dict, db: AsyncSession) -> bool:
+        try:
+            handler = _ACTION_REGISTRY.get(action)
+            if handler:
+                await handler(payload, db)
+                return True
+            logger.warning("[RuleEngine] Unknown action: %s", action)
+        except Exception as e:
+            logger.error("[RuleEngine] Action '%s' failed: %s", action, e)
+        return False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "version": self.version,
+            "fresh": self._fresh(),
+            "events": len(self._index),
+            "rules": [rule.stats() for rule in self.rules],
+        }
 
 
 # ======================================================================
@@ -204,3 +398,10 @@ rule_engine.register_rule({
     "conditions": {"change_lt": -10},
     "actions": ["notify_manager"],
 })
+
+
+# ======================================================================
+# Automatic reload on commit
+# ======================================================================
+
+cache_invalidation.watch(INVALIDATION_CHANNEL, ("automation_rules",), rule_engine.invalidate)
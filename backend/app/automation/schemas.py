@@ -43,6 +43,7 @@ class TaskListResponse(BaseModel):
     """Schema for listing tasks (wrapper with pagination)"""
     tasks: list["TaskResponse"] = []
     total: int = 0
+    next_cursor: Optional[str] = None  # pass back as `cursor` for the next page
     
     class Config:
         from_attributes = True
@@ -109,5 +110,37 @@ class ClaimRequest(BaseModel):
     override: bool = False
 
 
+# ---------------------- Rule Schemas ----------------------
+
+class RuleCreate(BaseModel):
+    """Schema for creating a rule engine rule"""
+    name: str = Field(..., min_length=1, max_length=100)
+    event: str = Field(..., min_length=1, max_length=100)
+    conditions: dict[str, Any] = {}
+    actions: list[str] = Field(..., min_length=1)
+    is_active: bool = True
+
+
+class RuleUpdate(BaseModel):
+    """Schema for updating a rule engine rule (only set fields change)"""
+    event: Optional[str] = Field(None, min_length=1, max_length=100)
+    conditions: Optional[dict[str, Any]] = None
+    actions: Optional[list[str]] = Field(None, min_length=1)
+    is_active: Optional[bool] = None
+
+
+class RuleResponse(BaseModel):
+    """Schema for rule response"""
+    id: int
+    name: str
+    event: str
+    conditions: dict[str, Any]
+    actions: list[str]
+    is_active: bool
+    created_by_id: Optional[int]
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
 # Update forward references
 TaskResponse.model_rebuild()
\ No newline at end of file
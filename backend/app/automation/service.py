@@ -4,11 +4,13 @@ Core business logic for task-based workflow automation.
 Phase 6.4 - Integrated notification hooks.
 Phase 6.5 - Make.com webhook integration.
 """
+import base64
 import json
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Optional, Any
 
-from sqlalchemy import select, func, update, exists
+from sqlalchemy import select, func, update, exists, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -27,6 +29,8 @@ from app.automation.payloads import (
     build_automation_failed_payload,
 )
 from app.integrations.make_webhook import emit_make_webhook
+from app.services.dispatch import claim_queue_criteria, set_assignment_status
+from app.services.role_directory import role_directory
 from app.services.notification_emitter import (
     notify_and_emit_task_completed_to_participants,
     notify_and_emit_order_completed_to_participants,
@@ -56,6 +60,82 @@ class ClaimInvalidStateError(ClaimError):
     """Raised when a claim is attempted on a task that is not in an open state."""
 
 
+# ---------------------- Task list pagination ----------------------
+
+# Columns loaded for slim (list view) task pages
+SLIM_TASK_COLUMNS = (
+    "id", "task_type", "status", "title", "created_by_id", "related_order_id",
+    "required_role", "claimed_by_user_id", "created_at", "updated_at",
+)
+
+
+@dataclass
+class TaskPage:
+    """One page of list_tasks_page results."""
+    tasks: list
+    total: int
+    next_cursor: Optional[str] = None
+
+
+def _encode_task_cursor(task: AutomationTask, total: int) -> str:
+    """Opaque keyset cursor: sort key of the last row, plus the page-1 total."""
+    created_at = task.created_at.isoformat() if task.created_at else None
+    raw = json.dumps({"k": [task.related_order_id, created_at, task.id], "t": total})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_task_cursor(cursor: str) -> tuple[tuple, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        order_id, created_at, task_id = data["k"]
+        created_at = datetime.fromisoformat(created_at) if created_at else None
+        return (order_id, created_at, int(task_id)), int(data["t"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _after_task_cursor(position: tuple, nulls_first: bool):
+    """Rows after `position` in related_order_id DESC, created_at ASC, id ASC order.
+
+    NULL related_order_id sorts first under DESC on PostgreSQL and last on
+    SQLite; `nulls_first` selects which.
+
+    created_at is compared with the cursor row's stored value (a primary-key
+    lookup), so ties match however the database stores timestamps (SQLite
+    keeps server defaults as text without microseconds). The cursor's own
+    value is only used if that row is gone.
+    """
+    from sqlalchemy import or_, and_
+
+    order_id, created_at, task_id = position
+    if created_at is None:
+        later_in_order = and_(AutomationTask.created_at.is_(None), AutomationTask.id > task_id)
+    else:
+        anchor = func.coalesce(
+            select(AutomationTask.created_at).where(AutomationTask.id == task_id).scalar_subquery(),
+            created_at,
+        )
+        later_in_order = or_(
+            AutomationTask.created_at > anchor,
+            and_(AutomationTask.created_at == anchor, AutomationTask.id > task_id),
+        )
+
+    if order_id is None:
+        same_group = and_(AutomationTask.related_order_id.is_(None), later_in_order)
+        if nulls_first:
+            return or_(same_group, AutomationTask.related_order_id.is_not(None))
+        return same_group
+
+    after = or_(
+        AutomationTask.related_order_id < order_id,
+        and_(AutomationTask.related_order_id == order_id, later_in_order),
+    )
+    if not nulls_first:
+        after = or_(after, AutomationTask.related_order_id.is_(None))
+    return after
+
+
 class AutomationService:
     """
     Service layer for the automation engine.
@@ -70,241 +150,188 @@ class AutomationService:
         override: bool = False,
     ) -> AutomationTask:
         """
-        Atomically claim a task (OPEN -> CLAIMED) for a user.
-
-        - Uses SELECT ... FOR UPDATE to lock the task row.
-        - Enforces `required_role` if set on the task.
-        - Allows system admins to override an existing claim when `override=True`.
-        - Raises ClaimConflictError on double-claim without override.
-        - Raises ClaimPermissionError when user role doesn't match required_role.
-        - Emits TaskEvent and writes an AuditLog entry.
+        Claim a task (OPEN/PENDING -> CLAIMED) for a user.
+
+        - One conditional UPDATE ... RETURNING decides the claim: open state,
+          no claimant and `required_role` are all in its WHERE, and it is
+          committed at once. Concurrent claimers hold the row lock for that
+          one statement; losers fail as soon as the winner commits.
+        - Roles and the admin flag come from the role directory (no user query).
+        - The claimer's assignment, TaskEvents, audit and notifications are
+          written after the claim commits.
+        - System admins bypass `required_role`, and may take over an existing
+          claim with `override=True` (locked path; rare).
+        - Raises ClaimNotFoundError, ClaimPermissionError (missing role),
+          ClaimConflictError (already claimed) or ClaimInvalidStateError.
         """
         from app.audit.logger import log_audit
 
-        # Lock the task row for update to prevent races
-        result = await db.execute(
-            select(AutomationTask).where(AutomationTask.id == task_id).with_for_update()
-        )
-        task = result.scalar_one_or_none()
-        if not task:
-            raise ClaimNotFoundError("Task not found")
-
-        # Resolve user and check minimal authorization
-        user_result = await db.execute(select(User).where(User.id == user_id))
-        user = user_result.scalar_one_or_none()
-        if not user:
-            raise ClaimPermissionError("User not found")
-
         # NOTE: Task claiming is global-role based. It intentionally does NOT depend on chat channels.
-        # Authorization rules (only):
-        # - Task must be OPEN or PENDING to be claimable (unless admin override)
-        # - If task.required_role is set, user must have the global role or be a system admin
-
-        # FRESH DB role resolution — do NOT use cached user.operational_roles or user.has_operational_role()
-        # This ensures admin role changes take effect immediately without logout/token refresh
-        from app.db.models import UserOperationalRole
-        role_result = await db.execute(
-            select(UserOperationalRole.role).where(UserOperationalRole.user_id == user.id)
-        )
-        user_roles = {row[0] for row in role_result}
-
-        # Fallback: include the simple `user.role` column if present (tests and some setups use this)
-        if getattr(user, 'role', None):
-            user_roles.add(user.role)
-
-        # Diagnostic logging for debugging role issues
-        logger.info(
-            "[CLAIM_ROLE_CHECK] user_id=%s roles=%s required_role=%s task_id=%s",
-            user.id,
-            sorted(user_roles),
-            task.required_role,
-            task.id,
-        )
-
-        # Full diagnostic log before role check
-        logger.error(
-            "[CLAIM_DEBUG] task_id=%s user_id=%s username=%s "
-            "task.required_role=%s task_metadata=%s "
-            "user_roles=%s task_status=%s claimed_by=%s",
-            task.id,
-            user.id,
-            user.username,
-            task.required_role,
-            task.task_metadata,
-            user_roles,
-            task.status,
-            task.claimed_by_user_id,
-        )
+        # The directory is invalidated on every role/activation commit, so admin role changes
+        # take effect immediately without logout/token refresh
+        profile = await role_directory.claim_profile(db, user_id)
+        if profile is None:
+            raise ClaimPermissionError("User not found")
 
-        # Role-based authorization (403) — resolved fresh from DB per request
-        if task.required_role:
-            if task.required_role not in user_roles and not user.is_system_admin:
-                # HARD SAFETY CHECK: Log explicit role mismatch to prevent silent failures
-                logger.error(
-                    "[CLAIM_DENIED_ROLE_MISMATCH]",
-                    extra={
-                        "user_id": user.id,
-                        "task_id": task.id,
-                        "required_role": task.required_role,
-                        "user_roles": list(user_roles),
-                    },
-                )
-                from app.audit.logger import log_audit
-                await log_audit(
-                    db,
-                    user,
-                    action="claim",
-                    resource="automation_task",
-                    resource_id=task.id,
-                    success=False,
-                    reason="missing_required_role",
-                )
-                raise ClaimPermissionError("You are not allowed to claim this task")
-
-        # Handle current task status cases
-        # Role-based claiming: reject if task is already claimed (regardless of who claimed it)
-        # Only allow admin override to take over existing claims
-        if task.status == AutomationTaskStatus.claimed:
-            # If admin and override=True, allow override (handled below)
-            if user.is_system_admin and override:
-                # allow to continue to override path
-                pass
-            else:
-                await log_audit(db, user, action="claim", resource="automation_task", resource_id=task.id, success=False, reason="already_claimed")
-                raise ClaimConflictError("Task already claimed")
+        criteria = [
+            AutomationTask.id == task_id,
+            AutomationTask.status.in_([AutomationTaskStatus.open, AutomationTaskStatus.pending]),
+            AutomationTask.claimed_by_user_id.is_(None),
+        ]
+        if not profile.is_system_admin:
+            criteria.append(or_(
+                AutomationTask.required_role.is_(None),
+                AutomationTask.required_role == "",
+                AutomationTask.required_role.in_(sorted(profile.roles)),
+            ))
+        claimed = (await db.execute(
+            update(AutomationTask)
+            .where(*criteria)
+            .values(claimed_by_user_id=user_id, claimed_at=datetime.now(timezone.utc), status=AutomationTaskStatus.claimed)
+            .returning(AutomationTask.required_role, AutomationTask.title, AutomationTask.related_order_id)
+            .execution_options(synchronize_session=False)
+        )).one_or_none()
+        await db.commit()
 
-        # For any state that is not OPEN or PENDING (e.g., done) that is not an admin override, reject with 400
-        if task.status not in (AutomationTaskStatus.open, AutomationTaskStatus.pending):
-            if not (user.is_system_admin and override):
-                raise ClaimInvalidStateError("Task is not open for claim")
+        if claimed is not None:
+            logger.debug("[Automation] Task %s claimed by user %s", task_id, user_id)
+            await AutomationService._after_claim(db, task_id, profile, claimed)
+            return await db.get(AutomationTask, task_id, populate_existing=True)
+
+        # Lost: find out why (plain read, no lock)
+        current = (await db.execute(
+            select(AutomationTask.status, AutomationTask.claimed_by_user_id, AutomationTask.required_role)
+            .where(AutomationTask.id == task_id)
+        )).one_or_none()
+        if current is None:
+            raise ClaimNotFoundError("Task not found")
 
-        # Normal claim path — perform an atomic UPDATE so concurrent claim attempts race on the DB
+        if current.required_role and current.required_role not in profile.roles and not profile.is_system_admin:
+            logger.warning(
+                "[CLAIM_DENIED_ROLE_MISMATCH] user_id=%s task_id=%s required_role=%s user_roles=%s",
+                user_id, task_id, current.required_role, sorted(profile.roles),
+            )
+            await log_audit(db, profile, action="claim", resource="automation_task", resource_id=task_id, success=False, reason="missing_required_role")
+            raise ClaimPermissionError("You are not allowed to claim this task")
+
+        if current.claimed_by_user_id and profile.is_system_admin and override:
+            return await AutomationService._override_claim(db, task_id, profile)
+
+        if (
+            current.claimed_by_user_id
+            or current.status == AutomationTaskStatus.claimed
+            # Open again by now: it was claimed and released while we raced
+            or current.status in (AutomationTaskStatus.open, AutomationTaskStatus.pending)
+        ):
+            await log_audit(db, profile, action="claim", resource="automation_task", resource_id=task_id, success=False, reason="already_claimed")
+            raise ClaimConflictError("Task already claimed")
 
-        # Role-based claiming: if task is already claimed (by anyone), conflict unless admin override
-        if task.claimed_by_user_id:
-            if not (user.is_system_admin and override):
-                await log_audit(db, user, action="claim", resource="automation_task", resource_id=task.id, success=False, reason="already_claimed")
-                raise ClaimConflictError("Task already claimed")
+        raise ClaimInvalidStateError("Task is not open for claim")
 
-            # Admin override - record reassignment event
-            prev = task.claimed_by_user_id
-            task.claimed_by_user_id = user_id
-            task.claimed_at = datetime.now(timezone.utc)
-            task.status = AutomationTaskStatus.claimed
+    @staticmethod
+    async def _after_claim(db: AsyncSession, task_id: int, profile, claimed) -> None:
+        """Post-commit bookkeeping for a won claim; failures never undo the claim."""
+        from app.audit.logger import log_audit
 
+        user_id = profile.id
+        try:
             await AutomationService._safe_log_event(
                 db=db,
-                task_id=task.id,
+                task_id=task_id,
                 user_id=user_id,
-                event_type=TaskEventType.task_reassigned,
-                metadata={"from_user_id": prev, "to_user_id": user_id}
-            )
-
-            await log_audit(db, user, action="claim_override", resource="automation_task", resource_id=task.id, success=True, reason="override")
-
-            # Notify previous claimer, new assignee, other admins
-            try:
-                from app.services.notifications import notify_task_reassigned
-                await notify_task_reassigned(
-                    db=db,
-                    task_id=task.id,
-                    task_title=task.title,
-                    from_user_id=prev,
-                    to_user_id=user_id,
-                    order_id=task.related_order_id,  # Pass order_id for participant-based notifications
-                )
-            except Exception as e:
-                logger.warning(f"[Automation] Failed to notify on task.reassigned: {e}")
-
-            await db.commit()
-            await db.refresh(task)
-            return task
-
-        # Normal claim path — perform an atomic UPDATE so concurrent claim attempts race on the DB
-        now = datetime.now(timezone.utc)
-        update_stmt = (
-            update(AutomationTask)
-            .where(
-                AutomationTask.id == task.id,
-                AutomationTask.status.in_([AutomationTaskStatus.open, AutomationTaskStatus.pending]),
-                AutomationTask.claimed_by_user_id == None,
+                event_type=TaskEventType.task_claimed,
+                metadata={"action": "claim"}
             )
-            .values(claimed_by_user_id=user_id, claimed_at=now, status=AutomationTaskStatus.claimed)
-        )
-        res = await db.execute(update_stmt)
-
-        if res.rowcount == 0:
-            # Someone else won the race
-            await log_audit(db, user, action="claim", resource="automation_task", resource_id=task.id, success=False, reason="race_conflict")
-            raise ClaimConflictError("Task already claimed")
 
-        # Log event and audit for successful claim
-        await AutomationService._safe_log_event(
-            db=db,
-            task_id=task.id,
-            user_id=user_id,
-            event_type=TaskEventType.task_claimed,
-            metadata={"action": "claim"}
-        )
-
-        await log_audit(db, user, action="claim", resource="automation_task", resource_id=task.id, success=True)
-
-        # Create a TaskAssignment for the claimer so this claim is visible in their 'my assignments'
-        try:
-            # Avoid creating duplicate assignment if one exists
-            existing_q = await db.execute(
-                select(TaskAssignment).where(
-                    TaskAssignment.task_id == task.id,
+            # Create a TaskAssignment for the claimer so this claim is visible in their 'my assignments'
+            role_hint = claimed.required_role if claimed.required_role else None
+            existing_assignment = await db.scalar(
+                select(TaskAssignment.id).where(
+                    TaskAssignment.task_id == task_id,
                     TaskAssignment.user_id == user_id,
-                    TaskAssignment.role_hint == task.required_role,
+                    TaskAssignment.role_hint == claimed.required_role,
                 )
             )
-            existing_assignment = existing_q.scalar_one_or_none()
             if not existing_assignment:
-                role_hint = task.required_role if task.required_role else None
-                new_assign = TaskAssignment(
-                    task_id=task.id,
+                db.add(TaskAssignment(
+                    task_id=task_id,
                     user_id=user_id,
                     role_hint=role_hint,
                     status=AssignmentStatus.in_progress,
-                )
-                db.add(new_assign)
-
-                # Log assignment event for the new assignment
-                evt = TaskEvent(
-                    task_id=task.id,
+                ))
+                db.add(TaskEvent(
+                    task_id=task_id,
                     user_id=user_id,
                     event_type=TaskEventType.assigned,
                     event_metadata=json.dumps({"assigned_user_id": user_id, "role_hint": role_hint}),
-                )
-                db.add(evt)
-                await db.flush()
-                logger.info(f"[Automation] Created assignment for claimer {user_id} on task {task.id} (role={role_hint})")
+                ))
+            await db.commit()
         except Exception as e:
-            logger.warning(f"[Automation] Failed to create assignment for claimer: {e}")
+            logger.warning(f"[Automation] Failed to record claim of task {task_id} by {user_id}: {e}")
+            await db.rollback()
+
+        await log_audit(db, profile, action="claim", resource="automation_task", resource_id=task_id, success=True)
 
         # Notify other role members and admins about the claim
         try:
             from app.services.notifications import notify_task_claimed
             await notify_task_claimed(
+                db=db,
+                task_id=task_id,
+                task_title=claimed.title,
+                claimer_id=user_id,
+                required_role=claimed.required_role,
+                order_id=claimed.related_order_id,  # Pass order_id for participant-based notifications
+            )
+            await db.commit()
+        except Exception as e:
+            logger.warning(f"[Automation] Failed to notify on task.claimed: {e}")
+            await db.rollback()
+
+    @staticmethod
+    async def _override_claim(db: AsyncSession, task_id: int, profile) -> AutomationTask:
+        """Admin takeover of an existing claim, under a row lock."""
+        from app.audit.logger import log_audit
+
+        result = await db.execute(
+            select(AutomationTask).where(AutomationTask.id == task_id).with_for_update()
+        )
+        task = result.scalar_one_or_none()
+        if not task:
+            raise ClaimNotFoundError("Task not found")
+
+        user_id = profile.id
+        prev = task.claimed_by_user_id
+        task.claimed_by_user_id = user_id
+        task.claimed_at = datetime.now(timezone.utc)
+        task.status = AutomationTaskStatus.claimed
+
+        await AutomationService._safe_log_event(
+            db=db,
+            task_id=task.id,
+            user_id=user_id,
+            event_type=TaskEventType.task_reassigned,
+            metadata={"from_user_id": prev, "to_user_id": user_id}
+        )
+
+        await log_audit(db, profile, action="claim_override", resource="automation_task", resource_id=task.id, success=True, reason="override")
+
+        # Notify previous claimer, new assignee, other admins
+        try:
+            from app.services.notifications import notify_task_reassigned
+            await notify_task_reassigned(
                 db=db,
                 task_id=task.id,
                 task_title=task.title,
-                claimer_id=user_id,
-                required_role=task.required_role,
+                from_user_id=prev,
+                to_user_id=user_id,
                 order_id=task.related_order_id,  # Pass order_id for participant-based notifications
             )
         except Exception as e:
-            logger.warning(f"[Automation] Failed to notify on task.claimed: {e}")
+            logger.warning(f"[Automation] Failed to notify on task.reassigned: {e}")
 
-        # Commit and verify we still hold the claim (detect races where another committer overwrote us)
         await db.commit()
         await db.refresh(task)
-        if task.claimed_by_user_id != user_id:
-            # Lost the race
-            await log_audit(db, user, action="claim", resource="automation_task", resource_id=task.id, success=False, reason="lost_race")
-            raise ClaimConflictError("Task was claimed by another user")
-
         return task
 
     # ---------------------- Task Operations ----------------------
@@ -474,18 +501,6 @@ class AutomationService:
         result = await db.execute(query)
         return result.scalar_one_or_none()
     
-    @staticmethod
-    async def list_tasks(
-        db: AsyncSession,
-        status: Optional[AutomationTaskStatus] = None,
-        task_type: Optional[AutomationTaskType] = None,
-        created_by_id: Optional[int] = None,
-        limit: int = 50,
-        offset: int = 0,
-        current_user: Optional[User] = None,
-    ) -> list[AutomationTask]:
-        pass
-
     @staticmethod
     async def _all_required_assignments_done(db: AsyncSession, automation_task_id: int) -> bool:
         """Return True if there are no remaining non-DONE/non-SKIPPED assignments for the automation task."""
@@ -500,119 +515,137 @@ class AutomationService:
         return res.scalar_one_or_none() is None
 
     @staticmethod
-    async def list_tasks(
+    def _list_criteria(
+        status: Optional[AutomationTaskStatus],
+        task_type: Optional[AutomationTaskType],
+        created_by_id: Optional[int],
+        current_user: Optional[User],
+    ) -> list:
+        """WHERE criteria shared by the task list rows and its total.
+
+        For non-admin users (created_by_id set), include tasks they created,
+        tasks where they have a TaskAssignment, or COMPLETED tasks for their
+        operational role. EXISTS instead of JOIN + DISTINCT keeps rows unique;
+        it is served by ix_task_assignments_user_task.
+        """
+        from sqlalchemy import or_, and_
+
+        criteria = []
+        if status:
+            criteria.append(AutomationTask.status == status)
+        if task_type:
+            criteria.append(AutomationTask.task_type == task_type)
+        if created_by_id:
+            visible = [
+                AutomationTask.created_by_id == created_by_id,
+                exists().where(
+                    TaskAssignment.user_id == created_by_id,
+                    TaskAssignment.task_id == AutomationTask.id,
+                ),
+            ]
+            role_val = getattr(current_user, 'role', None) if current_user is not None else None
+            if role_val:
+                visible.append(and_(
+                    AutomationTask.required_role == role_val,
+                    AutomationTask.status == AutomationTaskStatus.completed,
+                ))
+            criteria.append(or_(*visible))
+        return criteria
+
+    @staticmethod
+    async def list_tasks_page(
         db: AsyncSession,
         status: Optional[AutomationTaskStatus] = None,
         task_type: Optional[AutomationTaskType] = None,
         created_by_id: Optional[int] = None,
         limit: int = 50,
         offset: int = 0,
+        cursor: Optional[str] = None,
         current_user: Optional[User] = None,
-    ) -> list[AutomationTask]:
-        """List tasks with optional filters.
+        slim: bool = False,
+    ) -> TaskPage:
+        """List tasks with optional filters, plus the total match count.
 
-        For non-admin users, include tasks they created OR tasks where they have a TaskAssignment.
-        Use DISTINCT to avoid duplicates and preserve pagination.
-        """
-        """
-        List tasks with optional filters.
+        Ordered by related_order_id DESC, created_at ASC, id ASC (group by
+        order, then workflow sequence), which ix_automation_tasks_listing
+        serves. Pass the returned next_cursor back as `cursor` for keyset
+        pagination; `offset` is only honoured without a cursor.
 
-        For non-admin users, include tasks they created OR tasks where they have a TaskAssignment.
-        Use DISTINCT to avoid duplicates and preserve pagination.
-        """
-        from sqlalchemy import or_, exists, func
-        from app.db.models import TaskAssignment
+        The first page reads the total in the same query (COUNT(*) OVER());
+        cursor pages carry it forward in the cursor instead of recounting.
+        `slim` loads list columns only: no description/metadata/assignments.
 
-        # Determine user debug info (best-effort, do not change logic)
-        user_id_debug = getattr(current_user, 'id', None)
-        user_role_debug = getattr(current_user, 'role', None)
-        user_is_admin_debug = getattr(current_user, 'is_system_admin', None)
+        Raises ValueError for a malformed cursor.
+        """
+        from sqlalchemy.orm import load_only
 
-        query = select(AutomationTask).options(selectinload(AutomationTask.assignments).selectinload(TaskAssignment.user))
-        
-        if status:
-            query = query.where(AutomationTask.status == status)
-        if task_type:
-            query = query.where(AutomationTask.task_type == task_type)
+        criteria = AutomationService._list_criteria(status, task_type, created_by_id, current_user)
+        order_by = (AutomationTask.related_order_id.desc(), AutomationTask.created_at.asc(), AutomationTask.id.asc())
 
-        # If created_by_id is provided, we want tasks created by the user OR assigned to the user
-        # Use EXISTS subquery instead of JOIN + DISTINCT to avoid dialect-specific DISTINCT ON issues
-        if created_by_id:
-            assignment_exists = (
-                select(TaskAssignment.id)
-                .where(TaskAssignment.task_id == AutomationTask.id)
-                .where(TaskAssignment.user_id == created_by_id)
+        if slim:
+            options = [load_only(*(getattr(AutomationTask, c) for c in SLIM_TASK_COLUMNS))]
+        else:
+            options = [selectinload(AutomationTask.assignments).selectinload(TaskAssignment.user)]
+
+        total = None
+        if cursor:
+            position, total = _decode_task_cursor(cursor)
+            nulls_first = db.get_bind().dialect.name != "sqlite"
+            query = (
+                select(AutomationTask)
+                .options(*options)
+                .where(*criteria, _after_task_cursor(position, nulls_first))
+                .order_by(*order_by)
+                .limit(limit)
             )
-
-            # Allow non-admin users to still see COMPLETED automation tasks for their operational role
-            # (e.g., delivery users should see completed delivery tasks). This is a read-only, presentation
-            # change that ensures users can observe completed tasks relevant to their role without
-            # modifying workflows or assignments.
-            role_val = getattr(current_user, 'role', None) if current_user is not None else None
-            if role_val:
-                from sqlalchemy import and_
-                # Include tasks created by the user, tasks assigned to the user, OR completed tasks for their role
-                query = query.where(
-                    or_(
-                        AutomationTask.created_by_id == created_by_id,
-                        exists(assignment_exists),
-                        and_(AutomationTask.required_role == role_val, AutomationTask.status == AutomationTaskStatus.completed),
-                    )
-                )
-            else:
-                query = query.where(
-                    or_(
-                        AutomationTask.created_by_id == created_by_id,
-                        exists(assignment_exists),
-                    )
-                )
-
-        # Compute total matches BEFORE pagination (do not modify returned results)
-        # Build a simple count query with the same WHERE clauses
-        count_q = select(func.count()).select_from(AutomationTask)
-        # Apply same filters used above for count
-        if status:
-            count_q = count_q.where(AutomationTask.status == status)
-        if task_type:
-            count_q = count_q.where(AutomationTask.task_type == task_type)
-        if created_by_id:
-            assignment_exists = (
-                select(TaskAssignment.id)
-                .where(TaskAssignment.task_id == AutomationTask.id)
-                .where(TaskAssignment.user_id == created_by_id)
+            tasks = list((await db.execute(query)).scalars().all())
+        else:
+            query = (
+                select(AutomationTask, func.count().over().label("total"))
+                .options(*options)
+                .where(*criteria)
+                .order_by(*order_by)
+                .limit(limit)
+                .offset(offset)
             )
-            role_val = getattr(current_user, 'role', None) if current_user is not None else None
-            if role_val:
-                from sqlalchemy import and_
-                count_q = count_q.where(
-                    or_(
-                        AutomationTask.created_by_id == created_by_id,
-                        exists(assignment_exists),
-                        and_(AutomationTask.required_role == role_val, AutomationTask.status == AutomationTaskStatus.completed),
-                    )
-                )
+            rows = (await db.execute(query)).all()
+            tasks = [row[0] for row in rows]
+            if rows:
+                total = int(rows[0].total)
+            elif offset:
+                # Past the end: the window count has no row to ride on
+                total = int((await db.execute(
+                    select(func.count()).select_from(AutomationTask).where(*criteria)
+                )).scalar_one())
             else:
-                count_q = count_q.where(
-                    or_(
-                        AutomationTask.created_by_id == created_by_id,
-                        exists(assignment_exists),
-                    )
-                )
+                total = 0
 
-        total_result = await db.execute(count_q)
-        total_before_pagination = int(total_result.scalar_one())
+        next_cursor = None
+        if len(tasks) == limit and tasks:
+            next_cursor = _encode_task_cursor(tasks[-1], total)
+        return TaskPage(tasks=tasks, total=total, next_cursor=next_cursor)
 
-        # Log debug information
-        logger.info(f"[TASK-LIST-DEBUG] user_id={user_id_debug} role={user_role_debug} is_system_admin={user_is_admin_debug} limit={limit} offset={offset} total_before_pagination={total_before_pagination}")
-
-        # Apply consistent ordering: group by order, then workflow sequence
-        query = query.order_by(
-            AutomationTask.related_order_id.desc(),
-            AutomationTask.created_at.asc()
-        ).limit(limit).offset(offset)
-        
-        result = await db.execute(query)
-        return list(result.scalars().all())
+    @staticmethod
+    async def list_tasks(
+        db: AsyncSession,
+        status: Optional[AutomationTaskStatus] = None,
+        task_type: Optional[AutomationTaskType] = None,
+        created_by_id: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0,
+        current_user: Optional[User] = None,
+    ) -> list[AutomationTask]:
+        """List tasks with optional filters (rows of list_tasks_page)."""
+        page = await AutomationService.list_tasks_page(
+            db,
+            status=status,
+            task_type=task_type,
+            created_by_id=created_by_id,
+            limit=limit,
+            offset=offset,
+            current_user=current_user,
+        )
+        return page.tasks
 
     @staticmethod
     async def available_tasks_for_role(
@@ -622,20 +655,13 @@ class AutomationService:
         offset: int = 0,
     ) -> list[AutomationTask]:
         """Return tasks that are required for a role and have no assignments at all.
-        If role is None, returns all unclaimed open tasks regardless of required_role."""
+        If role is None, returns all unclaimed open tasks regardless of required_role.
+        Read through the claim queue index (see app.services.dispatch)."""
         # Exclude tasks that have ANY assignment - only truly free tasks are available
-        from sqlalchemy import select as _select
-        assignment_exists = (
-            _select(TaskAssignment.id)
-            .where(TaskAssignment.task_id == AutomationTask.id)
-        )
-
         query = (
             select(AutomationTask)
             .options(selectinload(AutomationTask.assignments).selectinload(TaskAssignment.user))
-            .where(AutomationTask.status == AutomationTaskStatus.open)
-            .where(AutomationTask.claimed_by_user_id == None)
-            .where(~exists(assignment_exists))
+            .where(*claim_queue_criteria())
             .order_by(
                 AutomationTask.related_order_id.desc(),
                 AutomationTask.created_at.asc()
@@ -683,11 +709,11 @@ class AutomationService:
                 from datetime import datetime
 
                 now = datetime.utcnow()
-                await db.execute(
-                    update(TaskAssignment)
-                    .where(TaskAssignment.task_id == task_id)
-                    .where(TaskAssignment.status != AssignmentStatus.done)
-                    .values(status=AssignmentStatus.done, completed_at=now)
+                await set_assignment_status(
+                    db, AssignmentStatus.done,
+                    TaskAssignment.task_id == task_id,
+                    TaskAssignment.status != AssignmentStatus.done,
+                    completed_at=now,
                 )
                 logger.info(f"[Automation] Auto-completed assignments for task {task_id} as part of task completion")
             except Exception as e:
@@ -919,13 +945,9 @@ class AutomationService:
             actor = actor_result.scalar_one_or_none()
             is_admin = bool(actor and getattr(actor, 'is_system_admin', False))
             
-            # FRESH DB role resolution — do NOT use cached user.operational_roles or user.has_operational_role()
-            # This ensures admin role changes take effect immediately without logout/token refresh
-            from app.db.models import UserOperationalRole
-            role_result = await db.execute(
-                select(UserOperationalRole.role).where(UserOperationalRole.user_id == user_id)
-            )
-            user_roles = {row[0] for row in role_result}
+            # Role directory resolution (invalidated on every role change) — do NOT use
+            # cached user.operational_roles or user.has_operational_role()
+            user_roles = set(await role_directory.roles_for_user(db, user_id))
             
             # Diagnostic logging for debugging role issues
             logger.info(
@@ -1126,18 +1148,14 @@ class AutomationService:
 
                     if remaining is None:
                         # Fallback: if we cannot determine, do not block - mark done
-                        await db.execute(
-                            update(TaskAssignment)
-                            .where(TaskAssignment.id == ack_assignment.id)
-                            .values(status=AssignmentStatus.done, completed_at=now)
+                        await set_assignment_status(
+                            db, AssignmentStatus.done, TaskAssignment.id == ack_assignment.id, completed_at=now,
                         )
                         logger.info(f"[Automation] Cross-role acknowledgment: marking {acknowledges_role}'s assignment as DONE (fallback)")
                     elif remaining is False:
                         # No remaining steps for this role - mark assignment DONE
-                        await db.execute(
-                            update(TaskAssignment)
-                            .where(TaskAssignment.id == ack_assignment.id)
-                            .values(status=AssignmentStatus.done, completed_at=now)
+                        await set_assignment_status(
+                            db, AssignmentStatus.done, TaskAssignment.id == ack_assignment.id, completed_at=now,
                         )
                         logger.info(f"[Automation] Cross-role acknowledgment: {role_hint} acknowledged receipt, marking {acknowledges_role}'s assignment as DONE")
                     else:
@@ -1168,14 +1186,12 @@ class AutomationService:
 
         if is_admin:
             # System admins may force-complete an assignment
-            upd = (
-                update(TaskAssignment)
-                .where(TaskAssignment.id == assignment.id)
-                .where(TaskAssignment.status != AssignmentStatus.done)
-                .values(status=AssignmentStatus.done, completed_at=now, notes=notes)
-            )
-            res = await db.execute(upd)
-            marked_done = res.rowcount > 0
+            marked_done = await set_assignment_status(
+                db, AssignmentStatus.done,
+                TaskAssignment.id == assignment.id,
+                TaskAssignment.status != AssignmentStatus.done,
+                completed_at=now, notes=notes,
+            ) > 0
         else:
             # Regular users: mark DONE only if final step or all workflow tasks for their role are done
             can_mark_done = should_mark_done
@@ -1209,15 +1225,13 @@ class AutomationService:
             # can_mark_done OR no remaining role tasks -> mark assignment done
             if can_mark_done or (remaining is False):
                 # Mark assignment as done
-                upd = (
-                    update(TaskAssignment)
-                    .where(TaskAssignment.id == assignment.id)
-                    .where(TaskAssignment.user_id == user_id)
-                    .where(TaskAssignment.status != AssignmentStatus.done)
-                    .values(status=AssignmentStatus.done, completed_at=now, notes=notes)
-                )
-                res = await db.execute(upd)
-                marked_done = res.rowcount > 0
+                marked_done = await set_assignment_status(
+                    db, AssignmentStatus.done,
+                    TaskAssignment.id == assignment.id,
+                    TaskAssignment.user_id == user_id,
+                    TaskAssignment.status != AssignmentStatus.done,
+                    completed_at=now, notes=notes,
+                ) > 0
             else:
                 # Do not mark assignment done; update notes only to record activity
                 upd = (
@@ -1569,11 +1583,11 @@ class AutomationService:
                 from datetime import datetime
 
                 now = datetime.utcnow()
-                await db.execute(
-                    update(TaskAssignment)
-                    .where(TaskAssignment.task_id == task_id)
-                    .where(TaskAssignment.status != AssignmentStatus.done)
-                    .values(status=AssignmentStatus.done, completed_at=now)
+                await set_assignment_status(
+                    db, AssignmentStatus.done,
+                    TaskAssignment.task_id == task_id,
+                    TaskAssignment.status != AssignmentStatus.done,
+                    completed_at=now,
                 )
                 logger.info(f"[Automation] Auto-completed assignments for task {task_id} as part of auto-close (assignments-only)")
             except Exception as e:
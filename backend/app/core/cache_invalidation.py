@@ -0,0 +1,185 @@
+"""
+Cache Invalidation
+
+Keeps process-wide, in-memory caches in step with the database:
+- watch() registers a cache: its channel name, the tables it is built from
+  and its invalidate() method
+- One set of Session listeners serves every cache: a flush or a bulk /
+  text statement touching a watched table marks the session; after_commit
+  invalidates the marked caches (which publish() to the other pods),
+  after_soft_rollback invalidates them locally only
+- By default any change to a watched table invalidates the whole cache; a
+  cache can narrow that (on_flush / on_statement, e.g. only some columns)
+  and, if keyed, drop just some keys
+- Messages go out on "cache:<channel>"; app/ws/redis_pubsub.py hands every
+  such message from another pod to dispatch()
+- Delivery is best effort: each cache also reloads after its own
+  MAX_AGE_SECONDS, which bounds staleness if a message is missed
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+# Redis channels are CHANNEL_PREFIX + the cache's channel name
+CHANNEL_PREFIX = "cache:"
+CHANNEL_PATTERN = CHANNEL_PREFIX + "*"
+
+_PENDING_KEY = "cache_invalidation_pending"
+
+# What a change invalidates: False (nothing), True (everything) or some keys
+Scope = Union[bool, Iterable[Any]]
+
+
+@dataclass(frozen=True)
+class Watch:
+    """A registered cache."""
+    channel: str
+    tables: FrozenSet[str]
+    invalidate: Callable[..., None]
+    on_flush: Optional[Callable[[Session], Scope]] = None
+    on_statement: Optional[Callable[[Any, str], Scope]] = None
+    keyed: bool = False
+
+    def apply(self, keys: Optional[List[Any]], broadcast: bool) -> None:
+        if self.keyed:
+            self.invalidate(keys, broadcast=broadcast)
+        else:
+            self.invalidate(broadcast=broadcast)
+
+
+_watches: Dict[str, Watch] = {}
+_by_table: Dict[str, List[Watch]] = {}
+
+
+def watch(
+    channel: str,
+    tables: Iterable[str],
+    invalidate: Callable[..., None],
+    on_flush: Optional[Callable[[Session], Scope]] = None,
+    on_statement: Optional[Callable[[Any, str], Scope]] = None,
+    keyed: bool = False,
+) -> Watch:
+    """
+    Register a cache built from `tables`.
+
+    `invalidate(broadcast=...)` - keyed: `invalidate(keys, broadcast=...)`,
+    None meaning all keys - drops the cache and, with `broadcast`, calls
+    publish(). `on_flush(session)` and `on_statement(statement, table)` are
+    only asked once a flush or bulk statement touched one of `tables`.
+    """
+    entry = Watch(channel, frozenset(tables), invalidate, on_flush, on_statement, keyed)
+    _watches[channel] = entry
+    _by_table.clear()
+    for registered in _watches.values():
+        for table in registered.tables:
+            _by_table.setdefault(table, []).append(registered)
+    return entry
+
+
+def invalidate_all(broadcast: bool = False) -> None:
+    """Drop every registered cache (rows changed outside any ORM session, e.g. test cleanup)."""
+    for entry in list(_watches.values()):
+        entry.apply(None, broadcast=broadcast)
+
+
+# ============================================================================
+# Cross-pod propagation
+# ============================================================================
+
+def publish(channel: str, keys: Optional[List[Any]] = None) -> None:
+    """Best-effort publish so other pods drop their copy (everything, or `keys`)."""
+    try:
+        from app.core.redis import redis_client
+        client = getattr(redis_client, "client", None)
+        if client is None:
+            return
+        message = {"type": "cache_invalidated", "origin": redis_client.instance_id}
+        if keys is not None:
+            message["keys"] = keys
+        client.publish(CHANNEL_PREFIX + channel, json.dumps(message))
+    except Exception as e:
+        logger.warning(f"[CacheInvalidation] Failed to publish {channel} invalidation: {e}")
+
+
+def dispatch(redis_channel: str, payload: dict) -> bool:
+    """Apply an invalidation published by another pod; False if the message is not one."""
+    if not redis_channel.startswith(CHANNEL_PREFIX) or payload.get("type") != "cache_invalidated":
+        return False
+    entry = _watches.get(redis_channel[len(CHANNEL_PREFIX):])
+    if entry is None:
+        return False
+    entry.apply(payload.get("keys"), broadcast=False)
+    return True
+
+
+# ============================================================================
+# Automatic invalidation on commit
+# ============================================================================
+
+def _watching(tables: Iterable[Optional[str]]) -> List[Watch]:
+    found: Dict[str, Watch] = {}
+    for table in tables:
+        for entry in _by_table.get(table, ()):
+            found[entry.channel] = entry
+    return list(found.values())
+
+
+def _mark(session: Session, entry: Watch, scope: Scope) -> None:
+    if scope is False or scope is None:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    current = pending.get(entry.channel)
+    if scope is True or not entry.keyed or current is True:
+        pending[entry.channel] = True
+        return
+    keys = set(scope)
+    if keys:
+        pending[entry.channel] = (current or set()) | keys
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_on_flush(session, flush_context):
+    touched = {getattr(obj, "__tablename__", None) for obj in (*session.new, *session.dirty, *session.deleted)}
+    for entry in _watching(touched):
+        _mark(session, entry, entry.on_flush(session) if entry.on_flush else True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_on_bulk_statement(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    statement = orm_execute_state.statement
+    session = orm_execute_state.session
+    if isinstance(statement, TextClause):
+        sql = statement.text.lower()
+        for entry in _watching(table for table in _by_table if table in sql):
+            _mark(session, entry, True)
+        return
+    table = getattr(getattr(statement, "table", None), "name", None)
+    for entry in _by_table.get(table, ()):
+        _mark(session, entry, entry.on_statement(statement, table) if entry.on_statement else True)
+
+
+def _invalidate_pending(session: Session, broadcast: bool) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    for channel, scope in (pending or {}).items():
+        _watches[channel].apply(None if scope is True else sorted(scope), broadcast=broadcast)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    _invalidate_pending(session, broadcast=True)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _invalidate_on_rollback(session, previous_transaction):
+    # A reload inside the rolled-back transaction may have cached its
+    # uncommitted changes; other pods never saw them
+    _invalidate_pending(session, broadcast=False)
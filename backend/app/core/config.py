@@ -27,6 +27,11 @@ class Settings(BaseSettings):
     JWT_SECRET: str = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
+
+    # Password hashing (bcrypt runs on a bounded thread pool, off the event loop)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 64
     
     # MinIO
     MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT", "localhost:9000")
@@ -69,6 +74,17 @@ class Settings(BaseSettings):
     # Defaults to False to avoid accidental assignment changes on startup.
     BACKFILL_ON_STARTUP: bool = False
 
+    # Async form submission queue: submissions sent with process_async are
+    # acknowledged immediately and processed by a background worker
+    FORM_QUEUE_ENABLED: bool = True
+    FORM_QUEUE_CONCURRENCY: int = 4  # per service target, per worker process
+    FORM_QUEUE_MAX_ATTEMPTS: int = 5
+
+    # In-process event bus (app/core/event_bus.py)
+    EVENT_BUS_MAX_PENDING: int = 1000  # per subscriber; further events are dropped (non-durable)
+    EVENT_OUTBOX_ENABLED: bool = True  # run the relay delivering durable subscribers (off: delivered in-process, no retries)
+    EVENT_OUTBOX_MAX_ATTEMPTS: int = 8
+
     # Testing flag (set True during pytest runs)
     TESTING: bool = False
 
@@ -78,6 +94,23 @@ class Settings(BaseSettings):
     # Make.com Webhook Integration (Phase 6.5)
     # If unset, webhook integration is disabled
     MAKE_WEBHOOK_URL: str = os.getenv("MAKE_WEBHOOK_URL", "")
+    # Make scenarios that accept a JSON array can take several events per POST
+    MAKE_WEBHOOK_BATCH_SIZE: int = 1
+
+    # Outbound webhook delivery (app/integrations/webhook_dispatcher.py)
+    WEBHOOK_DISPATCHER_ENABLED: bool = True  # off: each event is posted inline once, no retries
+    WEBHOOK_CONCURRENCY: int = 4  # concurrent POSTs per worker process
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_MAX_ATTEMPTS: int = 10
+    WEBHOOK_RETENTION_HOURS: int = 72  # finished deliveries (and their event_ids) are kept this long
+
+    # Notification inbox (app/services/notification_inbox.py)
+    NOTIFICATION_RETENTION_DAYS: int = 30  # read notifications older than this move to notifications_archive
+    NOTIFICATION_ARCHIVE_BATCH_SIZE: int = 1000
+
+    # Maintenance jobs (notification archive, inventory snapshot reconciliation) run on the
+    # cluster scheduler (app/ai/scheduler.py) even when AI_SCHEDULER_ENABLED is off
+    MAINTENANCE_JOBS_ENABLED: bool = True
 
     # Integration API token for external platforms (e.g., Make, Google Sheets)
     # Format: fear_allah_integration_<32chars>
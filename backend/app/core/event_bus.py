@@ -0,0 +1,411 @@
+"""
+In-Process Event Bus
+
+Publish/subscribe for domain events (EventType in app/core/events.py),
+replacing the if/elif routing that used to live in emit_event:
+- Subscribers register per event type (or ALL_EVENTS) with subscribe();
+  publish() is one route-table lookup that schedules each subscriber, so
+  producers never wait for Socket.IO, automation triggers or rules
+- Every subscriber has its own concurrency limit, timeout and pending cap
+  (EVENT_BUS_MAX_PENDING; beyond it events are dropped and counted), and
+  its errors are isolated from the producer and from other subscribers
+- Durable subscribers get an event_outbox row instead of an in-memory
+  task; the relay delivers those with retries and backoff. Delivery is
+  at-least-once, so durable handlers must tolerate repeats
+- Producers pass their session to publish() before committing it: the
+  outbox rows join the producer's transaction and the in-memory
+  subscribers are scheduled once it commits (nothing is delivered for a
+  rolled-back transaction). Without a session, publish() commits the
+  outbox rows itself before returning and raises if it cannot
+- outbox=False (the global bus when EVENT_OUTBOX_ENABLED is off, i.e. no
+  relay runs) delivers durable subscribers in-process like the others,
+  without retries, and logs a warning for each one registered
+- stats() reports per-subscriber calls, failures, drops and timings
+- inline=True (the global bus under settings.TESTING) awaits every
+  subscriber inside publish(), durable ones included; events published
+  with a session are delivered as tasks on commit (see drain())
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import event as orm_event, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.work_queue import (
+    PollingWorker, backoff, claim_due, default_session_factory, requeue_stale, utcnow,
+)
+from app.db.models import EventOutbox
+
+logger = logging.getLogger(__name__)
+
+# Subscribe to every event type
+ALL_EVENTS = "*"
+
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 900
+
+# Outbox rows claimed per relay pass
+RELAY_BATCH_SIZE = 50
+
+
+@dataclass(frozen=True)
+class Event:
+    """One published event; each subscriber receives its own payload copy."""
+    name: str
+    payload: Dict[str, Any]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    published_at: datetime = field(default_factory=utcnow)
+
+
+Handler = Callable[[Event], Awaitable[None]]
+
+
+@dataclass
+class Subscriber:
+    """A registered handler with its limits and metrics."""
+    name: str
+    handler: Handler
+    event_types: Tuple[str, ...]
+    concurrency: int = 4
+    timeout: float = 30.0
+    durable: bool = False
+    calls: int = 0
+    failures: int = 0
+    dropped: int = 0
+    pending: int = 0  # scheduled, not finished
+    running: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        return self._semaphore
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "event_types": list(self.event_types),
+            "durable": self.durable,
+            "concurrency": self.concurrency,
+            "calls": self.calls,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "pending": self.pending,
+            "running": self.running,
+            "avg_ms": round(self.total_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+
+
+class EventBus:
+    """Route table of subscribers plus the outbox relay for durable ones."""
+
+    def __init__(self, inline: bool = False, max_pending: int = 1000, outbox: bool = True):
+        self.inline = inline
+        self.outbox = outbox
+        self.max_pending = max(1, max_pending)
+        self.published = 0
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._routes: Dict[str, Tuple[Subscriber, ...]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._relay = PollingWorker("[EventBus] Outbox relay", self._relay_pass)
+        self.relayed = 0
+        self.relay_failures = 0
+
+    # ---------------------- Registration ----------------------
+
+    def subscribe(
+        self,
+        event_types: Union[str, Iterable[str]],
+        name: Optional[str] = None,
+        concurrency: int = 4,
+        timeout: float = 30.0,
+        durable: bool = False,
+    ):
+        """Decorator: register `async handler(event)` for event types (or ALL_EVENTS)."""
+        types = (event_types,) if isinstance(event_types, str) else tuple(event_types)
+
+        def decorator(handler: Handler) -> Handler:
+            self.add_subscriber(Subscriber(
+                name=name or f"{handler.__module__}.{handler.__qualname__}",
+                handler=handler,
+                event_types=types,
+                concurrency=concurrency,
+                timeout=timeout,
+                durable=durable,
+            ))
+            return handler
+
+        return decorator
+
+    def add_subscriber(self, subscriber: Subscriber) -> None:
+        """Register (or replace, by name) a subscriber."""
+        if subscriber.durable and not self.outbox:
+            logger.warning(
+                f"[EventBus] Outbox relay disabled (EVENT_OUTBOX_ENABLED): durable subscriber "
+                f"{subscriber.name} is delivered in-process, without retries"
+            )
+        self._subscribers[subscriber.name] = subscriber
+        self._routes.clear()
+
+    def remove_subscriber(self, name: str) -> None:
+        if self._subscribers.pop(name, None) is not None:
+            self._routes.clear()
+
+    def subscribers_for(self, event_name: str) -> Tuple[Subscriber, ...]:
+        route = self._routes.get(event_name)
+        if route is None:
+            route = tuple(
+                s for s in self._subscribers.values()
+                if event_name in s.event_types or ALL_EVENTS in s.event_types
+            )
+            self._routes[event_name] = route
+        return route
+
+    # ---------------------- Publishing ----------------------
+
+    async def publish(self, name: str, payload: dict, session: Optional[AsyncSession] = None) -> Event:
+        """
+        Publish an event.
+
+        With `session` (call before committing it), outbox rows for durable
+        subscribers join that session's transaction and the other
+        subscribers are scheduled when it commits. Without one, returns once
+        the outbox rows are committed and the others scheduled (inline mode:
+        once they have all run).
+        """
+        event = Event(name, dict(payload))
+        self.published += 1
+        subscribers = self.subscribers_for(name)
+        if not subscribers:
+            return event
+
+        durable = [s for s in subscribers if s.durable] if self.outbox and not self.inline else []
+        in_memory = [s for s in subscribers if s not in durable]
+        if session is not None:
+            if durable:
+                add_outbox_rows(session, event, durable)
+            if in_memory:
+                session.sync_session.info.setdefault("event_bus_on_commit", []).append((self, event, in_memory))
+            return event
+
+        if durable:
+            await self._write_outbox(event, durable)
+        for subscriber in in_memory:
+            if self.inline:
+                await self._deliver(subscriber, event)
+            else:
+                self._schedule(subscriber, event)
+        return event
+
+    def _dispatch_committed(self, event: Event, subscribers: List[Subscriber]) -> None:
+        """Schedule the in-memory deliveries of an event whose transaction committed."""
+        for subscriber in subscribers:
+            if self.inline:
+                self._spawn(self._deliver(subscriber, event))
+            else:
+                self._schedule(subscriber, event)
+
+    def _schedule(self, subscriber: Subscriber, event: Event) -> None:
+        if subscriber.pending >= self.max_pending:
+            subscriber.dropped += 1
+            logger.warning(f"[EventBus] Dropped {event.name} for {subscriber.name}: {subscriber.pending} pending")
+            return
+        subscriber.pending += 1
+
+        async def run():
+            try:
+                await self._deliver(subscriber, event)
+            finally:
+                subscriber.pending -= 1
+
+        self._spawn(run())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _deliver(self, subscriber: Subscriber, event: Event) -> Optional[str]:
+        """Run one handler under its limits; returns the error, if any."""
+        # Inline delivery is already serial, and a handler that publishes
+        # again must not wait on its own semaphore
+        limit = contextlib.nullcontext() if self.inline else subscriber.semaphore
+        async with limit:
+            subscriber.running += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    subscriber.handler(Event(event.name, dict(event.payload), event.id, event.published_at)),
+                    subscriber.timeout,
+                )
+                return None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                subscriber.failures += 1
+                error = str(e) or type(e).__name__
+                logger.warning(f"[EventBus] {subscriber.name} failed on {event.name}: {error}")
+                return error
+            finally:
+                elapsed = time.perf_counter() - started
+                subscriber.running -= 1
+                subscriber.calls += 1
+                subscriber.total_seconds += elapsed
+                subscriber.max_seconds = max(subscriber.max_seconds, elapsed)
+
+    async def drain(self) -> None:
+        """Wait for every scheduled delivery (shutdown, scripts and tests)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "published": self.published,
+            "in_flight": len(self._tasks),
+            "relay_running": self.relay_running,
+            "relayed": self.relayed,
+            "relay_failures": self.relay_failures,
+            "subscribers": {name: s.stats() for name, s in sorted(self._subscribers.items())},
+        }
+
+    # ---------------------- Durable delivery (outbox relay) ----------------------
+
+    async def _write_outbox(self, event: Event, subscribers: List[Subscriber]) -> None:
+        """Commit outbox rows in their own transaction (publish() without a session)."""
+        from app.db import database
+        try:
+            async with database.async_session() as db:
+                add_outbox_rows(db, event, subscribers)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"[EventBus] Failed to write outbox rows for {event.name} ({event.id}): {e}")
+            raise
+
+    @property
+    def relay_running(self) -> bool:
+        return self._relay.running
+
+    def notify(self) -> None:
+        """Wake the relay (new outbox rows committed)."""
+        self._relay.notify()
+
+    def start_relay(self, session_factory=None) -> None:
+        self._relay.start(session_factory)
+
+    async def stop_relay(self, timeout: float = 10.0) -> None:
+        """Stop the relay, then give in-memory deliveries `timeout` seconds to finish."""
+        await self._relay.stop()
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    async def _relay_pass(self, session_factory) -> None:
+        while await self.relay_once(session_factory) >= RELAY_BATCH_SIZE:
+            pass
+
+    async def relay_once(self, session_factory=None, limit: int = RELAY_BATCH_SIZE) -> int:
+        """Claim and deliver up to `limit` due outbox rows; returns how many were claimed."""
+        session_factory = default_session_factory(session_factory)
+        async with session_factory() as db:
+            # Rows a dead relay was delivering go back to the queue
+            await requeue_stale(db, EventOutbox, "delivering")
+            claimed = await claim_due(db, EventOutbox, limit, "delivering", [
+                EventOutbox.id, EventOutbox.event_id, EventOutbox.event_type,
+                EventOutbox.subscriber, EventOutbox.payload, EventOutbox.attempts,
+            ])
+        if not claimed:
+            return 0
+
+        errors = await asyncio.gather(*(self._deliver_row(row) for row in claimed))
+
+        finished = utcnow()
+        async with session_factory() as db:
+            delivered = [row.id for row, error in zip(claimed, errors) if error is None]
+            if delivered:
+                await db.execute(
+                    update(EventOutbox)
+                    .where(EventOutbox.id.in_(delivered))
+                    .values(status="delivered", delivered_at=finished, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for row, error in zip(claimed, errors):
+                if error is None:
+                    continue
+                self.relay_failures += 1
+                give_up = row.attempts >= settings.EVENT_OUTBOX_MAX_ATTEMPTS
+                await db.execute(
+                    update(EventOutbox)
+                    .where(EventOutbox.id == row.id)
+                    .values(
+                        status="failed" if give_up else "pending",
+                        next_attempt_at=finished + backoff(row.attempts, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS),
+                        last_error=error[:1000],
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if give_up:
+                    logger.error(f"[EventBus] Gave up delivering {row.event_type} to {row.subscriber}: {error}")
+            await db.commit()
+        self.relayed += len(delivered)
+        return len(claimed)
+
+    async def _deliver_row(self, row) -> Optional[str]:
+        subscriber = self._subscribers.get(row.subscriber)
+        if subscriber is None:
+            return f"No subscriber named {row.subscriber}"
+        try:
+            payload = json.loads(row.payload)
+        except (TypeError, ValueError) as e:
+            return f"Invalid payload: {e}"
+        return await self._deliver(subscriber, Event(row.event_type, payload, row.event_id))
+
+
+def add_outbox_rows(session: AsyncSession, event: Event, subscribers: Iterable[Subscriber]) -> None:
+    """Queue `event` for each durable subscriber in the session's transaction."""
+    payload = json.dumps(event.payload, default=str)
+    session.add_all([
+        EventOutbox(
+            event_id=event.id,
+            event_type=event.name,
+            subscriber=subscriber.name,
+            payload=payload,
+            status="pending",
+            attempts=0,
+            next_attempt_at=event.published_at,
+        )
+        for subscriber in subscribers
+    ])
+    session.sync_session.info["event_outbox_pending"] = True
+
+
+event_bus = EventBus(
+    inline=settings.TESTING,
+    max_pending=settings.EVENT_BUS_MAX_PENDING,
+    outbox=settings.EVENT_OUTBOX_ENABLED,
+)
+
+
+@orm_event.listens_for(Session, "after_commit")
+def _dispatch_on_commit(session):
+    if session.info.pop("event_outbox_pending", False):
+        event_bus.notify()
+    for bus, event, subscribers in session.info.pop("event_bus_on_commit", ()):
+        bus._dispatch_committed(event, subscribers)
+
+
+@orm_event.listens_for(Session, "after_soft_rollback")
+def _forget_on_rollback(session, previous_transaction):
+    session.info.pop("event_outbox_pending", None)
+    session.info.pop("event_bus_on_commit", None)
@@ -1,5 +1,5 @@
 """
-Centralized event type constants for the event emitter system.
+Centralized event type constants for the event bus (app/core/event_bus.py).
 """
 
 
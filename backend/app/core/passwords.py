@@ -0,0 +1,148 @@
+"""
+Password Hashing Off the Event Loop
+
+bcrypt takes ~100-300ms per call; run inline in an async handler it stalls
+every request and WebSocket on the worker. PasswordHasher runs hashing and
+verification on a small dedicated thread pool (bcrypt releases the GIL, so
+threads run in parallel without the pickling cost of a process pool):
+- At most PASSWORD_HASH_WORKERS hashes run at once per worker process
+- At most PASSWORD_HASH_MAX_QUEUE more wait; beyond that callers get a 503
+  with Retry-After instead of piling up behind a login wave
+- verify_and_update() returns a replacement hash when the stored one was
+  made with an older cost (BCRYPT_ROUNDS) so logins rehash transparently
+- stats() reports queue depth, peak, rejections and average wait/work time
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.security import pwd_context
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(HTTPException):
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress, please retry",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class PasswordHasher:
+    """Bounded thread pool for bcrypt work, with queue metrics."""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # submitted, not finished (queued + running)
+        self._running = 0
+        self.peak_queue = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._total_wait = 0.0
+        self._total_work = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending - self._running
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def _run(self, fn: Callable, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingBusy()
+            self._pending += 1
+            self.peak_queue = max(self.peak_queue, self._pending - self._running)
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._total_wait += started - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self.completed += 1
+                    self._total_work += time.perf_counter() - started
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._get_executor(), job)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return await future
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(pwd_context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash): new_hash is set when a valid hash should be replaced."""
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed)
+        if valid and new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "peak_queue": self.peak_queue,
+                "completed": completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 1) if completed else 0.0,
+                "avg_work_ms": round(self._total_work / completed * 1000, 1) if completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await password_hasher.hash(password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Check a password without blocking the event loop."""
+    return await password_hasher.verify(password, hashed)
+
+
+async def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Check a password and get a replacement hash if the stored cost is outdated."""
+    return await password_hasher.verify_and_update(password, hashed)
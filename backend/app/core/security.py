@@ -8,17 +8,24 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.enums import UserRole
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes below the configured cost are upgraded on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
 security = HTTPBearer()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Blocking bcrypt check; async code should use app.core.passwords instead."""
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
+    """Blocking bcrypt hash; async code should use app.core.passwords instead."""
     return pwd_context.hash(password)
 
 
@@ -161,43 +168,43 @@ def has_permission(role: str, permission: str, is_system_admin: bool = False) ->
 async def require_permission(permission: str, db: AsyncSession, user_data: dict):
     """Check if current user has required permission"""
     from app.db.models import User
-    
-    result = await db.execute(select(User).where(User.id == user_data["user_id"]))
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.is_banned:
+    from app.permissions.engine import current_grants
+
+    # Decided from the cached RBAC grants; the user row is still returned
+    # because callers use it
+    grants = await current_grants(db, user_data)
+
+    if grants.is_banned:
         raise HTTPException(status_code=403, detail="User is banned")
-    
-    role = user.role.value if user.role else "member"
-    if not has_permission(role, permission, user.is_system_admin):
+
+    if not grants.role_allows(permission):
         raise HTTPException(
             status_code=403,
             detail=f"Permission denied: {permission} required"
         )
-    
+
+    user = await db.get(User, grants.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
 async def require_admin(db: AsyncSession, user_data: dict):
     """Require user to be a system admin"""
     from app.db.models import User
-    
-    result = await db.execute(select(User).where(User.id == user_data["user_id"]))
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.is_banned:
+    from app.permissions.engine import current_grants
+
+    grants = await current_grants(db, user_data)
+
+    if grants.is_banned:
         raise HTTPException(status_code=403, detail="User is banned")
-    
-    role_val = user.role.value if hasattr(user.role, 'value') else user.role
-    if not user.is_system_admin and (not role_val or role_val != UserRole.system_admin.value):
+
+    if not grants.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
-    
+
+    user = await db.get(User, grants.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
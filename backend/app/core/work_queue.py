@@ -0,0 +1,155 @@
+"""
+Database Work Queues
+
+Shared building blocks of the table-backed queues: the event outbox relay
+(app/core/event_bus.py), the webhook dispatcher
+(app/integrations/webhook_dispatcher.py) and the form submission queue
+(app/services/form_queue.py). A queue table has id, status, attempts,
+next_attempt_at and started_at columns:
+- claim_due() moves due "pending" rows to a working status with FOR UPDATE
+  SKIP LOCKED, so workers on every pod can drain the same table
+- requeue_stale() returns rows a dead worker left in the working status
+- backoff() is the exponential retry delay, capped per queue
+- PollingWorker runs a queue's pass in the background, again when
+  notify()'d (rows committed in this process) and at least every
+  POLL_INTERVAL_SECONDS (rows written by other pods)
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Wake up at least this often to pick up rows written by other pods
+POLL_INTERVAL_SECONDS = 2.0
+
+# A row in its working status for longer than this belongs to a dead worker
+STALE_TIMEOUT_SECONDS = 300
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def backoff(attempts: int, base_seconds: float, max_seconds: float) -> timedelta:
+    """Delay before the next attempt after `attempts` failed ones."""
+    return timedelta(seconds=min(max_seconds, base_seconds * 2 ** max(0, attempts - 1)))
+
+
+def default_session_factory(session_factory=None):
+    if session_factory is not None:
+        return session_factory
+    from app.db import database
+    return database.async_session
+
+
+async def requeue_stale(
+    db: AsyncSession,
+    model,
+    working_status: str,
+    timeout_seconds: float = STALE_TIMEOUT_SECONDS,
+) -> int:
+    """Put rows stuck in `working_status` back to "pending", due now (not committed)."""
+    now = utcnow()
+    result = await db.execute(
+        update(model)
+        .where(model.status == working_status, model.started_at < now - timedelta(seconds=timeout_seconds))
+        .values(status="pending", next_attempt_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+async def claim_due(
+    db: AsyncSession,
+    model,
+    limit: int,
+    working_status: str,
+    returning: List[Any],
+    *criteria,
+) -> list:
+    """
+    Move up to `limit` due pending rows (matching `criteria`) to
+    `working_status`, counting the attempt, and commit.
+
+    Returns the `returning` columns of the claimed rows, oldest due first.
+    """
+    now = utcnow()
+    ids = (
+        select(model.id)
+        .where(model.status == "pending", model.next_attempt_at <= now, *criteria)
+        .order_by(model.next_attempt_at, model.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = (await db.execute(
+        update(model)
+        .where(model.id.in_(ids.scalar_subquery()), model.status == "pending")
+        .values(status=working_status, started_at=now, attempts=model.attempts + 1)
+        .returning(*returning)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    # RETURNING order is unspecified
+    return sorted(rows, key=lambda row: row.id)
+
+
+class PollingWorker:
+    """Background task running `run_pass(session_factory)` whenever there may be work."""
+
+    def __init__(
+        self,
+        name: str,
+        run_pass: Callable[[Any], Awaitable[Any]],
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+    ):
+        self.name = name
+        self.run_pass = run_pass
+        self.poll_interval = poll_interval
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    def notify(self) -> None:
+        """Run the next pass now (new rows committed)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self, session_factory=None) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.create_task(self._run(session_factory))
+        logger.info(f"{self.name} started")
+
+    async def stop(self) -> None:
+        """Cancel the loop; claimed rows are requeued or failed by their timeout."""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._runner = None
+        self._wakeup = None
+
+    async def _run(self, session_factory) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.run_pass(session_factory)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"{self.name} pass failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
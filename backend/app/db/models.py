@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, UniqueConstraint, Float, CheckConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, DateTime, ForeignKey, Text, Index, UniqueConstraint, Float, CheckConstraint
 from sqlalchemy import Enum as SAEnum
 from sqlalchemy import JSON as SAJSON
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.db.database import Base
 from app.db.enums import (
     UserStatus, UserRole, ChannelType, NotificationType, 
@@ -22,6 +22,10 @@ class User(Base):
         Index("ix_users_role", "role"),
         Index("ix_users_is_banned", "is_banned"),
         Index("ix_users_is_muted", "is_muted"),
+        # Substring search (ILIKE '%term%') for admin listings; pg_trgm on PostgreSQL
+        Index("ix_users_username_trgm", "username", postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"}),
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index("ix_users_display_name_trgm", "display_name", postgresql_using="gin", postgresql_ops={"display_name": "gin_trgm_ops"}),
     )
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
@@ -258,6 +262,8 @@ class Message(Base):
     __table_args__ = (
         # Message must refer to exactly one of channel_id or direct_conversation_id
         CheckConstraint("((channel_id IS NOT NULL) <> (direct_conversation_id IS NOT NULL))", name="ck_message_one_parent"),
+        # Deleted messages only: admin stats subtract these from the row estimate
+        Index("ix_messages_deleted", "id", postgresql_where=text("is_deleted"), sqlite_where=text("is_deleted")),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -355,6 +361,23 @@ class UserOperationalRole(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Inbox pages (keyset on id) and unread-only pages / mark-all-read
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+        Index(
+            "ix_notifications_user_unread",
+            "user_id", "id",
+            postgresql_where=text("is_read = false"),
+            sqlite_where=text("is_read = 0"),
+        ),
+        # Retention: read notifications by age
+        Index(
+            "ix_notifications_read_created_at",
+            "created_at",
+            postgresql_where=text("is_read = true"),
+            sqlite_where=text("is_read = 1"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -393,6 +416,51 @@ class Notification(Base):
     sale = relationship("Sale")
 
 
+class NotificationInbox(Base):
+    """
+    Per-user notification counters (the bell icon), one row per user.
+
+    Adjusted in the same transaction as every notification insert, read
+    and delete by app/services/notification_inbox.py.
+    """
+    __tablename__ = "notification_inboxes"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ArchivedNotification(Base):
+    """
+    Read notification moved out of the hot table by the retention job.
+
+    Same columns as notifications (ids kept), without foreign keys so the
+    referenced rows can go away.
+    """
+    __tablename__ = "notifications_archive"
+    __table_args__ = (
+        Index("ix_notifications_archive_user_id_id", "user_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    type = Column(String(50), nullable=False)
+    title = Column(String(255), nullable=False)
+    content = Column(Text)
+    channel_id = Column(Integer, nullable=True)
+    message_id = Column(Integer, nullable=True)
+    sender_id = Column(Integer, nullable=True)
+    task_id = Column(Integer, nullable=True)
+    order_id = Column(Integer, nullable=True)
+    inventory_id = Column(Integer, nullable=True)
+    sale_id = Column(Integer, nullable=True)
+    extra_data = Column(Text, nullable=True)
+    is_read = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class AuditLog(Base):
     """
     System-wide audit log for tracking all significant actions.
@@ -695,6 +763,85 @@ class ProcessingBatch(Base):
     inventory_transaction = relationship("InventoryTransaction", back_populates="related_batch", uselist=False)
 
 
+# ------------------ Reporting Rollups ------------------
+
+class SalesDailyRollup(Base):
+    """
+    Per-day sales aggregate keyed by product, channel and agent.
+
+    Maintained incrementally by record_sale and sale reversals (see
+    app/services/rollups.py) so reporting never rescans the sales table.
+    Reversed sales are subtracted, so totals are net of reversals.
+    """
+    __tablename__ = "sales_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "product_id", "sale_channel", "sold_by_user_id", name="uq_sales_daily_rollups_key"),
+        Index("ix_sales_daily_rollups_day", "day"),
+        Index("ix_sales_daily_rollups_product_day", "product_id", "day"),
+        Index("ix_sales_daily_rollups_user_day", "sold_by_user_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)  # UTC calendar day of Sale.created_at
+    product_id = Column(Integer, nullable=False)
+    sale_channel = Column(String(20), nullable=False)  # SaleChannel value
+    sold_by_user_id = Column(Integer, nullable=False)
+    sale_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_quantity = Column(BigInteger, nullable=False, default=0, server_default="0")
+    total_amount = Column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ProductionDailyRollup(Base):
+    """
+    Per-day production aggregate keyed by finished product.
+
+    Maintained incrementally by process_batch. Only completed batches are
+    counted; yield is stored as sum/count so averages can be recombined.
+    """
+    __tablename__ = "production_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "finished_product_id", name="uq_production_daily_rollups_key"),
+        Index("ix_production_daily_rollups_day", "day"),
+        Index("ix_production_daily_rollups_product_day", "finished_product_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)  # UTC calendar day of ProcessingBatch.created_at
+    finished_product_id = Column(Integer, nullable=False)  # inventory.id
+    batch_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_produced = Column(BigInteger, nullable=False, default=0, server_default="0")
+    total_expected = Column(BigInteger, nullable=False, default=0, server_default="0")
+    total_waste = Column(BigInteger, nullable=False, default=0, server_default="0")
+    waste_batch_count = Column(Integer, nullable=False, default=0, server_default="0")
+    yield_sum = Column(BigInteger, nullable=False, default=0, server_default="0")
+    yield_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class InventoryDailySnapshot(Base):
+    """
+    Per-item, per-day summary of the inventory ledger with the closing balance.
+
+    Maintained in the same transaction as every InventoryTransaction (see
+    app/services/inventory_snapshots.py), so stock as of any date is one
+    snapshot row plus the partial day's ledger rows.
+    """
+    __tablename__ = "inventory_daily_snapshots"
+    __table_args__ = (
+        UniqueConstraint("inventory_item_id", "day", name="uq_inventory_daily_snapshots_key"),
+        Index("ix_inventory_daily_snapshots_day", "day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    inventory_item_id = Column(Integer, ForeignKey("inventory.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)  # UTC calendar day of InventoryTransaction.created_at
+    net_change = Column(BigInteger, nullable=False, default=0, server_default="0")
+    transaction_count = Column(Integer, nullable=False, default=0, server_default="0")
+    closing_balance = Column(BigInteger, nullable=False, default=0, server_default="0")  # Ledger sum through day
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 # ------------------ Permissions & Roles (Phase 5.2 + 8.5.2) ------------------
 
 
@@ -801,6 +948,21 @@ class AutomationTask(Base):
         Index("ix_automation_tasks_status", "status"),
         Index("ix_automation_tasks_type", "task_type"),
         Index("ix_automation_tasks_created_by", "created_by_id"),
+        # Exactly one order-root automation task per order
+        Index(
+            "uq_order_root_per_order", "related_order_id",
+            unique=True,
+            postgresql_where=text("is_order_root = true"),
+            sqlite_where=text("is_order_root = 1"),
+        ),
+        # Claim queue: open, unclaimed tasks per role in listing order
+        Index(
+            "ix_automation_tasks_claim_queue", "required_role", "related_order_id", "created_at",
+            postgresql_where=text("status = 'open' AND claimed_by_user_id IS NULL"),
+            sqlite_where=text("status = 'open' AND claimed_by_user_id IS NULL"),
+        ),
+        # Task board order: related_order_id DESC, created_at, id (keyset pagination)
+        Index("ix_automation_tasks_listing", text("related_order_id DESC"), "created_at", "id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -844,6 +1006,8 @@ class TaskAssignment(Base):
     __table_args__ = (
         Index("ix_task_assignments_task_id", "task_id"),
         Index("ix_task_assignments_user_id", "user_id"),
+        # Covers the "assigned to me" EXISTS in task listing
+        Index("ix_task_assignments_user_task", "user_id", "task_id"),
         UniqueConstraint("task_id", "user_id", name="uq_task_user_assignment"),
     )
 
@@ -861,6 +1025,19 @@ class TaskAssignment(Base):
     user = relationship("User")
 
 
+class UserWorkload(Base):
+    """
+    Open (pending/in_progress) task assignments per user.
+    Maintained by app.services.dispatch in the same transaction as the
+    assignment change; used for least-loaded task dispatch.
+    """
+    __tablename__ = "user_workloads"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    open_assignments = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class TaskEvent(Base):
     """
     Audit log for task lifecycle events.
@@ -1036,6 +1213,14 @@ class FormSubmission(Base):
         Index("ix_form_submissions_form_id", "form_id"),
         Index("ix_form_submissions_submitted_by_id", "submitted_by_id"),
         Index("ix_form_submissions_created_at", "created_at"),
+        # Async processing queue: due, unclaimed submissions per service target
+        Index(
+            "ix_form_submissions_queue",
+            "service_target",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending' AND queued_at IS NOT NULL"),
+            sqlite_where=text("status = 'pending' AND queued_at IS NOT NULL"),
+        ),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -1051,8 +1236,15 @@ class FormSubmission(Base):
     result_type = Column(String(50), nullable=True)  # e.g., "sale", "order"
     
     # Status
-    status = Column(String(50), default="pending")  # pending, processed, failed
+    status = Column(String(50), default="pending")  # pending, processing, processed, failed
     error_message = Column(Text, nullable=True)
+
+    # Async processing (set only for queued submissions)
+    queued_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
     
     # Audit
     submitted_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -1091,6 +1283,8 @@ class AIRecommendation(Base):
         Index("ix_ai_recommendations_generated_by", "generated_by"),
         Index("ix_ai_recommendations_created_at", "created_at"),
         Index("ix_ai_recommendations_is_dismissed", "is_dismissed"),
+        Index("ix_ai_recommendations_type_product_id", "type", "product_id"),
+        Index("ix_ai_recommendations_type_raw_material_id", "type", "raw_material_id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -1105,6 +1299,10 @@ class AIRecommendation(Base):
     summary = Column(String(500), nullable=False)  # Short human-readable summary
     explanation = Column(Text, nullable=True)  # JSON array of explanation points
     data_refs = Column(Text, nullable=True)  # JSON object with referenced entity IDs
+
+    # Entity ids promoted from data_refs for indexed deduplication lookups
+    product_id = Column(Integer, nullable=True)
+    raw_material_id = Column(Integer, nullable=True)
     
     # Generation metadata
     generated_by = Column(SAEnum(AIGenerationMode, name="aigenerationmode", create_type=False), 
@@ -1147,3 +1345,199 @@ class AIRecommendation(Base):
     assigned_to = relationship("User", foreign_keys=[assigned_to_id])  # Phase 5.1
 
 
+# ------------------ Scheduler Coordination ------------------
+
+class SchedulerLease(Base):
+    """
+    Named time-limited lease used for scheduler leader election.
+
+    A worker holds the lease while expires_at is in the future and renews
+    it on every scheduler tick; see app/ai/scheduler_store.py.
+    """
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(64), primary_key=True)
+    owner = Column(String(128), nullable=False)
+    acquired_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class ScheduledJobState(Base):
+    """
+    Persistent state of a scheduled job, shared by all workers.
+
+    last_fire_time is the cron fire time most recently claimed; a fire time
+    is claimed by exactly one worker. running_owner/running_until form a
+    run lock so the same job never overlaps (manual triggers included).
+    """
+    __tablename__ = "scheduled_job_states"
+
+    job_id = Column(String(64), primary_key=True)
+    last_fire_time = Column(DateTime(timezone=True), nullable=True)
+    last_started_at = Column(DateTime(timezone=True), nullable=True)
+    last_finished_at = Column(DateTime(timezone=True), nullable=True)
+    last_duration_ms = Column(Float, nullable=True)
+    last_status = Column(String(20), nullable=True)  # completed, error
+    last_error = Column(Text, nullable=True)
+    last_run_by = Column(String(128), nullable=True)
+    run_count = Column(Integer, nullable=False, default=0, server_default="0")
+    running_owner = Column(String(128), nullable=True)
+    running_until = Column(DateTime(timezone=True), nullable=True)
+    trigger_requested_at = Column(DateTime(timezone=True), nullable=True)
+    trigger_requested_by_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class AIAnalysisJob(Base):
+    """
+    One AI analysis run (app/ai/jobs.py), shared by all workers so any of
+    them can report its progress.
+
+    At most one job per mode is active (queued or running). An active job
+    whose expires_at has passed was abandoned by the worker running it.
+    """
+    __tablename__ = "ai_analysis_jobs"
+    __table_args__ = (
+        Index(
+            "uq_ai_analysis_jobs_active_mode",
+            "mode",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(String(32), primary_key=True)
+    mode = Column(String(20), nullable=False)
+    status = Column(String(20), nullable=False, default="queued", server_default="queued")  # queued, running, completed, partial, error
+    requested_by_id = Column(Integer, nullable=True)
+    modules = Column(Text, nullable=False)  # JSON: status, insights, duration_ms, error per module
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+# ------------------ Idempotency ------------------
+
+class IdempotencyKey(Base):
+    """
+    Client-supplied idempotency key, unique per (scope, actor, key).
+
+    Written in the same transaction as the resource it produced (sale, order,
+    form submission) so a retry finds it or the duplicate write fails;
+    see app/services/idempotency.py.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("scope", "actor_id", "key", name="uq_idempotency_scope_actor_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(50), nullable=False)  # sale, order, form_submission
+    actor_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=True)  # sha256 of the canonical request; NULL for backfilled keys
+    resource_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ------------------ Event Outbox ------------------
+
+class EventOutbox(Base):
+    """
+    Pending delivery of one event to one durable event bus subscriber.
+
+    Written with (or right after) the change that produced the event and
+    drained by the outbox relay in app/core/event_bus.py (at-least-once).
+    """
+    __tablename__ = "event_outbox"
+    __table_args__ = (
+        # Relay: due, undelivered rows
+        Index(
+            "ix_event_outbox_due",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(32), nullable=False)
+    event_type = Column(String(100), nullable=False)
+    subscriber = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")  # pending, delivering, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ------------------ Automation Rules ------------------
+
+class AutomationRule(Base):
+    """
+    Rule engine rule managed at runtime (event -> conditions -> actions).
+
+    Compiled and indexed alongside the code-registered rules by
+    app/automation/rule_engine.py; edits are picked up on commit.
+    """
+    __tablename__ = "automation_rules"
+    __table_args__ = (
+        Index("ix_automation_rules_event", "event"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, unique=True)
+    event = Column(String(100), nullable=False)
+    conditions = Column(Text, nullable=False, default="{}", server_default="{}")  # JSON: {"quantity_gt": 5}
+    actions = Column(Text, nullable=False)  # JSON list of action names
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+# ------------------ Webhook Deliveries ------------------
+
+class WebhookDelivery(Base):
+    """
+    Outbound webhook event awaiting (or done with) delivery.
+
+    Rows are written by emit_make_webhook and drained by the dispatcher in
+    app/integrations/webhook_dispatcher.py. (target, event_id) is unique, so
+    the table is also the idempotency store; finished rows are purged after
+    WEBHOOK_RETENTION_HOURS.
+    """
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        UniqueConstraint("target", "event_id", name="uq_webhook_deliveries_target_event"),
+        # Dispatcher: due, undelivered rows
+        Index(
+            "ix_webhook_deliveries_due",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+        # Retention purge
+        Index("ix_webhook_deliveries_finished", "status", "finished_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    target = Column(String(50), nullable=False)  # e.g. "make"
+    url = Column(Text, nullable=False)
+    event_id = Column(String(64), nullable=False)
+    event = Column(String(100), nullable=True)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")  # pending, delivering, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    last_status_code = Column(Integer, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,6 +1,6 @@
 """
 Integrations package for external services (Make.com, Zoho, etc.)
 """
-from app.integrations.make_webhook import emit_make_webhook, clear_sent_events_cache
+from app.integrations.make_webhook import emit_make_webhook
 
-__all__ = ["emit_make_webhook", "clear_sent_events_cache"]
+__all__ = ["emit_make_webhook"]
@@ -0,0 +1,406 @@
+"""
+Outbound Webhook Dispatcher
+
+Durable delivery of outbound webhooks (Make.com today), so callers only
+write a row and never wait on the remote end:
+- enqueue() inserts into webhook_deliveries; (target, event_id) is unique,
+  so a repeated event_id is skipped - the table doubles as the idempotency
+  store, bounded by purging finished rows after WEBHOOK_RETENTION_HOURS
+- Workers claim due rows with FOR UPDATE SKIP LOCKED (any pod can drain;
+  claiming, backoff and the polling loop are app/core/work_queue.py) and
+  POST them through one shared, pooled httpx client, at most
+  WEBHOOK_CONCURRENCY requests at a time per process
+- Targets that accept JSON arrays get up to batch_size_for(target) events
+  per POST (X-Event-IDs header); others get one event per POST (X-Event-ID)
+- 2xx is delivered; timeouts, connection errors, 408/425/429 and 5xx are
+  retried with exponential backoff (Retry-After honoured) up to
+  WEBHOOK_MAX_ATTEMPTS; other 4xx fail at once
+- Rows left "delivering" by a dead worker go back to pending, so delivery
+  is at-least-once: receivers should de-duplicate on the event id header
+- With WEBHOOK_DISPATCHER_ENABLED off no worker runs: enqueue() posts the
+  event itself once its row is committed (one attempt; a retryable failure
+  stays pending until a dispatcher runs)
+- stats(): delivered/retried/failed counts, request latency, in-flight
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.work_queue import (
+    PollingWorker, backoff, claim_due, default_session_factory, requeue_stale, utcnow,
+)
+from app.db.models import WebhookDelivery
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+
+# Rows claimed per pass
+CLAIM_LIMIT = 100
+
+# How often the worker purges finished rows
+PURGE_INTERVAL_SECONDS = 600
+
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+
+def batch_size_for(target: str) -> int:
+    """Events per POST the target accepts (1: no batching)."""
+    if target == "make":
+        return max(1, settings.MAKE_WEBHOOK_BATCH_SIZE)
+    return 1
+
+
+# ============================================================================
+# Shared HTTP client
+# ============================================================================
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled client; keeps connections (and TLS sessions) alive between deliveries."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.WEBHOOK_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.WEBHOOK_CONCURRENCY * 2,
+                max_keepalive_connections=settings.WEBHOOK_CONCURRENCY,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# ============================================================================
+# Queueing
+# ============================================================================
+
+def _insert_ignoring_duplicates(db: AsyncSession, row: Dict[str, Any]):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(WebhookDelivery).values(row).on_conflict_do_nothing(
+        index_elements=["target", "event_id"]
+    )
+
+
+async def enqueue(
+    payload: Dict[str, Any],
+    url: str,
+    target: str = "make",
+    session: Optional[AsyncSession] = None,
+) -> bool:
+    """
+    Queue `payload` (which must carry an event_id) for delivery to `url`.
+    Returns False if the event_id was already queued for this target.
+    With `session`, the row joins that session's transaction (and, without
+    a dispatcher, is sent after its commit).
+    """
+    row = {
+        "target": target,
+        "url": url,
+        "event_id": payload["event_id"],
+        "event": payload.get("event"),
+        "payload": json.dumps(payload, default=str),
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": utcnow(),
+    }
+    if session is not None:
+        inserted = await _insert(session, row)
+        if inserted:
+            session.sync_session.info.setdefault("webhooks_queued", []).append((target, row["event_id"]))
+        return inserted
+    async with default_session_factory()() as db:
+        inserted = await _insert(db, row)
+        await db.commit()
+    if inserted:
+        await _after_queued([(target, row["event_id"])])
+    return inserted
+
+
+async def _after_queued(keys: List[Tuple[str, str]]) -> None:
+    """Wake the dispatcher, or without one, send the newly committed rows now."""
+    if settings.WEBHOOK_DISPATCHER_ENABLED:
+        webhook_dispatcher.notify()
+        return
+    for target, event_id in keys:
+        try:
+            await webhook_dispatcher.send_now(target, event_id)
+        except Exception as e:
+            logger.error(f"[Webhooks] Inline delivery of {target} event {event_id} failed: {e}")
+
+
+async def _insert(db: AsyncSession, row: Dict[str, Any]) -> bool:
+    stmt = _insert_ignoring_duplicates(db, row)
+    if stmt is not None:
+        result = await db.execute(stmt)
+        return bool(result.rowcount)
+    # Portable fallback
+    exists = await db.scalar(select(WebhookDelivery.id).where(
+        WebhookDelivery.target == row["target"], WebhookDelivery.event_id == row["event_id"],
+    ))
+    if exists:
+        return False
+    db.add(WebhookDelivery(**row))
+    await db.flush()
+    return True
+
+
+async def purge_finished(db: AsyncSession) -> int:
+    """Delete delivered/failed rows past retention (their event_ids may repeat after that)."""
+    result = await db.execute(
+        delete(WebhookDelivery)
+        .where(
+            WebhookDelivery.status.in_(("delivered", "failed")),
+            WebhookDelivery.finished_at < utcnow() - timedelta(hours=settings.WEBHOOK_RETENTION_HOURS),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount or 0
+
+
+# ============================================================================
+# Dispatcher
+# ============================================================================
+
+class WebhookDispatcher:
+    """Per-process worker posting queued webhook deliveries."""
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self._client = client
+        self._worker = PollingWorker("[Webhooks] Dispatcher", self._dispatch_pass)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._last_purge = 0.0
+        self.in_flight = 0
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.requests = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+
+    @property
+    def running(self) -> bool:
+        return self._worker.running
+
+    def notify(self) -> None:
+        """Wake the worker (new rows queued)."""
+        self._worker.notify()
+
+    def start(self, session_factory=None) -> None:
+        self._worker.start(session_factory)
+
+    async def stop(self) -> None:
+        """Stop the worker; rows it was posting are picked up again after restart."""
+        await self._worker.stop()
+
+    async def _dispatch_pass(self, session_factory) -> None:
+        while await self.dispatch_once(session_factory) >= CLAIM_LIMIT:
+            pass
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = time.monotonic()
+            async with default_session_factory(session_factory)() as db:
+                purged = await purge_finished(db)
+            if purged:
+                logger.info(f"[Webhooks] Purged {purged} finished deliveries")
+
+    async def drain(self, session_factory=None) -> int:
+        """Deliver everything due now (scripts and tests); returns rows claimed."""
+        handled = 0
+        while True:
+            claimed = await self.dispatch_once(session_factory)
+            if not claimed:
+                return handled
+            handled += claimed
+
+    async def dispatch_once(self, session_factory=None, limit: int = CLAIM_LIMIT) -> int:
+        """Claim up to `limit` due rows, post them and record the outcomes."""
+        factory = default_session_factory(session_factory)
+        async with factory() as db:
+            rows = await claim(db, limit)
+        await self._deliver(factory, rows)
+        return len(rows)
+
+    async def send_now(self, target: str, event_id: str, session_factory=None) -> bool:
+        """Post one queued event right away (no dispatcher running); True if delivered."""
+        factory = default_session_factory(session_factory)
+        async with factory() as db:
+            rows = await claim(db, 1, WebhookDelivery.target == target, WebhookDelivery.event_id == event_id)
+        delivered = self.delivered
+        await self._deliver(factory, rows)
+        return self.delivered > delivered
+
+    async def _deliver(self, factory, rows: list) -> None:
+        if not rows:
+            return
+
+        # Group by destination, keeping queue order, then cut into batches
+        groups: Dict[Tuple[str, str], list] = {}
+        for row in rows:
+            groups.setdefault((row.target, row.url), []).append(row)
+        batches = []
+        for (target, url), group in groups.items():
+            size = batch_size_for(target)
+            batches.extend((url, group[i:i + size]) for i in range(0, len(group), size))
+
+        outcomes = await asyncio.gather(*(self._post(url, batch) for url, batch in batches))
+
+        finished = utcnow()
+        async with factory() as db:
+            delivered = []
+            for (_, batch), (status_code, error, retry_after) in zip(batches, outcomes):
+                if error is None:
+                    delivered.extend(row.id for row in batch)
+                    continue
+                for row in batch:
+                    await self._record_failure(db, row, status_code, error, retry_after, finished)
+            if delivered:
+                await db.execute(
+                    update(WebhookDelivery)
+                    .where(WebhookDelivery.id.in_(delivered))
+                    .values(status="delivered", finished_at=finished, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        self.delivered += len(delivered)
+
+    async def _record_failure(self, db: AsyncSession, row, status_code: Optional[int], error: str,
+                              retry_after: Optional[float], now: datetime) -> None:
+        retryable = status_code is None or status_code >= 500 or status_code in RETRYABLE_STATUS_CODES
+        values: Dict[str, Any] = {"last_status_code": status_code, "last_error": error[:1000]}
+        if retryable and row.attempts < settings.WEBHOOK_MAX_ATTEMPTS:
+            delay = backoff(row.attempts, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS)
+            if retry_after:
+                delay = max(delay, timedelta(seconds=min(retry_after, BACKOFF_MAX_SECONDS)))
+            values.update(status="pending", next_attempt_at=now + delay)
+            self.retried += 1
+        else:
+            values.update(status="failed", finished_at=now)
+            self.failed += 1
+            logger.error(f"[Webhooks] Gave up on {row.target} event {row.event_id} after {row.attempts} attempt(s): {error}")
+        await db.execute(
+            update(WebhookDelivery)
+            .where(WebhookDelivery.id == row.id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _post(self, url: str, rows: list) -> Tuple[Optional[int], Optional[str], Optional[float]]:
+        """POST one batch; returns (status code, error or None, Retry-After seconds)."""
+        payloads = [json.loads(row.payload) for row in rows]
+        event_ids = [row.event_id for row in rows]
+        if len(rows) == 1:
+            body: Any = payloads[0]
+            headers = {"Content-Type": "application/json", "X-Event-ID": event_ids[0]}
+        else:
+            body = payloads
+            headers = {"Content-Type": "application/json", "X-Event-IDs": ",".join(event_ids)}
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, settings.WEBHOOK_CONCURRENCY))
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await self.client.post(url, json=body, headers=headers)
+            except httpx.TimeoutException:
+                return None, "Timeout", None
+            except httpx.RequestError as e:
+                return None, f"Request error: {e}", None
+            except Exception as e:
+                logger.error(f"[Webhooks] Unexpected error posting {event_ids}: {e}")
+                return None, f"Unexpected error: {e}", None
+            finally:
+                elapsed = time.perf_counter() - started
+                self.in_flight -= 1
+                self.requests += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+        if 200 <= response.status_code < 300:
+            logger.info(f"[Webhooks] Delivered {len(rows)} event(s) to {rows[0].target}: {', '.join(event_ids)}")
+            return response.status_code, None, None
+        retry_after = None
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            pass
+        return response.status_code, f"HTTP {response.status_code} - {response.text[:200]}", retry_after
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "running": self.running,
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "requests": self.requests,
+            "avg_ms": round(self.total_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+
+
+webhook_dispatcher = WebhookDispatcher()
+
+# Sends started on commit while no dispatcher runs
+_inline_sends: Set[asyncio.Task] = set()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_on_commit(session):
+    keys = session.info.pop("webhooks_queued", None)
+    if not keys:
+        return
+    if settings.WEBHOOK_DISPATCHER_ENABLED:
+        webhook_dispatcher.notify()
+    else:
+        task = asyncio.get_running_loop().create_task(_after_queued(keys))
+        _inline_sends.add(task)
+        task.add_done_callback(_inline_sends.discard)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_on_rollback(session, previous_transaction):
+    session.info.pop("webhooks_queued", None)
+
+
+# ============================================================================
+# Queue queries
+# ============================================================================
+
+async def claim(db: AsyncSession, limit: int, *criteria) -> List:
+    """Requeue rows of dead workers, then move up to `limit` due rows to "delivering" (committed)."""
+    await requeue_stale(db, WebhookDelivery, "delivering")
+    # Sorted by id: queue order within each destination
+    return await claim_due(db, WebhookDelivery, limit, "delivering", [
+        WebhookDelivery.id, WebhookDelivery.target, WebhookDelivery.url, WebhookDelivery.event_id,
+        WebhookDelivery.payload, WebhookDelivery.attempts,
+    ], *criteria)
@@ -24,6 +24,8 @@ from app.db.models import AuditLog  # noqa: F401
 
 # Socket.IO for real-time (Phase 4.1)
 from app.realtime import socket_app
+# Registers the event bus subscribers
+from app.services import event_subscribers  # noqa: F401
 
 
 async def seed_default_data():
@@ -152,19 +154,62 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             from app.core.config import logger
             logger.warning(f"[AI Scheduler] Failed to start: {e}")
+    elif settings.MAINTENANCE_JOBS_ENABLED and not settings.TESTING:
+        # Notification retention and inventory reconciliation don't depend on AI
+        try:
+            from app.ai.scheduler import setup_scheduler
+            setup_scheduler(ai_jobs=False)
+            from app.core.config import logger
+            logger.info("[AI Scheduler] AI jobs disabled (set AI_SCHEDULER_ENABLED=true to enable); maintenance jobs started")
+        except Exception as e:
+            from app.core.config import logger
+            logger.warning(f"[AI Scheduler] Failed to start maintenance jobs: {e}")
     else:
         from app.core.config import logger
         logger.info("[AI Scheduler] Disabled (set AI_SCHEDULER_ENABLED=true to enable)")
+
+    # Start the async form submission worker (submissions sent with process_async)
+    if settings.FORM_QUEUE_ENABLED and not settings.TESTING:
+        from app.services.form_queue import form_queue
+        form_queue.start()
+
+    # Deliver outbox rows for durable event subscribers
+    if settings.EVENT_OUTBOX_ENABLED and not settings.TESTING:
+        from app.core.event_bus import event_bus
+        event_bus.start_relay()
+
+    # Post queued outbound webhooks (Make.com)
+    if settings.WEBHOOK_DISPATCHER_ENABLED and not settings.TESTING:
+        from app.integrations.webhook_dispatcher import webhook_dispatcher
+        webhook_dispatcher.start()
     
     yield
     # Shutdown
     # Stop AI scheduler if running
     try:
-        from app.ai.scheduler import shutdown_scheduler
+        from app.ai.scheduler import release_leadership, shutdown_scheduler
+        await release_leadership()
         shutdown_scheduler()
     except Exception:
         pass
     
+    # Stop the form queue worker; unfinished submissions are failed on next start
+    from app.services.form_queue import form_queue
+    await form_queue.stop()
+
+    # Stop the outbox relay and let in-flight event deliveries finish
+    from app.core.event_bus import event_bus
+    await event_bus.stop_relay()
+
+    # Stop the webhook dispatcher; undelivered rows stay queued
+    from app.integrations.webhook_dispatcher import close_http_client, webhook_dispatcher
+    await webhook_dispatcher.stop()
+    await close_http_client()
+
+    # Stop the password hashing pool
+    from app.core.passwords import password_hasher
+    password_hasher.shutdown()
+
     # Stop Redis pub/sub listener if running
     ctl = getattr(app.state, '_redis_listener', None)
     if ctl and ctl.get('stop_event'):
@@ -0,0 +1,342 @@
+"""
+RBAC Engine
+
+Compiles everything that decides a user's access into one cached, per-user
+grant set so permission checks answer in O(1) without queries:
+- legacy global-role permissions (core/security.ROLE_PERMISSIONS, by
+  User.role / is_system_admin)
+- assigned roles (user_roles -> roles): SYSTEM_ROLE_PERMISSIONS for
+  scope "system" plus each role's DB permissions (role_permissions ->
+  permissions.key)
+- channel roles (channel_roles, scope "channel"): CHANNEL_ROLE_PERMISSIONS
+  plus the role's DB permissions, per channel
+
+Permissions are interned to bits once per process; each grant set holds
+int bitsets, so a check is one AND.
+
+Core Principles:
+- Compiled lazily per user (three small queries) on first check, then
+  served from memory
+- Versioned: invalidate() bumps the generation (all users or a set of
+  users); entries from an older generation recompile on next use
+- Invalidated automatically when a session commits changes to roles,
+  permissions, role_permissions, user_roles, channel_roles, or to a user's
+  role / admin / ban / active flags, including bulk statements
+- Invalidations are published on the "cache:rbac" Redis channel
+  (app/core/cache_invalidation.py) so every pod drops its copy
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Set
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import cache_invalidation
+from app.core.security import get_current_user, get_user_permissions
+from app.db.database import get_db
+from app.db.models import (
+    ChannelRoleAssignment, PermissionModel, Role, RolePermission, User, UserRole,
+)
+from app.permissions.role_map import CHANNEL_ROLE_PERMISSIONS, SYSTEM_ROLE_PERMISSIONS
+from app.permissions.roles import ChannelRole, SystemRole
+
+logger = logging.getLogger(__name__)
+
+# Cache invalidation channel (Redis: "cache:rbac")
+INVALIDATION_CHANNEL = "rbac"
+
+# Recompile at least this often even without invalidations
+MAX_AGE_SECONDS = 300
+
+# User columns that change a user's grants
+_USER_WATCHED_ATTRS = ("role", "is_system_admin", "is_banned", "is_active", "username", "deleted_at")
+_ROLE_TABLES = ("roles", "permissions", "role_permissions", "user_roles", "channel_roles")
+_WATCHED_TABLES = _ROLE_TABLES + ("users",)
+
+
+# ============================================================================
+# Permission bits
+# ============================================================================
+
+_bits: Dict[str, int] = {}
+
+
+def _key(permission) -> str:
+    return str(getattr(permission, "value", permission))
+
+
+def permission_bit(permission) -> int:
+    """Bit for a permission (Permission enum member or string key), interned per process."""
+    key = _key(permission)
+    bit = _bits.get(key)
+    if bit is None:
+        bit = _bits.setdefault(key, 1 << len(_bits))
+    return bit
+
+
+def mask(permissions: Iterable) -> int:
+    result = 0
+    for permission in permissions:
+        result |= permission_bit(permission)
+    return result
+
+
+_ADMIN_SYSTEM_ROLES = (SystemRole.SUPER_ADMIN.value, SystemRole.ADMIN.value)
+
+
+# ============================================================================
+# Grants
+# ============================================================================
+
+@dataclass(frozen=True)
+class UserGrants:
+    """Everything a permission check needs to know about one user."""
+    user_id: int
+    username: str
+    role: str  # UserRole value (global role column)
+    is_system_admin: bool
+    is_banned: bool
+    is_active: bool
+    system_roles: FrozenSet[str] = frozenset()
+    permission_keys: FrozenSet[str] = frozenset()  # DB permission keys of the user's assigned roles
+    role_bits: int = 0  # core/security.ROLE_PERMISSIONS
+    system_bits: int = 0  # system roles (static map + DB permissions)
+    channel_bits: Mapping[int, int] = field(default_factory=dict)
+    generation: int = 0
+    compiled_at: float = 0.0
+
+    @property
+    def is_admin(self) -> bool:
+        """System admin by flag or global role (require_admin semantics)."""
+        return self.is_system_admin or self.role == "system_admin"
+
+    @property
+    def is_team_admin(self) -> bool:
+        """System or team admin (the api/* _check_admin semantics)."""
+        return self.is_admin or self.role == "team_admin"
+
+    def role_allows(self, permission) -> bool:
+        """Legacy global-role check (core/security.has_permission)."""
+        return bool(self.role_bits & permission_bit(permission))
+
+    def allows(self, permission, channel_id: Optional[int] = None) -> bool:
+        """
+        RBAC check: DB-flagged system admins pass; otherwise any system role
+        or, with channel_id, any role in that channel must grant it.
+        """
+        if self.is_system_admin:
+            return True
+        bit = permission_bit(permission)
+        if self.system_bits & bit:
+            return True
+        return channel_id is not None and bool(self.channel_bits.get(channel_id, 0) & bit)
+
+
+def _compile_role_bits(role: str, is_system_admin: bool) -> int:
+    return mask(get_user_permissions(role, is_system_admin))
+
+
+def _static_system_bits(role_name: str) -> int:
+    try:
+        system_role = SystemRole(role_name)
+    except ValueError:
+        return 0  # custom role: DB permissions only
+    bits = mask(SYSTEM_ROLE_PERMISSIONS.get(system_role, ()))
+    if role_name in _ADMIN_SYSTEM_ROLES:
+        bits |= mask(CHANNEL_ROLE_PERMISSIONS[ChannelRole.OWNER])
+    return bits
+
+
+def _static_channel_bits(role_name: str) -> int:
+    try:
+        return mask(CHANNEL_ROLE_PERMISSIONS.get(ChannelRole(role_name), ()))
+    except ValueError:
+        return 0
+
+
+class RBACEngine:
+    """Process-wide cache of compiled per-user grants."""
+
+    def __init__(self):
+        self.version = 0
+        self._generation = 0
+        self._user_generation: Dict[int, int] = {}
+        self._grants: Dict[int, UserGrants] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    # ---------------------- Freshness ----------------------
+
+    def _is_fresh(self, grants: Optional[UserGrants]) -> bool:
+        return (
+            grants is not None
+            and grants.generation >= self._generation
+            and grants.generation >= self._user_generation.get(grants.user_id, 0)
+            and time.monotonic() - grants.compiled_at <= MAX_AGE_SECONDS
+        )
+
+    def invalidate(self, user_ids: Optional[Iterable[int]] = None, broadcast: bool = True) -> None:
+        """Mark grants stale (all users, or just `user_ids`); with `broadcast`, tell the other pods too."""
+        self.version += 1
+        if user_ids is None:
+            self._generation = self.version
+            self._user_generation.clear()
+            user_ids_list = None
+        else:
+            user_ids_list = sorted(set(user_ids))
+            for user_id in user_ids_list:
+                self._user_generation[user_id] = self.version
+        if broadcast:
+            cache_invalidation.publish(INVALIDATION_CHANNEL, user_ids_list)
+
+    # ---------------------- Lookups ----------------------
+
+    async def grants(self, db: AsyncSession, user_id: int) -> Optional[UserGrants]:
+        """Compiled grants for a user, or None if the user does not exist."""
+        cached = self._grants.get(user_id)
+        if self._is_fresh(cached):
+            return cached
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            cached = self._grants.get(user_id)
+            if self._is_fresh(cached):
+                return cached
+            compiled = await self._compile(db, user_id)
+            if compiled is None:
+                self._grants.pop(user_id, None)
+            else:
+                self._grants[user_id] = compiled
+            return compiled
+
+    async def _compile(self, db: AsyncSession, user_id: int) -> Optional[UserGrants]:
+        generation = self.version
+        row = (await db.execute(
+            select(User.username, User.role, User.is_system_admin, User.is_banned, User.is_active)
+            .where(User.id == user_id)
+        )).one_or_none()
+        if row is None:
+            return None
+        role = str(getattr(row.role, "value", row.role) or "member")
+        is_system_admin = bool(row.is_system_admin)
+
+        system_roles: Set[str] = set()
+        permission_keys: Set[str] = set()
+        system_bits = 0
+        result = await db.execute(
+            select(Role.name, Role.scope, PermissionModel.key)
+            .select_from(UserRole)
+            .join(Role, Role.id == UserRole.role_id)
+            .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+            .outerjoin(PermissionModel, PermissionModel.id == RolePermission.permission_id)
+            .where(UserRole.user_id == user_id)
+        )
+        for role_name, scope, permission_key in result.all():
+            if scope == "system" and role_name not in system_roles:
+                system_roles.add(role_name)
+                system_bits |= _static_system_bits(role_name)
+            if permission_key:
+                permission_keys.add(permission_key)
+                system_bits |= permission_bit(permission_key)
+
+        channel_bits: Dict[int, int] = {}
+        result = await db.execute(
+            select(ChannelRoleAssignment.channel_id, Role.name, PermissionModel.key)
+            .select_from(ChannelRoleAssignment)
+            .join(Role, Role.id == ChannelRoleAssignment.role_id)
+            .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+            .outerjoin(PermissionModel, PermissionModel.id == RolePermission.permission_id)
+            .where(ChannelRoleAssignment.user_id == user_id, Role.scope == "channel")
+        )
+        for channel_id, role_name, permission_key in result.all():
+            bits = channel_bits.get(channel_id, 0) | _static_channel_bits(role_name)
+            if permission_key:
+                bits |= permission_bit(permission_key)
+            channel_bits[channel_id] = bits
+
+        return UserGrants(
+            user_id=user_id,
+            username=row.username or "",
+            role=role,
+            is_system_admin=is_system_admin,
+            is_banned=bool(row.is_banned),
+            is_active=bool(row.is_active) if row.is_active is not None else True,
+            system_roles=frozenset(system_roles),
+            permission_keys=frozenset(permission_keys),
+            role_bits=_compile_role_bits(role, is_system_admin),
+            system_bits=system_bits,
+            channel_bits=channel_bits,
+            generation=generation,
+            compiled_at=time.monotonic(),
+        )
+
+    def snapshot(self) -> Dict[str, object]:
+        """Cache size and version, for diagnostics."""
+        return {
+            "version": self.version,
+            "cached_users": len(self._grants),
+            "fresh_users": sum(1 for g in self._grants.values() if self._is_fresh(g)),
+            "permission_bits": len(_bits),
+        }
+
+
+rbac = RBACEngine()
+
+
+# ============================================================================
+# FastAPI dependency
+# ============================================================================
+
+async def current_grants(db: AsyncSession, user_data: dict) -> UserGrants:
+    """Grants of the authenticated user; 404 if the user row is gone."""
+    grants = await rbac.grants(db, int(user_data["user_id"]))
+    if grants is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return grants
+
+
+async def get_current_grants(
+    db: AsyncSession = Depends(get_db),
+    user_data: dict = Depends(get_current_user),
+) -> UserGrants:
+    """Dependency: `grants: UserGrants = Depends(get_current_grants)`."""
+    return await current_grants(db, user_data)
+
+
+# ============================================================================
+# Automatic invalidation on commit
+# ============================================================================
+
+_ROLE_MODELS = (Role, PermissionModel, RolePermission, UserRole, ChannelRoleAssignment)
+
+
+def _changed_grants(session: Session) -> cache_invalidation.Scope:
+    """Ids of users whose grants a flush changed, or True for everyone."""
+    users: Set[int] = set()
+    for obj in session.new | session.deleted | session.dirty:
+        if isinstance(obj, (UserRole, ChannelRoleAssignment)):
+            # Only the assigned user's grants change
+            if obj.user_id is None:
+                return True
+            users.add(obj.user_id)
+        elif isinstance(obj, _ROLE_MODELS):
+            return True
+        elif isinstance(obj, User) and obj.id is not None:
+            # Inserts too: a reused id (restored backup, test database) must not
+            # inherit grants cached for a previous row
+            state = obj._sa_instance_state
+            if (
+                obj in session.new
+                or obj in session.deleted
+                or any(state.attrs[attr].history.has_changes() for attr in _USER_WATCHED_ATTRS)
+            ):
+                users.add(obj.id)
+    return users
+
+
+cache_invalidation.watch(
+    INVALIDATION_CHANNEL, _WATCHED_TABLES, rbac.invalidate, on_flush=_changed_grants, keyed=True,
+)
@@ -746,3 +746,21 @@ async def emit_sale_created(sale_id: int, product_id: int, quantity: int, user_i
 
     await sio.emit("sale:created", payload)
     logger.info(f"Emitted sale:created for sale {sale_id}, product={product_id}, qty={quantity}")
+
+
+# ============================================================================
+# Form Submission Events
+# ============================================================================
+
+async def emit_form_submission_status(user_id: int, submission_data: dict):
+    """
+    Emit form:submission_status to the submitter's sockets.
+    Sent as an async submission moves through processing/processed/failed.
+    """
+    if settings.TESTING:
+        return
+
+    for sid, user_data in list(authenticated_users.items()):
+        if user_data.get("user_id") == user_id:
+            await sio.emit("form:submission_status", submission_data, room=sid)
+    logger.debug(f"Emitted form:submission_status for submission {submission_data.get('id')} to user {user_id}")
@@ -0,0 +1,190 @@
+"""
+Admin Stats Service
+
+One snapshot of system-wide counts serving both GET /api/admin/stats and
+GET /api/system/stats:
+- All counts come from ONE statement: per-table conditional aggregates
+  (one scan each for users, channels, teams) plus scalar subqueries
+- Huge tables (messages, audit_logs) use the planner's pg_class row estimate
+  on PostgreSQL once it passes APPROX_COUNT_THRESHOLD; non-deleted messages
+  are the estimate minus the exact count of deleted ones (partial index
+  ix_messages_deleted). Smaller tables and other dialects count exactly
+- The snapshot is cached for CACHE_TTL_SECONDS in Redis (shared by pods)
+  and in process memory (when Redis is unavailable)
+- Dashboard views are audited at most once per admin per
+  AUDIT_VIEW_INTERVAL_SECONDS, so polling does not write an audit row
+  on every refresh
+"""
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import case, func, literal_column, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import AuditLog, Channel, Message, Team, User
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "admin_stats"
+CACHE_TTL_SECONDS = 30
+
+# Row estimate above which huge tables are not counted exactly
+APPROX_COUNT_THRESHOLD = 100_000
+
+AUDIT_VIEW_INTERVAL_SECONDS = 600
+
+_local_snapshot: Optional[Tuple[float, Dict[str, Any]]] = None
+_last_audited: Dict[int, float] = {}
+
+
+# ============================================================================
+# Query
+# ============================================================================
+
+def _flag(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _row_estimate(table: str):
+    """PostgreSQL planner row estimate (-1 until the table is first analyzed)."""
+    return literal_column(f"(SELECT reltuples::bigint FROM pg_class WHERE oid = '{table}'::regclass)")
+
+
+def _stats_query(dialect: str, since: datetime):
+    users = select(
+        func.count(User.id).label("total"),
+        _flag(User.is_active == True).label("active"),  # noqa: E712
+        _flag((User.is_active == True) & (User.is_banned == False)).label("active_unbanned"),  # noqa: E712
+        _flag(User.is_system_admin == True).label("admins"),  # noqa: E712
+        _flag(User.is_banned == True).label("banned"),  # noqa: E712
+        _flag(User.is_muted == True).label("muted"),  # noqa: E712
+    ).subquery("u")
+    channels = select(
+        func.count(Channel.id).label("total"),
+        _flag(Channel.is_archived == True).label("archived"),  # noqa: E712
+    ).subquery("c")
+    teams = select(func.count(Team.id).label("total")).subquery("t")
+
+    messages_exact = select(func.count(Message.id)).where(Message.is_deleted == False).scalar_subquery()  # noqa: E712
+    audit_exact = select(func.count(AuditLog.id)).scalar_subquery()
+    audit_recent = select(func.count(AuditLog.id)).where(AuditLog.created_at >= since).scalar_subquery()
+
+    if dialect == "postgresql":
+        # CASE only runs the exact subquery when the estimate is small
+        messages_est = _row_estimate("messages")
+        messages_deleted = select(func.count(Message.id)).where(Message.is_deleted == True).scalar_subquery()  # noqa: E712
+        messages_approx = messages_est >= APPROX_COUNT_THRESHOLD
+        audit_est = _row_estimate("audit_logs")
+        audit_approx = audit_est >= APPROX_COUNT_THRESHOLD
+        messages_total = case((messages_approx, messages_est - messages_deleted), else_=messages_exact)
+        audit_total = case((audit_approx, audit_est), else_=audit_exact)
+    else:
+        messages_approx = audit_approx = literal_column("0")
+        messages_total, audit_total = messages_exact, audit_exact
+
+    return (
+        select(
+            *users.c, channels.c.total.label("channels_total"), channels.c.archived.label("channels_archived"),
+            teams.c.total.label("teams_total"),
+            messages_total.label("messages_total"), messages_approx.label("messages_approximate"),
+            audit_total.label("audit_total"), audit_approx.label("audit_approximate"),
+            audit_recent.label("audit_last_24h"),
+        )
+        .select_from(users.join(channels, true()).join(teams, true()))
+    )
+
+
+async def compute_stats(db: AsyncSession) -> Dict[str, Any]:
+    """Compute a fresh stats snapshot with one query."""
+    now = datetime.utcnow()
+    dialect = db.get_bind().dialect.name
+    row = (await db.execute(_stats_query(dialect, now - timedelta(days=1)))).one()._mapping
+    return {
+        "users": {
+            "total": int(row["total"]),
+            "active": int(row["active"]),
+            "active_unbanned": int(row["active_unbanned"]),
+            "admins": int(row["admins"]),
+            "banned": int(row["banned"]),
+            "muted": int(row["muted"]),
+        },
+        "channels": {"total": int(row["channels_total"]), "archived": int(row["channels_archived"])},
+        "messages": {"total": max(int(row["messages_total"]), 0), "approximate": bool(row["messages_approximate"])},
+        "teams": {"total": int(row["teams_total"])},
+        "audit": {
+            "total": int(row["audit_total"]),
+            "approximate": bool(row["audit_approximate"]),
+            "last_24h": int(row["audit_last_24h"]),
+        },
+        "computed_at": now.isoformat(),
+    }
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+
+def _redis():
+    from app.core.redis import redis_client
+    return getattr(redis_client, "client", None)
+
+
+def _cache_get() -> Optional[Dict[str, Any]]:
+    try:
+        client = _redis()
+        if client is not None:
+            raw = client.get(CACHE_KEY)
+            if raw:
+                return json.loads(raw)
+    except Exception as e:
+        logger.debug(f"[AdminStats] Cache read failed: {e}")
+    if _local_snapshot and time.monotonic() - _local_snapshot[0] < CACHE_TTL_SECONDS:
+        return _local_snapshot[1]
+    return None
+
+
+def _cache_set(stats: Dict[str, Any]) -> None:
+    global _local_snapshot
+    _local_snapshot = (time.monotonic(), stats)
+    try:
+        client = _redis()
+        if client is not None:
+            client.set(CACHE_KEY, json.dumps(stats), ex=CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.debug(f"[AdminStats] Cache write failed: {e}")
+
+
+def invalidate() -> None:
+    """Drop the cached snapshot (next read recomputes)."""
+    global _local_snapshot
+    _local_snapshot = None
+    try:
+        client = _redis()
+        if client is not None:
+            client.delete(CACHE_KEY)
+    except Exception as e:
+        logger.debug(f"[AdminStats] Cache delete failed: {e}")
+
+
+async def get_stats(db: AsyncSession, refresh: bool = False) -> Dict[str, Any]:
+    """Cached stats snapshot; refresh=True recomputes it."""
+    if not refresh:
+        cached = _cache_get()
+        if cached is not None:
+            return cached
+    stats = await compute_stats(db)
+    _cache_set(stats)
+    return stats
+
+
+def should_audit_view(user_id: int) -> bool:
+    """True at most once per AUDIT_VIEW_INTERVAL_SECONDS per admin (per process)."""
+    now = time.monotonic()
+    last = _last_audited.get(user_id)
+    if last is not None and now - last < AUDIT_VIEW_INTERVAL_SECONDS:
+        return False
+    _last_audited[user_id] = now
+    return True
@@ -0,0 +1,296 @@
+"""
+Task Dispatch
+
+Workload-aware assignment of role-based automation tasks:
+- user_workloads keeps one counter per user: open (pending/in_progress)
+  task assignments
+- Counters move in the same transaction as the assignment change, so they
+  commit or roll back with it: ORM inserts, deletes and user/status edits
+  are counted by the flush hook below, bulk status changes go through
+  set_assignment_status() (UPDATE ... RETURNING)
+- pick_assignee: least-loaded active role member, round-robin on ties
+  (candidates come from the role directory, loads from user_workloads)
+- Claim queues (open, unclaimed, unassigned tasks per role) are read through
+  ix_automation_tasks_claim_queue; queue_depths() reports backlog per role
+  against staff and open work
+
+Other bulk statements on task_assignments bypass the counters; they are
+logged, and reconcile_workloads() rebuilds them.
+"""
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import delete, event, exists, func, insert, inspect as sa_inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.enums import AssignmentStatus, AutomationTaskStatus
+from app.db.models import AutomationTask, TaskAssignment, UserWorkload
+from app.services.role_directory import canonical_role, role_directory
+
+logger = logging.getLogger(__name__)
+
+# Assignment statuses that count as open work
+OPEN_ASSIGNMENT_STATUSES = (AssignmentStatus.pending, AssignmentStatus.in_progress)
+_OPEN_VALUES = frozenset(s.value for s in OPEN_ASSIGNMENT_STATUSES)
+
+# queue_depths() key for tasks without a required_role
+ANY_ROLE = "any"
+
+# Execution option marking bulk statements that adjust the counters themselves
+COUNTED_OPTION = "dispatch_counted"
+
+# Assignment columns the counters depend on
+_COUNTED_COLUMNS = ("user_id", "status")
+
+
+class DispatchError(Exception):
+    """Raised when a task cannot be dispatched (no role, no eligible user)."""
+    pass
+
+
+# ============================================================================
+# Claim queue
+# ============================================================================
+
+def claim_queue_criteria() -> tuple:
+    """WHERE criteria for claimable tasks (served by ix_automation_tasks_claim_queue)."""
+    return (
+        AutomationTask.status == AutomationTaskStatus.open,
+        AutomationTask.claimed_by_user_id.is_(None),
+        ~exists().where(TaskAssignment.task_id == AutomationTask.id),
+    )
+
+
+async def queue_depths(db: AsyncSession) -> Dict[str, Dict[str, int]]:
+    """
+    Backlog per role: queued (claimable) tasks, active staff holding the
+    role, and the open assignments those staff already carry.
+    """
+    result = await db.execute(
+        select(AutomationTask.required_role, func.count(AutomationTask.id))
+        .where(*claim_queue_criteria())
+        .group_by(AutomationTask.required_role)
+    )
+    queued = {role or ANY_ROLE: count for role, count in result.all()}
+
+    roles = set(queued) | set(await role_directory.roles(db))
+    roles.discard(ANY_ROLE)
+    staff = {role: await role_directory.users_for_role(db, role) for role in roles}
+    loads = await get_loads(db, {uid for ids in staff.values() for uid in ids})
+
+    depths = {
+        role: {
+            "queued": queued.get(role, 0),
+            "staff": len(staff[role]),
+            "open_assignments": sum(loads.get(uid, 0) for uid in staff[role]),
+        }
+        for role in sorted(roles)
+    }
+    if ANY_ROLE in queued:
+        depths[ANY_ROLE] = {"queued": queued[ANY_ROLE], "staff": 0, "open_assignments": 0}
+    return depths
+
+
+# ============================================================================
+# Assignee selection
+# ============================================================================
+
+async def get_loads(db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, int]:
+    """Open assignment counts for users (users without a counter row have 0)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    result = await db.execute(
+        select(UserWorkload.user_id, UserWorkload.open_assignments)
+        .where(UserWorkload.user_id.in_(user_ids))
+    )
+    return dict(result.all())
+
+
+async def pick_assignee(db: AsyncSession, role: str) -> Optional[int]:
+    """Least-loaded active user holding `role`; round-robin among equals."""
+    candidates = await role_directory.users_for_role(db, role)
+    if not candidates:
+        return None
+    loads = await get_loads(db, candidates)
+    return await role_directory.pick_assignee(db, role, loads=loads)
+
+
+async def dispatch_task(db: AsyncSession, task_id: int) -> AutomationTask:
+    """
+    Claim an open role task on behalf of the least-loaded role member.
+
+    Goes through AutomationService.claim_task, so the claim, its assignment,
+    events, audit and notifications are the same as a self-service claim.
+    Raises ClaimNotFoundError / ClaimConflictError / ClaimInvalidStateError
+    from the claim, or DispatchError when no one can take the task.
+    """
+    from app.automation.service import AutomationService, ClaimNotFoundError
+
+    result = await db.execute(select(AutomationTask.required_role).where(AutomationTask.id == task_id))
+    row = result.first()
+    if row is None:
+        raise ClaimNotFoundError("Task not found")
+    role = row[0]
+    if not role:
+        raise DispatchError("Task has no required role")
+
+    user_id = await pick_assignee(db, role)
+    if user_id is None:
+        raise DispatchError(f"No active user holds role '{canonical_role(role)}'")
+
+    logger.info(f"[Dispatch] Task {task_id} -> user {user_id} (role={role})")
+    return await AutomationService.claim_task(db, task_id, user_id)
+
+
+async def reconcile_workloads(db: AsyncSession) -> int:
+    """
+    Rebuild every counter from task_assignments (after manual data repairs
+    or raw SQL that bypassed the session hooks). Returns the number of
+    users with open work.
+    """
+    counts = await db.execute(
+        select(TaskAssignment.user_id, func.count(TaskAssignment.id))
+        .where(
+            TaskAssignment.user_id.is_not(None),
+            TaskAssignment.status.in_(OPEN_ASSIGNMENT_STATUSES),
+        )
+        .group_by(TaskAssignment.user_id)
+    )
+    rows = [{"user_id": uid, "open_assignments": n} for uid, n in counts.all()]
+    await db.execute(delete(UserWorkload))
+    if rows:
+        await db.execute(insert(UserWorkload), rows)
+    await db.commit()
+    logger.info(f"[Dispatch] Reconciled workloads for {len(rows)} users")
+    return len(rows)
+
+
+async def set_assignment_status(db: AsyncSession, status: AssignmentStatus, *criteria, **values: Any) -> int:
+    """
+    Set `status` (plus `values`, e.g. completed_at) on the task assignments
+    matching `criteria`; the counters move by the same amount. Returns the
+    number of assignments updated. Caller commits.
+    """
+    if "user_id" in values:
+        raise ValueError("Reassign through the ORM so the counters follow the user")
+    was_open = TaskAssignment.status.in_(OPEN_ASSIGNMENT_STATUSES)
+    opening = status in OPEN_ASSIGNMENT_STATUSES
+    stmt = (
+        update(TaskAssignment)
+        .values(status=status, **values)
+        .execution_options(**{COUNTED_OPTION: True})
+    )
+    # Rows staying on the same side first: the second statement then only sees rows that flip
+    kept = await db.execute(stmt.where(*criteria, was_open if opening else ~was_open))
+    flipped = (await db.execute(
+        stmt.where(*criteria, ~was_open if opening else was_open).returning(TaskAssignment.user_id)
+    )).scalars().all()
+    deltas = Counter(user_id for user_id in flipped if user_id is not None)
+    if deltas:
+        sign = 1 if opening else -1
+        await db.run_sync(_apply_deltas, Counter({user_id: sign * n for user_id, n in deltas.items()}))
+    return (kept.rowcount or 0) + len(flipped)
+
+
+# ============================================================================
+# Counter maintenance
+# ============================================================================
+
+def _is_open(user_id: Optional[int], status) -> bool:
+    if user_id is None:
+        return False
+    if status is None:  # column default
+        return True
+    return getattr(status, "value", status) in _OPEN_VALUES
+
+
+def _previous(state, attr: str):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.attrs[attr].value
+
+
+def _apply_deltas(session: Session, deltas: Counter) -> None:
+    """Add deltas to the per-user counters, creating rows as needed."""
+    rows = [{"user_id": uid, "open_assignments": d} for uid, d in deltas.items() if d]
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(UserWorkload).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "open_assignments": UserWorkload.open_assignments + stmt.excluded.open_assignments,
+                "updated_at": func.now(),
+            },
+        )
+        session.execute(stmt)
+        return
+
+    # Portable fallback: increment in place, insert when the user is new
+    for row in rows:
+        res = session.execute(
+            update(UserWorkload)
+            .where(UserWorkload.user_id == row["user_id"])
+            .values(open_assignments=UserWorkload.open_assignments + row["open_assignments"])
+        )
+        if res.rowcount == 0:
+            session.execute(insert(UserWorkload).values(**row))
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flushed_assignments(session, flush_context):
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, TaskAssignment) and _is_open(obj.user_id, obj.status):
+            deltas[obj.user_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, TaskAssignment):
+            state = sa_inspect(obj)
+            if _is_open(_previous(state, "user_id"), _previous(state, "status")):
+                deltas[_previous(state, "user_id")] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, TaskAssignment):
+            continue
+        state = sa_inspect(obj)
+        user_history = state.attrs.user_id.history
+        status_history = state.attrs.status.history
+        if not (user_history.has_changes() or status_history.has_changes()):
+            continue
+        old_user, old_status = _previous(state, "user_id"), _previous(state, "status")
+        if _is_open(old_user, old_status):
+            deltas[old_user] -= 1
+        if _is_open(obj.user_id, obj.status):
+            deltas[obj.user_id] += 1
+    if deltas:
+        _apply_deltas(session, deltas)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _warn_on_uncounted_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get(COUNTED_OPTION):
+        return
+    statement = orm_execute_state.statement
+    if getattr(getattr(statement, "table", None), "name", None) != TaskAssignment.__tablename__:
+        return
+    if orm_execute_state.is_update:
+        values = getattr(statement, "_values", None) or {}
+        if values and not any(getattr(column, "key", column) in _COUNTED_COLUMNS for column in values):
+            return  # e.g. notes only
+    logger.warning(
+        "[Dispatch] Bulk statement on task_assignments bypasses the workload counters; "
+        "use dispatch.set_assignment_status() or reconcile_workloads()"
+    )
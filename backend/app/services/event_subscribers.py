@@ -0,0 +1,164 @@
+"""
+Event Subscribers
+
+The handlers emit_event used to run one after another, registered on the
+event bus (app/core/event_bus.py) so each runs on its own:
+- Socket.IO broadcasts for orders, tasks and sales (in-memory; a missed
+  broadcast is repaired by the clients' next fetch)
+- Sales automation for recorded sales and low stock, and the admin alert
+  for reversed transactions (durable: delivered via the outbox)
+- The configurable rule engine, for every event type
+
+Imported once at startup (app/main.py) to register.
+"""
+import logging
+
+from sqlalchemy import select
+
+from app.core.event_bus import ALL_EVENTS, Event, event_bus
+from app.core.events import EventType
+from app.core.utils.user_utils import get_user_display_name
+from app.db import database
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Socket.IO
+# ============================================================================
+
+@event_bus.subscribe(['order.status_changed', 'order.completed'], name='socket.order_updated', concurrency=16, timeout=10)
+async def broadcast_order_updated(event: Event):
+    from app.realtime.socket import emit_order_updated
+    await emit_order_updated(
+        order_id=event.payload.get('order_id'),
+        status=event.payload.get('status'),
+        order_type=event.payload.get('order_type'),
+    )
+
+
+@event_bus.subscribe('order.submitted', name='socket.order_created', concurrency=16, timeout=10)
+async def broadcast_order_created(event: Event):
+    from app.realtime.socket import emit_order_created
+    await emit_order_created(
+        order_id=event.payload.get('order_id'),
+        status=event.payload.get('status'),
+        order_type=event.payload.get('order_type'),
+    )
+
+
+@event_bus.subscribe('task.completed', name='socket.task_completed', concurrency=16, timeout=10)
+async def broadcast_task_completed(event: Event):
+    from app.realtime.socket import emit_task_completed
+    await emit_task_completed(
+        task_id=event.payload.get('task_id'),
+        step_key=event.payload.get('step_key'),
+        order_id=event.payload.get('order_id'),
+    )
+
+
+@event_bus.subscribe('sale:created', name='socket.sale_created', concurrency=16, timeout=10)
+async def broadcast_sale_created(event: Event):
+    from app.realtime.socket import emit_sale_created
+    await emit_sale_created(
+        sale_id=event.payload.get('sale_id'),
+        product_id=event.payload.get('product_id'),
+        quantity=event.payload.get('quantity'),
+        user_id=event.payload.get('user_id'),
+        channel=event.payload.get('channel'),
+    )
+
+
+# ============================================================================
+# Automation triggers
+# ============================================================================
+
+@event_bus.subscribe(EventType.SALE_CREATED, name='automation.sale_recorded', durable=True)
+async def on_sale_created(event: Event):
+    from app.automation.sales_triggers import SalesAutomationTriggers
+    from app.db.models import Sale
+
+    sale_id = event.payload.get('sale_id')
+    if not sale_id:
+        return
+    async with database.async_session() as db:
+        sale = (await db.execute(select(Sale).where(Sale.id == sale_id))).scalar_one_or_none()
+        if sale:
+            user_display = await get_user_display_name(db, event.payload.get('user_id'))
+            logger.info("Sale recorded by %s (sale_id=%s)", user_display, sale_id)
+            await SalesAutomationTriggers.on_sale_recorded(
+                db=db, sale=sale,
+                transaction_id=event.payload.get('transaction_id'),
+            )
+
+
+@event_bus.subscribe(EventType.INVENTORY_UPDATED, name='automation.low_stock', durable=True)
+async def on_inventory_updated(event: Event):
+    from app.automation.sales_triggers import SalesAutomationTriggers
+    from app.db.models import Inventory
+
+    product_id = event.payload.get('product_id')
+    if not product_id:
+        return
+    async with database.async_session() as db:
+        inv = (await db.execute(
+            select(Inventory).where(Inventory.product_id == product_id)
+        )).scalar_one_or_none()
+        if inv and inv.total_stock <= inv.low_stock_threshold:
+            user_id = event.payload.get('user_id') or event.payload.get('sale_id') or 0
+            user_display = await get_user_display_name(db, user_id)
+            logger.warning(
+                "LOW STOCK: %s triggered by %s (stock=%s, threshold=%s)",
+                inv.product_name or f"Product {product_id}",
+                user_display, inv.total_stock, inv.low_stock_threshold,
+            )
+            await SalesAutomationTriggers.on_low_stock(
+                db=db,
+                inventory_item=inv,
+                triggered_by_user_id=user_id,
+            )
+
+
+@event_bus.subscribe(EventType.TRANSACTION_REVERSED, name='alerts.transaction_reversed', durable=True)
+async def on_transaction_reversed(event: Event):
+    from app.automation.notification_hooks import get_admins_and_managers
+    from app.db.enums import NotificationType
+    from app.services.notification_emitter import create_and_emit_to_multiple
+
+    original_id = event.payload.get('original_transaction_id')
+    async with database.async_session() as db:
+        user_display = await get_user_display_name(db, event.payload.get('user_id'))
+        logger.warning("REVERSAL ALERT: reversed by %s, original=%s", user_display, original_id)
+        admin_ids = await get_admins_and_managers(db)
+        if admin_ids:
+            await create_and_emit_to_multiple(
+                db=db,
+                user_ids=admin_ids,
+                notification_type=NotificationType.system,
+                title="Transaction Reversed",
+                content=f"Transaction #{original_id} was reversed by {user_display}",
+                metadata={
+                    "action_type": "reversal",
+                    "entity_id": original_id,
+                    "action_url": f"/sales?tab=transactions&highlight={original_id}",
+                },
+            )
+            await db.commit()
+
+
+# ============================================================================
+# Rule engine
+# ============================================================================
+
+@event_bus.subscribe(ALL_EVENTS, name='automation.rule_engine', concurrency=8)
+async def run_rules(event: Event):
+    from app.automation.rule_engine import rule_engine
+
+    if not rule_engine.wants(event.name):
+        return
+    payload = event.payload
+    payload['_event'] = event.name
+    async with database.async_session() as db:
+        if 'user_name' not in payload and payload.get('user_id'):
+            payload['user_name'] = await get_user_display_name(db, payload['user_id'])
+        await rule_engine.process(event.name, payload, db)
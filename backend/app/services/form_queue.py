@@ -0,0 +1,300 @@
+"""
+Form Submission Queue
+
+Asynchronous processing for form submissions sent with process_async, so
+front-line forms return as soon as the submission is stored instead of
+holding the request through the whole downstream workflow:
+- submit_form stores the submission as "pending" with queued_at set
+  (FormSubmissionService.enqueue) and answers 202 right away
+- Workers claim due submissions per service target with FOR UPDATE SKIP
+  LOCKED (served by ix_form_submissions_queue; see app/core/work_queue.py),
+  so every pod can drain the same queue; each target has its own concurrency limit per process
+  (FORM_QUEUE_CONCURRENCY, TARGET_CONCURRENCY overrides)
+- Handler errors are retried with exponential backoff up to
+  FORM_QUEUE_MAX_ATTEMPTS, unless the handler already committed part of
+  its work (services commit internally) - then the submission fails
+  rather than risk a duplicate sale/order; ValueError always fails
+- Submissions left "processing" by a crashed worker are failed after
+  PROCESSING_TIMEOUT_SECONDS with a message asking to check and resubmit,
+  for the same reason
+- Every status change is pushed to the submitter as form:submission_status
+"""
+import asyncio
+import json
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.work_queue import (
+    STALE_TIMEOUT_SECONDS, PollingWorker, backoff, claim_due, default_session_factory, utcnow,
+)
+from app.db.models import Form, FormSubmission
+
+logger = logging.getLogger(__name__)
+
+# A "processing" submission older than this belongs to a dead worker
+PROCESSING_TIMEOUT_SECONDS = STALE_TIMEOUT_SECONDS
+
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 600
+
+# Per-target concurrency overrides (default FORM_QUEUE_CONCURRENCY)
+TARGET_CONCURRENCY = {
+    "production": 2,  # batches lock raw material rows; keep contention low
+}
+
+INTERRUPTED_MESSAGE = "Processing was interrupted; check whether it was recorded before resubmitting"
+
+
+def _queued(*criteria) -> tuple:
+    return (FormSubmission.queued_at.is_not(None), *criteria)
+
+
+def serialize_status(submission: FormSubmission) -> dict:
+    """Payload of form:submission_status."""
+    return {
+        "id": submission.id,
+        "form_id": submission.form_id,
+        "status": submission.status,
+        "attempts": submission.attempts or 0,
+        "result_id": submission.result_id,
+        "result_type": submission.result_type,
+        "error_message": submission.error_message,
+        "processed_at": submission.processed_at.isoformat() if submission.processed_at else None,
+    }
+
+
+async def _emit(submission: FormSubmission) -> None:
+    if not submission.submitted_by_id:
+        return
+    try:
+        from app.realtime.socket import emit_form_submission_status
+        await emit_form_submission_status(submission.submitted_by_id, serialize_status(submission))
+    except Exception as e:
+        logger.warning(f"[FormQueue] Failed to emit status for submission {submission.id}: {e}")
+
+
+# ============================================================================
+# Queue queries
+# ============================================================================
+
+async def fail_interrupted(db: AsyncSession) -> int:
+    """Fail queued submissions stuck in "processing" past the timeout."""
+    now = utcnow()
+    result = await db.execute(
+        update(FormSubmission)
+        .where(*_queued(
+            FormSubmission.status == "processing",
+            FormSubmission.started_at < now - timedelta(seconds=PROCESSING_TIMEOUT_SECONDS),
+        ))
+        .values(status="failed", error_message=INTERRUPTED_MESSAGE, processed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if result.rowcount:
+        logger.warning(f"[FormQueue] Failed {result.rowcount} interrupted submission(s)")
+    return result.rowcount or 0
+
+
+async def due_targets(db: AsyncSession) -> List[str]:
+    """Service targets with submissions due now."""
+    result = await db.execute(
+        select(FormSubmission.service_target)
+        .where(*_queued(FormSubmission.status == "pending", FormSubmission.next_attempt_at <= utcnow()))
+        .distinct()
+    )
+    return [target for target in result.scalars().all() if target]
+
+
+async def claim(db: AsyncSession, service_target: str, limit: int) -> List[int]:
+    """Move up to `limit` due submissions of a target to "processing" (committed)."""
+    rows = await claim_due(
+        db, FormSubmission, limit, "processing", [FormSubmission.id],
+        *_queued(FormSubmission.service_target == service_target),
+    )
+    return [row.id for row in rows]
+
+
+async def queue_depths(db: AsyncSession) -> Dict[str, Dict[str, int]]:
+    """Pending (due or backing off) and processing counts per service target."""
+    result = await db.execute(
+        select(FormSubmission.service_target, FormSubmission.status, func.count())
+        .where(*_queued(FormSubmission.status.in_(("pending", "processing"))))
+        .group_by(FormSubmission.service_target, FormSubmission.status)
+    )
+    depths: Dict[str, Dict[str, int]] = {}
+    for target, status, count in result.all():
+        depths.setdefault(target or "", {"pending": 0, "processing": 0})[status] = count
+    return depths
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+class FormSubmissionQueue:
+    """Per-process worker pool draining queued form submissions."""
+
+    def __init__(self):
+        self._in_flight: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._worker = PollingWorker("[FormQueue] Worker", self.dispatch)
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker.running
+
+    def limit_for(self, service_target: str) -> int:
+        return max(1, TARGET_CONCURRENCY.get(service_target, settings.FORM_QUEUE_CONCURRENCY))
+
+    def notify(self) -> None:
+        """Wake the worker (new submission queued or a slot freed up)."""
+        self._worker.notify()
+
+    def start(self, session_factory=None) -> None:
+        self._worker.start(session_factory)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop claiming; give in-flight submissions `timeout` seconds to finish."""
+        await self._worker.stop()
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    async def dispatch(self, session_factory=None) -> List[asyncio.Task]:
+        """Fail interrupted work, claim due submissions into free slots and start them."""
+        factory = default_session_factory(session_factory)
+        started = []
+        async with factory() as db:
+            await fail_interrupted(db)
+            for target in await due_targets(db):
+                free = self.limit_for(target) - self._in_flight.get(target, 0)
+                if free <= 0:
+                    continue
+                for submission_id in await claim(db, target, free):
+                    started.append(self._spawn(factory, target, submission_id))
+        return started
+
+    async def drain(self, session_factory=None) -> int:
+        """Process everything due now and wait for it (scripts and tests)."""
+        handled = 0
+        while True:
+            started = await self.dispatch(session_factory)
+            if started:
+                handled += len(started)
+                await asyncio.gather(*started)
+            elif self._tasks:
+                await asyncio.wait(set(self._tasks))
+            else:
+                return handled
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "running": self.running,
+            "in_flight": dict(self._in_flight),
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    def _spawn(self, factory, service_target: str, submission_id: int) -> asyncio.Task:
+        self._in_flight[service_target] = self._in_flight.get(service_target, 0) + 1
+        task = asyncio.create_task(self._process(factory, submission_id))
+        self._tasks.add(task)
+
+        def _done(t: asyncio.Task) -> None:
+            self._tasks.discard(t)
+            self._in_flight[service_target] -= 1
+            self.notify()
+
+        task.add_done_callback(_done)
+        return task
+
+    async def _process(self, factory, submission_id: int) -> None:
+        from app.services.form_submission import FormSubmissionService
+
+        async with factory() as db:
+            submission = await db.get(FormSubmission, submission_id)
+            if submission is None or submission.status != "processing":
+                return
+            await _emit(submission)
+            form = await db.get(Form, submission.form_id)
+            if form is None:
+                await self._finish(db, submission, "failed", 0, "Form not found")
+                return
+
+            db.sync_session.info[_COMMITS_KEY] = 0
+            try:
+                status, result_id, error = await FormSubmissionService.submit(
+                    db=db,
+                    form=form,
+                    data=json.loads(submission.data or "{}"),
+                    user_id=submission.submitted_by_id,
+                    submission=submission,
+                    retryable=True,
+                )
+            except Exception as e:
+                committed = db.sync_session.info.pop(_COMMITS_KEY, 0) > 0
+                logger.warning(f"[FormQueue] Submission {submission_id} attempt failed: {e}")
+                await db.rollback()
+                submission = await db.get(FormSubmission, submission_id, populate_existing=True)
+                await self._retry_or_fail(db, submission, str(e), committed)
+                return
+            db.sync_session.info.pop(_COMMITS_KEY, None)
+
+            if status == "failed":
+                # Drop the handler's uncommitted partial writes
+                await db.rollback()
+                submission = await db.get(FormSubmission, submission_id, populate_existing=True)
+            await self._finish(db, submission, status, result_id, error)
+
+    async def _finish(self, db: AsyncSession, submission: FormSubmission, status: str,
+                      result_id: Optional[int], error: Optional[str]) -> None:
+        submission.status = status
+        submission.result_id = result_id
+        submission.result_type = submission.service_target
+        submission.error_message = error
+        submission.processed_at = utcnow()
+        await db.commit()
+        if status == "failed":
+            self.failed += 1
+        else:
+            self.processed += 1
+        await _emit(submission)
+
+    async def _retry_or_fail(self, db: AsyncSession, submission: FormSubmission,
+                             error: str, committed: bool) -> None:
+        attempts = submission.attempts or 1
+        if committed or attempts >= settings.FORM_QUEUE_MAX_ATTEMPTS:
+            await self._finish(db, submission, "failed", 0, error)
+            return
+        submission.status = "pending"
+        submission.started_at = None
+        submission.next_attempt_at = utcnow() + backoff(attempts, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS)
+        submission.error_message = f"Attempt {attempts} failed: {error}"
+        await db.commit()
+        self.retried += 1
+        await _emit(submission)
+
+
+form_queue = FormSubmissionQueue()
+
+
+# ============================================================================
+# Commit tracking (was the handler's work partly committed?)
+# ============================================================================
+
+_COMMITS_KEY = "form_queue_commits"
+
+
+@event.listens_for(Session, "after_commit")
+def _count_commits(session):
+    if _COMMITS_KEY in session.info:
+        session.info[_COMMITS_KEY] += 1
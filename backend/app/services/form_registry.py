@@ -0,0 +1,371 @@
+"""
+Form Registry
+
+Compiled, cached form definitions so rendering or submitting a form costs
+one query instead of reloading Form + FormField rows and the whole
+Inventory / RawMaterial tables each time:
+- CompiledForm: an immutable view of one form version with allowed_roles,
+  field_mapping and per-field JSON parsed once, the required-field check
+  precompiled and role-filtered field lists memoized per role
+- get(): one probe query for (id, current_version, updated_at) by slug;
+  the compiled form is cached under (slug, current_version, updated_at),
+  so every edit (update_form, add_field, restore_version, ...) bumps the
+  key and other pods can never serve a stale version
+- Dynamic option lists (options_source "products" / "raw_materials") are
+  cached per source and reloaded after a commit touches raw_materials or
+  an inventory product id/name (ORM or bulk statements); invalidations
+  are published on the "cache:form_registry" Redis channel
+  (app/core/cache_invalidation.py)
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.core import cache_invalidation
+from app.db.models import Form, FormField, Inventory, RawMaterial
+
+logger = logging.getLogger(__name__)
+
+# Cache invalidation channel (Redis: "cache:form_registry")
+INVALIDATION_CHANNEL = "form_registry"
+
+# Reload option lists at least this often even without invalidations
+MAX_AGE_SECONDS = 120
+
+# Keep at most this many compiled forms (oldest evicted first)
+MAX_COMPILED_FORMS = 256
+
+# Roles that see every form and field
+ADMIN_ROLES = ("system_admin", "admin")
+
+# Tables behind each options_source
+_OPTION_SOURCE_TABLES = {
+    "products": "inventory",
+    "raw_materials": "raw_materials",
+}
+_OPTION_SOURCE_MODELS = {
+    Inventory: "products",
+    RawMaterial: "raw_materials",
+}
+
+
+def _parse_json(value: Optional[str]) -> Any:
+    """Parse a JSON text column, None if empty or invalid."""
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+def _copy(value: Any) -> Any:
+    """Deep copy of a parsed JSON value."""
+    return json.loads(json.dumps(value)) if value is not None else None
+
+
+def _enum_value(value):
+    return value.value if hasattr(value, "value") else value
+
+
+# ============================================================================
+# Compiled definitions
+# ============================================================================
+
+@dataclass(frozen=True)
+class CompiledField:
+    id: int
+    key: str
+    label: str
+    field_type: str
+    placeholder: Optional[str]
+    help_text: Optional[str]
+    required: bool
+    min_value: Optional[int]
+    max_value: Optional[int]
+    min_length: Optional[int]
+    max_length: Optional[int]
+    pattern: Optional[str]
+    options: Any
+    options_source: Optional[str]
+    default_value: Optional[str]
+    role_visibility: Optional[Tuple[str, ...]]
+    conditional_visibility: Any
+    order_index: int
+    field_group: Optional[str]
+
+    def visible_to(self, role: str) -> bool:
+        return not self.role_visibility or role in ADMIN_ROLES or role in self.role_visibility
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Response kwargs; JSON values are copied so callers may mutate them."""
+        return {
+            "id": self.id,
+            "key": self.key,
+            "label": self.label,
+            "field_type": self.field_type,
+            "placeholder": self.placeholder,
+            "help_text": self.help_text,
+            "required": self.required,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "min_length": self.min_length,
+            "max_length": self.max_length,
+            "pattern": self.pattern,
+            "options": _copy(self.options),
+            "options_source": self.options_source,
+            "default_value": self.default_value,
+            "role_visibility": list(self.role_visibility) if self.role_visibility is not None else None,
+            "conditional_visibility": _copy(self.conditional_visibility),
+            "order_index": self.order_index,
+            "field_group": self.field_group,
+        }
+
+
+@dataclass(frozen=True)
+class CompiledForm:
+    id: int
+    slug: str
+    name: str
+    description: Optional[str]
+    category: str
+    allowed_roles: Optional[Tuple[str, ...]]
+    service_target: Optional[str]
+    field_mapping: Optional[Dict[str, str]]
+    is_active: bool
+    current_version: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    fields: Tuple[CompiledField, ...]
+    required_keys: Tuple[str, ...]
+    option_sources: FrozenSet[str]
+    _by_role: Dict[str, Tuple[CompiledField, ...]] = field(default_factory=dict, compare=False, repr=False)
+
+    def can_access(self, role: str) -> bool:
+        """No allowed_roles means everyone; admins always have access."""
+        return not self.allowed_roles or role in ADMIN_ROLES or role in self.allowed_roles
+
+    def fields_for(self, role: str) -> Tuple[CompiledField, ...]:
+        """Fields visible to `role`, computed once per role."""
+        visible = self._by_role.get(role)
+        if visible is None:
+            visible = tuple(f for f in self.fields if f.visible_to(role))
+            self._by_role[role] = visible
+        return visible
+
+    def missing_required(self, data: dict) -> List[str]:
+        """Required keys absent from `data` or empty."""
+        return [key for key in self.required_keys if data.get(key) in (None, "", [])]
+
+
+def compile_form(form: Form) -> CompiledForm:
+    """Compile a Form with its fields loaded."""
+    fields = []
+    for f in sorted(form.fields, key=lambda x: x.order_index or 0):
+        role_visibility = _parse_json(f.role_visibility)
+        fields.append(CompiledField(
+            id=f.id,
+            key=f.key,
+            label=f.label,
+            field_type=_enum_value(f.field_type),
+            placeholder=f.placeholder,
+            help_text=f.help_text,
+            required=bool(f.required),
+            min_value=f.min_value,
+            max_value=f.max_value,
+            min_length=f.min_length,
+            max_length=f.max_length,
+            pattern=f.pattern,
+            options=_parse_json(f.options),
+            options_source=f.options_source,
+            default_value=f.default_value,
+            role_visibility=tuple(role_visibility) if role_visibility is not None else None,
+            conditional_visibility=_parse_json(f.conditional_visibility),
+            order_index=f.order_index,
+            field_group=f.field_group,
+        ))
+    allowed_roles = _parse_json(form.allowed_roles)
+    field_mapping = _parse_json(form.field_mapping)
+    return CompiledForm(
+        id=form.id,
+        slug=form.slug,
+        name=form.name,
+        description=form.description,
+        category=_enum_value(form.category),
+        allowed_roles=tuple(allowed_roles) if allowed_roles else None,
+        service_target=form.service_target,
+        field_mapping=field_mapping if isinstance(field_mapping, dict) else None,
+        is_active=bool(form.is_active),
+        current_version=form.current_version or 1,
+        created_at=form.created_at,
+        updated_at=form.updated_at,
+        fields=tuple(fields),
+        required_keys=tuple(f.key for f in fields if f.required),
+        option_sources=frozenset(f.options_source for f in fields if f.options_source in _OPTION_SOURCE_TABLES),
+    )
+
+
+# ============================================================================
+# Registry
+# ============================================================================
+
+class FormRegistry:
+    """Process-wide cache of compiled forms and dynamic option lists."""
+
+    def __init__(self):
+        self.version = 0
+        self._forms: Dict[Tuple[str, int, Optional[datetime]], CompiledForm] = {}
+        self._options: Dict[str, Tuple[int, float, Tuple[Tuple[Any, str], ...]]] = {}
+        self._option_generation: Dict[str, int] = {source: 0 for source in _OPTION_SOURCE_TABLES}
+        self._lock = asyncio.Lock()
+
+    # ---------------------- Invalidation ----------------------
+
+    def invalidate(self, sources: Optional[List[str]] = None, broadcast: bool = True) -> None:
+        """
+        Drop compiled forms and mark option lists stale (all sources, or just
+        `sources`); with `broadcast`, tell the other pods too.
+        """
+        self.version += 1
+        if sources is None:
+            self._forms.clear()
+        for source in _OPTION_SOURCE_TABLES if sources is None else sources:
+            self._option_generation[source] = self._option_generation.get(source, 0) + 1
+        if broadcast:
+            cache_invalidation.publish(INVALIDATION_CHANNEL, sources)
+
+    # ---------------------- Forms ----------------------
+
+    async def get(self, db: AsyncSession, slug: str) -> Optional[CompiledForm]:
+        """Compiled definition of the active form `slug` (one query when cached)."""
+        row = (await db.execute(
+            select(Form.id, Form.current_version, Form.updated_at)
+            .where(Form.slug == slug, Form.is_active == True)  # noqa: E712
+        )).one_or_none()
+        if row is None:
+            return None
+        key = (slug, row.current_version or 1, row.updated_at)
+        compiled = self._forms.get(key)
+        if compiled is not None:
+            return compiled
+
+        result = await db.execute(select(Form).options(selectinload(Form.fields)).where(Form.id == row.id))
+        form = result.scalar_one_or_none()
+        if form is None:
+            return None
+        compiled = compile_form(form)
+        # Re-key on what was compiled in case the form changed in between
+        key = (slug, compiled.current_version, compiled.updated_at)
+        for stale in [k for k in self._forms if k[0] == slug]:
+            del self._forms[stale]
+        if len(self._forms) >= MAX_COMPILED_FORMS:
+            self._forms.pop(next(iter(self._forms)))
+        self._forms[key] = compiled
+        return compiled
+
+    # ---------------------- Dynamic options ----------------------
+
+    def _options_fresh(self, source: str) -> bool:
+        cached = self._options.get(source)
+        return (
+            cached is not None
+            and cached[0] == self._option_generation.get(source, 0)
+            and time.monotonic() - cached[1] <= MAX_AGE_SECONDS
+        )
+
+    async def _load_options(self, db: AsyncSession, source: str) -> Tuple[Tuple[Any, str], ...]:
+        if source == "products":
+            result = await db.execute(
+                select(Inventory.product_id, Inventory.product_name).order_by(Inventory.product_name)
+            )
+            return tuple((product_id, name) for product_id, name in result.all() if name)
+        result = await db.execute(
+            select(RawMaterial.id, RawMaterial.name, RawMaterial.current_stock, RawMaterial.unit)
+            .order_by(RawMaterial.name)
+        )
+        return tuple((rid, f"{name} ({stock} {unit})") for rid, name, stock, unit in result.all())
+
+    async def options(self, db: AsyncSession, source: str) -> Optional[List[dict]]:
+        """Live [{label, value}] options for a dynamic source (None if unknown)."""
+        if source not in _OPTION_SOURCE_TABLES:
+            return None
+        if not self._options_fresh(source):
+            async with self._lock:
+                if not self._options_fresh(source):
+                    generation = self._option_generation.get(source, 0)
+                    items = await self._load_options(db, source)
+                    self._options[source] = (generation, time.monotonic(), items)
+        return [{"label": label, "value": value} for value, label in self._options[source][2]]
+
+    def snapshot(self) -> Dict[str, object]:
+        """Cache sizes, for diagnostics."""
+        return {
+            "version": self.version,
+            "compiled_forms": len(self._forms),
+            "option_sources": {s: self._options_fresh(s) for s in _OPTION_SOURCE_TABLES},
+        }
+
+
+form_registry = FormRegistry()
+
+
+# ============================================================================
+# Automatic invalidation on commit
+# ============================================================================
+
+# Inventory columns shown in the products list; stock-only updates keep it
+_PRODUCT_OPTION_ATTRS = ("product_id", "product_name")
+
+# Invalidating everything drops compiled forms too; keys are option sources
+_WATCHED_TABLES = ("forms", "form_fields", *_OPTION_SOURCE_TABLES.values())
+
+
+def _touches_product_options(obj: Inventory) -> bool:
+    state = obj._sa_instance_state
+    return any(state.attrs[attr].history.has_changes() for attr in _PRODUCT_OPTION_ATTRS)
+
+
+def _updates_product_options(statement) -> bool:
+    values = getattr(statement, "_values", None)
+    if not values:
+        return True  # delete, or values we cannot see
+    return any(getattr(column, "key", column) in _PRODUCT_OPTION_ATTRS for column in values)
+
+
+def _changed_on_flush(session: Session) -> cache_invalidation.Scope:
+    sources = set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, (Form, FormField)):
+            return True
+        if type(obj) in _OPTION_SOURCE_MODELS:
+            sources.add(_OPTION_SOURCE_MODELS[type(obj)])
+    for obj in session.dirty:
+        if isinstance(obj, (Form, FormField)):
+            return True
+        if isinstance(obj, RawMaterial):
+            sources.add("raw_materials")
+        elif isinstance(obj, Inventory) and _touches_product_options(obj):
+            sources.add("products")
+    return sources
+
+
+def _changed_by_statement(statement, table: str) -> cache_invalidation.Scope:
+    if table == "raw_materials":
+        return {"raw_materials"}
+    if table == "inventory":
+        return {"products"} if _updates_product_options(statement) else False
+    return True
+
+
+cache_invalidation.watch(
+    INVALIDATION_CHANNEL, _WATCHED_TABLES, form_registry.invalidate,
+    on_flush=_changed_on_flush, on_statement=_changed_by_statement, keyed=True,
+)
@@ -19,6 +19,7 @@ from sqlalchemy import select
 
 from app.db.models import Form, FormSubmission
 from app.db.enums import FormCategory
+from app.services import idempotency
 
 logger = logging.getLogger(__name__)
 
@@ -45,9 +46,19 @@ class FormSubmissionService:
         data: dict,
         user_id: int,
         submission: Optional[FormSubmission] = None,
+        idempotency_key: Optional[str] = None,
+        retryable: bool = False,
     ) -> Tuple[str, int, Optional[str]]:
         """
         Submit form data to the appropriate service.
+
+        With `idempotency_key` (and a flushed `submission`), the key is
+        recorded in the same transaction as the submission and the service
+        write; check find_duplicate() before creating the submission.
+
+        With `retryable` (the async queue), unexpected handler errors are
+        raised instead of reported as "failed" so the caller can retry;
+        ValueError is still a permanent failure.
         
         Returns: (status, result_id, error_message)
         - status: "processed" or "failed"
@@ -55,6 +66,12 @@ class FormSubmissionService:
         - error_message: Error message if failed
         """
         service_target = form.service_target
+
+        if idempotency_key and submission is not None:
+            idempotency.remember(
+                db, idempotency.SCOPE_FORM_SUBMISSION, user_id, idempotency_key,
+                submission.id, cls._fingerprint(form, data),
+            )
         
         if not service_target:
             # No service target - just record the submission
@@ -77,9 +94,61 @@ class FormSubmissionService:
             logger.error(f"Validation error in form submission: {e}")
             return "failed", 0, str(e)
         except Exception as e:
+            if retryable:
+                raise
             logger.error(f"Error in form submission to {service_target}: {e}")
             return "failed", 0, str(e)
+
+    @classmethod
+    def enqueue(
+        cls,
+        db: AsyncSession,
+        form: Form,
+        data: dict,
+        user_id: int,
+        submission: FormSubmission,
+        idempotency_key: Optional[str] = None,
+    ) -> None:
+        """
+        Mark a flushed pending `submission` for the async queue (see
+        app/services/form_queue.py) instead of running the handler now.
+        The idempotency key is recorded in the caller's transaction.
+        """
+        from datetime import datetime, timezone
+
+        if idempotency_key:
+            idempotency.remember(
+                db, idempotency.SCOPE_FORM_SUBMISSION, user_id, idempotency_key,
+                submission.id, cls._fingerprint(form, data),
+            )
+        now = datetime.now(timezone.utc)
+        submission.status = "pending"
+        submission.queued_at = now
+        submission.next_attempt_at = now
     
+    @classmethod
+    async def find_duplicate(
+        cls,
+        db: AsyncSession,
+        form: Form,
+        data: dict,
+        user_id: int,
+        idempotency_key: Optional[str],
+    ) -> Optional[FormSubmission]:
+        """
+        Submission already recorded for this key, if any.
+
+        Raises IdempotencyConflictError if the key was used for different data.
+        """
+        hit = await idempotency.find(db, idempotency.SCOPE_FORM_SUBMISSION, user_id, idempotency_key)
+        if hit is None:
+            return None
+        return await db.get(FormSubmission, hit.check(cls._fingerprint(form, data)))
+
+    @staticmethod
+    def _fingerprint(form: Form, data: dict) -> str:
+        return idempotency.request_fingerprint({"form_id": form.id, "data": data})
+
     @classmethod
     def _apply_mapping(cls, form: Form, data: dict) -> dict:
         """
@@ -92,15 +161,18 @@ class FormSubmissionService:
             "quantity": "sales.quantity"
         }
         
-        If no mapping defined, data is passed through as-is.
+        If no mapping defined, data is passed through as-is. Accepts a Form
+        (JSON text) or a CompiledForm (already parsed).
         """
         if not form.field_mapping:
             return data
         
-        try:
-            mapping = json.loads(form.field_mapping)
-        except (json.JSONDecodeError, TypeError):
-            return data
+        mapping = form.field_mapping
+        if isinstance(mapping, str):
+            try:
+                mapping = json.loads(mapping)
+            except (json.JSONDecodeError, TypeError):
+                return data
         
         if not mapping:
             return data
@@ -126,7 +198,8 @@ class FormSubmissionService:
     def validate_required_fields(cls, form: Form, data: dict) -> list:
         """
         Validate that all required fields are present.
-        Returns list of missing field keys.
+        Returns list of missing field keys. CompiledForm.missing_required
+        is the precompiled equivalent used by the submit endpoint.
         """
         missing = []
         for field in form.fields:
@@ -0,0 +1,195 @@
+"""
+Idempotency Store
+
+Client-supplied idempotency keys for write endpoints (sales, orders, form
+submissions), so mobile retries are O(1) and never double-write:
+- idempotency_keys holds one row per (scope, actor, key) with the id of the
+  resource it produced and a fingerprint of the request
+- remember() adds the row to the caller's transaction, so it commits or
+  rolls back with the resource; the unique constraint makes the second of
+  two concurrent writers fail instead of writing twice
+- find() checks a Redis cache (TTL) before the table; entries are cached
+  after commit only
+- A key reused with a different request fingerprint raises
+  IdempotencyConflictError (callers map it to 409); keys without a stored
+  fingerprint (backfilled) match any request
+"""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# Scopes
+SCOPE_SALE = "sale"
+SCOPE_ORDER = "order"
+SCOPE_FORM_SUBMISSION = "form_submission"
+
+# Redis pre-check cache
+CACHE_PREFIX = "idem"
+CACHE_TTL_SECONDS = 24 * 3600
+
+
+class IdempotencyConflictError(Exception):
+    """An idempotency key was reused for a different request."""
+    http_code = 409
+
+
+@dataclass(frozen=True)
+class IdempotencyHit:
+    """A stored key: the resource it produced and the request fingerprint."""
+    resource_id: int
+    fingerprint: Optional[str] = None
+
+    def check(self, fingerprint: Optional[str]) -> int:
+        """Return resource_id, or raise if the key belonged to a different request."""
+        if self.fingerprint and fingerprint and self.fingerprint != fingerprint:
+            raise IdempotencyConflictError("Idempotency key was already used for a different request")
+        return self.resource_id
+
+
+def request_fingerprint(fields: Dict[str, Any]) -> str:
+    """Stable hash of the request fields that define "the same request"."""
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# ============================================================================
+# Redis cache (best-effort)
+# ============================================================================
+
+def _cache_key(scope: str, actor_id: int, key: str) -> str:
+    return f"{CACHE_PREFIX}:{scope}:{actor_id}:{key}"
+
+
+def _redis():
+    from app.core.redis import redis_client
+    return getattr(redis_client, "client", None)
+
+
+def _cache_get(scope: str, actor_id: int, key: str) -> Optional[IdempotencyHit]:
+    try:
+        client = _redis()
+        if client is None:
+            return None
+        raw = client.get(_cache_key(scope, actor_id, key))
+        if not raw:
+            return None
+        data = json.loads(raw)
+        return IdempotencyHit(resource_id=int(data["r"]), fingerprint=data.get("f"))
+    except Exception as e:
+        logger.debug(f"[Idempotency] Cache read failed: {e}")
+        return None
+
+
+def _cache_set(entries: Iterable[tuple]) -> None:
+    try:
+        client = _redis()
+        if client is None:
+            return
+        pipe = client.pipeline(transaction=False)
+        for scope, actor_id, key, hit in entries:
+            pipe.set(
+                _cache_key(scope, actor_id, key),
+                json.dumps({"r": hit.resource_id, "f": hit.fingerprint}),
+                ex=CACHE_TTL_SECONDS,
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"[Idempotency] Cache write failed: {e}")
+
+
+# ============================================================================
+# Store
+# ============================================================================
+
+async def find(
+    db: AsyncSession,
+    scope: str,
+    actor_id: int,
+    key: Optional[str],
+) -> Optional[IdempotencyHit]:
+    """Look up a key (cache first, then the unique index)."""
+    if not key:
+        return None
+    hit = _cache_get(scope, actor_id, key)
+    if hit is not None:
+        return hit
+    result = await db.execute(
+        select(IdempotencyKey.resource_id, IdempotencyKey.fingerprint).where(
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.actor_id == actor_id,
+            IdempotencyKey.key == key,
+        )
+    )
+    row = result.first()
+    if row is None:
+        return None
+    hit = IdempotencyHit(resource_id=row.resource_id, fingerprint=row.fingerprint)
+    _cache_set([(scope, actor_id, key, hit)])
+    return hit
+
+
+async def find_many(
+    db: AsyncSession,
+    scope: str,
+    actor_id: int,
+    keys: Iterable[str],
+) -> Dict[str, IdempotencyHit]:
+    """Look up several keys of one actor with one query."""
+    keys = {k for k in keys if k}
+    if not keys:
+        return {}
+    result = await db.execute(
+        select(IdempotencyKey.key, IdempotencyKey.resource_id, IdempotencyKey.fingerprint).where(
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.actor_id == actor_id,
+            IdempotencyKey.key.in_(keys),
+        )
+    )
+    return {
+        row.key: IdempotencyHit(resource_id=row.resource_id, fingerprint=row.fingerprint)
+        for row in result.all()
+    }
+
+
+def remember(
+    db: AsyncSession,
+    scope: str,
+    actor_id: int,
+    key: str,
+    resource_id: int,
+    fingerprint: Optional[str] = None,
+) -> None:
+    """
+    Record a key in the caller's transaction (flushed with it, cached after commit).
+
+    A concurrent writer that got there first makes the flush/commit raise
+    IntegrityError; the caller rolls back and returns find()'s resource.
+    """
+    db.add(IdempotencyKey(
+        scope=scope, actor_id=actor_id, key=key, resource_id=resource_id, fingerprint=fingerprint,
+    ))
+    db.sync_session.info.setdefault("idempotency_pending", []).append(
+        (scope, actor_id, key, IdempotencyHit(resource_id=resource_id, fingerprint=fingerprint))
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_on_commit(session):
+    pending = session.info.pop("idempotency_pending", None)
+    if pending:
+        _cache_set(pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session, previous_transaction):
+    session.info.pop("idempotency_pending", None)
@@ -12,6 +12,7 @@ from sqlalchemy import select, update, func
 from sqlalchemy.orm import selectinload
 
 from app.db.models import Inventory, InventoryTransaction
+from app.services.inventory_snapshots import record_ledger_change
 from app.services.task_engine import emit_event
 from app.core.events import EventType
 
@@ -118,6 +119,7 @@ async def create_inventory_item(
                 notes="Initial inventory setup",
             )
             session.add(transaction)
+            await record_ledger_change(session, inventory.id, initial_stock)
         
         await session.commit()
         
@@ -184,6 +186,7 @@ async def restock_inventory(
         notes=notes or "Manual restock",
     )
     session.add(transaction)
+    await record_ledger_change(session, inventory.id, quantity)
     
     await session.commit()
     await session.refresh(inventory)
@@ -274,6 +277,7 @@ async def adjust_inventory(
         notes=notes,
     )
     session.add(transaction)
+    await record_ledger_change(session, inventory.id, adjustment)
     
     await session.commit()
     await session.refresh(inventory)
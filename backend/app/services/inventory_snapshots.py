@@ -0,0 +1,304 @@
+"""
+Inventory Snapshots Service
+
+Maintains InventoryDailySnapshot: per inventory item and UTC day, the ledger's
+net change, transaction count and closing balance (running ledger sum).
+
+Core Principles:
+- Snapshots are written in the SAME transaction as the ledger row
+  (create_inventory_item, restock_inventory, adjust_inventory, record_sale,
+  record_sales_batch, process_batch, transaction reversal) - callers own the commit
+- A day's first change seeds closing_balance from the previous snapshot;
+  later changes that day add to it, so each write is a single upsert
+- stock_as_of() reads one snapshot row plus the partial day's ledger rows
+- rebuild_snapshots() recomputes snapshots from the ledger (backfill);
+  check_snapshot_consistency() reports (and optionally repairs) drift, and
+  reports items whose Inventory.total_stock disagrees with the ledger
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, insert, select, update
+
+from app.db.models import Inventory, InventoryDailySnapshot, InventoryTransaction
+from app.services.rollups import (
+    _dialect_name, _insert_chunked, _midnight, _naive_utc, day_bucket, rollup_day,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MEASURES = ("net_change", "transaction_count", "closing_balance")
+
+
+# ============================================================================
+# Incremental Maintenance (call before the caller's commit)
+# ============================================================================
+
+def _previous_closing(inventory_item_id: int, day: date):
+    """Scalar subquery: closing balance of the item's last snapshot before day."""
+    return (
+        select(InventoryDailySnapshot.closing_balance)
+        .where(
+            InventoryDailySnapshot.inventory_item_id == inventory_item_id,
+            InventoryDailySnapshot.day < day,
+        )
+        .order_by(InventoryDailySnapshot.day.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+async def _upsert_snapshot(
+    session: AsyncSession,
+    inventory_item_id: int,
+    day: date,
+    change: int,
+    count: int,
+) -> None:
+    """Add change/count to the item's snapshot for day, seeding it from the previous day."""
+    dialect = _dialect_name(session)
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(InventoryDailySnapshot).values(
+            inventory_item_id=inventory_item_id,
+            day=day,
+            net_change=change,
+            transaction_count=count,
+            closing_balance=func.coalesce(_previous_closing(inventory_item_id, day), 0) + change,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["inventory_item_id", "day"],
+            set_={
+                "net_change": InventoryDailySnapshot.net_change + stmt.excluded.net_change,
+                "transaction_count": InventoryDailySnapshot.transaction_count + stmt.excluded.transaction_count,
+                "closing_balance": InventoryDailySnapshot.closing_balance + stmt.excluded.net_change,
+                "updated_at": func.now(),
+            },
+        )
+        await session.execute(stmt)
+        return
+
+    # Portable fallback: increment in place, insert when the day is new
+    res = await session.execute(
+        update(InventoryDailySnapshot)
+        .where(
+            InventoryDailySnapshot.inventory_item_id == inventory_item_id,
+            InventoryDailySnapshot.day == day,
+        )
+        .values(
+            net_change=InventoryDailySnapshot.net_change + change,
+            transaction_count=InventoryDailySnapshot.transaction_count + count,
+            closing_balance=InventoryDailySnapshot.closing_balance + change,
+        )
+    )
+    if res.rowcount == 0:
+        previous = (await session.execute(select(_previous_closing(inventory_item_id, day)))).scalar()
+        await session.execute(insert(InventoryDailySnapshot).values(
+            inventory_item_id=inventory_item_id,
+            day=day,
+            net_change=change,
+            transaction_count=count,
+            closing_balance=(previous or 0) + change,
+        ))
+
+
+async def record_ledger_change(
+    session: AsyncSession,
+    inventory_item_id: int,
+    change: int,
+    at: Optional[datetime] = None,
+) -> None:
+    """Add one new ledger row's change to its item's daily snapshot."""
+    await _upsert_snapshot(session, inventory_item_id, rollup_day(at), int(change), 1)
+
+
+async def record_ledger_changes(
+    session: AsyncSession,
+    changes: Iterable[Tuple[int, int]],
+    at: Optional[datetime] = None,
+) -> None:
+    """Add a batch of (inventory_item_id, change) ledger rows, one upsert per item."""
+    per_item: Dict[int, List[int]] = {}
+    for inventory_item_id, change in changes:
+        totals = per_item.setdefault(inventory_item_id, [0, 0])
+        totals[0] += int(change)
+        totals[1] += 1
+    day = rollup_day(at)
+    for inventory_item_id in sorted(per_item):  # stable lock order
+        change, count = per_item[inventory_item_id]
+        await _upsert_snapshot(session, inventory_item_id, day, change, count)
+
+
+# ============================================================================
+# Reads
+# ============================================================================
+
+async def stock_as_of(
+    session: AsyncSession,
+    inventory_item_id: int,
+    at: datetime,
+) -> int:
+    """
+    Ledger stock of an item at a point in time (ledger rows created <= at).
+
+    Closing balance of the last whole day before `at`, plus that day's raw
+    ledger rows up to `at`.
+    """
+    at = _naive_utc(at)
+    day = at.date()
+    base = (await session.execute(select(_previous_closing(inventory_item_id, day)))).scalar()
+    partial = (await session.execute(
+        select(func.coalesce(func.sum(InventoryTransaction.change), 0)).where(
+            InventoryTransaction.inventory_item_id == inventory_item_id,
+            InventoryTransaction.created_at >= _midnight(day),
+            InventoryTransaction.created_at <= at,
+        )
+    )).scalar_one()
+    return int(base or 0) + int(partial)
+
+
+# ============================================================================
+# Backfill & Consistency
+# ============================================================================
+
+async def _ledger_snapshots(
+    session: AsyncSession,
+    inventory_item_ids: Optional[Sequence[int]],
+) -> Dict[tuple, Dict[str, int]]:
+    """Snapshots as they should be, computed from the ledger."""
+    day_col = day_bucket(session, InventoryTransaction.created_at).label("day")
+    q = (
+        select(
+            InventoryTransaction.inventory_item_id, day_col,
+            func.coalesce(func.sum(InventoryTransaction.change), 0),
+            func.count(InventoryTransaction.id),
+        )
+        .where(InventoryTransaction.created_at.isnot(None))
+        .group_by(InventoryTransaction.inventory_item_id, day_col)
+        .order_by(InventoryTransaction.inventory_item_id, day_col)
+    )
+    if inventory_item_ids is not None:
+        q = q.where(InventoryTransaction.inventory_item_id.in_(inventory_item_ids))
+
+    expected: Dict[tuple, Dict[str, int]] = {}
+    current_item, running = None, 0
+    for item_id, day, change, count in (await session.execute(q)).all():
+        if item_id != current_item:
+            current_item, running = item_id, 0
+        running += int(change)
+        expected[(item_id, day)] = {
+            "net_change": int(change), "transaction_count": int(count), "closing_balance": running,
+        }
+    return expected
+
+
+async def _stored_snapshots(
+    session: AsyncSession,
+    inventory_item_ids: Optional[Sequence[int]],
+) -> Dict[tuple, Dict[str, int]]:
+    q = select(InventoryDailySnapshot)
+    if inventory_item_ids is not None:
+        q = q.where(InventoryDailySnapshot.inventory_item_id.in_(inventory_item_ids))
+    return {
+        (s.inventory_item_id, s.day): {m: int(getattr(s, m)) for m in SNAPSHOT_MEASURES}
+        for s in (await session.execute(q)).scalars().all()
+    }
+
+
+async def rebuild_snapshots(
+    session: AsyncSession,
+    inventory_item_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, int]:
+    """
+    Recompute snapshots from the ledger for the given items (default: all).
+
+    Closing balances chain across days, so an item is always rebuilt over its
+    whole history. Commits on success, rolls back on failure.
+
+    Returns: {"items": n, "rows": m}
+    """
+    try:
+        expected = await _ledger_snapshots(session, inventory_item_ids)
+
+        stmt = delete(InventoryDailySnapshot)
+        if inventory_item_ids is not None:
+            stmt = stmt.where(InventoryDailySnapshot.inventory_item_id.in_(inventory_item_ids))
+        await session.execute(stmt)
+
+        await _insert_chunked(session, InventoryDailySnapshot, [
+            {"inventory_item_id": item_id, "day": day, **values}
+            for (item_id, day), values in expected.items()
+        ])
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    items = len({item_id for item_id, _ in expected})
+    logger.info(f"[Snapshots] Rebuilt {len(expected)} snapshot row(s) for {items} item(s)")
+    return {"items": items, "rows": len(expected)}
+
+
+def _diff(expected: Dict[tuple, Any], actual: Dict[tuple, Any]) -> List[Dict[str, Any]]:
+    mismatches = [
+        {"key": key, "expected": expected.get(key), "actual": actual.get(key)}
+        for key in set(expected) | set(actual)
+        if expected.get(key) != actual.get(key)
+    ]
+    mismatches.sort(key=lambda m: tuple(str(k) for k in m["key"]))
+    return mismatches
+
+
+async def check_snapshot_consistency(
+    session: AsyncSession,
+    inventory_item_ids: Optional[Sequence[int]] = None,
+    repair: bool = False,
+    max_reported: int = 100,
+) -> Dict[str, Any]:
+    """
+    Verify snapshots against the ledger, and Inventory.total_stock against both.
+
+    With repair=True, items whose snapshots drifted are rebuilt. Stock
+    mismatches are only reported: they mean total_stock moved without a
+    ledger row (or vice versa), which needs a human-approved adjustment.
+
+    Returns a report with mismatch counts and up to max_reported examples.
+    """
+    expected = await _ledger_snapshots(session, inventory_item_ids)
+    snapshots = _diff(expected, await _stored_snapshots(session, inventory_item_ids))
+
+    # expected is ordered by (item, day), so the last entry per item is its ledger stock
+    ledger_stock = {item_id: values["closing_balance"] for (item_id, _), values in expected.items()}
+    q = select(Inventory.id, Inventory.total_stock)
+    if inventory_item_ids is not None:
+        q = q.where(Inventory.id.in_(inventory_item_ids))
+    totals = dict((await session.execute(q)).all())
+    stock = _diff(
+        {(item_id,): ledger_stock.get(item_id, 0) for item_id in totals},
+        {(item_id,): int(total or 0) for item_id, total in totals.items()},
+    )
+
+    report: Dict[str, Any] = {
+        "consistent": not snapshots and not stock,
+        "snapshot_mismatch_count": len(snapshots),
+        "stock_mismatch_count": len(stock),
+        "snapshot_mismatches": snapshots[:max_reported],
+        "stock_mismatches": stock[:max_reported],
+        "repaired": False,
+    }
+
+    if not report["consistent"]:
+        logger.warning(
+            f"[Snapshots] Consistency check found {len(snapshots)} snapshot and "
+            f"{len(stock)} stock mismatches"
+        )
+        if repair and snapshots:
+            await rebuild_snapshots(session, sorted({m["key"][0] for m in snapshots}))
+            report["repaired"] = True
+
+    return report
@@ -14,6 +14,18 @@ from app.services.identity import resolve_display_name
 
 from app.core.config import settings
 
+async def _sender_entry(notification: Notification):
+    """The sender, if already loaded, else its cached directory entry (no lazy load)."""
+    if not notification.sender_id:
+        return None
+    if "sender" in notification.__dict__:
+        return notification.sender
+    from app.db import database
+    from app.services.notification_inbox import senders
+    async with database.async_session() as db:
+        return (await senders(db, [notification.sender_id])).get(notification.sender_id)
+
+
 async def emit_notification_to_user(user_id: int, notification: Notification):
     """
     Emit a notification to a specific user via Socket.IO
@@ -24,6 +36,7 @@ async def emit_notification_to_user(user_id: int, notification: Notification):
 
     from app.realtime.socket import emit_notification
     
+    sender = await _sender_entry(notification)
     notification_data = {
         "id": notification.id,
         "type": notification.type.value if hasattr(notification.type, 'value') else notification.type,
@@ -32,8 +45,8 @@ async def emit_notification_to_user(user_id: int, notification: Notification):
         "channel_id": notification.channel_id,
         "message_id": notification.message_id,
         "sender_id": notification.sender_id,
-        "sender_username": notification.sender.username if notification.sender else None,
-        "sender_display_name": resolve_display_name(notification.sender) if notification.sender else None,
+        "sender_username": sender.username if sender else None,
+        "sender_display_name": resolve_display_name(sender) if sender else None,
         "task_id": notification.task_id,
         "order_id": notification.order_id,
         "inventory_id": notification.inventory_id,
@@ -498,6 +511,7 @@ async def notify_and_emit_order_created_to_roles(
     order_reference: Optional[str] = None,
     creator_name: Optional[str] = None,
     created_by_id: Optional[int] = None,
+    defer_emit: bool = False,
 ) -> List[Notification]:
     """
     Emit order_created notifications to users based on order type roles.
@@ -505,6 +519,11 @@ async def notify_and_emit_order_created_to_roles(
     Uses user_operational_roles to resolve recipients.
     This is called at ORDER CREATION TIME, before any tasks exist.
 
+    Args:
+        defer_emit: When True, create DB records (flush only, no commit)
+                    and skip socket emissions. Caller must commit and then
+                    call emit_deferred_notifications().
+
     NOTE: This is the authoritative order_created emitter.
     Do NOT use task assignments or participant resolution here.
     """
@@ -544,6 +563,7 @@ async def notify_and_emit_order_created_to_roles(
         title="New Order",
         content=content,
         order_id=order_id,
+        defer_emit=defer_emit,
     )
 
 
@@ -0,0 +1,313 @@
+"""
+Notification Inbox
+
+Read model behind the notification bell and inbox, so polling them doesn't
+scan the notifications table:
+- notification_inboxes holds per-user unread/total counters, adjusted in
+  the same transaction as the change: ORM inserts, deletes and is_read
+  edits are counted by the flush hooks below, bulk reads go through
+  mark_read() (UPDATE ... RETURNING); get_counts() is one primary-key read
+- list_inbox(): newest first, keyset pagination on id (before_id), served
+  by ix_notifications_user_id_id / ix_notifications_user_unread
+- senders(): sender names from the mention directory cache
+  (app/services/user_directory.py) instead of loading Notification.sender
+  per row
+- archive_read(): retention job moving read notifications older than
+  NOTIFICATION_RETENTION_DAYS to notifications_archive, in batches
+
+Bulk statements on notifications issued elsewhere bypass the counters; they
+are logged, and recount() repairs a user's counters.
+"""
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import String, cast, delete, event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes
+
+from app.core.config import settings
+from app.db.enums import NotificationType
+from app.db.models import ArchivedNotification, Notification, NotificationInbox, User
+from app.services.user_directory import DirectoryEntry, mention_directory
+
+logger = logging.getLogger(__name__)
+
+# Execution option marking bulk statements that adjust the counters themselves
+COUNTED_OPTION = "notification_inbox_counted"
+
+_DELTAS_KEY = "notification_inbox_deltas"
+
+# user_id -> (unread delta, total delta)
+Deltas = Dict[int, Tuple[int, int]]
+
+
+@dataclass(frozen=True)
+class InboxCounts:
+    unread: int
+    total: int
+
+
+# ============================================================================
+# Counters
+# ============================================================================
+
+def _counter_upsert(dialect: str, deltas: Deltas, absolute: bool = False):
+    """One upsert for all users, in user_id order so concurrent writers lock rows alike."""
+    rows = [
+        {"user_id": user_id, "unread_count": unread, "total_count": total}
+        for user_id, (unread, total) in sorted(deltas.items())
+        if absolute or unread or total
+    ]
+    if not rows:
+        return None
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        logger.warning(f"[NotificationInbox] Counters not supported on {dialect}")
+        return None
+    table = NotificationInbox.__table__
+    stmt = dialect_insert(table).values(rows)
+    if absolute:
+        values = {"unread_count": stmt.excluded.unread_count, "total_count": stmt.excluded.total_count}
+    else:
+        values = {
+            "unread_count": table.c.unread_count + stmt.excluded.unread_count,
+            "total_count": table.c.total_count + stmt.excluded.total_count,
+        }
+    return stmt.on_conflict_do_update(index_elements=["user_id"], set_={**values, "updated_at": func.now()})
+
+
+async def _apply(db: AsyncSession, deltas: Deltas) -> None:
+    stmt = _counter_upsert(db.get_bind().dialect.name, deltas)
+    if stmt is not None:
+        await db.execute(stmt)
+
+
+async def get_counts(db: AsyncSession, user_id: int) -> InboxCounts:
+    """Unread and total notifications of a user (one primary-key read)."""
+    row = (await db.execute(
+        select(NotificationInbox.unread_count, NotificationInbox.total_count)
+        .where(NotificationInbox.user_id == user_id)
+    )).first()
+    if row is None:
+        return InboxCounts(unread=0, total=0)
+    return InboxCounts(unread=max(0, row.unread_count), total=max(0, row.total_count))
+
+
+async def recount(db: AsyncSession, user_id: int) -> InboxCounts:
+    """Recompute a user's counters from the notifications table. Caller commits."""
+    row = (await db.execute(
+        select(
+            func.count(Notification.id).filter(Notification.is_read == False),  # noqa: E712
+            func.count(Notification.id),
+        ).where(Notification.user_id == user_id)
+    )).one()
+    counts = InboxCounts(unread=row[0], total=row[1])
+    await db.execute(_counter_upsert(db.get_bind().dialect.name, {user_id: (counts.unread, counts.total)}, absolute=True))
+    return counts
+
+
+async def mark_read(db: AsyncSession, user_id: int, *criteria) -> List[int]:
+    """
+    Mark the user's unread notifications matching `criteria` as read and
+    return their ids; the counters move by the same amount. Caller commits.
+    """
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False, *criteria)  # noqa: E712
+        .values(is_read=True)
+        .returning(Notification.id)
+        .execution_options(**{COUNTED_OPTION: True})
+    )
+    ids = list(result.scalars().all())
+    if ids:
+        await _apply(db, {user_id: (-len(ids), 0)})
+    return ids
+
+
+# ============================================================================
+# Inbox pages
+# ============================================================================
+
+async def list_inbox(
+    db: AsyncSession,
+    user_id: int,
+    unread_only: bool = False,
+    notification_types: Optional[List[NotificationType]] = None,
+    limit: int = 50,
+    before_id: Optional[int] = None,
+    offset: int = 0,
+) -> List[Notification]:
+    """
+    A user's notifications, newest first.
+
+    Pass the last id of a page as `before_id` for the next one; `offset` is
+    kept for older callers.
+    """
+    query = select(Notification).where(Notification.user_id == user_id)
+    if unread_only:
+        query = query.where(Notification.is_read == False)  # noqa: E712
+    if notification_types:
+        query = query.where(Notification.type.in_(notification_types))
+    if before_id is not None:
+        query = query.where(Notification.id < before_id)
+    query = query.order_by(Notification.id.desc()).limit(limit)
+    if offset:
+        query = query.offset(offset)
+    return list((await db.execute(query)).scalars().all())
+
+
+async def senders(db: AsyncSession, sender_ids: Iterable[Optional[int]]) -> Dict[int, DirectoryEntry]:
+    """Sender names by id: cached directory entries, one query for users it doesn't list."""
+    ids = {sender_id for sender_id in sender_ids if sender_id}
+    if not ids:
+        return {}
+    found = await mention_directory.lookup(db, ids)
+    missing = ids - found.keys()
+    if missing:
+        rows = await db.execute(
+            select(User.id, User.username, User.display_name, User.avatar_url).where(User.id.in_(missing))
+        )
+        found.update({row[0]: DirectoryEntry(*row) for row in rows.all()})
+    return found
+
+
+# ============================================================================
+# Retention
+# ============================================================================
+
+_ARCHIVED_COLUMNS = [c.name for c in ArchivedNotification.__table__.columns if c.name != "archived_at"]
+
+
+async def archive_read(
+    db: AsyncSession,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Move read notifications older than the retention period to
+    notifications_archive, committing each batch. Returns how many moved.
+    """
+    days = settings.NOTIFICATION_RETENTION_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    source = Notification.__table__
+    moved = 0
+    while True:
+        ids = list((await db.execute(
+            select(source.c.id)
+            .where(source.c.is_read == True, source.c.created_at < cutoff)  # noqa: E712
+            .order_by(source.c.id)
+            .limit(batch_size)
+        )).scalars().all())
+        if not ids:
+            break
+        await db.execute(
+            insert(ArchivedNotification.__table__).from_select(
+                _ARCHIVED_COLUMNS,
+                select(*[
+                    cast(source.c.type, String(50)) if name == "type" else source.c[name]
+                    for name in _ARCHIVED_COLUMNS
+                ]).where(source.c.id.in_(ids)),
+            )
+        )
+        owners = (await db.execute(
+            delete(source)
+            .where(source.c.id.in_(ids))
+            .returning(source.c.user_id)
+            .execution_options(**{COUNTED_OPTION: True})
+        )).scalars().all()
+        await _apply(db, {user_id: (0, -count) for user_id, count in Counter(owners).items()})
+        await db.commit()
+        moved += len(owners)
+        if len(ids) < batch_size:
+            break
+    if moved:
+        logger.info(f"[NotificationInbox] Archived {moved} read notifications older than {days} days")
+    return moved
+
+
+# ============================================================================
+# Counting ORM changes
+# ============================================================================
+
+def _is_unread(value: Optional[bool]) -> int:
+    return 0 if value else 1
+
+
+def _read_change(session: Session, obj: Notification) -> Optional[Tuple[bool, bool]]:
+    """(was_read, is_read) if a flush changes obj.is_read, else None."""
+    history = attributes.get_history(obj, "is_read")
+    if not history.added:
+        return None
+    now = bool(history.added[0])
+    if history.deleted:
+        was = bool(history.deleted[0])
+    else:
+        # Set without loading the old value first (e.g. after expiry)
+        table = Notification.__table__
+        was = bool(session.connection().execute(
+            select(table.c.is_read).where(table.c.id == obj.id)
+        ).scalar())
+    return (was, now) if was != now else None
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_deltas(session, flush_context, instances):
+    deltas: Dict[int, List[int]] = {}
+
+    def add(user_id, unread, total):
+        entry = deltas.setdefault(user_id, [0, 0])
+        entry[0] += unread
+        entry[1] += total
+
+    for obj in session.new:
+        if isinstance(obj, Notification) and obj.user_id is not None:
+            add(obj.user_id, _is_unread(obj.is_read), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Notification):
+            add(obj.user_id, -_is_unread(obj.is_read), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            change = _read_change(session, obj)
+            if change is not None:
+                add(obj.user_id, -1 if change[1] else 1, 0)
+
+    if deltas:
+        session.info[_DELTAS_KEY] = {user_id: (unread, total) for user_id, (unread, total) in deltas.items()}
+    else:
+        session.info.pop(_DELTAS_KEY, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_deltas(session, flush_context):
+    # Rows are written by now (a new user's first notification needs its user row)
+    deltas = session.info.pop(_DELTAS_KEY, None)
+    if not deltas:
+        return
+    connection = session.connection()
+    stmt = _counter_upsert(connection.dialect.name, deltas)
+    if stmt is not None:
+        connection.execute(stmt)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_deltas(session, previous_transaction):
+    session.info.pop(_DELTAS_KEY, None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _warn_on_uncounted_statement(orm_execute_state):
+    if orm_execute_state.is_select or orm_execute_state.execution_options.get(COUNTED_OPTION):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) == "notifications":
+        logger.warning(
+            "[NotificationInbox] Bulk statement on notifications bypasses the inbox counters; "
+            "use notification_inbox.mark_read() or recount()"
+        )
@@ -5,12 +5,13 @@ Handles notification creation, delivery via Socket.IO, and management
 import json
 from typing import Optional, List, Dict, Any, Set
 from datetime import datetime
-from sqlalchemy import select, update, func, and_
+from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.db.models import Notification, User, AutomationTask, TaskAssignment
 from app.db.enums import NotificationType
+from app.services import notification_inbox
 
 
 # ============================================================
@@ -76,7 +77,7 @@ async def get_order_role_user_ids_by_type(db: AsyncSession, order_type: str) ->
         Tuple of (user_ids, roles) for debugging purposes
     """
     from app.constants.order_roles import ORDER_TYPE_ROLES
-    from app.db.models import UserOperationalRole
+    from app.services.role_directory import role_directory
     
     # Normalize order_type to lowercase
     order_type_val = order_type.lower() if order_type else order_type
@@ -85,19 +86,8 @@ async def get_order_role_user_ids_by_type(db: AsyncSession, order_type: str) ->
     if not roles:
         return [], roles  # Return empty list and roles for debugging
     
-    # Join users ← user_operational_roles, match roles
-    result = await db.execute(
-        select(User.id)
-        .join(UserOperationalRole, User.id == UserOperationalRole.user_id)
-        .where(
-            and_(
-                UserOperationalRole.role.in_(roles),
-                User.is_active == True,
-            )
-        )
-        .distinct()
-    )
-    user_ids = [row[0] for row in result.fetchall()]
+    # Active users holding any of the roles, from the role directory (no per-order join)
+    user_ids = await role_directory.users_for_roles(db, roles)
     return user_ids, roles  # Return both for debugging
 
 
@@ -166,21 +156,18 @@ class NotificationService:
         notification_types: Optional[List[NotificationType]] = None,
         limit: int = 50,
         offset: int = 0,
+        before_id: Optional[int] = None,
     ) -> List[Notification]:
-        """List notifications for a user with filters"""
-        query = select(Notification).where(Notification.user_id == user_id)
-        
-        if unread_only:
-            query = query.where(Notification.is_read == False)
-        
-        if notification_types:
-            query = query.where(Notification.type.in_(notification_types))
-        
-        query = query.order_by(Notification.created_at.desc())
-        query = query.offset(offset).limit(limit)
-        
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+        """List notifications for a user with filters (newest first; page with before_id)"""
+        return await notification_inbox.list_inbox(
+            self.db,
+            user_id,
+            unread_only=unread_only,
+            notification_types=notification_types,
+            limit=limit,
+            before_id=before_id,
+            offset=offset,
+        )
     
     async def get_unread_count(
         self,
@@ -188,33 +175,32 @@ class NotificationService:
         notification_types: Optional[List[NotificationType]] = None,
     ) -> int:
         """Get count of unread notifications"""
+        if not notification_types:
+            # Inbox counter (no scan of the notifications table)
+            return (await notification_inbox.get_counts(self.db, user_id)).unread
+        
         query = select(func.count(Notification.id)).where(
             and_(
                 Notification.user_id == user_id,
                 Notification.is_read == False,
+                Notification.type.in_(notification_types),
             )
         )
-        
-        if notification_types:
-            query = query.where(Notification.type.in_(notification_types))
-        
         result = await self.db.execute(query)
         return result.scalar() or 0
     
     async def mark_as_read(self, notification_id: int, user_id: int) -> bool:
-        """Mark a notification as read"""
-        result = await self.db.execute(
-            update(Notification)
-            .where(
-                and_(
-                    Notification.id == notification_id,
-                    Notification.user_id == user_id,
-                )
+        """Mark a notification as read; True if it is the user's (read already or not)"""
+        ids = await notification_inbox.mark_read(self.db, user_id, Notification.id == notification_id)
+        await self.db.commit()
+        if ids:
+            return True
+        existing = await self.db.scalar(
+            select(Notification.id).where(
+                and_(Notification.id == notification_id, Notification.user_id == user_id)
             )
-            .values(is_read=True)
         )
-        await self.db.commit()
-        return result.rowcount > 0
+        return existing is not None
     
     async def mark_all_as_read(
         self,
@@ -222,23 +208,10 @@ class NotificationService:
         notification_types: Optional[List[NotificationType]] = None,
     ) -> int:
         """Mark all notifications as read for a user"""
-        query = (
-            update(Notification)
-            .where(
-                and_(
-                    Notification.user_id == user_id,
-                    Notification.is_read == False,
-                )
-            )
-            .values(is_read=True)
-        )
-        
-        if notification_types:
-            query = query.where(Notification.type.in_(notification_types))
-        
-        result = await self.db.execute(query)
+        criteria = [Notification.type.in_(notification_types)] if notification_types else []
+        ids = await notification_inbox.mark_read(self.db, user_id, *criteria)
         await self.db.commit()
-        return result.rowcount
+        return len(ids)
     
     async def delete_notification(self, notification_id: int, user_id: int) -> bool:
         """Delete a notification"""
@@ -298,6 +271,55 @@ async def notify_task_opened(
     return await notify_users(db, recipients, NotificationType.task_opened, title=title, content=content, task_id=task_id)
 
 
+async def get_user_ids_by_role(db: AsyncSession, roles: List[str]) -> Dict[str, List[int]]:
+    """Active users for several global roles, resolved in one query."""
+    from app.db.enums import UserRole
+    valid_roles = [r for r in dict.fromkeys(roles) if r in UserRole._value2member_map_]
+    by_role: Dict[str, List[int]] = {r: [] for r in roles}
+    if not valid_roles:
+        return by_role
+    result = await db.execute(
+        select(User.id, User.role).where(User.role.in_(valid_roles), User.is_active == True)
+    )
+    for user_id, role in result.all():
+        by_role[role.value if hasattr(role, 'value') else role].append(user_id)
+    return by_role
+
+
+async def notify_tasks_opened(db: AsyncSession, tasks: List[AutomationTask]) -> List[Notification]:
+    """
+    Batched notify_task_opened for tasks created together (e.g. an order's role tasks).
+
+    Role members and admins are resolved once for all tasks, and the
+    notifications are flushed in one go; the caller commits.
+    """
+    tasks = [t for t in tasks if t.required_role]
+    if not tasks:
+        return []
+
+    role_user_ids = await get_user_ids_by_role(db, [t.required_role for t in tasks])
+    admin_ids = await get_admins_and_managers(db)
+
+    notifications = []
+    for task in tasks:
+        recipients = dict.fromkeys(
+            uid for uid in role_user_ids.get(task.required_role, []) + admin_ids if uid is not None
+        )
+        for user_id in recipients:
+            notifications.append(Notification(
+                user_id=user_id,
+                type=NotificationType.task_opened,
+                title="Task Available",
+                content=f"Task '{task.title}' is available for role: {task.required_role}",
+                task_id=task.id,
+                is_read=False,
+            ))
+    if notifications:
+        db.add_all(notifications)
+        await db.flush()
+    return notifications
+
+
 async def notify_task_claimed(
     db: AsyncSession,
     task_id: int,
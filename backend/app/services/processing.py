@@ -3,7 +3,7 @@ Processing Service Layer (Agriculture Phase)
 
 Handles manufacturing/processing operations:
 - Converting raw materials into finished goods
-- Recipe validation
+- Recipe validation (recipes served from the cached recipe graph)
 - Atomic inventory transactions
 - Production analytics
 
@@ -13,13 +13,15 @@ Core Principles:
 - Audit trail via transactions
 - No negative stock allowed
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
+import json
 import logging
 import uuid
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
+from sqlalchemy import case, insert, select, update, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
 from app.db.models import (
@@ -27,9 +29,15 @@ from app.db.models import (
     InventoryTransaction, RawMaterialTransaction
 )
 from app.db.enums import ProductType
+from app.services.rollups import aggregate_production, record_batch_rollup, record_batches_rollup
+from app.services.inventory_snapshots import record_ledger_change, record_ledger_changes
+from app.services.recipe_graph import CompiledGraph, recipe_graph
 
 logger = logging.getLogger(__name__)
 
+# Largest production schedule accepted by plan_production/process_batches
+MAX_BATCHES_PER_PLAN = 200
+
 
 # ============================================================================
 # Custom Exceptions
@@ -48,9 +56,13 @@ class RecipeNotFoundError(ProcessingError):
     http_code = 404
 
 class InsufficientRawMaterialError(ProcessingError):
-    """Not enough raw material stock (409)."""
+    """Not enough raw material stock (409). `plan` is set for multi-batch runs."""
     http_code = 409
 
+    def __init__(self, message: str, plan: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.plan = plan
+
 class ProductNotFoundError(ProcessingError):
     """Product not found (404)."""
     http_code = 404
@@ -188,6 +200,29 @@ async def update_recipe(
 # Processing Operations (Core Transaction)
 # ============================================================================
 
+async def _current_stock(session: AsyncSession, raw_material_ids) -> Dict[int, int]:
+    """Live stock of the given raw materials (one query; never cached)."""
+    if not raw_material_ids:
+        return {}
+    result = await session.execute(
+        select(RawMaterial.id, RawMaterial.current_stock).where(RawMaterial.id.in_(raw_material_ids))
+    )
+    return {rm_id: stock or 0 for rm_id, stock in result.all()}
+
+
+async def _require_recipes(session: AsyncSession, graph: CompiledGraph, product_ids) -> None:
+    """Raise ProductNotFoundError / RecipeNotFoundError for products missing from the graph."""
+    without = sorted(set(product_ids) - graph.products.keys())
+    if not without:
+        return
+    result = await session.execute(select(Inventory.id).where(Inventory.id.in_(without)))
+    existing = set(result.scalars().all())
+    for product_id in without:
+        if product_id not in existing:
+            raise ProductNotFoundError(f"Finished product {product_id} not found")
+    raise RecipeNotFoundError(f"No active recipes found for product {without[0]}")
+
+
 async def calculate_raw_material_requirements(
     session: AsyncSession,
     finished_product_id: int,
@@ -198,29 +233,25 @@ async def calculate_raw_material_requirements(
     
     Returns list of: {raw_material_id, name, required, available, sufficient, unit}
     """
-    recipes = await get_recipes_for_product(session, finished_product_id)
-    if not recipes:
+    graph = await recipe_graph.get(session)
+    product = graph.products.get(finished_product_id)
+    if product is None:
         raise RecipeNotFoundError(f"No active recipes found for product {finished_product_id}")
     
+    stock = await _current_stock(session, graph.material_ids([finished_product_id]))
     requirements = []
-    for recipe in recipes:
-        # Calculate required amount including waste
-        base_required = recipe.quantity_required * quantity_to_produce
-        waste_factor = 1 + (recipe.waste_percentage or 0) / 100
-        total_required = int(base_required * waste_factor)
-        
-        # Get current stock
-        rm = recipe.raw_material
-        available = rm.current_stock if rm else 0
+    for recipe in product.inputs:
+        total_required = recipe.required_for(quantity_to_produce)
+        available = stock.get(recipe.raw_material_id, 0)
         
         requirements.append({
             "raw_material_id": recipe.raw_material_id,
-            "name": rm.name if rm else f"Material #{recipe.raw_material_id}",
+            "name": graph.material_name(recipe.raw_material_id),
             "required": total_required,
             "available": available,
             "sufficient": available >= total_required,
             "unit": recipe.unit,
-            "recipe_id": recipe.id,
+            "recipe_id": recipe.recipe_id,
         })
     
     return requirements
@@ -256,8 +287,6 @@ async def process_batch(
     
     Returns: ProcessingBatch with all related transactions
     """
-    import json
-    
     batch = None
     
     try:
@@ -277,9 +306,9 @@ async def process_batch(
         if not finished_product:
             raise ProductNotFoundError(f"Finished product {finished_product_id} not found")
         
-        # Get and validate recipes
-        recipes = await get_recipes_for_product(session, finished_product_id)
-        if not recipes:
+        # Validate recipes (confirm the cached graph before moving stock)
+        graph = await recipe_graph.get(session, verify=True)
+        if finished_product_id not in graph.products:
             raise RecipeNotFoundError(f"No active recipes found for product {finished_product_id}")
         
         # Calculate requirements and check stock
@@ -322,7 +351,8 @@ async def process_batch(
         if not batch_reference:
             batch_reference = f"BATCH-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
         
-        # Create batch record first
+        # Create batch record first (created_at set explicitly so the rollup day matches)
+        now = datetime.utcnow()
         batch = ProcessingBatch(
             batch_reference=batch_reference,
             finished_product_id=finished_product_id,
@@ -335,7 +365,8 @@ async def process_batch(
             status="completed",
             notes=notes,
             processed_by_id=processed_by_id,
-            completed_at=datetime.utcnow(),
+            created_at=now,
+            completed_at=now,
         )
         session.add(batch)
         await session.flush()  # Get batch ID
@@ -388,6 +419,10 @@ async def process_batch(
         )
         session.add(inv_tx)
         
+        # Daily production rollup and ledger snapshot (same transaction)
+        await record_batch_rollup(session, batch)
+        await record_ledger_change(session, finished_product.id, quantity_to_produce)
+        
         # ===== COMMIT =====
         await session.commit()
         await session.refresh(batch)
@@ -408,6 +443,315 @@ async def process_batch(
         raise ValidationError(f"Processing failed: {str(e)}")
 
 
+# ============================================================================
+# Multi-Batch Production (a day's schedule in one transaction)
+# ============================================================================
+
+def _parse_batch_items(batches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Validate POST /batches-shaped items; raises ValidationError naming the item."""
+    if not batches:
+        raise ValidationError("At least one batch is required")
+    if len(batches) > MAX_BATCHES_PER_PLAN:
+        raise ValidationError(f"At most {MAX_BATCHES_PER_PLAN} batches per plan")
+
+    items = []
+    references = set()
+    for index, batch in enumerate(batches):
+        try:
+            finished_product_id = int(batch["finished_product_id"])
+            quantity = int(batch["quantity_to_produce"])
+            waste = int(batch.get("actual_waste_quantity") or 0)
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(f"Batch {index}: finished_product_id and quantity_to_produce are required")
+        if quantity <= 0:
+            raise ValidationError(f"Batch {index}: quantity_to_produce must be positive")
+        if waste < 0:
+            raise ValidationError(f"Batch {index}: actual_waste_quantity cannot be negative")
+        reference = batch.get("batch_reference")
+        if reference:
+            if reference in references:
+                raise ValidationError(f"Batch {index}: batch_reference '{reference}' is used twice")
+            references.add(reference)
+        items.append({
+            "finished_product_id": finished_product_id,
+            "quantity_to_produce": quantity,
+            "actual_waste_quantity": waste,
+            "batch_reference": reference,
+            "notes": batch.get("notes"),
+            "waste_notes": batch.get("waste_notes"),
+        })
+    return items
+
+
+async def _build_plan(
+    session: AsyncSession,
+    items: List[Dict[str, Any]],
+    verify: bool = False,
+    stock_overrides: Optional[Dict[int, int]] = None,
+) -> Dict[str, Any]:
+    product_ids = {item["finished_product_id"] for item in items}
+    graph = await recipe_graph.get(session, verify=verify)
+    await _require_recipes(session, graph, product_ids)
+
+    # Stock of the materials involved: one query (what-if overrides on top)
+    stock = await _current_stock(session, graph.material_ids(product_ids))
+    stock.update(stock_overrides or {})
+    materials: Dict[int, Dict[str, Any]] = {}
+    for rm_id in sorted(graph.material_ids(product_ids)):
+        name, unit = graph.materials[rm_id]
+        materials[rm_id] = {
+            "raw_material_id": rm_id,
+            "name": name,
+            "unit": unit,
+            "required": 0,
+            "available": stock.get(rm_id, 0),
+        }
+
+    # Allocate stock in input order so each batch says whether it still fits
+    remaining = {rm_id: m["available"] for rm_id, m in materials.items()}
+    planned = []
+    for index, item in enumerate(items):
+        product = graph.products[item["finished_product_id"]]
+        requirements = []
+        for recipe in product.inputs:
+            required = recipe.required_for(item["quantity_to_produce"])
+            materials[recipe.raw_material_id]["required"] += required
+            requirements.append({
+                "raw_material_id": recipe.raw_material_id,
+                "name": materials[recipe.raw_material_id]["name"],
+                "required": required,
+                "unit": recipe.unit,
+                "recipe_id": recipe.recipe_id,
+            })
+        can_process = all(remaining[r["raw_material_id"]] >= r["required"] for r in requirements)
+        if can_process:
+            for r in requirements:
+                remaining[r["raw_material_id"]] -= r["required"]
+        planned.append({
+            "index": index,
+            "finished_product_id": item["finished_product_id"],
+            "product_name": product.product_name,
+            "quantity_to_produce": item["quantity_to_produce"],
+            "requirements": requirements,
+            "can_process": can_process,
+        })
+
+    material_list = []
+    for m in sorted(materials.values(), key=lambda m: m["raw_material_id"]):
+        shortfall = max(0, m["required"] - m["available"])
+        material_list.append({**m, "shortfall": shortfall, "sufficient": shortfall == 0})
+
+    return {
+        "feasible": all(m["sufficient"] for m in material_list),
+        "batches": planned,
+        "materials": material_list,
+    }
+
+
+async def plan_production(
+    session: AsyncSession,
+    batches: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Combined raw material requirements for a production schedule.
+    Does NOT execute.
+
+    Items are shaped like the POST /batches payload and may mix products.
+    Recipes come from the cached recipe graph and stock of the materials
+    involved is read with one query; requirements are summed per raw
+    material across batches.
+    Stock is allocated in input order, so each batch's can_process says
+    whether it still fits after the batches before it.
+
+    Returns: {feasible, batches: [...], materials: [{raw_material_id, name,
+    unit, required, available, shortfall, sufficient}]}
+    Raises: ValidationError, ProductNotFoundError, RecipeNotFoundError
+    """
+    return await _build_plan(session, _parse_batch_items(batches))
+
+
+async def production_calculator(
+    session: AsyncSession,
+    plan: Optional[List[Dict[str, Any]]] = None,
+    stock_overrides: Optional[Dict[int, int]] = None,
+) -> Dict[str, Any]:
+    """
+    What-if production calculator for planning UIs. Does NOT execute.
+
+    Answers, for every product with active recipes in one call:
+    - capacity: how many units current stock (plus `stock_overrides`,
+      raw_material_id -> hypothetical stock) allows, and the limiting material
+    - plan (if given, POST /batches-shaped items): what the schedule needs,
+      as in plan_production, against the same stock
+
+    Served from the cached recipe graph plus one stock query.
+    Raises: ValidationError, ProductNotFoundError, RecipeNotFoundError
+    """
+    graph = await recipe_graph.get(session)
+    overrides = {int(rm_id): int(qty) for rm_id, qty in (stock_overrides or {}).items()}
+    if any(qty < 0 for qty in overrides.values()):
+        raise ValidationError("stock overrides cannot be negative")
+    stock = await _current_stock(session, graph.material_ids())
+    stock.update(overrides)
+
+    return {
+        "capacity": graph.capacity(stock),
+        "plan": (
+            await _build_plan(session, _parse_batch_items(plan), stock_overrides=overrides)
+            if plan else None
+        ),
+        "stock": [
+            {
+                "raw_material_id": rm_id,
+                "name": name,
+                "unit": unit,
+                "available": stock.get(rm_id, 0),
+                "overridden": rm_id in overrides,
+            }
+            for rm_id, (name, unit) in sorted(graph.materials.items())
+        ],
+    }
+
+
+async def process_batches(
+    session: AsyncSession,
+    batches: List[Dict[str, Any]],
+    processed_by_id: int,
+) -> List[ProcessingBatch]:
+    """
+    Execute a whole production schedule - many batches, one transaction.
+
+    ATOMIC (all or nothing):
+    1. Plan combined requirements (plan_production)
+    2. One guarded multi-row raw material UPDATE (no material may go negative)
+    3. One finished goods UPDATE (quantities summed per product)
+    4. Bulk ProcessingBatch, RawMaterialTransaction and InventoryTransaction inserts
+    5. One rollup / ledger snapshot upsert per bucket, one commit
+
+    If stock is short nothing is written and InsufficientRawMaterialError
+    carries the plan (which batches fit, shortfall per material). Losing
+    a stock race to a concurrent writer rolls back the whole schedule.
+
+    Returns: the created ProcessingBatch rows, in input order
+    """
+    try:
+        items = _parse_batch_items(batches)
+        plan = await _build_plan(session, items, verify=True)
+        if not plan["feasible"]:
+            details = ", ".join(
+                f"{m['name']}: need {m['required']} {m['unit']}, have {m['available']}"
+                for m in plan["materials"] if not m["sufficient"]
+            )
+            raise InsufficientRawMaterialError(f"Insufficient raw materials: {details}", plan=plan)
+
+        # ===== ATOMIC WRITE PHASE =====
+        now = datetime.utcnow()
+        batch_rows = []
+        for item, entry in zip(items, plan["batches"]):
+            quantity = item["quantity_to_produce"]
+            reference = item["batch_reference"] or f"BATCH-{now.strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
+            batch_rows.append({
+                "batch_reference": reference,
+                "finished_product_id": item["finished_product_id"],
+                "quantity_produced": quantity,
+                "expected_quantity": quantity,
+                "actual_waste_quantity": item["actual_waste_quantity"],
+                "waste_notes": item["waste_notes"],
+                "raw_materials_used": json.dumps([
+                    {
+                        "raw_material_id": r["raw_material_id"],
+                        "name": r["name"],
+                        "quantity_used": r["required"],
+                        "unit": r["unit"],
+                    }
+                    for r in entry["requirements"]
+                ]),
+                "yield_efficiency": 100,
+                "status": "completed",
+                "notes": item["notes"],
+                "processed_by_id": processed_by_id,
+                "created_at": now,
+                "completed_at": now,
+            })
+        res = await session.scalars(
+            insert(ProcessingBatch).returning(ProcessingBatch, sort_by_parameter_order=True), batch_rows
+        )
+        created = list(res.all())
+
+        # One guarded UPDATE for every raw material
+        used = {m["raw_material_id"]: m["required"] for m in plan["materials"] if m["required"] > 0}
+        delta = case(used, value=RawMaterial.id, else_=0)
+        res_upd = await session.execute(
+            update(RawMaterial)
+            .where(RawMaterial.id.in_(used))
+            .where(RawMaterial.current_stock >= delta)
+            .values(current_stock=RawMaterial.current_stock - delta)
+            .execution_options(synchronize_session=False)
+        )
+        if res_upd.rowcount != len(used):
+            raise InsufficientRawMaterialError(
+                "Race condition: raw material stock dropped below the planned amount - please retry"
+            )
+
+        produced: Dict[int, int] = {}
+        for item in items:
+            produced[item["finished_product_id"]] = produced.get(item["finished_product_id"], 0) + item["quantity_to_produce"]
+        added = case(produced, value=Inventory.id, else_=0)
+        await session.execute(
+            update(Inventory)
+            .where(Inventory.id.in_(produced))
+            .values(total_stock=Inventory.total_stock + added, version=Inventory.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+        await session.execute(insert(RawMaterialTransaction), [
+            {
+                "raw_material_id": r["raw_material_id"],
+                "change": -r["required"],
+                "reason": "processing_out",
+                "notes": f"Batch {batch.batch_reference}: producing {batch.quantity_produced} units of {entry['product_name']}",
+                "performed_by_id": processed_by_id,
+                "related_batch_id": batch.id,
+            }
+            for batch, entry in zip(created, plan["batches"])
+            for r in entry["requirements"]
+        ])
+        await session.execute(insert(InventoryTransaction), [
+            {
+                "inventory_item_id": batch.finished_product_id,
+                "change": batch.quantity_produced,
+                "reason": "processing_in",
+                "related_batch_id": batch.id,
+                "performed_by_id": processed_by_id,
+                "notes": f"Batch {batch.batch_reference}: produced from raw materials",
+            }
+            for batch in created
+        ])
+
+        await record_batches_rollup(session, created)
+        await record_ledger_changes(session, [(b.finished_product_id, b.quantity_produced) for b in created])
+
+        # ===== COMMIT =====
+        await session.commit()
+
+        logger.info(
+            f"[Processing] {len(created)} batches completed for {len(produced)} products "
+            f"by user {processed_by_id}"
+        )
+        return created
+
+    except ProcessingError:
+        await session.rollback()
+        raise
+    except IntegrityError:
+        await session.rollback()
+        raise ValidationError("Processing failed: a batch_reference is already in use")
+    except Exception as e:
+        await session.rollback()
+        logger.exception(f"[Processing] Unexpected error during multi-batch processing: {e}")
+        raise ValidationError(f"Processing failed: {str(e)}")
+
+
 async def get_batch(
     session: AsyncSession,
     batch_id: int
@@ -599,6 +943,8 @@ async def get_production_report(
 ) -> Dict[str, Any]:
     """
     Comprehensive production report with yield and waste analysis.
+
+    Served from the daily production rollups; end_date is inclusive.
     
     Returns:
     - Summary: total batches, total produced, total waste
@@ -606,71 +952,51 @@ async def get_production_report(
     - Yield efficiency: average efficiency across batches
     - Waste analysis: total waste by product
     """
-    import json
+    # Rollup reads are half-open; keep end_date inclusive as before
+    end_exclusive = end_date + timedelta(microseconds=1) if end_date else None
+    by_product = await aggregate_production(
+        session, start_date, end_exclusive,
+        group_by=("finished_product_id",), finished_product_id=finished_product_id,
+    )
     
-    # Base query for batches
-    query = select(ProcessingBatch).where(ProcessingBatch.status == "completed")
+    names = {}
+    if by_product:
+        name_q = select(Inventory.id, Inventory.product_name).where(
+            Inventory.id.in_([pid for (pid,) in by_product])
+        )
+        names = dict((await session.execute(name_q)).all())
     
-    if start_date:
-        query = query.where(ProcessingBatch.created_at >= start_date)
-    if end_date:
-        query = query.where(ProcessingBatch.created_at <= end_date)
-    if finished_product_id:
-        query = query.where(ProcessingBatch.finished_product_id == finished_product_id)
+    def _avg_yield(totals: Dict[str, int]) -> Optional[int]:
+        if not totals["yield_count"]:
+            return None
+        return int(totals["yield_sum"] / totals["yield_count"])
     
-    result = await session.execute(
-        query.options(selectinload(ProcessingBatch.finished_product))
-    )
-    batches = list(result.scalars().all())
-    
-    # Calculate aggregates
-    total_batches = len(batches)
-    total_produced = sum(b.quantity_produced for b in batches)
-    total_expected = sum(b.expected_quantity or b.quantity_produced for b in batches)
-    total_waste = sum(b.actual_waste_quantity or 0 for b in batches)
-    
-    # Calculate overall yield efficiency
-    avg_yield_efficiency = None
-    batches_with_yield = [b for b in batches if b.yield_efficiency is not None]
-    if batches_with_yield:
-        avg_yield_efficiency = int(sum(b.yield_efficiency for b in batches_with_yield) / len(batches_with_yield))
-    
-    # Breakdown by product
-    product_breakdown = {}
-    for batch in batches:
-        pid = batch.finished_product_id
-        if pid not in product_breakdown:
-            product_breakdown[pid] = {
-                "finished_product_id": pid,
-                "product_name": batch.finished_product.product_name if batch.finished_product else f"Product #{pid}",
-                "batch_count": 0,
-                "total_produced": 0,
-                "total_expected": 0,
-                "total_waste": 0,
-                "yield_efficiencies": [],
-            }
-        
-        product_breakdown[pid]["batch_count"] += 1
-        product_breakdown[pid]["total_produced"] += batch.quantity_produced
-        product_breakdown[pid]["total_expected"] += batch.expected_quantity or batch.quantity_produced
-        product_breakdown[pid]["total_waste"] += batch.actual_waste_quantity or 0
-        if batch.yield_efficiency is not None:
-            product_breakdown[pid]["yield_efficiencies"].append(batch.yield_efficiency)
-    
-    # Calculate average yield efficiency per product
-    for pid, data in product_breakdown.items():
-        efficiencies = data.pop("yield_efficiencies")
-        data["avg_yield_efficiency"] = int(sum(efficiencies) / len(efficiencies)) if efficiencies else None
+    product_breakdown = [
+        {
+            "finished_product_id": pid,
+            "product_name": names.get(pid) or f"Product #{pid}",
+            "batch_count": totals["batch_count"],
+            "total_produced": totals["total_produced"],
+            "total_expected": totals["total_expected"],
+            "total_waste": totals["total_waste"],
+            "avg_yield_efficiency": _avg_yield(totals),
+        }
+        for (pid,), totals in by_product.items()
+    ]
+    
+    overall = {m: sum(t[m] for t in by_product.values()) for m in (
+        "batch_count", "total_produced", "total_expected", "total_waste", "yield_sum", "yield_count",
+    )}
     
     return {
         "summary": {
-            "total_batches": total_batches,
-            "total_produced": total_produced,
-            "total_expected": total_expected,
-            "total_waste": total_waste,
-            "avg_yield_efficiency": avg_yield_efficiency,
+            "total_batches": overall["batch_count"],
+            "total_produced": overall["total_produced"],
+            "total_expected": overall["total_expected"],
+            "total_waste": overall["total_waste"],
+            "avg_yield_efficiency": _avg_yield(overall),
         },
-        "by_product": list(product_breakdown.values()),
+        "by_product": product_breakdown,
         "period": {
             "start_date": start_date.isoformat() if start_date else None,
             "end_date": end_date.isoformat() if end_date else None,
@@ -682,17 +1008,23 @@ async def get_waste_report(
     session: AsyncSession,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    entry_limit: int = 100,
 ) -> Dict[str, Any]:
     """
     Waste analysis report.
     
-    Returns waste totals and breakdown by batch with notes.
+    Totals come from the daily production rollups; the breakdown lists the
+    most recent `entry_limit` batches with waste, with notes.
     """
+    end_exclusive = end_date + timedelta(microseconds=1) if end_date else None
+    totals = (await aggregate_production(session, start_date, end_exclusive)).get((), {})
+    
     query = (
         select(ProcessingBatch)
         .where(ProcessingBatch.status == "completed")
         .where(ProcessingBatch.actual_waste_quantity > 0)
         .order_by(ProcessingBatch.created_at.desc())
+        .limit(entry_limit)
     )
     
     if start_date:
@@ -705,8 +1037,6 @@ async def get_waste_report(
     )
     batches_with_waste = list(result.scalars().all())
     
-    total_waste = sum(b.actual_waste_quantity or 0 for b in batches_with_waste)
-    
     waste_entries = [
         {
             "batch_id": b.id,
@@ -722,7 +1052,7 @@ async def get_waste_report(
     ]
     
     return {
-        "total_waste": total_waste,
-        "batches_with_waste": len(batches_with_waste),
+        "total_waste": totals.get("total_waste", 0),
+        "batches_with_waste": totals.get("waste_batch_count", 0),
         "waste_entries": waste_entries,
     }
@@ -0,0 +1,284 @@
+"""
+Recipe Graph
+
+In-memory view of every active recipe - finished product -> raw materials
+with per-unit ratio and expected waste - so production calculations stop
+reloading ProcessingRecipe + RawMaterial rows on every request:
+- get(): the compiled graph, loaded with one query and reused until a
+  commit touches processing_recipes (create_recipe, update_recipe, bulk
+  statements), a raw material's name/unit or a product's name;
+  invalidations are published on the "cache:recipe_graph" Redis channel
+  (app/core/cache_invalidation.py)
+- get(verify=True) also compares one aggregate probe of the recipes table
+  with the graph's stamp and reloads on mismatch; stock-moving writes use
+  it so a recipe edited on another pod is never applied with its old ratio
+- Stock is never cached: calculators take current stock as input
+- CompiledGraph.capacity(): how many of each product the given stock
+  allows and which material limits it, for every product in one pass
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import cache_invalidation
+from app.db.models import Inventory, ProcessingRecipe, RawMaterial
+
+logger = logging.getLogger(__name__)
+
+# Cache invalidation channel (Redis: "cache:recipe_graph")
+INVALIDATION_CHANNEL = "recipe_graph"
+
+# Reload at least this often even without invalidations
+MAX_AGE_SECONDS = 300
+
+# Columns that show up in the graph (labels); other changes, e.g. stock, don't matter
+_WATCHED_ATTRS = {
+    RawMaterial: ("name", "unit"),
+    Inventory: ("product_name",),
+}
+_WATCHED_TABLES = {
+    "raw_materials": _WATCHED_ATTRS[RawMaterial],
+    "inventory": _WATCHED_ATTRS[Inventory],
+}
+
+
+def required_amount(quantity_required: int, waste_percentage: Optional[int], quantity_to_produce: int) -> int:
+    """Raw material needed for a run, including the recipe's expected waste."""
+    base_required = quantity_required * quantity_to_produce
+    waste_factor = 1 + (waste_percentage or 0) / 100
+    return int(base_required * waste_factor)
+
+
+# ============================================================================
+# Compiled graph
+# ============================================================================
+
+@dataclass(frozen=True)
+class RecipeInput:
+    """One raw material edge of a product's recipe."""
+    recipe_id: int
+    raw_material_id: int
+    quantity_required: int
+    waste_percentage: int
+    unit: str
+
+    def required_for(self, quantity_to_produce: int) -> int:
+        return required_amount(self.quantity_required, self.waste_percentage, quantity_to_produce)
+
+    def max_quantity(self, stock: int) -> int:
+        """Largest run that `stock` of this material allows."""
+        if stock <= 0:
+            return 0
+        quantity = int(stock / (self.quantity_required * (1 + self.waste_percentage / 100)))
+        # Settle float rounding against the exact requirement formula
+        while self.required_for(quantity + 1) <= stock:
+            quantity += 1
+        while quantity > 0 and self.required_for(quantity) > stock:
+            quantity -= 1
+        return quantity
+
+
+@dataclass(frozen=True)
+class ProductRecipe:
+    """All active recipe inputs of one finished product (by recipe id)."""
+    finished_product_id: int
+    product_name: str
+    inputs: Tuple[RecipeInput, ...]
+
+
+@dataclass(frozen=True)
+class CompiledGraph:
+    products: Dict[int, ProductRecipe]
+    materials: Dict[int, Tuple[str, str]]  # raw_material_id -> (name, unit)
+    stamp: tuple
+
+    def material_ids(self, product_ids: Optional[Iterable[int]] = None) -> Set[int]:
+        """Raw materials used by `product_ids` (all products by default)."""
+        if product_ids is None:
+            return set(self.materials)
+        return {
+            i.raw_material_id
+            for pid in product_ids if pid in self.products
+            for i in self.products[pid].inputs
+        }
+
+    def material_name(self, raw_material_id: int) -> str:
+        material = self.materials.get(raw_material_id)
+        return material[0] if material else f"Material #{raw_material_id}"
+
+    def capacity(self, stock: Dict[int, int]) -> List[Dict[str, object]]:
+        """
+        Per product (by name): the most units `stock` allows on its own, and
+        the limiting raw material. Products compete for shared materials, so
+        the figures are alternatives, not a combined schedule.
+        """
+        rows = []
+        for product in sorted(self.products.values(), key=lambda p: (p.product_name, p.finished_product_id)):
+            limits = [(i.max_quantity(stock.get(i.raw_material_id, 0)), i) for i in product.inputs]
+            max_quantity, limiting = min(limits, key=lambda pair: (pair[0], pair[1].recipe_id))
+            rows.append({
+                "finished_product_id": product.finished_product_id,
+                "product_name": product.product_name,
+                "max_quantity": max_quantity,
+                "limiting_material": {
+                    "raw_material_id": limiting.raw_material_id,
+                    "name": self.material_name(limiting.raw_material_id),
+                },
+                "inputs": [
+                    {
+                        "raw_material_id": i.raw_material_id,
+                        "name": self.material_name(i.raw_material_id),
+                        "quantity_required": i.quantity_required,
+                        "waste_percentage": i.waste_percentage,
+                        "unit": i.unit,
+                        "available": stock.get(i.raw_material_id, 0),
+                        "max_quantity": limit,
+                    }
+                    for limit, i in limits
+                ],
+            })
+        return rows
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+
+def _stamp_query():
+    changed_at = func.coalesce(ProcessingRecipe.updated_at, ProcessingRecipe.created_at)
+    return select(
+        func.count(ProcessingRecipe.id),
+        func.max(ProcessingRecipe.id),
+        func.max(changed_at),
+        func.sum(ProcessingRecipe.quantity_required),
+        func.sum(ProcessingRecipe.waste_percentage),
+        func.count(ProcessingRecipe.id).filter(ProcessingRecipe.is_active == True),  # noqa: E712
+    )
+
+
+class RecipeGraph:
+    """Process-wide cache of the compiled recipe graph."""
+
+    def __init__(self):
+        self.version = 0
+        self._graph: Optional[Tuple[int, float, CompiledGraph]] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, broadcast: bool = True) -> None:
+        """Drop the graph; with `broadcast`, tell the other pods too."""
+        self.version += 1
+        if broadcast:
+            cache_invalidation.publish(INVALIDATION_CHANNEL)
+
+    def _fresh(self) -> bool:
+        return (
+            self._graph is not None
+            and self._graph[0] == self.version
+            and time.monotonic() - self._graph[1] <= MAX_AGE_SECONDS
+        )
+
+    async def _load(self, db: AsyncSession) -> CompiledGraph:
+        stamp = tuple((await db.execute(_stamp_query())).one())
+        result = await db.execute(
+            select(
+                ProcessingRecipe.id,
+                ProcessingRecipe.finished_product_id,
+                ProcessingRecipe.raw_material_id,
+                ProcessingRecipe.quantity_required,
+                ProcessingRecipe.waste_percentage,
+                ProcessingRecipe.unit,
+                RawMaterial.name,
+                RawMaterial.unit,
+                Inventory.product_name,
+            )
+            .join(RawMaterial, RawMaterial.id == ProcessingRecipe.raw_material_id)
+            .join(Inventory, Inventory.id == ProcessingRecipe.finished_product_id)
+            .where(ProcessingRecipe.is_active == True)  # noqa: E712
+            .order_by(ProcessingRecipe.id)
+        )
+        inputs: Dict[int, List[RecipeInput]] = {}
+        names: Dict[int, str] = {}
+        materials: Dict[int, Tuple[str, str]] = {}
+        for rid, pid, rm_id, qty, waste, unit, rm_name, rm_unit, product_name in result.all():
+            inputs.setdefault(pid, []).append(RecipeInput(rid, rm_id, qty, waste or 0, unit))
+            names[pid] = product_name or f"Product #{pid}"
+            materials[rm_id] = (rm_name, rm_unit)
+        products = {
+            pid: ProductRecipe(pid, names[pid], tuple(edges)) for pid, edges in inputs.items()
+        }
+        return CompiledGraph(products=products, materials=materials, stamp=stamp)
+
+    async def get(self, db: AsyncSession, verify: bool = False) -> CompiledGraph:
+        """
+        The compiled graph of active recipes. With `verify`, one probe query
+        confirms the cached graph still matches the recipes table.
+        """
+        if self._fresh() and verify:
+            stamp = tuple((await db.execute(_stamp_query())).one())
+            if stamp != self._graph[2].stamp:
+                self.invalidate(broadcast=False)
+        if not self._fresh():
+            async with self._lock:
+                if not self._fresh():
+                    version = self.version
+                    graph = await self._load(db)
+                    self._graph = (version, time.monotonic(), graph)
+        return self._graph[2]
+
+    def snapshot(self) -> Dict[str, object]:
+        """Cache state, for diagnostics."""
+        graph = self._graph[2] if self._graph else None
+        return {
+            "version": self.version,
+            "fresh": self._fresh(),
+            "products": len(graph.products) if graph else 0,
+            "materials": len(graph.materials) if graph else 0,
+        }
+
+
+recipe_graph = RecipeGraph()
+
+
+# ============================================================================
+# Automatic invalidation on commit
+# ============================================================================
+
+def _touches_labels(obj) -> bool:
+    state = obj._sa_instance_state
+    return any(state.attrs[attr].history.has_changes() for attr in _WATCHED_ATTRS[type(obj)])
+
+
+def _changed_on_flush(session: Session) -> bool:
+    for obj in session.new:
+        if isinstance(obj, ProcessingRecipe):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, (ProcessingRecipe, RawMaterial, Inventory)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, ProcessingRecipe):
+            return True
+        if type(obj) in _WATCHED_ATTRS and _touches_labels(obj):
+            return True
+    return False
+
+
+def _changed_by_statement(statement, table: str) -> bool:
+    if table not in _WATCHED_TABLES:
+        return True  # processing_recipes
+    values = getattr(statement, "_values", None)
+    if not values:
+        return True  # delete, or values we cannot see
+    return any(getattr(column, "key", column) in _WATCHED_TABLES[table] for column in values)
+
+
+cache_invalidation.watch(
+    INVALIDATION_CHANNEL, ("processing_recipes", *_WATCHED_TABLES), recipe_graph.invalidate,
+    on_flush=_changed_on_flush, on_statement=_changed_by_statement,
+)
@@ -0,0 +1,232 @@
+"""
+Operational Role Directory
+
+In-memory view of user_operational_roles so automation hot paths (claims,
+assignment, order fan-out) do not query role tables:
+- role -> active user ids (sorted)
+- user -> operational roles (active and inactive users)
+- user -> claim profile (global role + system admin flag), loaded per user
+  on first use, so task claims need no user query
+
+Core Principles:
+- Loaded lazily with ONE query on first use, then served from memory
+- Versioned: every reload bumps `version`; invalidate() marks it stale
+- Invalidated automatically when a session commits changes to
+  user_operational_roles or to users (insert/delete, is_active, deleted_at),
+  including bulk statements; endpoints may also call invalidate() directly
+- Invalidations are published on the "cache:role_directory" Redis channel
+  (app/core/cache_invalidation.py) so every pod drops its copy
+- Assignee selection is round-robin per role, or least-loaded when the
+  caller supplies per-user load
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import cache_invalidation
+from app.db.models import User, UserOperationalRole
+
+logger = logging.getLogger(__name__)
+
+# Cache invalidation channel (Redis: "cache:role_directory")
+INVALIDATION_CHANNEL = "role_directory"
+
+# Reload at least this often even without invalidations
+MAX_AGE_SECONDS = 300
+
+# Role aliases used by templates and older callers -> canonical operational role
+ROLE_ALIASES = {
+    "delivery_driver": "delivery",
+    "warehouse_staff": "foreman",  # warehouse staff treated as foreman
+    "store_keeper": "storekeeper",
+    "sales_rep": "agent",
+}
+
+# User columns whose changes affect the directory
+_USER_WATCHED_ATTRS = ("is_active", "deleted_at", "role", "is_system_admin")
+_WATCHED_TABLES = ("users", "user_operational_roles")
+
+
+def canonical_role(role: str) -> str:
+    return ROLE_ALIASES.get(role, role)
+
+
+@dataclass(frozen=True)
+class ClaimProfile:
+    """What task claiming needs to know about a user."""
+    id: int
+    roles: FrozenSet[str]  # operational roles plus the global `role` column
+    is_system_admin: bool
+
+
+class RoleDirectory:
+    """Process-wide cache of operational roles."""
+
+    def __init__(self):
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self._generation = 0
+        self._loaded_generation = -1
+        self._users_by_role: Dict[str, List[int]] = {}
+        self._roles_by_user: Dict[int, FrozenSet[str]] = {}
+        self._profiles: Dict[int, Optional[ClaimProfile]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+
+    # ---------------------- Freshness ----------------------
+
+    @property
+    def is_stale(self) -> bool:
+        return (
+            self.loaded_at is None
+            or self._loaded_generation != self._generation
+            or time.monotonic() - self.loaded_at > MAX_AGE_SECONDS
+        )
+
+    def invalidate(self, broadcast: bool = True) -> None:
+        """Mark the directory stale; with `broadcast`, tell the other pods too."""
+        self._generation += 1
+        if broadcast:
+            cache_invalidation.publish(INVALIDATION_CHANNEL)
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self.is_stale:
+            return
+        async with self._lock:
+            if not self.is_stale:
+                return
+            await self._load(db)
+
+    async def _load(self, db: AsyncSession) -> None:
+        generation = self._generation
+        result = await db.execute(
+            select(UserOperationalRole.user_id, UserOperationalRole.role, User.is_active)
+            .join(User, User.id == UserOperationalRole.user_id)
+        )
+        users_by_role: Dict[str, set] = {}
+        roles_by_user: Dict[int, set] = {}
+        for user_id, role, is_active in result.all():
+            roles_by_user.setdefault(user_id, set()).add(role)
+            if is_active:
+                users_by_role.setdefault(role, set()).add(user_id)
+
+        self._users_by_role = {role: sorted(ids) for role, ids in users_by_role.items()}
+        self._roles_by_user = {user_id: frozenset(roles) for user_id, roles in roles_by_user.items()}
+        self._profiles = {}
+        self._loaded_generation = generation
+        self.loaded_at = time.monotonic()
+        self.version += 1
+        logger.debug(
+            f"[RoleDirectory] Loaded v{self.version}: {len(self._roles_by_user)} users, "
+            f"{len(self._users_by_role)} roles"
+        )
+
+    # ---------------------- Lookups ----------------------
+
+    async def users_for_role(self, db: AsyncSession, role: str) -> List[int]:
+        """Active user ids holding an operational role, ascending."""
+        await self.ensure_loaded(db)
+        return list(self._users_by_role.get(canonical_role(role), ()))
+
+    async def users_for_roles(self, db: AsyncSession, roles: Iterable[str]) -> List[int]:
+        """Distinct active user ids holding any of `roles`, ascending."""
+        await self.ensure_loaded(db)
+        ids = set()
+        for role in roles:
+            ids.update(self._users_by_role.get(canonical_role(role), ()))
+        return sorted(ids)
+
+    async def roles(self, db: AsyncSession) -> List[str]:
+        """Operational roles held by at least one active user."""
+        await self.ensure_loaded(db)
+        return sorted(self._users_by_role)
+
+    async def roles_for_user(self, db: AsyncSession, user_id: int) -> FrozenSet[str]:
+        """Operational roles of a user (empty if none)."""
+        await self.ensure_loaded(db)
+        return self._roles_by_user.get(user_id, frozenset())
+
+    async def claim_profile(self, db: AsyncSession, user_id: int) -> Optional[ClaimProfile]:
+        """Roles and admin flag of a user (None if the user does not exist)."""
+        await self.ensure_loaded(db)
+        if user_id in self._profiles:
+            return self._profiles[user_id]
+        generation = self._generation
+        row = (await db.execute(
+            select(User.role, User.is_system_admin).where(User.id == user_id)
+        )).one_or_none()
+        profile = None
+        if row is not None:
+            roles = set(self._roles_by_user.get(user_id, ()))
+            if row.role:
+                roles.add(getattr(row.role, "value", row.role))
+            profile = ClaimProfile(id=user_id, roles=frozenset(roles), is_system_admin=bool(row.is_system_admin))
+        if generation == self._generation:
+            self._profiles[user_id] = profile
+        return profile
+
+    async def pick_assignee(
+        self,
+        db: AsyncSession,
+        role: str,
+        loads: Optional[Dict[int, int]] = None,
+    ) -> Optional[int]:
+        """
+        Choose an active user for a role.
+
+        Round-robin over the role's users; with `loads` (user id -> open
+        work), the least-loaded user wins and round-robin breaks ties.
+        """
+        role = canonical_role(role)
+        candidates = await self.users_for_role(db, role)
+        if not candidates:
+            return None
+
+        start = self._cursor.get(role, 0) % len(candidates)
+        ordered = candidates[start:] + candidates[:start]
+        if loads is not None:
+            ordered.sort(key=lambda uid: loads.get(uid, 0))  # stable: keeps rotation order on ties
+        chosen = ordered[0]
+        self._cursor[role] = candidates.index(chosen) + 1
+        return chosen
+
+    def snapshot(self) -> Dict[str, object]:
+        """Directory contents and version, for diagnostics."""
+        return {
+            "version": self.version,
+            "stale": self.is_stale,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded_at else None,
+            "users_by_role": {role: list(ids) for role, ids in self._users_by_role.items()},
+        }
+
+
+role_directory = RoleDirectory()
+
+
+# ============================================================================
+# Automatic invalidation on commit
+# ============================================================================
+
+def _touches_directory(session: Session) -> bool:
+    for obj in session.new | session.deleted:
+        if isinstance(obj, (User, UserOperationalRole)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, UserOperationalRole):
+            return True
+        if isinstance(obj, User) and session.is_modified(obj, include_collections=False):
+            state = obj._sa_instance_state
+            if any(state.attrs[attr].history.has_changes() for attr in _USER_WATCHED_ATTRS):
+                return True
+    return False
+
+
+cache_invalidation.watch(
+    INVALIDATION_CHANNEL, _WATCHED_TABLES, role_directory.invalidate, on_flush=_touches_directory,
+)
@@ -0,0 +1,618 @@
+"""
+Reporting Rollups Service
+
+Maintains per-day aggregate tables so reporting does not rescan raw rows:
+- SalesDailyRollup: (day, product, channel, agent) -> count / quantity / amount
+- ProductionDailyRollup: (day, finished product) -> batches / produced / waste / yield
+
+Core Principles:
+- Rollups are written in the SAME transaction as the source row
+  (record_sale, sale reversal, process_batch/process_batches) - callers own the commit
+- Days are UTC calendar days of the source row's created_at
+- Reversed sales are subtracted, so sales rollups are net of reversals
+- Reads combine whole days from rollups with raw rows for partial-day edges,
+  so arbitrary datetime ranges stay exact
+- rebuild_rollups() recomputes any day range from raw tables (backfill);
+  check_rollup_consistency() reports (and optionally repairs) drift
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import enum
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Date, case, delete, func, insert, select, update
+
+from app.db.models import (
+    Sale, ProcessingBatch, SalesDailyRollup, ProductionDailyRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+# Dimensions that reads may group sales rollups by
+SALES_DIMENSIONS = ("day", "product_id", "sale_channel", "sold_by_user_id")
+
+# Dimensions that reads may group production rollups by
+PRODUCTION_DIMENSIONS = ("day", "finished_product_id")
+
+SALES_MEASURES = ("sale_count", "total_quantity", "total_amount")
+
+PRODUCTION_MEASURES = (
+    "batch_count", "total_produced", "total_expected", "total_waste",
+    "waste_batch_count", "yield_sum", "yield_count",
+)
+
+# Rows per INSERT when rebuilding
+_REBUILD_CHUNK = 1000
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a datetime to naive UTC (the convention used across services)."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def rollup_day(value: Optional[datetime]) -> date:
+    """UTC calendar day a row with the given timestamp is rolled up into."""
+    value = _naive_utc(value)
+    return (value or datetime.utcnow()).date()
+
+
+def _channel_value(channel: Any) -> str:
+    """Store SaleChannel members and raw strings uniformly."""
+    if isinstance(channel, enum.Enum):
+        return str(channel.value)
+    return str(channel)
+
+
+def _dialect_name(session: AsyncSession) -> str:
+    return session.get_bind().dialect.name
+
+
+def day_bucket(session: AsyncSession, column):
+    """SQL expression bucketing a timestamp column into its UTC day."""
+    if _dialect_name(session) == "postgresql":
+        return func.date(func.timezone("UTC", column), type_=Date)
+    return func.date(column, type_=Date)
+
+
+def split_range(
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> Tuple[Optional[date], Optional[date], List[Tuple[datetime, datetime, date]]]:
+    """
+    Split the half-open range [start, end) into whole days and partial-day edges.
+
+    Returns (day_from, day_to, edges):
+    - day_from / day_to bound the whole days served from rollups
+      (day_to exclusive; None means unbounded)
+    - edges lists (edge_start, edge_end, day) ranges to read from raw rows
+    """
+    start = _naive_utc(start)
+    end = _naive_utc(end)
+    edges: List[Tuple[datetime, datetime, date]] = []
+
+    day_from = None
+    if start is not None:
+        day_from = start.date()
+        if start != _midnight(day_from):
+            day_from = day_from + timedelta(days=1)
+            edge_end = _midnight(day_from)
+            if end is not None and end < edge_end:
+                edge_end = end
+            edges.append((start, edge_end, start.date()))
+
+    day_to = None
+    if end is not None:
+        day_to = end.date()
+        if end != _midnight(day_to) and not (edges and edges[0][2] == day_to):
+            edge_start = _midnight(day_to)
+            if start is not None and start > edge_start:
+                edge_start = start
+            edges.append((edge_start, end, day_to))
+
+    return day_from, day_to, edges
+
+
+def _has_whole_days(day_from: Optional[date], day_to: Optional[date]) -> bool:
+    return day_from is None or day_to is None or day_from < day_to
+
+
+async def _upsert_increment(
+    session: AsyncSession,
+    model,
+    key: Dict[str, Any],
+    deltas: Dict[str, int],
+) -> None:
+    """Add deltas to the rollup row identified by key, creating it if missing."""
+    dialect = _dialect_name(session)
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model).values(**key, **deltas)
+        set_ = {name: getattr(model, name) + stmt.excluded[name] for name in deltas}
+        set_["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_=set_)
+        await session.execute(stmt)
+        return
+
+    # Portable fallback: increment in place, insert when the bucket is new
+    res = await session.execute(
+        update(model)
+        .where(*[getattr(model, k) == v for k, v in key.items()])
+        .values(**{name: getattr(model, name) + delta for name, delta in deltas.items()})
+    )
+    if res.rowcount == 0:
+        await session.execute(insert(model).values(**key, **deltas))
+
+
+# ============================================================================
+# Incremental Maintenance (call before the caller's commit)
+# ============================================================================
+
+def _sale_key(sale: Sale) -> Dict[str, Any]:
+    return {
+        "day": rollup_day(sale.created_at),
+        "product_id": sale.product_id,
+        "sale_channel": _channel_value(sale.sale_channel),
+        "sold_by_user_id": sale.sold_by_user_id,
+    }
+
+
+async def record_sale_rollup(session: AsyncSession, sale: Sale) -> None:
+    """Add a newly recorded sale to its daily bucket."""
+    await _upsert_increment(session, SalesDailyRollup, _sale_key(sale), {
+        "sale_count": 1,
+        "total_quantity": int(sale.quantity or 0),
+        "total_amount": int(sale.total_amount or 0),
+    })
+
+
+async def record_sales_rollup(session: AsyncSession, sales: Sequence[Sale]) -> None:
+    """Add a batch of newly recorded sales, one upsert per daily bucket."""
+    buckets: Dict[tuple, Dict[str, int]] = {}
+    keys: Dict[tuple, Dict[str, Any]] = {}
+    for sale in sales:
+        key = _sale_key(sale)
+        bucket_id = tuple(key.values())
+        keys[bucket_id] = key
+        _merge(buckets, bucket_id, ("sale_count", "total_quantity", "total_amount"),
+               (1, int(sale.quantity or 0), int(sale.total_amount or 0)))
+    for bucket_id, deltas in buckets.items():
+        await _upsert_increment(session, SalesDailyRollup, keys[bucket_id], deltas)
+
+
+async def reverse_sale_rollup(session: AsyncSession, sale: Sale) -> None:
+    """
+    Subtract a reversed sale from the bucket it was counted in.
+
+    Only updates an existing bucket: a sale that was never rolled up
+    (e.g. pre-dates a backfill) must not produce a negative bucket.
+    """
+    key = _sale_key(sale)
+    await session.execute(
+        update(SalesDailyRollup)
+        .where(*[getattr(SalesDailyRollup, k) == v for k, v in key.items()])
+        .values(
+            sale_count=SalesDailyRollup.sale_count - 1,
+            total_quantity=SalesDailyRollup.total_quantity - int(sale.quantity or 0),
+            total_amount=SalesDailyRollup.total_amount - int(sale.total_amount or 0),
+            updated_at=func.now(),
+        )
+    )
+
+
+def _batch_deltas(batch: ProcessingBatch) -> Dict[str, int]:
+    waste = int(batch.actual_waste_quantity or 0)
+    return {
+        "batch_count": 1,
+        "total_produced": int(batch.quantity_produced or 0),
+        "total_expected": int(batch.expected_quantity or batch.quantity_produced or 0),
+        "total_waste": waste,
+        "waste_batch_count": 1 if waste > 0 else 0,
+        "yield_sum": int(batch.yield_efficiency or 0),
+        "yield_count": 1 if batch.yield_efficiency is not None else 0,
+    }
+
+
+async def record_batch_rollup(session: AsyncSession, batch: ProcessingBatch) -> None:
+    """Add a completed processing batch to its daily bucket."""
+    if batch.status != "completed":
+        return
+    await _upsert_increment(
+        session,
+        ProductionDailyRollup,
+        {"day": rollup_day(batch.created_at), "finished_product_id": batch.finished_product_id},
+        _batch_deltas(batch),
+    )
+
+
+async def record_batches_rollup(session: AsyncSession, batches: Sequence[ProcessingBatch]) -> None:
+    """Add many completed processing batches, one upsert per daily bucket."""
+    buckets: Dict[tuple, Dict[str, int]] = {}
+    for batch in batches:
+        if batch.status != "completed":
+            continue
+        deltas = _batch_deltas(batch)
+        _merge(buckets, (rollup_day(batch.created_at), batch.finished_product_id), tuple(deltas), tuple(deltas.values()))
+    for (day, finished_product_id), deltas in buckets.items():
+        await _upsert_increment(
+            session, ProductionDailyRollup, {"day": day, "finished_product_id": finished_product_id}, deltas,
+        )
+
+
+# ============================================================================
+# Reads
+# ============================================================================
+
+def _merge(target: Dict[tuple, Dict[str, int]], key: tuple, measures: Sequence[str], values: Sequence[Any]) -> None:
+    bucket = target.setdefault(key, {m: 0 for m in measures})
+    for name, value in zip(measures, values):
+        bucket[name] += int(value or 0)
+
+
+async def aggregate_sales(
+    session: AsyncSession,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    group_by: Sequence[str] = (),
+    product_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    sale_channel: Optional[str] = None,
+) -> Dict[tuple, Dict[str, int]]:
+    """
+    Aggregate non-reversed sales in [start, end), grouped by SALES_DIMENSIONS.
+
+    Returns {group_key_tuple: {"sale_count", "total_quantity", "total_amount"}}.
+    With no group_by the single key is ().
+    """
+    for dim in group_by:
+        if dim not in SALES_DIMENSIONS:
+            raise ValueError(f"Unknown sales dimension: {dim}")
+
+    results: Dict[tuple, Dict[str, int]] = {}
+    day_from, day_to, edges = split_range(start, end)
+
+    if _has_whole_days(day_from, day_to):
+        cols = [getattr(SalesDailyRollup, dim) for dim in group_by]
+        q = select(
+            *cols,
+            func.coalesce(func.sum(SalesDailyRollup.sale_count), 0),
+            func.coalesce(func.sum(SalesDailyRollup.total_quantity), 0),
+            func.coalesce(func.sum(SalesDailyRollup.total_amount), 0),
+        )
+        if day_from is not None:
+            q = q.where(SalesDailyRollup.day >= day_from)
+        if day_to is not None:
+            q = q.where(SalesDailyRollup.day < day_to)
+        if product_id is not None:
+            q = q.where(SalesDailyRollup.product_id == product_id)
+        if user_id is not None:
+            q = q.where(SalesDailyRollup.sold_by_user_id == user_id)
+        if sale_channel:
+            q = q.where(SalesDailyRollup.sale_channel == _channel_value(sale_channel))
+        if cols:
+            q = q.group_by(*cols)
+        for row in (await session.execute(q)).all():
+            values = row[len(cols):]
+            if not values[0]:
+                continue  # bucket fully reversed
+            key = tuple(_channel_value(v) if dim == "sale_channel" else v for dim, v in zip(group_by, row))
+            _merge(results, key, SALES_MEASURES, values)
+
+    # Partial-day edges come from raw rows; each edge lies within a single day
+    raw_dims = [dim for dim in group_by if dim != "day"]
+    raw_cols = [getattr(Sale, dim) for dim in raw_dims]
+    for edge_start, edge_end, edge_day in edges:
+        q = select(
+            *raw_cols,
+            func.count(Sale.id),
+            func.coalesce(func.sum(Sale.quantity), 0),
+            func.coalesce(func.sum(Sale.total_amount), 0),
+        ).where(
+            Sale.is_reversed == False,  # noqa: E712
+            Sale.created_at >= edge_start,
+            Sale.created_at < edge_end,
+        )
+        if product_id is not None:
+            q = q.where(Sale.product_id == product_id)
+        if user_id is not None:
+            q = q.where(Sale.sold_by_user_id == user_id)
+        if sale_channel:
+            q = q.where(Sale.sale_channel == _channel_value(sale_channel))
+        if raw_cols:
+            q = q.group_by(*raw_cols)
+        for row in (await session.execute(q)).all():
+            values = row[len(raw_cols):]
+            if not values[0]:
+                continue
+            by_dim = dict(zip(raw_dims, row))
+            by_dim["day"] = edge_day
+            if "sale_channel" in by_dim:
+                by_dim["sale_channel"] = _channel_value(by_dim["sale_channel"])
+            _merge(results, tuple(by_dim[dim] for dim in group_by), SALES_MEASURES, values)
+
+    return results
+
+
+async def aggregate_production(
+    session: AsyncSession,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    group_by: Sequence[str] = (),
+    finished_product_id: Optional[int] = None,
+) -> Dict[tuple, Dict[str, int]]:
+    """
+    Aggregate completed processing batches in [start, end), grouped by
+    PRODUCTION_DIMENSIONS. Values are keyed by PRODUCTION_MEASURES.
+    """
+    for dim in group_by:
+        if dim not in PRODUCTION_DIMENSIONS:
+            raise ValueError(f"Unknown production dimension: {dim}")
+
+    results: Dict[tuple, Dict[str, int]] = {}
+    day_from, day_to, edges = split_range(start, end)
+
+    if _has_whole_days(day_from, day_to):
+        cols = [getattr(ProductionDailyRollup, dim) for dim in group_by]
+        q = select(
+            *cols,
+            *[func.coalesce(func.sum(getattr(ProductionDailyRollup, m)), 0) for m in PRODUCTION_MEASURES],
+        )
+        if day_from is not None:
+            q = q.where(ProductionDailyRollup.day >= day_from)
+        if day_to is not None:
+            q = q.where(ProductionDailyRollup.day < day_to)
+        if finished_product_id is not None:
+            q = q.where(ProductionDailyRollup.finished_product_id == finished_product_id)
+        if cols:
+            q = q.group_by(*cols)
+        for row in (await session.execute(q)).all():
+            values = row[len(cols):]
+            if not values[0]:
+                continue
+            _merge(results, tuple(row[:len(cols)]), PRODUCTION_MEASURES, values)
+
+    raw_dims = [dim for dim in group_by if dim != "day"]
+    raw_cols = [getattr(ProcessingBatch, dim) for dim in raw_dims]
+    for edge_start, edge_end, edge_day in edges:
+        q = select(*raw_cols, *_raw_production_measures()).where(
+            ProcessingBatch.status == "completed",
+            ProcessingBatch.created_at >= edge_start,
+            ProcessingBatch.created_at < edge_end,
+        )
+        if finished_product_id is not None:
+            q = q.where(ProcessingBatch.finished_product_id == finished_product_id)
+        if raw_cols:
+            q = q.group_by(*raw_cols)
+        for row in (await session.execute(q)).all():
+            values = row[len(raw_cols):]
+            if not values[0]:
+                continue
+            by_dim = dict(zip(raw_dims, row))
+            by_dim["day"] = edge_day
+            _merge(results, tuple(by_dim[dim] for dim in group_by), PRODUCTION_MEASURES, values)
+
+    return results
+
+
+def _raw_production_measures() -> list:
+    """Raw-table expressions matching PRODUCTION_MEASURES, in order."""
+    return [
+        func.count(ProcessingBatch.id),
+        func.coalesce(func.sum(ProcessingBatch.quantity_produced), 0),
+        func.coalesce(func.sum(func.coalesce(ProcessingBatch.expected_quantity, ProcessingBatch.quantity_produced)), 0),
+        func.coalesce(func.sum(func.coalesce(ProcessingBatch.actual_waste_quantity, 0)), 0),
+        func.coalesce(func.sum(case((ProcessingBatch.actual_waste_quantity > 0, 1), else_=0)), 0),
+        func.coalesce(func.sum(ProcessingBatch.yield_efficiency), 0),
+        func.count(ProcessingBatch.yield_efficiency),
+    ]
+
+
+# ============================================================================
+# Backfill & Consistency
+# ============================================================================
+
+def _day_bounds(column, start_day: Optional[date], end_day: Optional[date]) -> list:
+    conds = []
+    if start_day is not None:
+        conds.append(column >= _midnight(start_day))
+    if end_day is not None:
+        conds.append(column < _midnight(end_day + timedelta(days=1)))
+    return conds
+
+
+async def _raw_sales_buckets(
+    session: AsyncSession,
+    start_day: Optional[date],
+    end_day: Optional[date],
+) -> Dict[tuple, Dict[str, int]]:
+    day_col = day_bucket(session, Sale.created_at).label("day")
+    q = (
+        select(
+            day_col, Sale.product_id, Sale.sale_channel, Sale.sold_by_user_id,
+            func.count(Sale.id),
+            func.coalesce(func.sum(Sale.quantity), 0),
+            func.coalesce(func.sum(Sale.total_amount), 0),
+        )
+        .where(Sale.is_reversed == False, Sale.created_at.isnot(None))  # noqa: E712
+        .where(*_day_bounds(Sale.created_at, start_day, end_day))
+        .group_by(day_col, Sale.product_id, Sale.sale_channel, Sale.sold_by_user_id)
+    )
+    buckets: Dict[tuple, Dict[str, int]] = {}
+    for day, product_id, channel, user_id, *values in (await session.execute(q)).all():
+        _merge(buckets, (day, product_id, _channel_value(channel), user_id), SALES_MEASURES, values)
+    return buckets
+
+
+async def _rollup_sales_buckets(
+    session: AsyncSession,
+    start_day: Optional[date],
+    end_day: Optional[date],
+) -> Dict[tuple, Dict[str, int]]:
+    q = select(SalesDailyRollup)
+    if start_day is not None:
+        q = q.where(SalesDailyRollup.day >= start_day)
+    if end_day is not None:
+        q = q.where(SalesDailyRollup.day <= end_day)
+    buckets: Dict[tuple, Dict[str, int]] = {}
+    for r in (await session.execute(q)).scalars().all():
+        if not r.sale_count:
+            continue
+        _merge(buckets, (r.day, r.product_id, r.sale_channel, r.sold_by_user_id),
+               SALES_MEASURES, [getattr(r, m) for m in SALES_MEASURES])
+    return buckets
+
+
+async def _raw_production_buckets(
+    session: AsyncSession,
+    start_day: Optional[date],
+    end_day: Optional[date],
+) -> Dict[tuple, Dict[str, int]]:
+    day_col = day_bucket(session, ProcessingBatch.created_at).label("day")
+    q = (
+        select(day_col, ProcessingBatch.finished_product_id, *_raw_production_measures())
+        .where(ProcessingBatch.status == "completed", ProcessingBatch.created_at.isnot(None))
+        .where(*_day_bounds(ProcessingBatch.created_at, start_day, end_day))
+        .group_by(day_col, ProcessingBatch.finished_product_id)
+    )
+    buckets: Dict[tuple, Dict[str, int]] = {}
+    for day, product_id, *values in (await session.execute(q)).all():
+        _merge(buckets, (day, product_id), PRODUCTION_MEASURES, values)
+    return buckets
+
+
+async def _rollup_production_buckets(
+    session: AsyncSession,
+    start_day: Optional[date],
+    end_day: Optional[date],
+) -> Dict[tuple, Dict[str, int]]:
+    q = select(ProductionDailyRollup)
+    if start_day is not None:
+        q = q.where(ProductionDailyRollup.day >= start_day)
+    if end_day is not None:
+        q = q.where(ProductionDailyRollup.day <= end_day)
+    buckets: Dict[tuple, Dict[str, int]] = {}
+    for r in (await session.execute(q)).scalars().all():
+        if not r.batch_count:
+            continue
+        _merge(buckets, (r.day, r.finished_product_id),
+               PRODUCTION_MEASURES, [getattr(r, m) for m in PRODUCTION_MEASURES])
+    return buckets
+
+
+async def _insert_chunked(session: AsyncSession, model, rows: List[Dict[str, Any]]) -> None:
+    for i in range(0, len(rows), _REBUILD_CHUNK):
+        await session.execute(insert(model), rows[i:i + _REBUILD_CHUNK])
+
+
+async def rebuild_rollups(
+    session: AsyncSession,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+) -> Dict[str, int]:
+    """
+    Recompute rollups for the inclusive day range from raw tables (backfill).
+
+    Existing rollup rows in the range are replaced. With no bounds the whole
+    history is rebuilt. Commits on success, rolls back on failure.
+
+    Returns: {"sales_rows": n, "production_rows": m}
+    """
+    try:
+        sales = await _raw_sales_buckets(session, start_day, end_day)
+        production = await _raw_production_buckets(session, start_day, end_day)
+
+        for model in (SalesDailyRollup, ProductionDailyRollup):
+            stmt = delete(model)
+            if start_day is not None:
+                stmt = stmt.where(model.day >= start_day)
+            if end_day is not None:
+                stmt = stmt.where(model.day <= end_day)
+            await session.execute(stmt)
+
+        await _insert_chunked(session, SalesDailyRollup, [
+            {"day": day, "product_id": pid, "sale_channel": channel, "sold_by_user_id": uid, **values}
+            for (day, pid, channel, uid), values in sales.items()
+        ])
+        await _insert_chunked(session, ProductionDailyRollup, [
+            {"day": day, "finished_product_id": pid, **values}
+            for (day, pid), values in production.items()
+        ])
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    logger.info(
+        f"[Rollups] Rebuilt {len(sales)} sales and {len(production)} production rows "
+        f"(range={start_day}..{end_day})"
+    )
+    return {"sales_rows": len(sales), "production_rows": len(production)}
+
+
+def _diff(raw: Dict[tuple, Dict[str, int]], rolled: Dict[tuple, Dict[str, int]]) -> List[Dict[str, Any]]:
+    mismatches = []
+    for key in set(raw) | set(rolled):
+        expected = raw.get(key)
+        actual = rolled.get(key)
+        if expected != actual:
+            mismatches.append({"key": key, "expected": expected, "actual": actual})
+    mismatches.sort(key=lambda m: tuple(str(k) for k in m["key"]))
+    return mismatches
+
+
+async def check_rollup_consistency(
+    session: AsyncSession,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    repair: bool = False,
+    max_reported: int = 100,
+) -> Dict[str, Any]:
+    """
+    Compare rollups against raw tables for the inclusive day range.
+
+    With repair=True, the span of days containing mismatches is rebuilt.
+
+    Returns a report with mismatch counts and up to max_reported examples.
+    """
+    sales = _diff(
+        await _raw_sales_buckets(session, start_day, end_day),
+        await _rollup_sales_buckets(session, start_day, end_day),
+    )
+    production = _diff(
+        await _raw_production_buckets(session, start_day, end_day),
+        await _rollup_production_buckets(session, start_day, end_day),
+    )
+
+    report: Dict[str, Any] = {
+        "consistent": not sales and not production,
+        "sales_mismatch_count": len(sales),
+        "production_mismatch_count": len(production),
+        "sales_mismatches": sales[:max_reported],
+        "production_mismatches": production[:max_reported],
+        "repaired": False,
+    }
+
+    if not report["consistent"]:
+        logger.warning(
+            f"[Rollups] Consistency check found {len(sales)} sales and "
+            f"{len(production)} production mismatches"
+        )
+        if repair:
+            days = [m["key"][0] for m in sales + production]
+            await rebuild_rollups(session, min(days), max(days))
+            report["repaired"] = True
+
+    return report
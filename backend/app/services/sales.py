@@ -21,12 +21,16 @@ import os
 import logging
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
+from sqlalchemy import case, insert, select, update, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
 from app.db.models import Inventory, Sale, InventoryTransaction, Order, User
 from app.db.enums import SaleChannel
+from app.services import idempotency
 from app.services.task_engine import emit_event
+from app.services.rollups import aggregate_sales, record_sale_rollup, record_sales_rollup
+from app.services.inventory_snapshots import record_ledger_change, record_ledger_changes
 from app.core.events import EventType
 
 logger = logging.getLogger(__name__)
@@ -291,12 +295,14 @@ async def record_sale(
             raise ValidationError("Price must be >= 0")
 
         # If idempotency key provided and a prior sale exists, return it (idempotent)
+        fingerprint = None
         if idempotency_key:
-            q = select(Sale).where(Sale.idempotency_key == idempotency_key, Sale.sold_by_user_id == sold_by_user_id)
-            res = await session.execute(q)
-            existing = res.scalar_one_or_none()
-            if existing:
-                return existing
+            fingerprint = _sale_fingerprint(product_id, quantity, unit_price, sale_channel, related_order_id)
+            hit = await idempotency.find(session, idempotency.SCOPE_SALE, sold_by_user_id, idempotency_key)
+            if hit:
+                existing = await session.get(Sale, hit.check(fingerprint))
+                if existing:
+                    return existing
 
         # If related_order_id provided, validate order exists and is in an acceptable state
         if related_order_id is not None:
@@ -361,6 +367,8 @@ async def record_sale(
         # Insert sale record
         total_amount = float(unit_price) * int(quantity)
         sale = Sale(
+            # Set explicitly so the rollup day matches the stored timestamp
+            created_at=datetime.utcnow(),
             product_id=product_id,
             quantity=quantity,
             unit_price=int(unit_price),
@@ -398,13 +406,50 @@ async def record_sale(
         )
         session.add(transaction)
 
+        if idempotency_key:
+            idempotency.remember(
+                session, idempotency.SCOPE_SALE, sold_by_user_id, idempotency_key, sale.id, fingerprint,
+            )
+
+        # Daily rollup and ledger snapshot (same transaction, so reports never drift from sales)
+        await record_sale_rollup(session, sale)
+        await record_ledger_change(session, inventory_item.id, -quantity)
+
+        # Events join the transaction (outbox rows for durable subscribers;
+        # the others run once it commits)
+        await session.flush()  # Get transaction ID
+        await emit_event(EventType.SALE_CREATED, {
+            'sale_id': sale.id,
+            'transaction_id': transaction.id,
+            'product_id': sale.product_id,
+            'quantity': sale.quantity,
+            'user_id': sold_by_user_id,
+            'channel': sale.sale_channel,
+        }, session=session)
+        await emit_event(EventType.INVENTORY_UPDATED, {
+            'product_id': sale.product_id,
+            'stock_before': stock_before,
+            'stock_after': stock_before - quantity,
+            'change': -quantity,
+            'reason': 'sale',
+            'sale_id': sale.id,
+        }, session=session)
+
         # ===== COMMIT - Atomic transaction complete =====
         await session.commit()
 
-    except SalesError:
+    except (SalesError, idempotency.IdempotencyConflictError):
         # Known sales errors - rollback and re-raise with proper HTTP code
         await session.rollback()
         raise
+    except IntegrityError:
+        # A concurrent retry with the same idempotency key committed first
+        await session.rollback()
+        hit = await idempotency.find(session, idempotency.SCOPE_SALE, sold_by_user_id, idempotency_key)
+        existing = await session.get(Sale, hit.resource_id) if hit else None
+        if existing:
+            return existing
+        raise ValidationError("Sale recording failed: conflicting write - please retry")
     except Exception as e:
         # Unexpected error - rollback and wrap in ValidationError
         await session.rollback()
@@ -420,26 +465,6 @@ async def record_sale(
     try:
         # Refresh inventory to get updated stock
         await session.refresh(inventory_item)
-        
-        # Emit sale:created event (canonical event name)
-        await emit_event(EventType.SALE_CREATED, {
-            'sale_id': sale.id,
-            'transaction_id': transaction.id,
-            'product_id': sale.product_id,
-            'quantity': sale.quantity,
-            'user_id': sold_by_user_id,
-            'channel': sale.sale_channel,
-        })
-        
-        # Emit inventory:updated event
-        await emit_event(EventType.INVENTORY_UPDATED, {
-            'product_id': sale.product_id,
-            'stock_before': stock_before,
-            'stock_after': sale.stock_after,
-            'change': -quantity,
-            'reason': 'sale',
-            'sale_id': sale.id,
-        })
 
         # Check for low stock and trigger automation event (pass previous stock to avoid repeated alerts)
         if SALES_AUTOMATION_ENABLED:
@@ -453,6 +478,341 @@ async def record_sale(
     return sale
 
 
+# ============================================================================
+# Batch Recording (offline sync)
+# ============================================================================
+
+# Upper bound on sales per batch call
+MAX_SALES_PER_BATCH = int(os.environ.get("MAX_SALES_PER_BATCH", "500"))
+
+
+@dataclass
+class BatchSaleItemResult:
+    """Outcome of one sale in a batch."""
+    index: int
+    status: str  # created | duplicate | rejected
+    sale_id: Optional[int] = None
+    product_id: Optional[int] = None
+    quantity: Optional[int] = None
+    error: Optional[str] = None  # validation_error | product_not_found | insufficient_stock | idempotency_conflict
+    message: Optional[str] = None
+
+
+def _sale_fingerprint(product_id, quantity, unit_price, sale_channel, related_order_id) -> str:
+    """Fingerprint of the fields that make two sale requests "the same"."""
+    return idempotency.request_fingerprint({
+        'product_id': int(product_id),
+        'quantity': int(quantity),
+        'unit_price': float(unit_price),
+        'channel': normalize_channel(sale_channel),
+        'related_order_id': int(related_order_id) if related_order_id is not None else None,
+    })
+
+
+def _parse_sale_date(sale_date: Optional[str]) -> Optional[datetime]:
+    if not sale_date:
+        return None
+    try:
+        return datetime.fromisoformat(sale_date.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None  # Keep as None if parsing fails (same as record_sale)
+
+
+async def record_sales_batch(
+    session: AsyncSession,
+    items: list,
+    sold_by_user_id: int,
+    caller_role: Optional[str] = None,
+) -> list:
+    """
+    Record many sales (dicts shaped like the POST /api/sales payload) in one transaction.
+
+    Each item is validated on its own; invalid, unknown-product and
+    out-of-stock items are rejected and the rest are recorded. Items whose
+    idempotency_key was already used by this user (earlier or in this
+    batch) are reported as duplicates, or rejected when the key was used
+    for a different sale.
+
+    ATOMIC: one guarded multi-row inventory UPDATE (stock deltas aggregated
+    per product), bulk Sale and InventoryTransaction inserts, one rollup
+    upsert per daily bucket, one commit. If the guarded UPDATE loses a race
+    the whole batch is rolled back (InsufficientStockError; safe to retry
+    with the same idempotency keys).
+    EVENTS: in the transaction; sale:created per sale, inventory:updated
+    once per product. SIDE EFFECTS: after commit; the low-stock check once
+    per product.
+
+    Returns one BatchSaleItemResult per item, in input order.
+    Raises: PermissionDeniedError, ValidationError, InsufficientStockError
+    """
+    if caller_role and caller_role.lower() in BLOCKED_ROLES:
+        raise PermissionDeniedError(f"Role '{caller_role}' is not allowed to record sales")
+    if not items:
+        raise ValidationError("At least one sale is required")
+    if len(items) > MAX_SALES_PER_BATCH:
+        raise ValidationError(f"At most {MAX_SALES_PER_BATCH} sales per batch")
+
+    results: list = [None] * len(items)
+    parsed: list = []  # (index, fields)
+
+    def reject(index: int, error: str, message: str, **fields) -> None:
+        results[index] = BatchSaleItemResult(index=index, status="rejected", error=error, message=message, **fields)
+
+    # ===== VALIDATION PHASE (no DB writes) =====
+    for index, item in enumerate(items):
+        try:
+            product_id = int(item.get('product_id'))
+            quantity = int(item.get('quantity'))
+            unit_price = float(item.get('unit_price'))
+            related_order_id = item.get('related_order_id')
+            related_order_id = int(related_order_id) if related_order_id is not None else None
+        except (AttributeError, TypeError, ValueError):
+            reject(index, "validation_error", "product_id, quantity, and unit_price are required")
+            continue
+        if quantity <= 0:
+            reject(index, "validation_error", "Quantity must be > 0", product_id=product_id, quantity=quantity)
+            continue
+        if unit_price < 0:
+            reject(index, "validation_error", "Price must be >= 0", product_id=product_id, quantity=quantity)
+            continue
+        parsed.append((index, {
+            **item,
+            'product_id': product_id,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'related_order_id': related_order_id,
+        }))
+
+    try:
+        # Idempotency: one lookup for the whole batch
+        seen_keys = await idempotency.find_many(
+            session, idempotency.SCOPE_SALE, sold_by_user_id, (f.get('idempotency_key') for _, f in parsed),
+        )
+
+        # Related orders: one lookup
+        order_ids = {f['related_order_id'] for _, f in parsed if f['related_order_id'] is not None}
+        order_status: dict = {}
+        if order_ids:
+            res = await session.execute(select(Order.id, Order.status).where(Order.id.in_(order_ids)))
+            order_status = {oid: getattr(status, 'value', status) for oid, status in res.all()}
+
+        # Inventory: one lookup
+        product_ids = {f['product_id'] for _, f in parsed}
+        res = await session.execute(select(Inventory).where(Inventory.product_id.in_(product_ids)))
+        inventory = {inv.product_id: inv for inv in res.scalars().all()}
+
+        # Allocate stock in input order
+        available = {pid: inv.total_stock for pid, inv in inventory.items()}
+        stock_before = dict(available)
+        accepted: list = []  # (index, fields)
+        duplicate_of: dict = {}  # index -> (key, fields) for keys recorded earlier in this batch
+        batch_keys: dict = {}  # key -> fingerprint of the item that will record it
+        for index, f in parsed:
+            pid, qty, key, oid = f['product_id'], f['quantity'], f.get('idempotency_key'), f['related_order_id']
+            if key:
+                fingerprint = _sale_fingerprint(pid, qty, f['unit_price'], f.get('sale_channel'), oid)
+                f['fingerprint'] = fingerprint
+                try:
+                    if key in seen_keys:
+                        results[index] = BatchSaleItemResult(
+                            index=index, status="duplicate", sale_id=seen_keys[key].check(fingerprint),
+                            product_id=pid, quantity=qty,
+                        )
+                        continue
+                except idempotency.IdempotencyConflictError as e:
+                    reject(index, "idempotency_conflict", str(e), product_id=pid, quantity=qty)
+                    continue
+                if key in batch_keys:
+                    if batch_keys[key] != fingerprint:
+                        reject(index, "idempotency_conflict", "Idempotency key is used by another sale in this batch",
+                               product_id=pid, quantity=qty)
+                        continue
+                    duplicate_of[index] = (key, f)
+                    continue
+            if oid is not None:
+                if oid not in order_status:
+                    reject(index, "validation_error", "Related order not found", product_id=pid, quantity=qty)
+                    continue
+                if order_status[oid] not in ("awaiting_confirmation", "completed"):
+                    reject(index, "validation_error", "Order is not in a delivered/completed state", product_id=pid, quantity=qty)
+                    continue
+            if pid not in inventory:
+                reject(index, "product_not_found", f"Inventory record for product {pid} not found", product_id=pid, quantity=qty)
+                continue
+            if available[pid] < qty:
+                reject(index, "insufficient_stock",
+                       f"Insufficient stock: requested {qty}, available {available[pid]}", product_id=pid, quantity=qty)
+                continue
+            available[pid] -= qty
+            if key:
+                batch_keys[key] = f['fingerprint']
+            accepted.append((index, f))
+
+        sales: list = []
+        if accepted:
+            # ===== ATOMIC WRITE PHASE =====
+            deltas: dict = {}
+            for _, f in accepted:
+                deltas[f['product_id']] = deltas.get(f['product_id'], 0) + f['quantity']
+
+            # One guarded UPDATE for every product: no product may go negative
+            delta = case(deltas, value=Inventory.product_id, else_=0)
+            res_upd = await session.execute(
+                update(Inventory)
+                .where(Inventory.product_id.in_(deltas))
+                .where(Inventory.total_stock >= delta)
+                .values(
+                    total_stock=Inventory.total_stock - delta,
+                    total_sold=Inventory.total_sold + delta,
+                    version=Inventory.version + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if res_upd.rowcount != len(deltas):
+                raise InsufficientStockError("Insufficient stock or concurrent modification - please retry")
+
+            now = datetime.utcnow()
+            sale_rows = []
+            for _, f in accepted:
+                channel = normalize_channel(f.get('sale_channel'))
+                sale_rows.append({
+                    'created_at': now,
+                    'product_id': f['product_id'],
+                    'quantity': f['quantity'],
+                    'unit_price': int(f['unit_price']),
+                    'total_amount': int(f['unit_price'] * f['quantity']),
+                    'sold_by_user_id': sold_by_user_id,
+                    'sale_channel': channel,
+                    'related_order_id': f['related_order_id'],
+                    'location': f.get('location'),
+                    'idempotency_key': f.get('idempotency_key'),
+                    'reference': f.get('reference'),
+                    'customer_name': f.get('customer_name'),
+                    'customer_phone': f.get('customer_phone'),
+                    'discount': f.get('discount'),
+                    'payment_method': f.get('payment_method'),
+                    'sale_date': _parse_sale_date(f.get('sale_date')),
+                    'linked_order_id': f.get('linked_order_id'),
+                    'affiliate_code': f.get('affiliate_code') or None,
+                    'affiliate_name': f.get('affiliate_name') or None,
+                    'affiliate_source': f.get('affiliate_source') or None,
+                })
+            res = await session.scalars(insert(Sale).returning(Sale, sort_by_parameter_order=True), sale_rows)
+            sales = list(res.all())
+
+            await session.execute(insert(InventoryTransaction), [
+                {
+                    'inventory_item_id': inventory[sale.product_id].id,
+                    'change': -sale.quantity,  # Negative for sale
+                    'reason': "sale",
+                    'related_sale_id': sale.id,
+                    'related_order_id': sale.related_order_id,
+                    'performed_by_id': sold_by_user_id,
+                    'notes': f"Sale recorded via {row['sale_channel']}"
+                             + (f" | Customer: {row['customer_name']}" if row['customer_name'] else ""),
+                }
+                for sale, row in zip(sales, sale_rows)
+            ])
+
+            for (_, f), sale in zip(accepted, sales):
+                if sale.idempotency_key:
+                    idempotency.remember(
+                        session, idempotency.SCOPE_SALE, sold_by_user_id, sale.idempotency_key, sale.id, f['fingerprint'],
+                    )
+
+            await record_sales_rollup(session, sales)
+            await record_ledger_changes(
+                session, [(inventory[sale.product_id].id, -sale.quantity) for sale in sales],
+            )
+            await _emit_batch_events(session, sales, stock_before, sold_by_user_id)
+
+            # ===== COMMIT - Atomic transaction complete =====
+            await session.commit()
+
+    except SalesError:
+        await session.rollback()
+        raise
+    except IntegrityError:
+        # A concurrent retry with the same idempotency keys committed first
+        await session.rollback()
+        raise ValidationError("Batch sale recording failed: conflicting write - please retry")
+    except Exception as e:
+        await session.rollback()
+        logger.exception(f"[Sales] Unexpected error during batch sale recording: {e}")
+        raise ValidationError(f"Batch sale recording failed: {str(e)}")
+
+    key_to_sale = {}
+    for (index, f), sale in zip(accepted, sales):
+        results[index] = BatchSaleItemResult(
+            index=index, status="created", sale_id=sale.id, product_id=sale.product_id, quantity=sale.quantity,
+        )
+        if sale.idempotency_key:
+            key_to_sale[sale.idempotency_key] = sale.id
+    for index, (key, f) in duplicate_of.items():
+        results[index] = BatchSaleItemResult(
+            index=index, status="duplicate", sale_id=key_to_sale.get(key),
+            product_id=f['product_id'], quantity=f['quantity'],
+        )
+
+    if sales and SALES_AUTOMATION_ENABLED:
+        await _batch_side_effects(session, sales, inventory, stock_before, sold_by_user_id)
+
+    logger.info(
+        f"[Sales] Batch by user={sold_by_user_id}: {len(sales)} recorded, "
+        f"{sum(1 for r in results if r.status == 'rejected')} rejected, "
+        f"{sum(1 for r in results if r.status == 'duplicate')} duplicate"
+    )
+    return results
+
+
+async def _emit_batch_events(session: AsyncSession, sales: list, stock_before: dict, sold_by_user_id: int) -> None:
+    """Events for a batch, in its transaction: per sale, then once per product."""
+    sold: dict = {}
+    for sale in sales:
+        sold[sale.product_id] = sold.get(sale.product_id, 0) + sale.quantity
+        await emit_event(EventType.SALE_CREATED, {
+            'sale_id': sale.id,
+            'product_id': sale.product_id,
+            'quantity': sale.quantity,
+            'user_id': sold_by_user_id,
+            'channel': sale.sale_channel,
+        }, session=session)
+    for product_id, quantity in sold.items():
+        await emit_event(EventType.INVENTORY_UPDATED, {
+            'product_id': product_id,
+            'stock_before': stock_before[product_id],
+            'stock_after': stock_before[product_id] - quantity,
+            'change': -quantity,
+            'reason': 'sale',
+            'user_id': sold_by_user_id,
+            'sale_ids': [s.id for s in sales if s.product_id == product_id],
+        }, session=session)
+
+
+async def _batch_side_effects(
+    session: AsyncSession,
+    sales: list,
+    inventory: dict,
+    stock_before: dict,
+    sold_by_user_id: int,
+) -> None:
+    """Post-commit low stock checks for a batch, once per product."""
+    try:
+        res = await session.execute(
+            select(Inventory).where(Inventory.product_id.in_({s.product_id for s in sales}))
+            .execution_options(populate_existing=True)
+        )
+        refreshed = {inv.product_id: inv for inv in res.scalars().all()}
+        for product_id in dict.fromkeys(s.product_id for s in sales):
+            inventory_item = refreshed.get(product_id, inventory[product_id])
+            await _check_low_stock_trigger(
+                session, inventory_item, sold_by_user_id, previous_stock=stock_before[product_id],
+            )
+    except Exception as e:
+        # Side effects failing should NOT invalidate the sales
+        logger.warning(f"[Sales] Batch side effect failed (sales still valid): {e}")
+
+
 # ============================================================================
 # High-Level API for Slash Commands
 # ============================================================================
@@ -633,52 +993,29 @@ async def get_sales_summary(
 ) -> dict:
     """
     Get aggregated sales summary with optional filters.
+
+    Served from the daily rollups (net of reversed sales).
     
     Returns:
         dict with total_sales, total_quantity, total_amount, by_channel breakdown
     """
-    query = select(
-        func.count(Sale.id).label('total_sales'),
-        func.coalesce(func.sum(Sale.quantity), 0).label('total_quantity'),
-        func.coalesce(func.sum(Sale.total_amount), 0).label('total_amount'),
+    totals = (await aggregate_sales(
+        session, start_date, end_date, user_id=user_id, sale_channel=sale_channel,
+    )).get((), {})
+
+    # By-channel breakdown (not narrowed by sale_channel)
+    channels = await aggregate_sales(
+        session, start_date, end_date, group_by=("sale_channel",), user_id=user_id,
     )
-    
-    if start_date:
-        query = query.where(Sale.created_at >= start_date)
-    if end_date:
-        query = query.where(Sale.created_at < end_date)
-    if user_id:
-        query = query.where(Sale.sold_by_user_id == user_id)
-    if sale_channel:
-        query = query.where(Sale.sale_channel == sale_channel)
-    
-    result = await session.execute(query)
-    row = result.one()
-    
-    # Get by-channel breakdown
-    channel_query = select(
-        Sale.sale_channel,
-        func.count(Sale.id).label('count'),
-        func.coalesce(func.sum(Sale.total_amount), 0).label('amount'),
-    ).group_by(Sale.sale_channel)
-    
-    if start_date:
-        channel_query = channel_query.where(Sale.created_at >= start_date)
-    if end_date:
-        channel_query = channel_query.where(Sale.created_at < end_date)
-    if user_id:
-        channel_query = channel_query.where(Sale.sold_by_user_id == user_id)
-    
-    channel_result = await session.execute(channel_query)
     by_channel = [
-        {"channel": r[0], "count": r[1], "amount": float(r[2])}
-        for r in channel_result.all()
+        {"channel": channel, "count": v["sale_count"], "amount": float(v["total_amount"])}
+        for (channel,), v in channels.items()
     ]
     
     return {
-        "total_sales": row[0],
-        "total_quantity": int(row[1]),
-        "total_amount": float(row[2]),
+        "total_sales": totals.get("sale_count", 0),
+        "total_quantity": int(totals.get("total_quantity", 0)),
+        "total_amount": float(totals.get("total_amount", 0)),
         "by_channel": by_channel,
     }
 
@@ -690,43 +1027,36 @@ async def get_agent_performance(
 ) -> list[dict]:
     """
     Get sales performance grouped by agent (sold_by_user_id).
-    Only includes AGENT channel sales.
+    Only includes AGENT channel sales. Served from the daily rollups.
     
     Returns:
         List of agent performance records with user info.
     """
     # Use 'field' channel for agent sales (agents work in the field)
-    query = select(
-        Sale.sold_by_user_id,
-        func.count(Sale.id).label('total_sales'),
-        func.coalesce(func.sum(Sale.quantity), 0).label('total_quantity'),
-        func.coalesce(func.sum(Sale.total_amount), 0).label('total_amount'),
-    ).where(Sale.sale_channel == SaleChannel.field.value).group_by(Sale.sold_by_user_id)
-    
-    if start_date:
-        query = query.where(Sale.created_at >= start_date)
-    if end_date:
-        query = query.where(Sale.created_at < end_date)
-    
-    query = query.order_by(func.sum(Sale.total_amount).desc())
-    
-    result = await session.execute(query)
-    rows = result.all()
+    agents = await aggregate_sales(
+        session, start_date, end_date,
+        group_by=("sold_by_user_id",), sale_channel=SaleChannel.field.value,
+    )
+    rows = sorted(agents.items(), key=lambda item: item[1]["total_amount"], reverse=True)
     
-    # Fetch user details
+    # Fetch user details in one query
+    users = {}
+    if rows:
+        user_q = select(User.id, User.username, User.display_name).where(
+            User.id.in_([user_id for (user_id,), _ in rows])
+        )
+        users = {r[0]: r for r in (await session.execute(user_q)).all()}
+
     performance = []
-    for user_id, total_sales, total_quantity, total_amount in rows:
-        user_q = select(User.username, User.display_name).where(User.id == user_id)
-        user_res = await session.execute(user_q)
-        user_row = user_res.one_or_none()
-        
+    for (user_id,), totals in rows:
+        user_row = users.get(user_id)
         performance.append({
             "user_id": user_id,
-            "username": user_row[0] if user_row else None,
-            "display_name": user_row[1] if user_row else None,
-            "total_sales": total_sales,
-            "total_quantity": int(total_quantity),
-            "total_amount": float(total_amount),
+            "username": user_row[1] if user_row else None,
+            "display_name": user_row[2] if user_row else None,
+            "total_sales": totals["sale_count"],
+            "total_quantity": int(totals["total_quantity"]),
+            "total_amount": float(totals["total_amount"]),
         })
     
     return performance
@@ -751,14 +1081,10 @@ async def generate_daily_sales_summary(
     # Top product by revenue
     top_product = None
     try:
-        prod_q = select(Sale.product_id, func.coalesce(func.sum(Sale.total_amount), 0).label('amount')).where(
-            Sale.created_at >= start, Sale.created_at < end
-        ).group_by(Sale.product_id).order_by(func.sum(Sale.total_amount).desc()).limit(1)
-        prod_res = await session.execute(prod_q)
-        prod_row = prod_res.one_or_none()
-        if prod_row:
-            prod_id = prod_row[0]
-            amount = float(prod_row[1] or 0)
+        products = await aggregate_sales(session, start, end, group_by=("product_id",))
+        if products:
+            (prod_id,), prod_totals = max(products.items(), key=lambda item: item[1]["total_amount"])
+            amount = float(prod_totals["total_amount"])
             # Try to resolve product name from Inventory
             pname = None
             try:
@@ -1,7 +1,9 @@
 from datetime import datetime
 import json
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from app.db.models import Order, Task
 from app.db.enums import OrderType, OrderStatus, TaskStatus
 import logging
@@ -51,134 +53,88 @@ WORKFLOWS = {
 }
 
 
-async def emit_event(event_name: str, payload: dict):
-    """Event emission hook - emits Socket.IO events and routes to automation triggers."""
+async def emit_event(event_name: str, payload: dict, session: Optional[AsyncSession] = None):
+    """
+    Event emission hook - publishes to the event bus (subscribers: app/services/event_subscribers.py).
+
+    Producers of events with durable subscribers pass their session before
+    committing, so the event is queued in the same transaction.
+    """
     logger.info("Event emitted: %s %s", event_name, payload)
-    
-    # --- Socket.IO routing ---
-    try:
-        from app.realtime.socket import emit_order_updated, emit_order_created, emit_task_completed, emit_sale_created
-        
-        if event_name == 'order.status_changed' or event_name == 'order.completed':
-            await emit_order_updated(
-                order_id=payload.get('order_id'),
-                status=payload.get('status'),
-                order_type=payload.get('order_type')
-            )
-        elif event_name == 'order.submitted':
-            await emit_order_created(
-                order_id=payload.get('order_id'),
-                status=payload.get('status'),
-                order_type=payload.get('order_type')
-            )
-        elif event_name == 'task.completed':
-            await emit_task_completed(
-                task_id=payload.get('task_id'),
-                step_key=payload.get('step_key'),
-                order_id=payload.get('order_id')
-            )
-        elif event_name == 'sale:created':
-            await emit_sale_created(
-                sale_id=payload.get('sale_id'),
-                product_id=payload.get('product_id'),
-                quantity=payload.get('quantity'),
-                user_id=payload.get('user_id'),
-                channel=payload.get('channel'),
-            )
-    except Exception as e:
-        logger.warning(f"Failed to emit socket event {event_name}: {e}")
+    from app.core.event_bus import event_bus
+    await event_bus.publish(event_name, payload, session=session)
+
 
-    # --- Automation trigger routing ---
+def _parse_items(items):
+    """Items as passed by callers (list, JSON string or plain string) -> Python value or None."""
+    if isinstance(items, list):
+        return items
+    if not items:
+        return []
     try:
-        from app.core.events import EventType
-        from app.automation.sales_triggers import SalesAutomationTriggers
-        from app.db.database import async_session
-        from app.core.utils.user_utils import get_user_display_name
-
-        if event_name == EventType.SALE_CREATED:
-            sale_id = payload.get('sale_id')
-            if sale_id:
-                async with async_session() as db:
-                    from app.db.models import Sale
-                    from sqlalchemy import select
-                    res = await db.execute(select(Sale).where(Sale.id == sale_id))
-                    sale = res.scalar_one_or_none()
-                    if sale:
-                        user_display = await get_user_display_name(db, payload.get('user_id'))
-                        payload['user_name'] = user_display
-                        logger.info("Sale recorded by %s (sale_id=%s)", user_display, sale_id)
-                        await SalesAutomationTriggers.on_sale_recorded(
-                            db=db, sale=sale,
-                            transaction_id=payload.get('transaction_id'),
-                        )
+        return json.loads(items)
+    except (TypeError, ValueError):
+        return None
 
-        elif event_name == EventType.INVENTORY_UPDATED:
-            product_id = payload.get('product_id')
-            if product_id:
-                async with async_session() as db:
-                    from app.db.models import Inventory
-                    from sqlalchemy import select
-                    res = await db.execute(
-                        select(Inventory).where(Inventory.product_id == product_id)
-                    )
-                    inv = res.scalar_one_or_none()
-                    if inv and inv.total_stock <= inv.low_stock_threshold:
-                        user_id = payload.get('user_id') or payload.get('sale_id') or 0
-                        user_display = await get_user_display_name(db, user_id)
-                        payload['user_name'] = user_display
-                        logger.warning(
-                            "LOW STOCK: %s triggered by %s (stock=%s, threshold=%s)",
-                            inv.product_name or f"Product {product_id}",
-                            user_display, inv.total_stock, inv.low_stock_threshold,
-                        )
-                        await SalesAutomationTriggers.on_low_stock(
-                            db=db,
-                            inventory_item=inv,
-                            triggered_by_user_id=user_id,
-                        )
 
-        elif event_name == EventType.TRANSACTION_REVERSED:
-            original_id = payload.get('original_transaction_id')
-            user_id = payload.get('user_id')
-            async with async_session() as db:
-                user_display = await get_user_display_name(db, user_id)
-                payload['user_name'] = user_display
-                logger.warning(
-                    "REVERSAL ALERT: reversed by %s, original=%s",
-                    user_display, original_id,
-                )
-                from app.automation.notification_hooks import get_admins_and_managers
-                from app.services.notification_emitter import create_and_emit_to_multiple
-                from app.db.enums import NotificationType
-                admin_ids = await get_admins_and_managers(db)
-                if admin_ids:
-                    await create_and_emit_to_multiple(
-                        db=db,
-                        user_ids=admin_ids,
-                        notification_type=NotificationType.system,
-                        title="Transaction Reversed",
-                        content=f"Transaction #{original_id} was reversed by {user_display}",
-                        metadata={
-                            "action_type": "reversal",
-                            "entity_id": original_id,
-                            "action_url": f"/sales?tab=transactions&highlight={original_id}",
-                        },
-                    )
-                    await db.commit()
+def _normalize_order_fields(metadata, items, customer_name, customer_phone):
+    """
+    Normalize create_order inputs into column values.
 
-    except Exception as e:
-        logger.warning(f"Failed to route automation trigger for {event_name}: {e}")
+    Returns (meta_dict, items_json, customer_name, customer_phone).
+    Form payloads are kept under meta['form_payload'] and their items and
+    customer fields are promoted to columns; delivery_location and
+    per-item quantities are derived into meta unless already present.
+    """
+    if isinstance(metadata, dict):
+        meta_dict = dict(metadata)
+    else:
+        try:
+            meta_dict = json.loads(metadata) if metadata else {}
+        except (TypeError, ValueError):
+            meta_dict = {}
+        if not isinstance(meta_dict, dict):
+            meta_dict = {}
 
-    # --- Rule engine (configurable automation) ---
-    try:
-        from app.automation.rule_engine import rule_engine
-        from app.db.database import async_session as _async_session
+    # If payload looks like a form payload (top-level fields), normalize under 'form_payload'
+    if 'form_payload' not in meta_dict and isinstance(metadata, dict) and ('fields' in metadata or 'responses' in metadata):
+        meta_dict['form_payload'] = metadata
 
-        async with _async_session() as rule_db:
-            payload['_event'] = event_name
-            await rule_engine.process(event_name, payload, rule_db)
-    except Exception as e:
-        logger.warning(f"Rule engine failed for {event_name}: {e}")
+    form_payload = meta_dict.get('form_payload')
+    if not isinstance(form_payload, dict):
+        form_payload = None
+
+    items_list = _parse_items(items)
+    if form_payload is not None:
+        items_from_form = form_payload.get('items') or (form_payload.get('form_payload') or {}).get('items')
+        if items_from_form is not None:
+            items_list = items_from_form if isinstance(items_from_form, list) else []
+        customer_name = customer_name or form_payload.get('customer_name') or (form_payload.get('customer') or {}).get('name')
+        customer_phone = customer_phone or form_payload.get('customer_phone') or (form_payload.get('customer') or {}).get('phone')
+    # Unparseable strings (e.g. a bare product reference) are stored as given
+    items_val = json.dumps(items_list) if items_list is not None else items
+
+    # Do not overwrite explicit meta entries
+    if 'delivery_location' not in meta_dict and form_payload is not None:
+        dl = form_payload.get('delivery_location') or (form_payload.get('delivery') or {}).get('location')
+        if dl is not None:
+            meta_dict['delivery_location'] = dl
+
+    if 'quantities' not in meta_dict and isinstance(items_list, list) and items_list:
+        quantities = []
+        for it in items_list:
+            qv = (it.get('quantity') or it.get('qty')) if isinstance(it, dict) else None
+            try:
+                quantities.append(int(qv) if qv is not None else None)
+            except (TypeError, ValueError):
+                quantities.append(None)
+        meta_dict['quantities'] = quantities
+
+    # DB expects VARCHAR
+    if customer_phone is not None:
+        customer_phone = str(customer_phone)
+
+    return meta_dict, items_val, customer_name, customer_phone
 
 
 async def create_order(
@@ -196,123 +152,54 @@ async def create_order(
     customer_phone: str = None,
     payment_method: str = None,
     internal_comment: str = None,
+    idempotency_key: str = None,
 ):
-    """Create order and associated tasks. First task becomes ACTIVE."""
+    """Create order and associated tasks. First task becomes ACTIVE.
+
+    The order, its workflow steps and its automation tasks are written in
+    ONE transaction (one flush per phase, a single commit). Notifications,
+    webhooks and events only go out after that commit. The automation
+    phase runs in a savepoint so a failure there never loses the order.
+
+    With `idempotency_key` (per creator), a retry returns the order the key
+    already produced, with no side effects; reusing the key for different
+    order contents raises IdempotencyConflictError.
+    """
     # Normalize order_type to lowercase to accept both AGENT_RESTOCK and agent_restock
     order_type = order_type.lower() if order_type else order_type
     
     if order_type not in WORKFLOWS:
         raise ValueError("Invalid order_type")
 
-    # Normalize metadata into a dict regardless of how it was passed (dict or JSON/string)
-    meta_dict = {}
-    if isinstance(metadata, dict):
-        meta_dict = dict(metadata)
-    else:
-        try:
-            meta_dict = json.loads(metadata) if metadata else {}
-        except Exception:
-            try:
-                import ast
-                meta_dict = ast.literal_eval(metadata) if metadata else {}
-            except Exception:
-                meta_dict = {}
-
-    # If payload looks like a form payload (top-level fields), normalize under 'form_payload'
-    if 'form_payload' not in meta_dict and isinstance(metadata, dict) and ('fields' in metadata or 'responses' in metadata):
-        meta_dict['form_payload'] = metadata
-
-    # If a form_payload is present, optionally persist normalized top-level fields
-    form_payload = meta_dict.get('form_payload')
-    if isinstance(form_payload, dict):
-        # Persist items/customer info into order columns for easier querying
-        try:
-            items_from_form = form_payload.get('items') or (form_payload.get('form_payload') or {}).get('items') if isinstance(form_payload, dict) else None
-            if items_from_form is not None:
-                items_list = items_from_form if isinstance(items_from_form, list) else []
-                items_val = json.dumps(items_list)
-            else:
-                # If API passed a python list in 'items' param, prefer that
-                try:
-                    items_list = items if isinstance(items, list) else (json.loads(items) if items else [])
-                except Exception:
-                    items_list = []
-                items_val = json.dumps(items_list) if items_list is not None else None
-        except Exception:
-            items_val = json.dumps(items) if items is not None else None
-
-        customer_name_val = customer_name or form_payload.get('customer_name') or (form_payload.get('customer') or {}).get('name') if isinstance(form_payload, dict) else customer_name
-        customer_phone_val = customer_phone or form_payload.get('customer_phone') or (form_payload.get('customer') or {}).get('phone') if isinstance(form_payload, dict) else customer_phone
-    else:
-        # Non-form path: ensure items stored as JSON string when possible
-        try:
-            items_list = items if isinstance(items, list) else (json.loads(items) if items else [])
-            items_val = json.dumps(items_list) if items_list is not None else None
-        except Exception:
-            items_val = items
-        customer_name_val = customer_name
-        customer_phone_val = customer_phone
-
-    # Ensure meta includes delivery_location and quantities derived from items when possible
-    # Do not overwrite existing explicit meta entries
-    if 'delivery_location' not in meta_dict:
-        # Try to find delivery_location in form_payload or top-level meta
-        dl = None
-        if isinstance(form_payload, dict):
-            dl = form_payload.get('delivery_location') or (form_payload.get('delivery') or {}).get('location')
-        dl = dl or meta_dict.get('delivery_location')
-        if dl is not None:
-            meta_dict['delivery_location'] = dl
-
-    if 'quantities' not in meta_dict:
-        try:
-            qtys = None
-            # try extracting from items_list computed above
-            if 'items_list' in locals() and isinstance(items_list, list) and len(items_list) > 0:
-                q = []
-                for it in items_list:
-                    if isinstance(it, dict):
-                        qv = it.get('quantity') or it.get('qty')
-                        try:
-                            q.append(int(qv) if qv is not None else None)
-                        except Exception:
-                            q.append(None)
-                    else:
-                        q.append(None)
-                qtys = q
-            if qtys is not None:
-                meta_dict['quantities'] = qtys
-        except Exception:
-            pass
-    else:
-        items_val = items
-        customer_name_val = customer_name
-        customer_phone_val = customer_phone
-
-    # Normalize customer_phone to string (DB expects VARCHAR)
-    if customer_phone_val is not None:
-        customer_phone_val = str(customer_phone_val)
-
-    # Create the order; store meta as a JSON string for consistent reading later
-    try:
-        meta_json = json.dumps(meta_dict) if meta_dict else None
-    except Exception:
-        meta_json = str(meta_dict) if meta_dict else None
-
-    # Temporary runtime verification log (remove after verification)
-    try:
-        logger.info(
-            "[ORDER-CREATE] create_order meta=%s",
-            meta_dict,
-        )
-    except Exception:
-        logger.warning("[ORDER-CREATE] failed to log meta_dict")
-
+    meta_dict, items_val, customer_name_val, customer_phone_val = _normalize_order_fields(
+        metadata, items, customer_name, customer_phone
+    )
+    logger.debug("[ORDER-CREATE] create_order meta=%s", meta_dict)
+
+    fingerprint = None
+    if idempotency_key and created_by_id:
+        from app.services import idempotency
+        fingerprint = idempotency.request_fingerprint({
+            "order_type": order_type,
+            "items": items_val,
+            "meta": meta_dict,
+            "customer_name": customer_name_val,
+            "customer_phone": customer_phone_val,
+        })
+        hit = await idempotency.find(session, idempotency.SCOPE_ORDER, created_by_id, idempotency_key)
+        if hit:
+            existing = await session.get(Order, hit.check(fingerprint))
+            if existing:
+                return existing
+
+    # ---- Phase 1: order + workflow steps (one flush) ----
     order = Order(
         order_type=order_type,
-        status=OrderStatus.submitted.value,
+        # The first workflow step starts ACTIVE, so the order is in progress right away
+        status=OrderStatus.in_progress.value,
         items=items_val,
-        meta=meta_json,
+        # Store meta as a JSON string for consistent reading later
+        meta=json.dumps(meta_dict) if meta_dict else None,
         # Track creator for notifications and attribution
         created_by_id=created_by_id,
         # Capture channel context when available
@@ -326,102 +213,82 @@ async def create_order(
         payment_method=payment_method,
         internal_comment=internal_comment,
     )
-    session.add(order)
-    await session.flush()  # ensure order.id
-    print(f"[task_engine] created order id={order.id}")
-
-    tasks_cfg = WORKFLOWS[order_type]
-    tasks = []
-    for i, tcfg in enumerate(tasks_cfg):
-        t = Task(order_id=order.id, step_key=tcfg["step_key"], title=tcfg["title"], required=tcfg.get("required", True))
-        # first task active
-        if i == 0:
-            t.status = TaskStatus.active.value
-            t.activated_at = datetime.utcnow()
-        else:
-            t.status = TaskStatus.pending.value
-        session.add(t)
-        tasks.append(t)
+    now = datetime.utcnow()
+    order.tasks = [
+        Task(
+            step_key=tcfg["step_key"],
+            title=tcfg["title"],
+            required=tcfg.get("required", True),
+            status=TaskStatus.active.value if i == 0 else TaskStatus.pending.value,
+            activated_at=now if i == 0 else None,
+        )
+        for i, tcfg in enumerate(WORKFLOWS[order_type])
+    ]
+    try:
+        # Savepoint: losing a key race undoes this order, not the caller's transaction
+        async with session.begin_nested():
+            session.add(order)
+            await session.flush()
+            if fingerprint:
+                idempotency.remember(session, idempotency.SCOPE_ORDER, created_by_id, idempotency_key, order.id, fingerprint)
+                await session.flush()
+    except IntegrityError:
+        if not fingerprint:
+            raise
+        # A concurrent retry with the same key created the order first
+        hit = await idempotency.find(session, idempotency.SCOPE_ORDER, created_by_id, idempotency_key)
+        existing = await session.get(Order, hit.check(fingerprint)) if hit else None
+        if existing is None:
+            raise
+        return existing
+
+    # ---- Phase 2: automation tasks (one flush, in a savepoint) ----
+    automation_tasks = []
+    if AUTOMATIONS_ENABLED and created_by_id:
+        try:
+            from app.automation.order_triggers import OrderAutomationTriggers
+            async with session.begin_nested():
+                automation_tasks = await OrderAutomationTriggers.on_order_created(session, order, created_by_id)
+        except Exception as e:
+            automation_tasks = []
+            logger.exception(f"[Automation] Failed to trigger order automation for order {order.id}: {e}")
 
     await session.commit()
 
-    # ============================================================
-    # Emit order_created notification to role-based recipients
-    # This MUST happen immediately after order creation, NOT in task hooks.
-    # Uses user_operational_roles to resolve recipients.
-    # ============================================================
+    # ---- Phase 3: side effects (after commit) ----
+    # order_created goes to role-based recipients (user_operational_roles) at
+    # creation time, NOT from task hooks.
+    notifications = []
     try:
         from app.services.notification_emitter import notify_and_emit_order_created_to_roles
         from app.core.utils.user_utils import get_user_display_name as _get_display_name
         _creator_name = await _get_display_name(session, created_by_id) if created_by_id else None
-        await notify_and_emit_order_created_to_roles(
+        notifications = await notify_and_emit_order_created_to_roles(
             db=session,
             order_id=order.id,
-            order_type=order.order_type.value if hasattr(order.order_type, 'value') else order.order_type,
+            order_type=order_type,
             order_reference=order.reference,
             creator_name=_creator_name,
             created_by_id=created_by_id,
+            defer_emit=True,
         )
     except Exception as e:
         logger.error(f"[ORDER_CREATED] Failed to emit order_created notification: {e}")
 
-    # Emit order.submitted with order_type for frontend
-    await emit_event('order.submitted', {"order_id": order.id, "status": order.status, "order_type": order.order_type})
-    
-    # Trigger automation (Phase 6.2)
-    if AUTOMATIONS_ENABLED and created_by_id:
-        try:
-            from app.automation.order_triggers import OrderAutomationTriggers
-            await OrderAutomationTriggers.on_order_created(session, order, created_by_id)
-        except Exception as e:
-            # Log full traceback for easier debugging when automation triggers fail
-            import traceback, sys
-            logger.error(f"[Automation] Failed to trigger order automation: {e}\n{traceback.format_exc()}")
-            # Print to stderr as well so pytest captures full traceback in output
-            print(traceback.format_exc(), file=sys.stderr)
-    """Recompute order status based on tasks. Returns (new_status, changed_flag).
-    NOTE: This function does NOT commit; caller must commit.
-    """
-    # Load tasks
-    q = select(Task).where(Task.order_id == order.id).order_by(Task.id)
-    result = await session.execute(q)
-    tasks = result.scalars().all()
-
-    # Recompute order status based on tasks. Do not return here; persist changes and return the Order object at the end.
-    status_changed = False
-
-    # Detect awaiting confirmation patterns (deliver done, confirm_received pending)
-    deliver_done = any(t.step_key == 'deliver_items' and t.status == TaskStatus.done.value for t in tasks)
-    confirm_pending = any(t.step_key == 'confirm_received' and t.status != TaskStatus.done.value for t in tasks)
-    if deliver_done and confirm_pending:
-        new_status = OrderStatus.awaiting_confirmation.value
-        if order.status != new_status:
-            order.status = new_status
-            session.add(order)
-            status_changed = True
-
-    # If any ACTIVE -> IN_PROGRESS
-    elif any(t.status == TaskStatus.active.value for t in tasks):
-        new_status = OrderStatus.in_progress.value
-        if order.status != new_status:
-            order.status = new_status
-            session.add(order)
-            status_changed = True
+    if automation_tasks:
+        from app.automation.order_triggers import OrderAutomationTriggers
+        await OrderAutomationTriggers.emit_order_tasks_created(session, automation_tasks, created_by_id)
 
-    # If all required tasks done -> COMPLETED
-    else:
-        required_tasks = [t for t in tasks if t.required]
-        if required_tasks and all(t.status == TaskStatus.done.value for t in required_tasks):
-            new_status = OrderStatus.completed.value
-            if order.status != new_status:
-                order.status = new_status
-                session.add(order)
-                status_changed = True
-
-    # Commit any status change so callers see the updated order
-    if status_changed:
+    try:
         await session.commit()
-        await session.refresh(order)
+        from app.services.notification_emitter import emit_deferred_notifications
+        await emit_deferred_notifications(notifications)
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"[ORDER_CREATED] Failed to store order {order.id} notifications: {e}")
+
+    # Emit order.submitted with order_type for frontend
+    await emit_event('order.submitted', {"order_id": order.id, "status": order.status, "order_type": order.order_type})
 
     return order
 
@@ -617,6 +484,7 @@ async def complete_task(session: AsyncSession, task_id: int, user_id: int, commi
                 from app.automation.order_triggers import OrderAutomationTriggers
                 from app.db.models import Task as OrderTask, TaskAssignment
                 from app.db.enums import TaskStatus as OrderTaskStatus, AssignmentStatus
+                from app.services.dispatch import set_assignment_status
 
                 automation_task = await OrderAutomationTriggers._get_order_automation_task(session, order.id)
                 if automation_task:
@@ -635,12 +503,12 @@ async def complete_task(session: AsyncSession, task_id: int, user_id: int, commi
                     if not has_remaining:
                         # No remaining delivery workflow steps - mark delivery assignments DONE for this automation task
                         now = datetime.utcnow()
-                        await session.execute(
-                            update(TaskAssignment)
-                            .where(TaskAssignment.task_id == automation_task.id)
-                            .where(TaskAssignment.role_hint == 'delivery')
-                            .where(TaskAssignment.status != AssignmentStatus.done)
-                            .values(status=AssignmentStatus.done, completed_at=now)
+                        await set_assignment_status(
+                            session, AssignmentStatus.done,
+                            TaskAssignment.task_id == automation_task.id,
+                            TaskAssignment.role_hint == 'delivery',
+                            TaskAssignment.status != AssignmentStatus.done,
+                            completed_at=now,
                         )
                         logger.info(f"[TaskEngine] Marked delivery assignments DONE for automation task {automation_task.id} as all delivery steps completed for order {order.id}")
             except Exception as e:
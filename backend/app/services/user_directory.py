@@ -0,0 +1,310 @@
+"""
+User Directory
+
+Admin user listings and @mention autocomplete that stay fast with tens of
+thousands of users:
+- list_users_page(): filters + search, newest first (id DESC), returning the
+  page AND the total from one query (window count); OFFSET pages for the
+  legacy page/skip parameters, keyset cursors for everything after
+- Search is a case-insensitive substring match on username, email and
+  display_name, served on PostgreSQL by pg_trgm GIN indexes
+  (ix_users_*_trgm); LIKE wildcards in the term are matched literally
+- MentionDirectory: in-memory, prefix-sorted list of active users for
+  autocomplete; invalidated on commits that touch users (insert/delete or
+  a watched column) and on the "cache:user_directory" Redis channel for
+  other pods (app/core/cache_invalidation.py). lookup() serves the same
+  entries by id (notification sender names)
+"""
+import asyncio
+import base64
+import bisect
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import cache_invalidation
+from app.db.enums import UserRole
+from app.db.models import User
+
+logger = logging.getLogger(__name__)
+
+# Cache invalidation channel (Redis: "cache:user_directory")
+INVALIDATION_CHANNEL = "user_directory"
+
+# Reload at least this often even without invalidations
+MAX_AGE_SECONDS = 120
+
+MAX_AUTOCOMPLETE_RESULTS = 20
+
+# User columns shown by autocomplete or deciding who is listed
+_USER_WATCHED_ATTRS = ("username", "display_name", "avatar_url", "is_active", "is_banned", "deleted_at")
+
+
+# ============================================================================
+# Admin listing
+# ============================================================================
+
+@dataclass
+class UserPage:
+    """One page of users plus the total for the filters."""
+    users: List[User]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+def _encode_cursor(user: User, total: int) -> str:
+    raw = json.dumps({"k": user.id, "t": total})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return int(data["k"]), int(data["t"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_condition(term: str):
+    """Case-insensitive substring match on username, email or display name."""
+    pattern = f"%{_escape_like(term.strip())}%"
+    return or_(
+        User.username.ilike(pattern, escape="\\"),
+        User.email.ilike(pattern, escape="\\"),
+        User.display_name.ilike(pattern, escape="\\"),
+    )
+
+
+def filter_criteria(
+    search: Optional[str] = None,
+    role: Optional[str] = None,
+    status: Optional[str] = None,
+    include_deleted: bool = False,
+) -> list:
+    """
+    WHERE clauses shared by the admin listings.
+
+    status: active | inactive | banned | muted | deleted. Unknown roles are
+    ignored, as before. Soft-deleted users are only listed for
+    status="deleted" unless include_deleted is set.
+    """
+    criteria = []
+    if search and search.strip():
+        criteria.append(search_condition(search))
+    if role:
+        try:
+            criteria.append(User.role == UserRole(role))
+        except ValueError:
+            pass
+    if status == "deleted":
+        criteria.append(User.deleted_at.is_not(None))
+        return criteria
+    if not include_deleted:
+        criteria.append(User.deleted_at.is_(None))
+    if status == "active":
+        criteria.extend([User.is_active == True, User.is_banned == False])  # noqa: E712
+    elif status == "inactive":
+        criteria.append(User.is_active == False)  # noqa: E712
+    elif status == "banned":
+        criteria.append(User.is_banned == True)  # noqa: E712
+    elif status == "muted":
+        criteria.append(User.is_muted == True)  # noqa: E712
+    return criteria
+
+
+async def list_users_page(
+    db: AsyncSession,
+    criteria: Iterable = (),
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> UserPage:
+    """
+    Users matching `criteria`, newest first.
+
+    The first page carries the total as a window count (one query); cursor
+    pages skip the count and reuse the total stored in the cursor. Raises
+    ValueError for a malformed cursor.
+    """
+    criteria = list(criteria)
+    if cursor:
+        last_id, total = _decode_cursor(cursor)
+        users = list((await db.execute(
+            select(User).where(*criteria, User.id < last_id).order_by(User.id.desc()).limit(limit)
+        )).scalars().all())
+    else:
+        rows = (await db.execute(
+            select(User, func.count().over().label("total"))
+            .where(*criteria)
+            .order_by(User.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )).all()
+        users = [row[0] for row in rows]
+        if rows:
+            total = int(rows[0].total)
+        elif offset:
+            # Past the end: the window count has no row to ride on
+            total = int((await db.execute(select(func.count(User.id)).where(*criteria))).scalar_one())
+        else:
+            total = 0
+
+    next_cursor = None
+    if len(users) == limit:
+        next_cursor = _encode_cursor(users[-1], total)
+    return UserPage(users=users, total=total, next_cursor=next_cursor)
+
+
+# ============================================================================
+# Mention autocomplete
+# ============================================================================
+
+@dataclass(frozen=True)
+class DirectoryEntry:
+    id: int
+    username: str
+    display_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "id": self.id,
+            "username": self.username,
+            "display_name": self.display_name,
+            "avatar_url": self.avatar_url,
+        }
+
+
+@dataclass
+class _Index:
+    entries: List[DirectoryEntry] = field(default_factory=list)
+    # (lowercased name, entry position) sorted by name, for bisect prefix scans
+    by_username: List[Tuple[str, int]] = field(default_factory=list)
+    by_display_name: List[Tuple[str, int]] = field(default_factory=list)
+    by_id: Dict[int, DirectoryEntry] = field(default_factory=dict)
+
+
+class MentionDirectory:
+    """Process-wide cache of active users for @mention pickers."""
+
+    def __init__(self):
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self._generation = 0
+        self._loaded_generation = -1
+        self._index = _Index()
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return (
+            self.loaded_at is None
+            or self._loaded_generation != self._generation
+            or time.monotonic() - self.loaded_at > MAX_AGE_SECONDS
+        )
+
+    def invalidate(self, broadcast: bool = True) -> None:
+        """Mark the directory stale; with `broadcast`, tell the other pods too."""
+        self._generation += 1
+        if broadcast:
+            cache_invalidation.publish(INVALIDATION_CHANNEL)
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self.is_stale:
+            return
+        async with self._lock:
+            if not self.is_stale:
+                return
+            await self._load(db)
+
+    async def _load(self, db: AsyncSession) -> None:
+        generation = self._generation
+        result = await db.execute(
+            select(User.id, User.username, User.display_name, User.avatar_url).where(
+                User.is_active == True,  # noqa: E712
+                User.is_banned == False,  # noqa: E712
+                User.deleted_at.is_(None),
+            )
+        )
+        index = _Index(entries=[DirectoryEntry(*row) for row in result.all()])
+        for pos, entry in enumerate(index.entries):
+            index.by_id[entry.id] = entry
+            index.by_username.append((entry.username.lower(), pos))
+            if entry.display_name:
+                index.by_display_name.append((entry.display_name.lower(), pos))
+        index.by_username.sort()
+        index.by_display_name.sort()
+
+        self._index = index
+        self._loaded_generation = generation
+        self.loaded_at = time.monotonic()
+        self.version += 1
+        logger.debug(f"[UserDirectory] Loaded v{self.version}: {len(index.entries)} users")
+
+    async def autocomplete(self, db: AsyncSession, prefix: str, limit: int = 10) -> List[DirectoryEntry]:
+        """Active users whose username (first) or display name starts with `prefix`."""
+        await self.ensure_loaded(db)
+        limit = max(1, min(limit, MAX_AUTOCOMPLETE_RESULTS))
+        prefix = prefix.strip().lstrip("@").lower()
+        index = self._index
+
+        found: List[DirectoryEntry] = []
+        seen = set()
+        for keys in (index.by_username, index.by_display_name):
+            i = bisect.bisect_left(keys, (prefix, -1))
+            while i < len(keys) and len(found) < limit and keys[i][0].startswith(prefix):
+                pos = keys[i][1]
+                if pos not in seen:
+                    seen.add(pos)
+                    found.append(index.entries[pos])
+                i += 1
+        return found
+
+
+    async def lookup(self, db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, DirectoryEntry]:
+        """Entries for the given ids; users not listed (inactive, banned, deleted) are left out."""
+        await self.ensure_loaded(db)
+        by_id = self._index.by_id
+        return {uid: by_id[uid] for uid in user_ids if uid in by_id}
+
+
+mention_directory = MentionDirectory()
+
+
+async def resolve_usernames(db: AsyncSession, usernames: Iterable[str]) -> Dict[str, int]:
+    """Map exact usernames to user ids with one query (unknown names are left out)."""
+    names = {u for u in usernames if u}
+    if not names:
+        return {}
+    result = await db.execute(select(User.username, User.id).where(User.username.in_(names)))
+    return dict(result.all())
+
+
+# ============================================================================
+# Automatic invalidation on commit
+# ============================================================================
+
+def _touches_directory(session: Session) -> bool:
+    for obj in session.new | session.deleted:
+        if isinstance(obj, User):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj, include_collections=False):
+            state = obj._sa_instance_state
+            if any(state.attrs[attr].history.has_changes() for attr in _USER_WATCHED_ATTRS):
+                return True
+    return False
+
+
+cache_invalidation.watch(INVALIDATION_CHANNEL, ("users",), mention_directory.invalidate, on_flush=_touches_directory)
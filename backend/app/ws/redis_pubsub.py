@@ -3,6 +3,8 @@ import threading
 import asyncio
 from typing import Optional
 
+from app.core import cache_invalidation
+
 
 def start_redis_listener(redis_client, manager) -> dict:
     """Start a background redis pubsub listener for channel:* and broadcast events to local manager.
@@ -13,8 +15,8 @@ def start_redis_listener(redis_client, manager) -> dict:
 
     try:
         pubsub = redis_client.client.pubsub()
-        # Listen for channel events and global presence events
-        pubsub.psubscribe("channel:*", "presence")
+        # Listen for channel events, global presence events and cache invalidations
+        pubsub.psubscribe("channel:*", "presence", cache_invalidation.CHANNEL_PATTERN)
     except Exception:
         # If redis is not reachable, we still return a control structure
         return {"thread": None, "stop_event": stop_event, "pubsub": None}
@@ -52,6 +54,9 @@ def start_redis_listener(redis_client, manager) -> dict:
                 try:
                     if isinstance(channel_name, bytes):
                         channel_name = channel_name.decode('utf-8')
+                    if channel_name.startswith(cache_invalidation.CHANNEL_PREFIX):
+                        loop.call_soon_threadsafe(cache_invalidation.dispatch, channel_name, payload)
+                        continue
                     # If presence channel, broadcast presence update instead
                     if channel_name == "presence":
                         coro = manager.broadcast_presence(payload)
@@ -0,0 +1,73 @@
+"""Benchmark the batched forecasting engine on a synthetic dataset.
+
+Generates daily sales for N products over D days (weekly seasonality,
+random stockout stretches) and times compute_forecasts() on the NumPy
+path and, optionally, the pure-Python fallback.
+
+Usage (from backend/):
+    PYTHONPATH=. python scripts/benchmark_forecasting.py                       # 10k products, 2 years
+    PYTHONPATH=. python scripts/benchmark_forecasting.py --products 1000 --days 365 --python
+"""
+import argparse
+import random
+import time
+
+import app.ai.forecasting as forecasting
+
+
+def build_dataset(products: int, days: int, seed: int = 42):
+    rng = random.Random(seed)
+    weekly = [0.8, 0.9, 1.0, 1.0, 1.1, 1.4, 0.8]
+    sales, closing, stock = [], [], []
+    for _ in range(products):
+        base = rng.uniform(0.5, 40.0)
+        row = [max(0.0, round(base * weekly[t % 7] * rng.uniform(0.6, 1.4))) for t in range(days)]
+        level = [rng.uniform(50, 500)] * days
+        # One stockout stretch in ~20% of products
+        if rng.random() < 0.2:
+            s = rng.randrange(days)
+            for t in range(s, min(days, s + rng.randrange(1, 14))):
+                row[t] = 0.0
+                level[t] = 0.0
+        sales.append(row)
+        closing.append(level)
+        stock.append(rng.randrange(0, 2000))
+    return sales, closing, stock
+
+
+def run(label, sales, closing, stock):
+    started = time.perf_counter()
+    results = forecasting.compute_forecasts(sales, closing, stock, first_weekday=0)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>8}: {len(results)} products in {elapsed:.3f}s ({elapsed / max(len(results), 1) * 1e6:.1f} us/product)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--python", action="store_true", help="Also time the pure-Python fallback")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    sales, closing, stock = build_dataset(args.products, args.days)
+    print(f"dataset: {args.products} products x {args.days} days built in {time.perf_counter() - started:.1f}s")
+
+    numpy_module = forecasting.np
+    if numpy_module is not None:
+        # Time the vectorized math; list-to-array conversion is a one-off load cost
+        run("numpy", numpy_module.asarray(sales), numpy_module.asarray(closing), numpy_module.asarray(stock))
+    else:
+        print("   numpy: not installed")
+
+    if args.python or numpy_module is None:
+        forecasting.np = None
+        try:
+            run("python", sales, closing, stock)
+        finally:
+            forecasting.np = numpy_module
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Backfill or verify the daily reporting rollups.
+
+Usage:
+    python scripts/rebuild_rollups.py                      # rebuild full history
+    python scripts/rebuild_rollups.py --start 2026-01-01   # rebuild a day range
+    python scripts/rebuild_rollups.py --check              # report drift only
+    python scripts/rebuild_rollups.py --check --repair     # rebuild drifted days
+"""
+import argparse
+import asyncio
+from datetime import date
+
+from app.db.database import async_session
+from app.services.rollups import check_rollup_consistency, rebuild_rollups
+
+
+async def main(args):
+    start_day = date.fromisoformat(args.start) if args.start else None
+    end_day = date.fromisoformat(args.end) if args.end else None
+    async with async_session() as db:
+        if args.check:
+            report = await check_rollup_consistency(db, start_day, end_day, repair=args.repair)
+            print(
+                f"Consistent: {report['consistent']} "
+                f"(sales mismatches={report['sales_mismatch_count']}, "
+                f"production mismatches={report['production_mismatch_count']}, "
+                f"repaired={report['repaired']})"
+            )
+            for m in report["sales_mismatches"] + report["production_mismatches"]:
+                print(f"  {m['key']}: expected={m['expected']} actual={m['actual']}")
+        else:
+            counts = await rebuild_rollups(db, start_day, end_day)
+            print(f"Rebuild completed. {counts['sales_rows']} sales row(s), {counts['production_rows']} production row(s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", help="First day (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--end", help="Last day (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--check", action="store_true", help="Compare rollups with raw tables instead of rebuilding")
+    parser.add_argument("--repair", action="store_true", help="With --check, rebuild days that drifted")
+    asyncio.run(main(parser.parse_args()))
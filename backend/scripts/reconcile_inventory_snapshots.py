@@ -0,0 +1,41 @@
+"""Verify (or rebuild) daily inventory ledger snapshots against the ledger.
+
+The scheduler runs the check with repair daily (inventory_reconciliation in
+app/ai/scheduler.py); this script is for ad-hoc runs and full rebuilds.
+
+Usage:
+    python scripts/reconcile_inventory_snapshots.py                  # report drift only
+    python scripts/reconcile_inventory_snapshots.py --repair         # rebuild drifted items
+    python scripts/reconcile_inventory_snapshots.py --rebuild        # rebuild all snapshots
+    python scripts/reconcile_inventory_snapshots.py --item 12 --item 14
+"""
+import argparse
+import asyncio
+
+from app.db.database import async_session
+from app.services.inventory_snapshots import check_snapshot_consistency, rebuild_snapshots
+
+
+async def main(args):
+    async with async_session() as db:
+        if args.rebuild:
+            counts = await rebuild_snapshots(db, args.item)
+            print(f"Rebuild completed. {counts['rows']} snapshot row(s) for {counts['items']} item(s).")
+            return
+        report = await check_snapshot_consistency(db, args.item, repair=args.repair)
+        print(
+            f"Consistent: {report['consistent']} "
+            f"(snapshot mismatches={report['snapshot_mismatch_count']}, "
+            f"stock mismatches={report['stock_mismatch_count']}, "
+            f"repaired={report['repaired']})"
+        )
+        for m in report["snapshot_mismatches"] + report["stock_mismatches"]:
+            print(f"  {m['key']}: expected={m['expected']} actual={m['actual']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--item", type=int, action="append", help="Inventory item id (repeatable; default all)")
+    parser.add_argument("--repair", action="store_true", help="Rebuild snapshots of items that drifted")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild snapshots from the ledger without checking")
+    asyncio.run(main(parser.parse_args()))
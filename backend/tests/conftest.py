@@ -209,5 +209,8 @@ async def clean_tables(test_engine):
         # delete in reverse order to respect FK constraints
         for table in reversed(Base.metadata.sorted_tables):
             await conn.execute(table.delete())
+    # Rows were deleted outside any ORM session, so drop every cache built from them explicitly
+    from app.core import cache_invalidation
+    cache_invalidation.invalidate_all()
     yield
     # No teardown step needed (tables remain, rows should be empty)
@@ -0,0 +1,67 @@
+"""
+Tests for the admin stats snapshot (app/services/admin_stats.py).
+
+Tests:
+- compute_stats returns every count from one query
+- get_stats serves the cached snapshot until refreshed
+- Dashboard views are audited once per interval
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Channel, Message, Team, User
+from app.services import admin_stats
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    admin_stats.invalidate()
+    admin_stats._last_audited.clear()
+    yield
+    admin_stats.invalidate()
+
+
+@pytest.mark.anyio
+async def test_compute_stats_counts(db_session: AsyncSession):
+    author = User(username='stats_a', email='a@example.com', hashed_password='x', is_active=True, is_system_admin=True)
+    db_session.add_all([
+        author,
+        User(username='stats_b', email='b@example.com', hashed_password='x', is_active=True, is_banned=True),
+        User(username='stats_c', email='c@example.com', hashed_password='x', is_active=False, is_muted=True),
+        Team(name='stats-team'),
+    ])
+    channel = Channel(name='stats-general')
+    db_session.add_all([channel, Channel(name='stats-old', is_archived=True)])
+    await db_session.flush()
+    db_session.add_all([
+        Message(content='hi', channel_id=channel.id, author_id=author.id),
+        Message(content='hello', channel_id=channel.id, author_id=author.id),
+        Message(content='gone', channel_id=channel.id, author_id=author.id, is_deleted=True),
+    ])
+    await db_session.commit()
+
+    stats = await admin_stats.compute_stats(db_session)
+    assert stats['users'] == {
+        'total': 3, 'active': 2, 'active_unbanned': 1, 'admins': 1, 'banned': 1, 'muted': 1,
+    }
+    assert stats['channels'] == {'total': 2, 'archived': 1}
+    assert stats['messages'] == {'total': 2, 'approximate': False}
+    assert stats['teams'] == {'total': 1}
+    assert stats['audit']['total'] == stats['audit']['last_24h']
+
+
+@pytest.mark.anyio
+async def test_get_stats_is_cached_until_refresh(db_session: AsyncSession):
+    first = await admin_stats.get_stats(db_session)
+    db_session.add(User(username='stats_late', email='late@example.com', hashed_password='x', is_active=True))
+    await db_session.commit()
+
+    assert (await admin_stats.get_stats(db_session))['users']['total'] == first['users']['total']
+    refreshed = await admin_stats.get_stats(db_session, refresh=True)
+    assert refreshed['users']['total'] == first['users']['total'] + 1
+
+
+def test_view_audit_is_throttled():
+    assert admin_stats.should_audit_view(1) is True
+    assert admin_stats.should_audit_view(1) is False
+    assert admin_stats.should_audit_view(2) is True
@@ -0,0 +1,223 @@
+"""
+Tests for the AI analysis job runner (app/ai/jobs.py).
+
+Tests:
+- run_all_analysis swaps each module's insights and keeps dismissed ones
+- A failing module marks the job partial without touching other modules
+- A failing analyzer fails its module, which keeps its previous insights
+- POST /api/ai/run returns a job that can be polled
+- One active job per mode; an abandoned one can be taken over
+- A job saved by another worker can be polled from this one
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.ai.analyzers as analyzers
+import app.ai.jobs as jobs
+from app.ai.engine import collect_waste_insights, run_all_analysis
+from app.ai.jobs import (
+    AnalysisModule, create_analysis_job, get_active_job, get_analysis_job, run_analysis_job, session_factory_for,
+)
+from app.core.security import create_access_token, get_password_hash
+from app.db.models import AIAnalysisJob, AIRecommendation, User
+from app.db.enums import AIRecommendationType, AIGenerationMode
+
+
+def _insight(rec_type, summary, is_dismissed=False):
+    return AIRecommendation(
+        type=rec_type,
+        summary=summary,
+        data_refs=json.dumps({}),
+        generated_by=AIGenerationMode.on_demand,
+        is_dismissed=is_dismissed,
+    )
+
+
+async def _fake_waste(session):
+    return [{"type": AIRecommendationType.waste_alert, "summary": "fresh waste", "data_refs": {}}]
+
+
+async def _failing(session):
+    raise RuntimeError("boom")
+
+
+@pytest.mark.anyio
+async def test_run_all_analysis_swaps_module_insights(db_session: AsyncSession, monkeypatch):
+    db_session.add_all([
+        _insight(AIRecommendationType.waste_alert, "stale waste"),
+        _insight(AIRecommendationType.waste_alert, "dismissed waste", is_dismissed=True),
+        _insight(AIRecommendationType.demand_forecast, "stale demand"),
+    ])
+    await db_session.commit()
+
+    monkeypatch.setattr(jobs, "ANALYSIS_MODULES", [
+        AnalysisModule("waste_analysis", _fake_waste, (AIRecommendationType.yield_insight, AIRecommendationType.waste_alert)),
+    ])
+    result = await run_all_analysis(db_session, mode=AIGenerationMode.on_demand)
+
+    assert result["status"] == "completed"
+    assert result["modules"] == {"waste_analysis": 1}
+    assert result["module_timings_ms"]["waste_analysis"] >= 0
+
+    db_session.expire_all()
+    summaries = set((await db_session.execute(select(AIRecommendation.summary))).scalars().all())
+    # Only the module's own non-dismissed insights were replaced
+    assert summaries == {"fresh waste", "dismissed waste", "stale demand"}
+
+
+@pytest.mark.anyio
+async def test_failing_module_marks_job_partial(db_session: AsyncSession, monkeypatch):
+    db_session.add(_insight(AIRecommendationType.demand_forecast, "kept demand"))
+    await db_session.commit()
+
+    monkeypatch.setattr(jobs, "ANALYSIS_MODULES", [
+        AnalysisModule("demand_forecast", _failing, (AIRecommendationType.demand_forecast,)),
+        AnalysisModule("waste_analysis", _fake_waste, (AIRecommendationType.waste_alert,)),
+    ])
+    job = await create_analysis_job(db_session, AIGenerationMode.on_demand)
+    assert job.progress == 0.0
+    await run_analysis_job(job, session_factory_for(db_session))
+
+    assert job.status == "partial"
+    assert job.progress == 1.0
+    assert job.modules["demand_forecast"]["status"] == "error"
+    assert job.modules["demand_forecast"]["error"] == "boom"
+    assert job.modules["waste_analysis"]["insights"] == 1
+    # Progress was saved for other workers
+    saved = await get_analysis_job(db_session, job.id)
+    assert saved.status == "partial"
+    assert saved.modules == job.modules
+
+    # The failed module's previous insights are left in place
+    db_session.expire_all()
+    summaries = set((await db_session.execute(select(AIRecommendation.summary))).scalars().all())
+    assert "kept demand" in summaries
+
+
+@pytest.mark.anyio
+async def test_failing_analyzer_keeps_module_insights(db_session: AsyncSession, monkeypatch):
+    db_session.add(_insight(AIRecommendationType.waste_alert, "kept waste"))
+    await db_session.commit()
+
+    monkeypatch.setattr(analyzers, "analyze_production_yields", _failing)
+    monkeypatch.setattr(analyzers, "analyze_waste_baselines", _fake_waste)
+    monkeypatch.setattr(jobs, "ANALYSIS_MODULES", [
+        AnalysisModule("waste_analysis", collect_waste_insights, (AIRecommendationType.waste_alert,)),
+    ])
+    job = await create_analysis_job(db_session, AIGenerationMode.on_demand)
+    await run_analysis_job(job, session_factory_for(db_session))
+
+    assert job.status == "error"
+    assert job.modules["waste_analysis"]["error"] == "AI-3 analyzers failed: Yield analysis"
+    db_session.expire_all()
+    summaries = set((await db_session.execute(select(AIRecommendation.summary))).scalars().all())
+    assert summaries == {"kept waste"}
+
+
+@pytest.mark.anyio
+async def test_run_endpoint_returns_pollable_job(client, db_session: AsyncSession, monkeypatch):
+    admin = User(
+        username="ai_jobs_admin",
+        email="ai_jobs_admin@example.com",
+        hashed_password=get_password_hash("x"),
+        is_active=True,
+        is_system_admin=True,
+    )
+    db_session.add(admin)
+    await db_session.commit()
+    await db_session.refresh(admin)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin.id), 'username': admin.username})}"}
+
+    monkeypatch.setattr(jobs, "ANALYSIS_MODULES", [
+        AnalysisModule("waste_analysis", _fake_waste, (AIRecommendationType.waste_alert,)),
+    ])
+    resp = await client.post("/api/ai/run?wait=true", headers=headers)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "completed"
+    assert body["modules"]["waste_analysis"]["insights"] == 1
+
+    resp = await client.get(f"/api/ai/jobs/{body['job_id']}", headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["progress"] == 1.0
+
+    resp = await client.get("/api/ai/jobs/missing", headers=headers)
+    assert resp.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_one_active_job_per_mode(db_session: AsyncSession, monkeypatch):
+    monkeypatch.setattr(jobs, "ANALYSIS_MODULES", [
+        AnalysisModule("waste_analysis", _fake_waste, (AIRecommendationType.waste_alert,)),
+    ])
+    first = await create_analysis_job(db_session, AIGenerationMode.on_demand)
+    assert first is not None
+    assert await create_analysis_job(db_session, AIGenerationMode.on_demand) is None
+    # Other modes are independent
+    assert await create_analysis_job(db_session, AIGenerationMode.auto) is not None
+    assert (await get_active_job(db_session, AIGenerationMode.on_demand)).id == first.id
+
+    await run_analysis_job(first, session_factory_for(db_session))
+    assert await get_active_job(db_session, AIGenerationMode.on_demand) is None
+    assert await create_analysis_job(db_session, AIGenerationMode.on_demand) is not None
+
+
+@pytest.mark.anyio
+async def test_abandoned_job_is_taken_over(db_session: AsyncSession):
+    stale = await create_analysis_job(db_session, AIGenerationMode.on_demand)
+    row = await db_session.get(AIAnalysisJob, stale.id)
+    row.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    await db_session.commit()
+
+    assert await get_active_job(db_session, AIGenerationMode.on_demand) is None
+    job = await create_analysis_job(db_session, AIGenerationMode.on_demand)
+    assert job is not None
+    abandoned = await get_analysis_job(db_session, stale.id)
+    assert abandoned.status == "error"
+    assert abandoned.error.startswith("Abandoned")
+
+
+@pytest.mark.anyio
+async def test_poll_job_of_another_worker(client, db_session: AsyncSession):
+    admin = User(
+        username="ai_jobs_poller",
+        email="ai_jobs_poller@example.com",
+        hashed_password=get_password_hash("x"),
+        is_active=True,
+        is_system_admin=True,
+    )
+    db_session.add(admin)
+    now = datetime.utcnow()
+    # Row written by a worker whose process memory this one does not share
+    db_session.add(AIAnalysisJob(
+        id="f" * 32,
+        mode=AIGenerationMode.on_demand.value,
+        status="running",
+        modules=json.dumps({
+            "waste_analysis": {"status": "completed", "insights": 2, "duration_ms": 5.0, "error": None},
+            "demand_forecast": {"status": "running", "insights": 0, "duration_ms": None, "error": None},
+        }),
+        created_at=now,
+        started_at=now,
+        expires_at=now + timedelta(hours=1),
+    ))
+    await db_session.commit()
+    await db_session.refresh(admin)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(admin.id), 'username': admin.username})}"}
+
+    resp = await client.get(f"/api/ai/jobs/{'f' * 32}", headers=headers)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "running"
+    assert body["progress"] == 0.5
+    assert body["insights_generated"] == 2
+
+    # Starting another on-demand run returns the active job
+    resp = await client.post("/api/ai/run", headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["job_id"] == "f" * 32
+    assert resp.json()["message"] == "AI analysis started"
@@ -0,0 +1,92 @@
+"""
+Tests for the batched demand forecasting engine (app/ai/forecasting.py).
+
+Tests:
+- EW velocity, weekday seasonality and coverage on synthetic series
+- Stocked-out days are excluded from demand
+- NumPy and pure-Python paths agree
+- forecast_products / analyze_inventory_coverage read sales from the DB
+"""
+import random
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.ai.forecasting as forecasting
+from app.ai.forecasting import compute_forecasts, forecast_products
+from app.ai.analyzers import analyze_inventory_coverage
+from app.db.models import Inventory
+from app.db.enums import ProductType
+
+
+def test_flat_series_velocity_and_coverage():
+    [fc] = compute_forecasts([[10.0] * 28], [[100.0] * 28], [50], first_weekday=0)
+    assert fc["velocity"] == pytest.approx(10.0)
+    assert fc["seasonality"] == pytest.approx([1.0] * 7)
+    assert fc["demand_7d"] == pytest.approx(70.0)
+    assert fc["coverage_days"] == pytest.approx(5.0)
+    assert fc["stockout_days"] == 0
+
+
+def test_stockout_days_excluded_from_velocity():
+    sales = [10.0] * 21 + [0.0] * 7
+    closing = [100.0] * 21 + [0.0] * 7
+    [fc] = compute_forecasts([sales], [closing], [0], first_weekday=0)
+    assert fc["velocity"] == pytest.approx(10.0)
+    assert fc["flat_daily_avg"] == pytest.approx(7.5)
+    assert fc["stockout_days"] == 7
+    assert fc["coverage_days"] == 0.0
+
+
+def test_weekday_seasonality_shapes_demand():
+    # Saturdays (weekday 5) sell triple
+    sales = [30.0 if t % 7 == 5 else 10.0 for t in range(56)]
+    [fc] = compute_forecasts([sales], [[100.0] * 56], [1000], first_weekday=0)
+    assert fc["seasonality"][5] > 2 * fc["seasonality"][0]
+    assert sum(fc["seasonality"]) == pytest.approx(7.0)
+    assert fc["demand_7d"] == pytest.approx(90.0, rel=0.05)
+
+
+def test_no_demand_has_no_coverage():
+    [fc] = compute_forecasts([[0.0] * 14], [[5.0] * 14], [5], first_weekday=3)
+    assert fc["velocity"] == 0.0
+    assert fc["coverage_days"] is None
+
+
+def test_numpy_and_python_paths_agree(monkeypatch):
+    if forecasting.np is None:
+        pytest.skip("numpy not installed")
+    rng = random.Random(7)
+    sales = [[float(rng.randrange(0, 20)) for _ in range(60)] for _ in range(25)]
+    closing = [[float(rng.choice([0, 5, 50])) for _ in range(60)] for _ in range(25)]
+    stock = [rng.randrange(0, 300) for _ in range(25)]
+
+    vectorized = compute_forecasts(sales, closing, stock, first_weekday=2)
+    monkeypatch.setattr(forecasting, "np", None)
+    looped = compute_forecasts(sales, closing, stock, first_weekday=2)
+
+    for a, b in zip(vectorized, looped):
+        for key in ("velocity", "flat_daily_avg", "demand_7d", "demand_28d"):
+            assert a[key] == pytest.approx(b[key])
+        assert a["seasonality"] == pytest.approx(b["seasonality"])
+        assert (a["coverage_days"] is None) == (b["coverage_days"] is None)
+        if a["coverage_days"] is not None:
+            assert a["coverage_days"] == pytest.approx(b["coverage_days"])
+        assert a["stockout_days"] == b["stockout_days"]
+
+
+@pytest.mark.anyio
+async def test_forecast_products_and_coverage_insight(db_session: AsyncSession):
+    db_session.add(Inventory(product_id=8001, product_name="Paste", product_type=ProductType.finished_good, total_stock=0, total_sold=0))
+    db_session.add(Inventory(product_id=8002, product_name="Idle", product_type=ProductType.finished_good, total_stock=40, total_sold=0))
+    await db_session.commit()
+
+    forecasts = await forecast_products(db_session, lookback_days=14)
+    assert set(forecasts) == {8001, 8002}
+    assert forecasts[8002].velocity == 0.0
+    assert forecasts[8002].coverage_days is None
+
+    insights = await analyze_inventory_coverage(db_session, lookback_days=14)
+    by_product = {i["data_refs"]["product_id"]: i for i in insights}
+    assert "No recent sales" in by_product[8002]["summary"]
+    assert by_product[8001]["data_refs"]["coverage_days"] == 0.0
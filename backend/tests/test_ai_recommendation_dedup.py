@@ -0,0 +1,88 @@
+"""
+Tests for set-based recommendation deduplication (app/ai/recommender.py).
+
+Tests:
+- Saved rows carry the promoted product_id / raw_material_id columns
+- Candidates matching an active recommendation are filtered
+- Dismissed / rejected rows and other types don't count as duplicates
+- Repeated keys within one batch are collapsed
+"""
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ai.engine import save_insights_to_db
+from app.ai.recommender import deduplicate_recommendations, entity_refs, find_duplicate_recommendation
+from app.db.models import AIRecommendation
+from app.db.enums import AIRecommendationType, AIRecommendationStatus, AIGenerationMode
+
+
+def _candidate(rec_type, **refs):
+    return {"type": rec_type, "summary": f"{rec_type.value} {refs}", "data_refs": refs}
+
+
+def _existing(rec_type, status=AIRecommendationStatus.pending, is_dismissed=False, **refs):
+    return AIRecommendation(
+        type=rec_type,
+        summary="existing",
+        data_refs=json.dumps(refs),
+        generated_by=AIGenerationMode.recommendation,
+        status=status,
+        is_dismissed=is_dismissed,
+        **entity_refs(refs),
+    )
+
+
+def test_entity_refs_ignores_non_integers():
+    assert entity_refs({"product_id": 5, "raw_material_id": "7"}) == {"product_id": 5, "raw_material_id": None}
+    assert entity_refs(None) == {"product_id": None, "raw_material_id": None}
+    assert entity_refs({"product_id": True}) == {"product_id": None, "raw_material_id": None}
+
+
+@pytest.mark.anyio
+async def test_deduplicate_against_active_recommendations(db_session: AsyncSession):
+    reorder = AIRecommendationType.reorder_recommendation
+    procurement = AIRecommendationType.procurement_recommendation
+    db_session.add_all([
+        _existing(reorder, product_id=1),
+        _existing(reorder, product_id=2, is_dismissed=True),
+        _existing(reorder, product_id=3, status=AIRecommendationStatus.rejected),
+        _existing(procurement, raw_material_id=10),
+    ])
+    await db_session.commit()
+
+    candidates = [
+        _candidate(reorder, product_id=1),           # duplicate
+        _candidate(reorder, product_id=2),           # existing one dismissed
+        _candidate(reorder, product_id=3),           # existing one rejected
+        _candidate(procurement, raw_material_id=10),  # duplicate
+        _candidate(procurement, product_id=1),       # different type than existing product 1
+        _candidate(reorder, product_id=4),
+        _candidate(reorder, product_id=4),           # repeated within the batch
+        _candidate(reorder),                         # no entity: never a duplicate
+    ]
+    unique = await deduplicate_recommendations(db_session, candidates)
+
+    kept = [(r["type"], r["data_refs"].get("product_id"), r["data_refs"].get("raw_material_id")) for r in unique]
+    assert kept == [
+        (reorder, 2, None),
+        (reorder, 3, None),
+        (procurement, 1, None),
+        (reorder, 4, None),
+        (reorder, None, None),
+    ]
+
+    assert (await find_duplicate_recommendation(db_session, reorder, product_id=1)) is not None
+    assert (await find_duplicate_recommendation(db_session, reorder, product_id=2)) is None
+
+
+@pytest.mark.anyio
+async def test_saved_insights_promote_entity_columns(db_session: AsyncSession):
+    [saved] = await save_insights_to_db(
+        db_session,
+        [{"type": AIRecommendationType.demand_forecast, "summary": "s", "data_refs": {"product_id": 42}}],
+        AIGenerationMode.auto,
+    )
+    assert saved.product_id == 42
+    assert saved.raw_material_id is None
@@ -0,0 +1,198 @@
+"""
+Tests for cluster-safe scheduling (app/ai/scheduler.py + scheduler_store.py).
+
+Tests:
+- Leader lease is exclusive, renewable and taken over after expiry
+- A fire time is claimed by one worker only, and only once
+- A run that lost its lock does not release the new holder's
+- latest_fire_time coalesces missed occurrences
+- scheduler_tick: baseline on first sight, catch-up run, no re-run, leader only
+- trigger_job on a non-leader is queued for the leader
+- setup_scheduler(ai_jobs=False) schedules only the maintenance jobs
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+apscheduler = pytest.importorskip("apscheduler")
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+import app.ai.scheduler as scheduler
+from app.ai.jobs import session_factory_for
+from app.ai.scheduler_store import (
+    claim_job_run,
+    get_job_state,
+    get_lease,
+    record_job_result,
+    release_lease,
+    try_acquire_lease,
+)
+
+
+@pytest.mark.anyio
+async def test_leader_lease_exclusive_and_expiring(db_session: AsyncSession):
+    assert await try_acquire_lease(db_session, "worker-a", ttl_seconds=60, name="test_lease") is True
+    assert await try_acquire_lease(db_session, "worker-b", ttl_seconds=60, name="test_lease") is False
+    assert await try_acquire_lease(db_session, "worker-a", ttl_seconds=60, name="test_lease") is True
+
+    lease = await get_lease(db_session, "test_lease")
+    lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    await db_session.commit()
+    assert await try_acquire_lease(db_session, "worker-b", ttl_seconds=60, name="test_lease") is True
+    assert (await get_lease(db_session, "test_lease")).owner == "worker-b"
+
+    await release_lease(db_session, "worker-b", name="test_lease")
+    assert await try_acquire_lease(db_session, "worker-a", ttl_seconds=60, name="test_lease") is True
+
+
+@pytest.mark.anyio
+async def test_fire_time_claimed_once(db_session: AsyncSession):
+    fire = datetime(2026, 1, 1, 2, 0)
+    runtime = timedelta(minutes=5)
+
+    assert await claim_job_run(db_session, "job_x", "worker-a", runtime, fire_time=fire) is True
+    # Locked and already claimed
+    assert await claim_job_run(db_session, "job_x", "worker-b", runtime, fire_time=fire) is False
+
+    started = datetime.utcnow()
+    await record_job_result(db_session, "job_x", "worker-a", started, {"status": "completed"})
+    # Lock released, but the same fire time is never claimed twice
+    assert await claim_job_run(db_session, "job_x", "worker-b", runtime, fire_time=fire) is False
+    assert await claim_job_run(db_session, "job_x", "worker-b", runtime, fire_time=fire + timedelta(days=1)) is True
+
+    state = await get_job_state(db_session, "job_x")
+    assert state.run_count == 1
+    assert state.last_status == "completed"
+    assert state.running_owner == "worker-b"
+
+
+@pytest.mark.anyio
+async def test_overrun_result_keeps_new_owner_lock(db_session: AsyncSession):
+    fire = datetime(2026, 1, 1, 2, 0)
+    started = datetime.utcnow()
+    assert await claim_job_run(db_session, "job_y", "worker-a", timedelta(seconds=-1), fire_time=fire) is True
+    # worker-a overran its max runtime and worker-b reclaimed the job
+    assert await claim_job_run(db_session, "job_y", "worker-b", timedelta(minutes=5)) is True
+
+    await record_job_result(db_session, "job_y", "worker-a", started, {"status": "completed"})
+    assert await claim_job_run(db_session, "job_y", "worker-c", timedelta(minutes=5)) is False
+    state = await get_job_state(db_session, "job_y")
+    assert state.running_owner == "worker-b"
+    assert state.run_count == 0
+
+    await record_job_result(db_session, "job_y", "worker-b", started, {"status": "completed"})
+    state = await get_job_state(db_session, "job_y")
+    assert state.running_owner is None
+    assert state.run_count == 1
+
+
+def test_latest_fire_time_coalesces_missed_runs():
+    trigger = CronTrigger(hour=2, minute=0, timezone="UTC")
+    since = datetime(2026, 1, 1, 0, 0)
+    assert scheduler.latest_fire_time(trigger, since, datetime(2026, 1, 3, 5, 0)) == datetime(2026, 1, 3, 2, 0)
+    assert scheduler.latest_fire_time(trigger, since, datetime(2026, 1, 1, 1, 0)) is None
+    # The fire time equal to `since` was already handled
+    assert scheduler.latest_fire_time(trigger, datetime(2026, 1, 1, 2, 0), datetime(2026, 1, 1, 3, 0)) is None
+
+    # Interval jobs keep even gaps across midnight, whatever the interval
+    trigger = IntervalTrigger(hours=5, start_date=scheduler.INTERVAL_EPOCH)
+    first = scheduler.latest_fire_time(trigger, since, datetime(2026, 1, 1, 23, 0))
+    second = scheduler.latest_fire_time(trigger, first, first + timedelta(hours=5))
+    assert second - first == timedelta(hours=5)
+    assert second.date() != first.date()
+
+
+@pytest.fixture
+def cluster(db_session, monkeypatch):
+    """Point the scheduler at the test DB with one counting job."""
+    calls = []
+
+    async def counting_job():
+        calls.append(datetime.utcnow())
+        return {"status": "completed"}
+
+    monkeypatch.setattr(scheduler, "_async_session_factory", session_factory_for(db_session))
+    monkeypatch.setattr(scheduler, "JOB_FUNCTIONS", {"counting_job": counting_job})
+    monkeypatch.setattr(scheduler, "_scheduled_jobs", {
+        "counting_job": scheduler.ScheduledJob(
+            "counting_job", "Counting", CronTrigger(minute=0, timezone="UTC"),
+            catchup_window=timedelta(hours=6), max_runtime=timedelta(minutes=5),
+        ),
+    })
+    monkeypatch.setattr(scheduler, "WORKER_ID", "worker-a")
+    monkeypatch.setattr(scheduler, "_is_leader", False)
+    return calls
+
+
+async def _drain():
+    for task in list(scheduler._running_tasks.values()):
+        await task
+
+
+@pytest.mark.anyio
+async def test_tick_runs_missed_fire_time_once_on_leader(db_session: AsyncSession, cluster, monkeypatch):
+    await scheduler.scheduler_tick()
+    await _drain()
+    assert scheduler._is_leader is True
+    assert cluster == []  # first sight only records a baseline
+
+    state = await get_job_state(db_session, "counting_job")
+    state.last_fire_time = datetime.utcnow() - timedelta(hours=3)
+    await db_session.commit()
+
+    await scheduler.scheduler_tick()
+    await _drain()
+    assert len(cluster) == 1  # three missed hours coalesced into one run
+
+    await scheduler.scheduler_tick()
+    await _drain()
+    assert len(cluster) == 1
+
+    # Another worker never becomes leader while the lease is held
+    monkeypatch.setattr(scheduler, "WORKER_ID", "worker-b")
+    monkeypatch.setattr(scheduler, "_is_leader", False)
+    state = await get_job_state(db_session, "counting_job")
+    state.last_fire_time = datetime.utcnow() - timedelta(hours=3)
+    await db_session.commit()
+    await scheduler.scheduler_tick()
+    await _drain()
+    assert scheduler._is_leader is False
+    assert len(cluster) == 1
+
+    state = await get_job_state(db_session, "counting_job")
+    assert state.run_count == 1
+    assert state.last_run_by == "worker-a"
+
+
+@pytest.mark.anyio
+async def test_trigger_on_non_leader_is_routed(db_session: AsyncSession, cluster, monkeypatch):
+    monkeypatch.setattr(scheduler, "_scheduler_enabled", True)
+    monkeypatch.setattr(scheduler, "TRIGGER_POLL_SECONDS", 0.01)
+
+    result = await scheduler.trigger_job("counting_job", requested_by_id=7, wait_seconds=0.05)
+    assert result["status"] == "queued"
+    assert cluster == []
+
+    state = await get_job_state(db_session, "counting_job")
+    assert state.trigger_requested_at is not None
+    assert state.trigger_requested_by_id == 7
+
+    # The leader picks the request up on its next tick
+    await scheduler.scheduler_tick()
+    await _drain()
+    assert len(cluster) == 1
+    state = await get_job_state(db_session, "counting_job")
+    assert state.trigger_requested_at is None
+
+
+@pytest.mark.anyio
+async def test_maintenance_only_scheduler(monkeypatch):
+    monkeypatch.setattr(scheduler, "_scheduled_jobs", {})
+    scheduler.setup_scheduler(ai_jobs=False)
+    try:
+        assert set(scheduler._scheduled_jobs) == set(scheduler.MAINTENANCE_JOBS)
+        assert scheduler.get_scheduler_status()["enabled"] is True
+    finally:
+        scheduler.shutdown_scheduler()
@@ -211,3 +211,36 @@ async def test_claim_inserts_task_claimed_event(test_session: AsyncSession):
     res = await test_session.execute(select(TaskEvent).where(TaskEvent.task_id == t.id, TaskEvent.event_type == TaskEventType.task_claimed))
     ev = res.scalar_one_or_none()
     assert ev is not None, "Expected a TaskEvent of type task_claimed to be created on claim"
+
+
+@pytest.mark.anyio
+async def test_claim_outcomes_without_locking_path(test_session: AsyncSession):
+    """Admins bypass required_role; finished tasks are invalid; the claimer gets an assignment."""
+    from app.db.models import TaskAssignment
+
+    admin = User(email='fastadmin@example.com', username='fastadmin', hashed_password='x', is_active=True, is_system_admin=True)
+    driver = User(email='fastdriver@example.com', username='fastdriver', hashed_password='x', is_active=True)
+    test_session.add_all([admin, driver])
+    await test_session.commit()
+
+    restricted = AutomationTask(task_type=AutomationTaskType.restock, status=AutomationTaskStatus.open, title='Delivery only', created_by_id=driver.id, required_role='delivery')
+    done = AutomationTask(task_type=AutomationTaskType.restock, status=AutomationTaskStatus.completed, title='Done', created_by_id=driver.id)
+    test_session.add_all([restricted, done])
+    await test_session.commit()
+
+    from app.automation.service import ClaimInvalidStateError, ClaimNotFoundError
+    with pytest.raises(ClaimInvalidStateError):
+        await AutomationService.claim_task(db=test_session, task_id=done.id, user_id=driver.id)
+    with pytest.raises(ClaimNotFoundError):
+        await AutomationService.claim_task(db=test_session, task_id=done.id + 1000, user_id=driver.id)
+
+    task = await AutomationService.claim_task(db=test_session, task_id=restricted.id, user_id=admin.id)
+    assert (task.status, task.claimed_by_user_id) == (AutomationTaskStatus.claimed, admin.id)
+    assignment = (await test_session.execute(
+        select(TaskAssignment).where(TaskAssignment.task_id == restricted.id)
+    )).scalar_one()
+    assert (assignment.user_id, assignment.role_hint) == (admin.id, 'delivery')
+
+    # Already claimed, but the role check still answers first
+    with pytest.raises(ClaimPermissionError):
+        await AutomationService.claim_task(db=test_session, task_id=restricted.id, user_id=driver.id)
@@ -0,0 +1,70 @@
+"""
+Tests for shared cache invalidation (app/core/cache_invalidation.py).
+
+Tests:
+- Keys changed by several flushes are invalidated once, after commit, and broadcast
+- Bulk statements on a watched table invalidate everything
+- A rollback invalidates locally only
+- Messages from other pods reach the registered cache
+"""
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import cache_invalidation
+from app.db.models import RawMaterial
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """A keyed cache of raw material names, recording its invalidations."""
+    monkeypatch.setattr(cache_invalidation, "_watches", dict(cache_invalidation._watches))
+    monkeypatch.setattr(cache_invalidation, "_by_table", {})
+    recorded = []
+
+    def changed_names(session):
+        return {obj.name for obj in session.new | session.dirty if isinstance(obj, RawMaterial)}
+
+    cache_invalidation.watch(
+        "test_materials", ("raw_materials",),
+        lambda keys, broadcast: recorded.append((keys, broadcast)),
+        on_flush=changed_names, keyed=True,
+    )
+    return recorded
+
+
+@pytest.mark.anyio
+async def test_flushed_keys_invalidate_after_commit(db_session: AsyncSession, calls):
+    db_session.add(RawMaterial(name="Oil", unit="l", current_stock=1))
+    await db_session.flush()
+    db_session.add(RawMaterial(name="Nuts", unit="kg", current_stock=1))
+    await db_session.flush()
+    assert calls == []
+
+    await db_session.commit()
+    assert calls == [(["Nuts", "Oil"], True)]
+
+    await db_session.execute(update(RawMaterial).values(current_stock=0))
+    await db_session.commit()
+    assert calls[-1] == (None, True)
+
+
+@pytest.mark.anyio
+async def test_rollback_invalidates_locally(db_session: AsyncSession, calls):
+    db_session.add(RawMaterial(name="Salt", unit="kg", current_stock=1))
+    await db_session.flush()
+    await db_session.rollback()
+    assert calls == [(["Salt"], False)]
+
+    await db_session.commit()
+    assert len(calls) == 1
+
+
+def test_dispatch_remote_message(calls):
+    assert cache_invalidation.dispatch("cache:test_materials", {"type": "cache_invalidated", "keys": ["Oil"]})
+    assert cache_invalidation.dispatch("cache:test_materials", {"type": "cache_invalidated"})
+    assert calls == [(["Oil"], False), (None, False)]
+
+    assert not cache_invalidation.dispatch("presence", {"type": "presence_update"})
+    assert not cache_invalidation.dispatch("cache:unknown", {"type": "cache_invalidated"})
+    assert len(calls) == 2
@@ -0,0 +1,141 @@
+"""
+Tests for workload-aware dispatch (app/services/dispatch.py).
+
+Tests:
+- Open-assignment counters follow ORM changes and set_assignment_status();
+  other bulk statements are logged and left to reconcile
+- Counters roll back with the transaction; reconcile rebuilds them
+- Least-loaded selection, dispatch_task and per-role queue depth
+"""
+import logging
+
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.automation.order_triggers import OrderAutomationTriggers
+from app.automation.service import AutomationService
+from app.db.enums import AssignmentStatus, AutomationTaskStatus, AutomationTaskType
+from app.db.models import AutomationTask, TaskAssignment, User, UserOperationalRole, UserWorkload
+from app.services.dispatch import (
+    dispatch_task, get_loads, queue_depths, reconcile_workloads, set_assignment_status,
+)
+
+
+async def _user(session: AsyncSession, username: str, *roles: str) -> User:
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x", is_active=True)
+    session.add(user)
+    await session.flush()
+    for role in roles:
+        session.add(UserOperationalRole(user_id=user.id, role=role))
+    await session.commit()
+    return user
+
+
+async def _task(session: AsyncSession, creator: User, role: str | None = None) -> AutomationTask:
+    task = AutomationTask(
+        task_type=AutomationTaskType.restock,
+        title=f"{role or 'generic'} task",
+        created_by_id=creator.id,
+        required_role=role,
+        status=AutomationTaskStatus.open,
+    )
+    session.add(task)
+    await session.commit()
+    return task
+
+
+@pytest.mark.anyio
+async def test_counters_follow_assignment_changes(db_session: AsyncSession, caplog):
+    a = await _user(db_session, "wl_a")
+    b = await _user(db_session, "wl_b")
+    c = await _user(db_session, "wl_c")
+    t1 = await _task(db_session, a)
+    t2 = await _task(db_session, a)
+
+    await AutomationService.assign_user_to_task(db_session, t1.id, a.id, role_hint="agent")
+    await AutomationService.assign_user_to_task(db_session, t2.id, a.id, role_hint="agent")
+    placeholder = await AutomationService.assign_user_to_task(db_session, t2.id, None, role_hint="delivery")
+    assert await get_loads(db_session, [a.id, b.id]) == {a.id: 2}
+
+    # Placeholder bound to a user (ORM update of user_id)
+    await AutomationService.assign_user_to_task(db_session, t2.id, b.id, role_hint="delivery")
+    assert await get_loads(db_session, [a.id, b.id]) == {a.id: 2, b.id: 1}
+
+    # Reassignment moves the load
+    await AutomationService.reassign_assignment(db_session, placeholder.id, new_user_id=c.id)
+    assert await get_loads(db_session, [a.id, b.id, c.id]) == {a.id: 2, b.id: 0, c.id: 1}
+
+    # Task completion closes its assignments with a bulk UPDATE
+    await AutomationService.update_task_status(db_session, t2.id, AutomationTaskStatus.completed)
+    assert await get_loads(db_session, [a.id, c.id]) == {a.id: 1, c.id: 0}
+
+    # Bulk status changes through the helper
+    assert await set_assignment_status(db_session, AssignmentStatus.skipped, TaskAssignment.task_id == t1.id) == 1
+    await db_session.commit()
+    assert await get_loads(db_session, [a.id]) == {a.id: 0}
+    assert await set_assignment_status(db_session, AssignmentStatus.pending, TaskAssignment.task_id == t1.id) == 1
+    assert await set_assignment_status(db_session, AssignmentStatus.in_progress, TaskAssignment.task_id == t1.id) == 1
+    await db_session.commit()
+    assert await get_loads(db_session, [a.id]) == {a.id: 1}
+
+    # Any other bulk statement is only logged; reconcile repairs the counters
+    with caplog.at_level(logging.WARNING, logger="app.services.dispatch"):
+        await db_session.execute(delete(TaskAssignment).where(TaskAssignment.task_id == t1.id))
+    await db_session.commit()
+    assert "bypasses the workload counters" in caplog.text
+    assert await get_loads(db_session, [a.id]) == {a.id: 1}
+    await reconcile_workloads(db_session)
+    assert await get_loads(db_session, [a.id]) == {}
+
+
+@pytest.mark.anyio
+async def test_counters_roll_back_and_reconcile(db_session: AsyncSession):
+    a = await _user(db_session, "wl_rb")
+    task = await _task(db_session, a)
+    user_id, task_id = a.id, task.id
+
+    db_session.add(TaskAssignment(task_id=task_id, user_id=user_id, role_hint="agent"))
+    await db_session.flush()
+    assert await get_loads(db_session, [user_id]) == {user_id: 1}
+    await db_session.rollback()
+    assert await get_loads(db_session, [user_id]) == {}
+
+    db_session.add(TaskAssignment(task_id=task_id, user_id=user_id, role_hint="agent", status=AssignmentStatus.in_progress))
+    await db_session.commit()
+    await db_session.execute(delete(UserWorkload))
+    await db_session.commit()
+    assert await reconcile_workloads(db_session) == 1
+    assert await get_loads(db_session, [user_id]) == {user_id: 1}
+
+
+@pytest.mark.anyio
+async def test_least_loaded_dispatch_and_queue_depth(db_session: AsyncSession):
+    admin = await _user(db_session, "wl_admin")
+    busy = await _user(db_session, "wl_foreman_busy", "foreman")
+    idle = await _user(db_session, "wl_foreman_idle", "foreman")
+    busy_id, idle_id = busy.id, idle.id
+    for _ in range(2):
+        other = await _task(db_session, admin)
+        await AutomationService.assign_user_to_task(db_session, other.id, busy_id, role_hint="foreman")
+
+    queued = [await _task(db_session, admin, "foreman") for _ in range(3)]
+    await _task(db_session, admin)
+    depths = await queue_depths(db_session)
+    assert depths["foreman"] == {"queued": 3, "staff": 2, "open_assignments": 2}
+    assert depths["any"]["queued"] == 1
+
+    assert await OrderAutomationTriggers._find_user_by_role(db_session, "warehouse_staff") == idle_id
+
+    # Dispatch claims for the least-loaded foreman until loads even out
+    claimed = [(await dispatch_task(db_session, t.id)).claimed_by_user_id for t in queued]
+    assert claimed[:2] == [idle_id, idle_id]
+    assert claimed[2] in (busy_id, idle_id)
+    assert (await queue_depths(db_session))["foreman"]["queued"] == 0
+
+    loads = await get_loads(db_session, [busy_id, idle_id])
+    assert sum(loads.values()) == 5
+    assignees = (await db_session.execute(
+        select(TaskAssignment.user_id).where(TaskAssignment.task_id.in_([t.id for t in queued]))
+    )).scalars().all()
+    assert sorted(assignees) == sorted(claimed)
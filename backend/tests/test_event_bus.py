@@ -0,0 +1,189 @@
+"""
+Tests for the in-process event bus (app/core/event_bus.py).
+
+Tests:
+- Events reach subscribers of their type and ALL_EVENTS, each with its own payload copy
+- A failing or slow subscriber doesn't affect the others; metrics count both
+- Concurrency limits hold and events beyond the pending cap are dropped
+- Durable subscribers are delivered from the outbox, retried with backoff
+- Without the outbox relay, durable subscribers are delivered in-process
+- With a session, events wait for its commit and vanish on rollback;
+  without one, the outbox rows are committed before publish() returns
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.event_bus import ALL_EVENTS, EventBus
+from app.db import database
+from app.db.models import EventOutbox
+
+
+def _factory(session: AsyncSession):
+    return sessionmaker(session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.anyio
+async def test_routing_and_error_isolation():
+    bus = EventBus()
+    seen = []
+
+    @bus.subscribe('order.submitted', name='orders')
+    async def orders(event):
+        event.payload['touched'] = True
+        seen.append(('orders', event.name))
+
+    @bus.subscribe(ALL_EVENTS, name='everything')
+    async def everything(event):
+        seen.append(('everything', event.name, 'touched' in event.payload))
+
+    @bus.subscribe('order.submitted', name='broken')
+    async def broken(event):
+        raise RuntimeError('boom')
+
+    @bus.subscribe('order.submitted', name='slow', timeout=0.05)
+    async def slow(event):
+        await asyncio.sleep(1)
+
+    payload = {'order_id': 1}
+    await bus.publish('order.submitted', payload)
+    await bus.publish('task.completed', {'task_id': 2})
+    await bus.drain()
+
+    assert sorted(seen) == [
+        ('everything', 'order.submitted', False),
+        ('everything', 'task.completed', False),
+        ('orders', 'order.submitted'),
+    ]
+    assert payload == {'order_id': 1}
+    stats = bus.stats()['subscribers']
+    assert (stats['broken']['calls'], stats['broken']['failures']) == (1, 1)
+    assert stats['slow']['failures'] == 1
+    assert stats['everything']['calls'] == 2
+
+
+@pytest.mark.anyio
+async def test_concurrency_limit_and_pending_cap():
+    bus = EventBus(max_pending=3)
+    release = asyncio.Event()
+    running = []
+
+    @bus.subscribe('sale:created', name='limited', concurrency=2)
+    async def limited(event):
+        running.append(event.payload['n'])
+        await release.wait()
+
+    for n in range(5):
+        await bus.publish('sale:created', {'n': n})
+    await asyncio.sleep(0.01)
+    stats = bus.stats()['subscribers']['limited']
+    assert (stats['pending'], stats['running'], stats['dropped']) == (3, 2, 2)
+
+    release.set()
+    await bus.drain()
+    assert sorted(running) == [0, 1, 2]
+    assert bus.stats()['subscribers']['limited']['pending'] == 0
+
+
+@pytest.mark.anyio
+async def test_outbox_delivery_with_retry(db_session: AsyncSession):
+    bus = EventBus()
+    attempts = []
+
+    @bus.subscribe('transaction:reversed', name='alerts', durable=True)
+    async def alerts(event):
+        attempts.append(event.payload)
+        if len(attempts) == 1:
+            raise RuntimeError('mail server down')
+
+    await bus.publish('transaction:reversed', {'original_transaction_id': 7}, session=db_session)
+    await db_session.commit()
+    assert attempts == []
+
+    assert await bus.relay_once(_factory(db_session)) == 1
+    row = (await db_session.execute(select(EventOutbox))).scalar_one()
+    await db_session.refresh(row)
+    assert (row.status, row.attempts, row.last_error) == ('pending', 1, 'mail server down')
+    assert row.next_attempt_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+
+    # Not due yet
+    assert await bus.relay_once(_factory(db_session)) == 0
+
+    await db_session.execute(
+        update(EventOutbox).values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    await db_session.commit()
+    assert await bus.relay_once(_factory(db_session)) == 1
+    await db_session.refresh(row)
+    assert (row.status, row.attempts, row.last_error) == ('delivered', 2, None)
+    assert attempts == [{'original_transaction_id': 7}] * 2
+    assert bus.stats()['relayed'] == 1
+
+
+@pytest.mark.anyio
+async def test_durable_delivered_in_process_without_outbox(db_session: AsyncSession, caplog):
+    bus = EventBus(outbox=False)
+    seen = []
+
+    with caplog.at_level(logging.WARNING, logger='app.core.event_bus'):
+        @bus.subscribe('transaction:reversed', name='alerts', durable=True)
+        async def alerts(event):
+            seen.append(event.payload)
+    assert 'durable subscriber alerts is delivered in-process' in caplog.text
+
+    await bus.publish('transaction:reversed', {'original_transaction_id': 8}, session=db_session)
+    await db_session.commit()
+    await bus.drain()
+    assert seen == [{'original_transaction_id': 8}]
+    assert (await db_session.execute(select(EventOutbox))).scalars().all() == []
+
+
+@pytest.mark.anyio
+async def test_session_publish_follows_the_transaction(db_session: AsyncSession):
+    bus = EventBus()
+    seen = []
+
+    @bus.subscribe('transaction:reversed', name='socket')
+    async def socket(event):
+        seen.append(event.payload['original_transaction_id'])
+
+    @bus.subscribe('transaction:reversed', name='alerts', durable=True)
+    async def alerts(event):
+        pass
+
+    await bus.publish('transaction:reversed', {'original_transaction_id': 1}, session=db_session)
+    await bus.drain()
+    assert seen == []  # not before the commit
+    await db_session.rollback()
+
+    await bus.publish('transaction:reversed', {'original_transaction_id': 2}, session=db_session)
+    await db_session.commit()
+    await bus.drain()
+    assert seen == [2]
+    rows = (await db_session.execute(select(EventOutbox))).scalars().all()
+    assert [row.payload for row in rows] == ['{"original_transaction_id": 2}']
+
+
+@pytest.mark.anyio
+async def test_publish_without_session_commits_outbox_rows(db_session: AsyncSession, monkeypatch):
+    bus = EventBus()
+
+    @bus.subscribe('transaction:reversed', name='alerts', durable=True)
+    async def alerts(event):
+        pass
+
+    monkeypatch.setattr(database, 'async_session', _factory(db_session))
+    await bus.publish('transaction:reversed', {'original_transaction_id': 3})
+    assert len((await db_session.execute(select(EventOutbox))).scalars().all()) == 1
+
+    def unavailable():
+        raise RuntimeError('database down')
+
+    monkeypatch.setattr(database, 'async_session', unavailable)
+    with pytest.raises(RuntimeError, match='database down'):
+        await bus.publish('transaction:reversed', {'original_transaction_id': 4})
@@ -0,0 +1,140 @@
+"""
+Tests for the async form submission queue (app/services/form_queue.py).
+
+Tests:
+- Queued submissions are claimed, processed and stamped with progress
+- Errors before any commit are retried with backoff, then succeed
+- Errors after the handler committed, and ValueError, fail without retry
+- Submissions stuck in "processing" are failed as interrupted
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db.enums import FormCategory
+from app.db.models import Form, FormSubmission
+from app.services.form_queue import INTERRUPTED_MESSAGE, FormSubmissionQueue
+from app.services.form_submission import FormSubmissionService
+
+TARGET = 'queue_test'
+
+
+@pytest.fixture
+def handler_calls():
+    calls = []
+    behaviour = {'fail': []}
+
+    async def handler(db, data, user_id, submission=None):
+        calls.append(data)
+        if behaviour['fail']:
+            kind = behaviour['fail'].pop(0)
+            if kind == 'commit':
+                submission.error_message = 'partial'
+                await db.commit()
+                raise RuntimeError('broke after commit')
+            if kind == 'invalid':
+                raise ValueError('bad quantity')
+            raise RuntimeError('temporary outage')
+        return 42
+
+    FormSubmissionService.register_handler(TARGET, handler)
+    yield calls, behaviour
+    FormSubmissionService._handlers.pop(TARGET, None)
+
+
+async def _enqueue(session: AsyncSession) -> FormSubmission:
+    form = Form(slug='queue_form', name='Queued', category=FormCategory.sale, is_active=True,
+                current_version=1, service_target=TARGET)
+    session.add(form)
+    await session.flush()
+    submission = FormSubmission(form_id=form.id, form_version=1, data=json.dumps({'qty': 3}),
+                                submitted_by_id=1, service_target=TARGET, status='pending')
+    session.add(submission)
+    await session.flush()
+    FormSubmissionService.enqueue(session, form, {'qty': 3}, 1, submission)
+    await session.commit()
+    return submission
+
+
+async def _reload(session: AsyncSession, submission: FormSubmission) -> FormSubmission:
+    reloaded = await session.get(FormSubmission, submission.id, populate_existing=True)
+    await session.commit()
+    return reloaded
+
+
+def _factory(session: AsyncSession):
+    return sessionmaker(session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.anyio
+async def test_queued_submission_is_processed(db_session: AsyncSession, handler_calls):
+    calls, _ = handler_calls
+    submission = await _enqueue(db_session)
+    queue = FormSubmissionQueue()
+
+    assert await queue.drain(_factory(db_session)) == 1
+    submission = await _reload(db_session, submission)
+    assert calls == [{'qty': 3}]
+    assert (submission.status, submission.result_id, submission.result_type) == ('processed', 42, TARGET)
+    assert submission.attempts == 1
+    assert submission.started_at is not None and submission.processed_at is not None
+    assert queue.stats()['processed'] == 1
+    assert await queue.drain(_factory(db_session)) == 0
+
+
+@pytest.mark.anyio
+async def test_retry_with_backoff(db_session: AsyncSession, handler_calls):
+    _, behaviour = handler_calls
+    behaviour['fail'] = ['outage']
+    submission = await _enqueue(db_session)
+    queue = FormSubmissionQueue()
+
+    await queue.drain(_factory(db_session))
+    submission = await _reload(db_session, submission)
+    assert submission.status == 'pending'
+    assert submission.attempts == 1
+    assert 'temporary outage' in submission.error_message
+    next_attempt = submission.next_attempt_at.replace(tzinfo=timezone.utc)
+    assert next_attempt > datetime.now(timezone.utc)
+
+    # Not due yet
+    assert await queue.drain(_factory(db_session)) == 0
+
+    submission.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await db_session.commit()
+    await queue.drain(_factory(db_session))
+    submission = await _reload(db_session, submission)
+    assert (submission.status, submission.attempts, submission.error_message) == ('processed', 2, None)
+    assert queue.stats()['retried'] == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('kind, message', [('commit', 'broke after commit'), ('invalid', 'bad quantity')])
+async def test_permanent_failures(db_session: AsyncSession, handler_calls, kind, message):
+    calls, behaviour = handler_calls
+    behaviour['fail'] = [kind]
+    submission = await _enqueue(db_session)
+    queue = FormSubmissionQueue()
+
+    await queue.drain(_factory(db_session))
+    submission = await _reload(db_session, submission)
+    assert (submission.status, submission.error_message) == ('failed', message)
+    assert len(calls) == 1
+    assert queue.stats()['failed'] == 1
+
+
+@pytest.mark.anyio
+async def test_interrupted_submission_fails(db_session: AsyncSession, handler_calls):
+    calls, _ = handler_calls
+    submission = await _enqueue(db_session)
+    submission.status = 'processing'
+    submission.started_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    await db_session.commit()
+
+    await FormSubmissionQueue().drain(_factory(db_session))
+    submission = await _reload(db_session, submission)
+    assert (submission.status, submission.error_message) == ('failed', INTERRUPTED_MESSAGE)
+    assert calls == []
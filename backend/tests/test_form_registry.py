@@ -0,0 +1,104 @@
+"""
+Tests for the form registry (app/services/form_registry.py).
+
+Tests:
+- Compiled forms parse JSON once, filter fields by role and check required keys
+- The compiled form is reused until the form's version changes
+- Dynamic option lists are cached and reloaded only after relevant changes
+"""
+import json
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.enums import FormCategory, FormFieldType
+from app.db.models import Form, FormField, Inventory, RawMaterial
+from app.services.form_registry import form_registry
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry():
+    form_registry.invalidate(broadcast=False)
+    yield
+    form_registry.invalidate(broadcast=False)
+
+
+async def _seed_form(session: AsyncSession) -> Form:
+    form = Form(
+        slug='registry_sale', name='Sale', category=FormCategory.sale, is_active=True, current_version=1,
+        allowed_roles=json.dumps(['agent']), field_mapping=json.dumps({'qty': 'sales.quantity'}),
+    )
+    session.add(form)
+    await session.flush()
+    session.add_all([
+        FormField(form_id=form.id, key='product_id', label='Product', field_type=FormFieldType.select,
+                  required=True, options_source='products', order_index=0),
+        FormField(form_id=form.id, key='qty', label='Quantity', field_type=FormFieldType.number,
+                  required=True, order_index=1),
+        FormField(form_id=form.id, key='discount', label='Discount', field_type=FormFieldType.number,
+                  role_visibility=json.dumps(['storekeeper']), order_index=2),
+    ])
+    await session.commit()
+    return form
+
+
+@pytest.mark.anyio
+async def test_compiled_form(db_session: AsyncSession):
+    form = await _seed_form(db_session)
+
+    compiled = await form_registry.get(db_session, 'registry_sale')
+    assert compiled.id == form.id
+    assert compiled.field_mapping == {'qty': 'sales.quantity'}
+    assert compiled.can_access('agent') and compiled.can_access('system_admin')
+    assert not compiled.can_access('member')
+    assert [f.key for f in compiled.fields_for('agent')] == ['product_id', 'qty']
+    assert [f.key for f in compiled.fields_for('storekeeper')] == ['product_id', 'qty', 'discount']
+    assert compiled.fields_for('agent') is compiled.fields_for('agent')
+    assert compiled.missing_required({'product_id': 1, 'qty': ''}) == ['qty']
+    assert compiled.option_sources == frozenset({'products'})
+
+    assert await form_registry.get(db_session, 'missing') is None
+
+
+@pytest.mark.anyio
+async def test_compiled_form_follows_version(db_session: AsyncSession):
+    form = await _seed_form(db_session)
+    first = await form_registry.get(db_session, 'registry_sale')
+    assert await form_registry.get(db_session, 'registry_sale') is first
+
+    form.name = 'Sale v2'
+    form.current_version = 2
+    await db_session.commit()
+    second = await form_registry.get(db_session, 'registry_sale')
+    assert second is not first
+    assert (second.name, second.current_version) == ('Sale v2', 2)
+
+    form.is_active = False
+    await db_session.commit()
+    assert await form_registry.get(db_session, 'registry_sale') is None
+
+
+@pytest.mark.anyio
+async def test_dynamic_options_are_cached(db_session: AsyncSession):
+    db_session.add_all([
+        Inventory(product_id=7, product_name='Bread', total_stock=5),
+        RawMaterial(name='Flour', unit='kg', current_stock=10),
+    ])
+    await db_session.commit()
+
+    assert await form_registry.options(db_session, 'products') == [{'label': 'Bread', 'value': 7}]
+    flour = await form_registry.options(db_session, 'raw_materials')
+    assert flour[0]['label'] == 'Flour (10 kg)'
+    assert await form_registry.options(db_session, 'users:agent') is None
+
+    # Stock changes keep the product list but refresh raw material labels
+    await db_session.execute(update(Inventory).where(Inventory.product_id == 7).values(total_stock=1))
+    await db_session.execute(update(RawMaterial).values(current_stock=4))
+    await db_session.commit()
+    assert form_registry.snapshot()['option_sources'] == {'products': True, 'raw_materials': False}
+    assert (await form_registry.options(db_session, 'raw_materials'))[0]['label'] == 'Flour (4 kg)'
+
+    await db_session.execute(update(Inventory).where(Inventory.product_id == 7).values(product_name='Rye'))
+    await db_session.commit()
+    assert await form_registry.options(db_session, 'products') == [{'label': 'Rye', 'value': 7}]
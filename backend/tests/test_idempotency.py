@@ -0,0 +1,94 @@
+"""
+Tests for the idempotency store (app/services/idempotency.py).
+
+Tests:
+- record_sale retries return the first sale; a reused key with other values conflicts
+- A key rolled back with its sale is not kept
+- create_order retries return the first order without a second write, also
+  when they lose the key insert race (only the savepoint is rolled back)
+"""
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import IdempotencyKey, Inventory, Order, Sale, User
+from app.services import idempotency
+from app.services.idempotency import IdempotencyConflictError
+from app.services.sales import InsufficientStockError, record_sale
+from app.services.task_engine import create_order
+
+
+@pytest.fixture
+async def idem_user(db_session: AsyncSession):
+    user = User(username='idem_user', email='idem@example.com', hashed_password='x', is_active=True)
+    db_session.add(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+    return user
+
+
+@pytest.mark.anyio
+async def test_sale_key_returns_first_sale_and_rejects_other_values(db_session: AsyncSession, idem_user: User):
+    user_id = idem_user.id
+    db_session.add(Inventory(product_id=8101, total_stock=10, total_sold=0))
+    await db_session.commit()
+
+    first = await record_sale(db_session, 8101, 2, 5, user_id, sale_channel='field', idempotency_key='s-1')
+    again = await record_sale(db_session, 8101, 2, 5, user_id, sale_channel='field', idempotency_key='s-1')
+    assert again.id == first.id
+
+    hit = await idempotency.find(db_session, idempotency.SCOPE_SALE, user_id, 's-1')
+    assert hit.resource_id == first.id
+
+    with pytest.raises(IdempotencyConflictError):
+        await record_sale(db_session, 8101, 3, 5, user_id, sale_channel='field', idempotency_key='s-1')
+
+    # Failed sales do not keep their key
+    with pytest.raises(InsufficientStockError):
+        await record_sale(db_session, 8101, 50, 5, user_id, idempotency_key='s-2')
+    assert await idempotency.find(db_session, idempotency.SCOPE_SALE, user_id, 's-2') is None
+
+    assert (await db_session.execute(select(func.count(Sale.id)))).scalar_one() == 1
+
+
+@pytest.mark.anyio
+async def test_order_key_returns_first_order(db_session: AsyncSession, idem_user: User):
+    user_id = idem_user.id
+    first = await create_order(db_session, 'agent_restock', items='[]', created_by_id=user_id, idempotency_key='o-1')
+    again = await create_order(db_session, 'agent_restock', items='[]', created_by_id=user_id, idempotency_key='o-1')
+    assert again.id == first.id
+    assert (await db_session.execute(select(func.count(Order.id)))).scalar_one() == 1
+
+    with pytest.raises(IdempotencyConflictError):
+        await create_order(db_session, 'agent_retail', items='[]', created_by_id=user_id, idempotency_key='o-1')
+
+    keys = (await db_session.execute(select(IdempotencyKey.scope, IdempotencyKey.resource_id))).all()
+    assert keys == [(idempotency.SCOPE_ORDER, first.id)]
+
+
+@pytest.mark.anyio
+async def test_order_key_race_keeps_caller_transaction(db_session: AsyncSession, idem_user: User, monkeypatch):
+    user_id = idem_user.id
+    first = await create_order(db_session, 'agent_restock', items='[]', created_by_id=user_id, idempotency_key='o-2')
+
+    # Each retry misses the pre-check, as if it raced the first request
+    real_find = idempotency.find
+    misses = []
+
+    async def racing_find(session, scope, actor_id, key):
+        if not misses:
+            misses.append(key)
+            return None
+        return await real_find(session, scope, actor_id, key)
+
+    monkeypatch.setattr(idempotency, 'find', racing_find)
+    db_session.add(Inventory(product_id=8102, total_stock=1, total_sold=0))
+    again = await create_order(db_session, 'agent_restock', items='[]', created_by_id=user_id, idempotency_key='o-2')
+    assert again.id == first.id
+    misses.clear()
+    with pytest.raises(IdempotencyConflictError):
+        await create_order(db_session, 'agent_retail', items='[]', created_by_id=user_id, idempotency_key='o-2')
+
+    await db_session.commit()
+    assert (await db_session.execute(select(func.count(Order.id)))).scalar_one() == 1
+    assert (await db_session.execute(select(Inventory.product_id))).scalars().all() == [8102]
@@ -0,0 +1,99 @@
+"""
+Tests for daily inventory ledger snapshots (app/services/inventory_snapshots.py).
+
+Tests:
+- Ledger writes (create, restock, adjust, sale) maintain today's snapshot
+- stock_as_of combines earlier closings with the partial day's ledger rows
+- check_snapshot_consistency detects and repairs drift, and reports stock drift
+- The scheduled reconciliation job repairs drift
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.ai.scheduler as scheduler
+from app.ai.jobs import session_factory_for
+from app.db.models import InventoryDailySnapshot, InventoryTransaction, User
+from app.services.inventory import adjust_inventory, create_inventory_item, restock_inventory
+from app.services.inventory_snapshots import check_snapshot_consistency, stock_as_of
+from app.services.sales import record_sale
+
+
+@pytest.fixture
+async def snapshot_user(db_session: AsyncSession):
+    user = User(username='snapshot_user', email='snapshot@example.com', hashed_password='x', is_active=True)
+    db_session.add(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+    return user
+
+
+@pytest.mark.anyio
+async def test_ledger_writes_maintain_today_snapshot(db_session: AsyncSession, snapshot_user: User):
+    item = await create_inventory_item(db_session, product_id=8201, initial_stock=10, created_by_id=snapshot_user.id)
+    await restock_inventory(db_session, 8201, 5, snapshot_user.id)
+    await adjust_inventory(db_session, 8201, -3, snapshot_user.id)
+    await record_sale(db_session, 8201, 2, 5, snapshot_user.id)
+
+    snapshot = (await db_session.execute(select(InventoryDailySnapshot))).scalar_one()
+    assert snapshot.inventory_item_id == item.id
+    assert (snapshot.net_change, snapshot.transaction_count, snapshot.closing_balance) == (10, 4, 10)
+
+    now = datetime.utcnow()
+    assert await stock_as_of(db_session, item.id, now + timedelta(hours=1)) == 10
+    assert await stock_as_of(db_session, item.id, now - timedelta(days=1)) == 0
+
+    report = await check_snapshot_consistency(db_session)
+    assert report['consistent'] is True
+
+
+@pytest.mark.anyio
+async def test_history_as_of_and_consistency_repair(db_session: AsyncSession, snapshot_user: User):
+    item = await create_inventory_item(db_session, product_id=8202, initial_stock=0, created_by_id=snapshot_user.id)
+    # Historical ledger rows written without the snapshot hook
+    db_session.add_all([
+        InventoryTransaction(inventory_item_id=item.id, change=20, reason='restock', created_at=datetime(2025, 5, 1, 9)),
+        InventoryTransaction(inventory_item_id=item.id, change=-4, reason='sale', created_at=datetime(2025, 5, 3, 9)),
+        InventoryTransaction(inventory_item_id=item.id, change=-6, reason='sale', created_at=datetime(2025, 5, 3, 15)),
+    ])
+    await db_session.commit()
+
+    report = await check_snapshot_consistency(db_session, repair=True)
+    assert report['snapshot_mismatch_count'] == 2
+    assert report['stock_mismatch_count'] == 1  # total_stock never moved with those rows
+    assert report['repaired'] is True
+
+    closings = dict((await db_session.execute(
+        select(InventoryDailySnapshot.day, InventoryDailySnapshot.closing_balance)
+    )).all())
+    assert closings == {datetime(2025, 5, 1).date(): 20, datetime(2025, 5, 3).date(): 10}
+
+    assert await stock_as_of(db_session, item.id, datetime(2025, 5, 2)) == 20
+    assert await stock_as_of(db_session, item.id, datetime(2025, 5, 3, 12)) == 16
+    assert await stock_as_of(db_session, item.id, datetime(2025, 6, 1)) == 10
+
+    # A restock today continues from the last closing balance
+    await restock_inventory(db_session, 8202, 10, snapshot_user.id)
+    report = await check_snapshot_consistency(db_session)
+    assert report['snapshot_mismatch_count'] == 0
+    today = (await db_session.execute(
+        select(InventoryDailySnapshot).order_by(InventoryDailySnapshot.day.desc()).limit(1)
+    )).scalar_one()
+    assert today.closing_balance == 20
+
+
+@pytest.mark.anyio
+async def test_scheduled_reconciliation_repairs_drift(db_session: AsyncSession, snapshot_user: User, monkeypatch):
+    item = await create_inventory_item(db_session, product_id=8203, initial_stock=5, created_by_id=snapshot_user.id)
+    db_session.add(InventoryTransaction(inventory_item_id=item.id, change=0, reason='adjustment', created_at=datetime(2025, 5, 1, 9)))
+    await db_session.commit()
+    monkeypatch.setattr(scheduler, "_async_session_factory", session_factory_for(db_session))
+
+    result = await scheduler.run_inventory_reconciliation()
+    assert result['status'] == 'completed'
+    assert (result['snapshot_mismatches'], result['repaired']) == (1, True)
+
+    result = await scheduler.run_inventory_reconciliation()
+    assert result['consistent'] is True
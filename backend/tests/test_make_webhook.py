@@ -4,7 +4,7 @@ Validates payload contract, idempotency, and failure handling.
 """
 import pytest
 import json
-from unittest.mock import AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, patch
 from datetime import datetime, timezone
 
 
@@ -274,11 +274,9 @@ class TestWebhookEmitter:
     def test_webhook_disabled_when_url_not_set(self):
         """Verify webhook does nothing when MAKE_WEBHOOK_URL is not configured."""
         import asyncio
-        from app.integrations.make_webhook import emit_make_webhook, clear_sent_events_cache
+        from app.integrations.make_webhook import emit_make_webhook
         
         async def _test():
-            clear_sent_events_cache()
-            
             # With no URL configured, should return False without error
             with patch('app.integrations.make_webhook.settings') as mock_settings:
                 mock_settings.MAKE_WEBHOOK_URL = ""
@@ -294,176 +292,197 @@ class TestWebhookEmitter:
         
         asyncio.run(_test())
     
-    def test_webhook_called_with_correct_payload(self):
-        """Verify webhook is called with correct headers and payload."""
-        import asyncio
-        from app.integrations.make_webhook import emit_make_webhook, clear_sent_events_cache
-        from app.automation.payloads import build_make_payload
-        
-        async def _test():
-            clear_sent_events_cache()
-            
-            payload = build_make_payload(
-                event="order.created",
-                actor_user_id=1,
-                actor_username="test",
-                entity_type="order",
-                entity_id=123,
-                data={"status": "created"},
-            )
-            
-            mock_response = MagicMock()
-            mock_response.status_code = 200
-            mock_response.text = "OK"
-            
-            with patch('app.integrations.make_webhook.httpx.AsyncClient') as mock_client:
-                mock_instance = AsyncMock()
-                mock_instance.post = AsyncMock(return_value=mock_response)
-                mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_instance)
-                mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
-                
-                result = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test")
-                
-                assert result is True
-                
-                # Verify POST was called
-                mock_instance.post.assert_called_once()
-                call_args = mock_instance.post.call_args
-                
-                # Verify URL
-                assert call_args[0][0] == "https://hook.make.com/test"
-                
-                # Verify headers
-                assert call_args[1]["headers"]["Content-Type"] == "application/json"
-                assert call_args[1]["headers"]["X-Event-ID"] == payload["event_id"]
-                
-                # Verify payload
-                assert call_args[1]["json"] == payload
-        
-        asyncio.run(_test())
-    
-    def test_idempotency_prevents_duplicate_sends(self):
-        """Verify same event_id is not sent twice."""
+    def test_missing_event_id_skips_send(self):
+        """Verify payloads without event_id are rejected."""
         import asyncio
-        from app.integrations.make_webhook import emit_make_webhook, clear_sent_events_cache
+        from app.integrations.make_webhook import emit_make_webhook
         
         async def _test():
-            clear_sent_events_cache()
-            
-            event_id = "evt_IDEMPOTENT1"
             payload = {
                 "version": "1.0",
                 "event": "test.event",
-                "event_id": event_id,
+                # Missing event_id
                 "data": {},
             }
             
-            mock_response = MagicMock()
-            mock_response.status_code = 200
-            
-            call_count = 0
-            
-            async def mock_post(*args, **kwargs):
-                nonlocal call_count
-                call_count += 1
-                return mock_response
-            
-            with patch('app.integrations.make_webhook.httpx.AsyncClient') as mock_client:
-                mock_instance = AsyncMock()
-                mock_instance.post = mock_post
-                mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_instance)
-                mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
-                
-                # First call should send
-                result1 = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test")
-                assert result1 is True
-                assert call_count == 1
-                
-                # Second call with same event_id should skip
-                result2 = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test")
-                assert result2 is True  # Returns True because event was already sent
-                assert call_count == 1  # No additional call
+            result = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test")
+            assert result is False
         
         asyncio.run(_test())
+
+
+def _factory(session):
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    return sessionmaker(session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+def _dispatcher(handler):
+    """Dispatcher whose pooled client is served by `handler(request) -> httpx.Response`."""
+    import httpx
+    from app.integrations.webhook_dispatcher import WebhookDispatcher
+    return WebhookDispatcher(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+async def _emit(session, payload):
+    """Queue `payload` in the test database (not the app's default one) and commit."""
+    from app.integrations.make_webhook import emit_make_webhook
+    queued = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test", session=session)
+    await session.commit()
+    return queued
+
+
+async def _deliveries(session):
+    from sqlalchemy import select
+    from app.db.models import WebhookDelivery
+    rows = (await session.execute(
+        select(WebhookDelivery).order_by(WebhookDelivery.id).execution_options(populate_existing=True)
+    )).scalars().all()
+    await session.commit()
+    return rows
+
+
+class TestWebhookDispatcher:
+    """Test queued delivery through the webhook dispatcher."""
     
-    def test_failure_does_not_raise_exception(self):
-        """Verify webhook failure doesn't crash the caller."""
-        import asyncio
-        from app.integrations.make_webhook import emit_make_webhook, clear_sent_events_cache
+    @pytest.mark.anyio
+    async def test_webhook_called_with_correct_payload(self, db_session):
+        """Verify a queued event is posted with the right headers and body."""
         import httpx
+        from app.automation.payloads import build_make_payload
         
-        async def _test():
-            clear_sent_events_cache()
-            
-            payload = {
-                "version": "1.0",
-                "event": "test.event",
-                "event_id": "evt_FAIL123",
-                "data": {},
-            }
-            
-            with patch('app.integrations.make_webhook.httpx.AsyncClient') as mock_client:
-                mock_instance = AsyncMock()
-                mock_instance.post = AsyncMock(side_effect=httpx.TimeoutException("Timeout"))
-                mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_instance)
-                mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
-                
-                # Should not raise
-                result = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test")
-                
-                # Should return False on failure
-                assert result is False
+        payload = build_make_payload(
+            event="order.created",
+            actor_user_id=1,
+            actor_username="test",
+            entity_type="order",
+            entity_id=123,
+            data={"status": "created"},
+        )
+        requests = []
+        
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, text="OK")
+        
+        dispatcher = _dispatcher(handler)
+        assert await _emit(db_session, payload) is True
+        assert requests == []  # the caller never waits on Make
+        
+        assert await dispatcher.drain(_factory(db_session)) == 1
+        assert len(requests) == 1
+        assert str(requests[0].url) == "https://hook.make.com/test"
+        assert requests[0].headers["Content-Type"] == "application/json"
+        assert requests[0].headers["X-Event-ID"] == payload["event_id"]
+        assert json.loads(requests[0].content) == payload
+        
+        (row,) = await _deliveries(db_session)
+        assert (row.status, row.attempts) == ("delivered", 1)
+        assert dispatcher.stats()["delivered"] == 1
+    
+    @pytest.mark.anyio
+    async def test_idempotency_prevents_duplicate_sends(self, db_session):
+        """Verify same event_id is queued and sent once."""
+        import httpx
         
-        asyncio.run(_test())
+        payload = {"version": "1.0", "event": "test.event", "event_id": "evt_IDEMPOTENT1", "data": {}}
+        calls = []
+        dispatcher = _dispatcher(lambda request: calls.append(request) or httpx.Response(200))
+        
+        assert await _emit(db_session, payload) is True
+        await dispatcher.drain(_factory(db_session))
+        # Already sent: still True, nothing new queued or posted
+        assert await _emit(db_session, payload) is True
+        await dispatcher.drain(_factory(db_session))
+        
+        assert len(calls) == 1
+        assert len(await _deliveries(db_session)) == 1
     
-    def test_http_error_response_returns_false(self):
-        """Verify non-2xx responses return False."""
-        import asyncio
-        from app.integrations.make_webhook import emit_make_webhook, clear_sent_events_cache
+    @pytest.mark.anyio
+    async def test_failures_are_retried_with_backoff(self, db_session):
+        """Verify timeouts and 5xx are retried later, not raised or dropped."""
+        import httpx
+        from sqlalchemy import update
+        from app.db.models import WebhookDelivery
+        
+        outcomes = [httpx.ConnectTimeout("Timeout"), httpx.Response(503, text="Busy"), httpx.Response(200)]
+        
+        def handler(request):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        
+        dispatcher = _dispatcher(handler)
+        await _emit(db_session, {"event": "test.event", "event_id": "evt_RETRY", "data": {}})
+        
+        for expected_error in ("Timeout", "HTTP 503 - Busy"):
+            await dispatcher.drain(_factory(db_session))
+            (row,) = await _deliveries(db_session)
+            assert (row.status, row.last_error) == ("pending", expected_error)
+            assert row.next_attempt_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+            # Not due yet
+            assert await dispatcher.drain(_factory(db_session)) == 0
+            await db_session.execute(update(WebhookDelivery).values(next_attempt_at=datetime(2000, 1, 1, tzinfo=timezone.utc)))
+            await db_session.commit()
+        
+        await dispatcher.drain(_factory(db_session))
+        (row,) = await _deliveries(db_session)
+        assert (row.status, row.attempts, row.last_error) == ("delivered", 3, None)
+        assert dispatcher.stats()["retried"] == 2
+    
+    @pytest.mark.anyio
+    async def test_client_error_fails_without_retry(self, db_session):
+        """Verify a 4xx rejection is final."""
+        import httpx
         
-        async def _test():
-            clear_sent_events_cache()
-            
-            payload = {
-                "version": "1.0",
-                "event": "test.event",
-                "event_id": "evt_HTTP500",
-                "data": {},
-            }
-            
-            mock_response = MagicMock()
-            mock_response.status_code = 500
-            mock_response.text = "Internal Server Error"
-            
-            with patch('app.integrations.make_webhook.httpx.AsyncClient') as mock_client:
-                mock_instance = AsyncMock()
-                mock_instance.post = AsyncMock(return_value=mock_response)
-                mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_instance)
-                mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
-                
-                result = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test")
-                
-                assert result is False
+        dispatcher = _dispatcher(lambda request: httpx.Response(400, text="Bad payload"))
+        await _emit(db_session, {"event": "test.event", "event_id": "evt_HTTP400", "data": {}})
         
-        asyncio.run(_test())
+        await dispatcher.drain(_factory(db_session))
+        (row,) = await _deliveries(db_session)
+        assert (row.status, row.last_status_code) == ("failed", 400)
+        assert row.finished_at is not None
+        assert dispatcher.stats()["failed"] == 1
     
-    def test_missing_event_id_skips_send(self):
-        """Verify payloads without event_id are rejected."""
+    @pytest.mark.anyio
+    async def test_events_are_batched_when_target_supports_it(self, db_session):
+        """Verify Make events share one POST when MAKE_WEBHOOK_BATCH_SIZE allows."""
+        import httpx
+        
+        bodies = []
+        dispatcher = _dispatcher(lambda request: bodies.append(json.loads(request.content)) or httpx.Response(200))
+        for n in range(5):
+            await _emit(db_session, {"event": "test.event", "event_id": f"evt_BATCH{n}", "data": {"n": n}})
+        
+        with patch('app.integrations.webhook_dispatcher.settings.MAKE_WEBHOOK_BATCH_SIZE', 3):
+            await dispatcher.drain(_factory(db_session))
+        
+        assert sorted([event["data"]["n"] for event in body] for body in bodies) == [[0, 1, 2], [3, 4]]
+        assert {row.status for row in await _deliveries(db_session)} == {"delivered"}
+    
+    @pytest.mark.anyio
+    async def test_sent_inline_without_dispatcher(self, db_session, monkeypatch):
+        """Verify events are still posted when WEBHOOK_DISPATCHER_ENABLED is off."""
         import asyncio
+        import httpx
+        from app.db import database
+        from app.integrations import webhook_dispatcher as module
         from app.integrations.make_webhook import emit_make_webhook
         
-        async def _test():
-            payload = {
-                "version": "1.0",
-                "event": "test.event",
-                # Missing event_id
-                "data": {},
-            }
-            
-            result = await emit_make_webhook(payload, webhook_url="https://hook.make.com/test")
-            assert result is False
+        requests = []
+        monkeypatch.setattr(module.settings, "WEBHOOK_DISPATCHER_ENABLED", False)
+        monkeypatch.setattr(module, "webhook_dispatcher", _dispatcher(lambda request: requests.append(request) or httpx.Response(200)))
+        monkeypatch.setattr(database, "async_session", _factory(db_session))
         
-        asyncio.run(_test())
+        # In the caller's transaction: sent once it commits
+        await _emit(db_session, {"event": "test.event", "event_id": "evt_INLINE1", "data": {}})
+        await asyncio.gather(*module._inline_sends)
+        # Without a session: sent before emit_make_webhook returns
+        await emit_make_webhook({"event": "test.event", "event_id": "evt_INLINE2", "data": {}}, webhook_url="https://hook.make.com/test")
+        
+        assert [request.headers["X-Event-ID"] for request in requests] == ["evt_INLINE1", "evt_INLINE2"]
+        assert [row.status for row in await _deliveries(db_session)] == ["delivered", "delivered"]
 
 
 # Integration tests need DB fixtures - mark them
@@ -480,10 +499,6 @@ class TestWebhookIntegrationWithAutomation:
         from app.automation.service import AutomationService
         from app.db.enums import AutomationTaskType
         from app.db.models import User
-        from app.integrations.make_webhook import clear_sent_events_cache
-        
-        clear_sent_events_cache()
-        
         # Create a test user first
         user = User(
             email="webhook_test@test.com",
@@ -523,10 +538,6 @@ class TestWebhookIntegrationWithAutomation:
         from app.automation.service import AutomationService
         from app.db.enums import AutomationTaskType
         from app.db.models import User, TaskAssignment
-        from app.integrations.make_webhook import clear_sent_events_cache
-        
-        clear_sent_events_cache()
-        
         # Create test user
         user = User(
             email="assignee_test@test.com",
@@ -583,10 +594,6 @@ class TestWebhookIntegrationWithAutomation:
         from app.automation.service import AutomationService
         from app.db.enums import AutomationTaskType
         from app.db.models import User
-        from app.integrations.make_webhook import clear_sent_events_cache
-        
-        clear_sent_events_cache()
-        
         # Create test user
         user = User(
             email="failure_test@test.com",
@@ -0,0 +1,103 @@
+"""
+Tests for the notification inbox read model (app/services/notification_inbox.py).
+
+Tests:
+- Counters follow ORM creates, is_read edits and deletes, and bulk reads
+- Keyset pages walk the inbox newest first without overlap
+- Sender names come from the directory, inactive senders from the table
+- Old read notifications move to the archive; unread and recent ones stay
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.enums import NotificationType
+from app.db.models import ArchivedNotification, Notification, User
+from app.services import notification_inbox
+from app.services.notifications import NotificationService
+
+
+async def _users(session: AsyncSession):
+    owner = User(username='inbox_owner', email='inbox_owner@example.com', hashed_password='x', is_active=True)
+    sender = User(username='inbox_sender', email='inbox_sender@example.com', display_name='Sender',
+                  hashed_password='x', is_active=True)
+    former = User(username='inbox_former', email='inbox_former@example.com', hashed_password='x', is_active=False)
+    session.add_all([owner, sender, former])
+    await session.commit()
+    return owner, sender, former
+
+
+def _notification(user_id: int, title: str, **kwargs) -> Notification:
+    return Notification(user_id=user_id, type=NotificationType.system, title=title, **kwargs)
+
+
+@pytest.mark.anyio
+async def test_counters_follow_changes(db_session: AsyncSession):
+    owner, _, _ = await _users(db_session)
+    service = NotificationService(db_session)
+    first = await service.create_notification(user_id=owner.id, notification_type=NotificationType.system, title='1')
+    db_session.add_all([_notification(owner.id, '2'), _notification(owner.id, '3', is_read=True)])
+    await db_session.commit()
+    assert await notification_inbox.get_counts(db_session, owner.id) == notification_inbox.InboxCounts(2, 3)
+
+    # Edit of an expired object: the previous value is looked up
+    db_session.expire(first)
+    first.is_read = True
+    await db_session.commit()
+    assert await service.get_unread_count(owner.id) == 1
+
+    await db_session.delete(first)
+    await db_session.commit()
+    assert await notification_inbox.get_counts(db_session, owner.id) == notification_inbox.InboxCounts(1, 2)
+
+    assert await service.mark_all_as_read(owner.id) == 1
+    assert await service.mark_all_as_read(owner.id) == 0
+    assert await notification_inbox.get_counts(db_session, owner.id) == notification_inbox.InboxCounts(0, 2)
+    assert await notification_inbox.recount(db_session, owner.id) == notification_inbox.InboxCounts(0, 2)
+
+
+@pytest.mark.anyio
+async def test_keyset_pages_and_senders(db_session: AsyncSession):
+    owner, sender, former = await _users(db_session)
+    db_session.add_all([
+        _notification(owner.id, f'n{i}', sender_id=(sender.id if i % 2 else former.id), is_read=(i < 2))
+        for i in range(5)
+    ])
+    await db_session.commit()
+
+    first = await notification_inbox.list_inbox(db_session, owner.id, limit=2)
+    second = await notification_inbox.list_inbox(db_session, owner.id, limit=2, before_id=first[-1].id)
+    third = await notification_inbox.list_inbox(db_session, owner.id, limit=2, before_id=second[-1].id)
+    assert [n.title for n in first + second + third] == ['n4', 'n3', 'n2', 'n1', 'n0']
+    unread = await notification_inbox.list_inbox(db_session, owner.id, unread_only=True)
+    assert [n.title for n in unread] == ['n4', 'n3', 'n2']
+
+    names = await notification_inbox.senders(db_session, [n.sender_id for n in first] + [None])
+    assert {uid: entry.username for uid, entry in names.items()} == {
+        sender.id: 'inbox_sender', former.id: 'inbox_former',
+    }
+
+
+@pytest.mark.anyio
+async def test_archive_moves_old_read_notifications(db_session: AsyncSession):
+    owner, _, _ = await _users(db_session)
+    old = datetime.now(timezone.utc) - timedelta(days=60)
+    db_session.add_all([
+        _notification(owner.id, 'old read', is_read=True, created_at=old),
+        _notification(owner.id, 'old read 2', is_read=True, created_at=old),
+        _notification(owner.id, 'old unread', created_at=old),
+        _notification(owner.id, 'new read', is_read=True),
+    ])
+    await db_session.commit()
+
+    assert await notification_inbox.archive_read(db_session, older_than_days=30, batch_size=1) == 2
+    remaining = (await db_session.execute(
+        select(Notification.title).where(Notification.user_id == owner.id).order_by(Notification.id)
+    )).scalars().all()
+    assert remaining == ['old unread', 'new read']
+    archived = (await db_session.execute(select(ArchivedNotification))).scalars().all()
+    assert sorted(a.title for a in archived) == ['old read', 'old read 2']
+    assert {a.type for a in archived} == {NotificationType.system.value}
+    assert await notification_inbox.get_counts(db_session, owner.id) == notification_inbox.InboxCounts(1, 2)
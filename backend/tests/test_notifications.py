@@ -196,6 +196,10 @@ async def test_mark_as_read(db_session: AsyncSession, test_users):
     # Verify
     updated = await service.get_notification(notification.id)
     assert updated.is_read is True
+    
+    # Already read: still succeeds; someone else's notification does not
+    assert await service.mark_as_read(notification.id, user.id) is True
+    assert await service.mark_as_read(notification.id, user.id + 1000) is False
 
 
 @pytest.mark.asyncio
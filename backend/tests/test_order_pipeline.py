@@ -0,0 +1,111 @@
+"""
+Tests for the single-transaction order pipeline (task_engine.create_order).
+
+Tests:
+- Order, workflow steps, root and role tasks are created together
+- Role tasks notify role members and admins after commit
+- uq_order_root_per_order rejects a second order-root task
+- An automation failure keeps the order and leaves no partial tasks
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.automation.order_triggers import OrderAutomationTriggers
+from app.db.models import AutomationTask, Notification, Order, Task, User
+from app.db.enums import AutomationTaskStatus, AutomationTaskType, NotificationType, OrderStatus, TaskStatus, UserRole
+from app.services.task_engine import create_order
+
+
+async def _user(session: AsyncSession, username: str, **kwargs) -> User:
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x", is_active=True, **kwargs)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+@pytest.mark.anyio
+async def test_create_order_builds_tasks_in_one_pass(db_session: AsyncSession):
+    agent = await _user(db_session, "pipeline_agent")
+    foreman = await _user(db_session, "pipeline_foreman", role=UserRole.foreman)
+    admin = await _user(db_session, "pipeline_admin", is_system_admin=True)
+    expected_recipients = sorted([foreman.id, admin.id])
+
+    order = await create_order(
+        db_session, "AGENT_RESTOCK",
+        items='[{"product_id": 1, "quantity": 4}]',
+        metadata={"note": "burst"},
+        created_by_id=agent.id,
+    )
+    order_id = order.id
+    db_session.expire_all()
+
+    order = await db_session.get(Order, order_id)
+    assert order.status == OrderStatus.in_progress.value
+    steps = (await db_session.execute(select(Task).where(Task.order_id == order.id).order_by(Task.id))).scalars().all()
+    assert [t.status for t in steps] == [TaskStatus.active.value] + [TaskStatus.pending.value] * 4
+    assert '"quantities": [4]' in order.meta
+
+    tasks = (await db_session.execute(
+        select(AutomationTask).where(AutomationTask.related_order_id == order.id)
+    )).scalars().all()
+    roots = [t for t in tasks if t.is_order_root]
+    assert len(roots) == 1
+    assert roots[0].required_role is None
+    assert roots[0].status == AutomationTaskStatus.in_progress  # requester assigned
+    role_tasks = {t.required_role: t for t in tasks if not t.is_order_root}
+    assert set(role_tasks) == {"foreman", "delivery"}
+    assert all(t.status == AutomationTaskStatus.open for t in role_tasks.values())
+
+    recipients = (await db_session.execute(
+        select(Notification.user_id).where(
+            Notification.type == NotificationType.task_opened,
+            Notification.task_id == role_tasks["foreman"].id,
+        )
+    )).scalars().all()
+    assert sorted(recipients) == expected_recipients
+
+
+@pytest.mark.anyio
+async def test_second_order_root_is_rejected(db_session: AsyncSession):
+    agent = await _user(db_session, "pipeline_agent2")
+    order = await create_order(db_session, "agent_retail", created_by_id=agent.id)
+
+    db_session.add(AutomationTask(
+        task_type=AutomationTaskType.retail,
+        title="duplicate root",
+        created_by_id=agent.id,
+        related_order_id=order.id,
+        is_order_root=True,
+    ))
+    with pytest.raises(IntegrityError):
+        await db_session.commit()
+    await db_session.rollback()
+
+
+@pytest.mark.anyio
+async def test_automation_failure_keeps_order(db_session: AsyncSession, monkeypatch):
+    agent = await _user(db_session, "pipeline_agent3")
+
+    async def failing_trigger(db, order, created_by_id):
+        db.add(AutomationTask(
+            task_type=AutomationTaskType.restock,
+            title="partial",
+            created_by_id=created_by_id,
+            related_order_id=order.id,
+        ))
+        await db.flush()
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(OrderAutomationTriggers, "on_order_created", failing_trigger)
+    order = await create_order(db_session, "agent_restock", created_by_id=agent.id)
+    order_id = order.id
+    db_session.expire_all()
+
+    assert await db_session.get(Order, order_id) is not None
+    tasks = (await db_session.execute(
+        select(AutomationTask).where(AutomationTask.related_order_id == order_id)
+    )).scalars().all()
+    assert tasks == []
@@ -0,0 +1,60 @@
+"""
+Tests for off-loop password hashing (app/core/passwords.py).
+
+Tests:
+- Hash and verify round-trip through the pool
+- verify_and_update returns a new hash for a cheaper stored hash
+- A full pool rejects with 503 and Retry-After instead of queueing forever
+"""
+import asyncio
+import threading
+
+import pytest
+from passlib.hash import bcrypt
+
+from app.core.passwords import PasswordHasher, PasswordHashingBusy, password_hasher
+from app.core.security import pwd_context
+
+
+@pytest.mark.anyio
+async def test_hash_and_verify():
+    hashed = await password_hasher.hash('s3cret-pass')
+    assert await password_hasher.verify('s3cret-pass', hashed)
+    assert not await password_hasher.verify('wrong', hashed)
+    assert password_hasher.stats()['queue_depth'] == 0
+
+
+@pytest.mark.anyio
+async def test_verify_and_update_rehashes_old_cost():
+    cheap = bcrypt.using(rounds=4).hash('s3cret-pass')
+    valid, new_hash = await password_hasher.verify_and_update('s3cret-pass', cheap)
+    assert valid
+    assert new_hash and not pwd_context.needs_update(new_hash)
+
+    assert await password_hasher.verify_and_update('wrong', cheap) == (False, None)
+    current = await password_hasher.hash('s3cret-pass')
+    assert await password_hasher.verify_and_update('s3cret-pass', current) == (True, None)
+
+
+@pytest.mark.anyio
+async def test_full_pool_rejects():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        first = asyncio.ensure_future(hasher._run(release.wait))
+        second = asyncio.ensure_future(hasher._run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordHashingBusy) as exc:
+            await hasher._run(release.wait)
+        assert exc.value.status_code == 503
+        assert exc.value.headers['Retry-After'] == '1'
+
+        stats = hasher.stats()
+        assert stats['rejected'] == 1
+        assert stats['peak_queue'] >= 1
+        release.set()
+        await asyncio.gather(first, second)
+        assert hasher.stats()['completed'] == 2
+    finally:
+        release.set()
+        hasher.shutdown()
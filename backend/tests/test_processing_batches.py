@@ -0,0 +1,119 @@
+"""
+Tests for multi-batch production (plan_production / process_batches).
+
+Tests:
+- The plan sums requirements per raw material across products and flags
+  which batches fit in input order
+- A feasible schedule is posted in one transaction: stock, ledgers, rollups
+- A short schedule writes nothing and the error carries the plan
+- Duplicate batch references are rejected up front
+"""
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import (
+    Inventory, InventoryTransaction, ProcessingBatch, ProductionDailyRollup, RawMaterial,
+    RawMaterialTransaction, User,
+)
+from app.services.inventory import create_inventory_item
+from app.services.processing import (
+    InsufficientRawMaterialError,
+    ValidationError,
+    create_recipe,
+    plan_production,
+    process_batches,
+)
+
+
+@pytest.fixture
+async def schedule(db_session: AsyncSession):
+    """Two products sharing groundnuts; paste also uses oil (10% waste)."""
+    user = User(username='planner', email='planner@example.com', hashed_password='x', is_active=True)
+    db_session.add(user)
+    await db_session.commit()
+    paste = await create_inventory_item(db_session, product_id=9101, product_name='Paste', initial_stock=0, created_by_id=user.id)
+    snack = await create_inventory_item(db_session, product_id=9102, product_name='Snack', initial_stock=3, created_by_id=user.id)
+    nuts = RawMaterial(name='Groundnuts', unit='kg', current_stock=100)
+    oil = RawMaterial(name='Oil', unit='l', current_stock=50)
+    db_session.add_all([nuts, oil])
+    await db_session.commit()
+    await create_recipe(db_session, finished_product_id=paste.id, raw_material_id=nuts.id, quantity_required=2, unit='kg')
+    await create_recipe(db_session, finished_product_id=paste.id, raw_material_id=oil.id, quantity_required=1, unit='l', waste_percentage=10)
+    await create_recipe(db_session, finished_product_id=snack.id, raw_material_id=nuts.id, quantity_required=3, unit='kg')
+    return user, paste, snack, nuts, oil
+
+
+@pytest.mark.anyio
+async def test_plan_combines_requirements(db_session: AsyncSession, schedule):
+    _, paste, snack, nuts, oil = schedule
+
+    plan = await plan_production(db_session, [
+        {'finished_product_id': paste.id, 'quantity_to_produce': 20},
+        {'finished_product_id': snack.id, 'quantity_to_produce': 30},
+    ])
+    materials = {m['raw_material_id']: m for m in plan['materials']}
+    assert materials[nuts.id]['required'] == 130
+    assert (materials[nuts.id]['shortfall'], materials[nuts.id]['sufficient']) == (30, False)
+    assert materials[oil.id]['required'] == 22
+    assert materials[oil.id]['sufficient']
+    assert not plan['feasible']
+    assert [b['can_process'] for b in plan['batches']] == [True, False]
+    assert plan['batches'][0]['product_name'] == 'Paste'
+
+
+@pytest.mark.anyio
+async def test_process_batches_posts_schedule(db_session: AsyncSession, schedule):
+    user, paste, snack, nuts, oil = schedule
+
+    batches = await process_batches(db_session, [
+        {'finished_product_id': paste.id, 'quantity_to_produce': 10, 'batch_reference': 'DAY-1'},
+        {'finished_product_id': snack.id, 'quantity_to_produce': 5, 'actual_waste_quantity': 1},
+        {'finished_product_id': paste.id, 'quantity_to_produce': 5},
+    ], processed_by_id=user.id)
+    assert [b.finished_product_id for b in batches] == [paste.id, snack.id, paste.id]
+    assert batches[0].batch_reference == 'DAY-1'
+
+    stock = dict((await db_session.execute(select(RawMaterial.id, RawMaterial.current_stock))).all())
+    assert stock == {nuts.id: 100 - 30 - 15, oil.id: 50 - 11 - 5}
+    totals = dict((await db_session.execute(select(Inventory.id, Inventory.total_stock))).all())
+    assert totals == {paste.id: 15, snack.id: 3 + 5}
+
+    rm_rows = await db_session.scalar(select(func.count()).select_from(RawMaterialTransaction))
+    inv_rows = await db_session.scalar(
+        select(func.count()).select_from(InventoryTransaction).where(InventoryTransaction.reason == 'processing_in')
+    )
+    assert (rm_rows, inv_rows) == (5, 3)
+
+    rollups = {r.finished_product_id: r for r in (await db_session.execute(select(ProductionDailyRollup))).scalars()}
+    assert (rollups[paste.id].batch_count, rollups[paste.id].total_produced) == (2, 15)
+    assert rollups[snack.id].waste_batch_count == 1
+
+
+@pytest.mark.anyio
+async def test_short_schedule_writes_nothing(db_session: AsyncSession, schedule):
+    user, paste, snack, nuts, _ = schedule
+    # The failed call rolls back and expires these objects
+    nuts_id = nuts.id
+
+    with pytest.raises(InsufficientRawMaterialError) as exc:
+        await process_batches(db_session, [
+            {'finished_product_id': snack.id, 'quantity_to_produce': 30},
+            {'finished_product_id': paste.id, 'quantity_to_produce': 10},
+        ], processed_by_id=user.id)
+    assert not exc.value.plan['feasible']
+    assert [b['can_process'] for b in exc.value.plan['batches']] == [True, False]
+
+    assert await db_session.scalar(select(func.count()).select_from(ProcessingBatch)) == 0
+    assert await db_session.scalar(select(RawMaterial.current_stock).where(RawMaterial.id == nuts_id)) == 100
+
+
+@pytest.mark.anyio
+async def test_duplicate_reference_rejected(db_session: AsyncSession, schedule):
+    user, paste, _, _, _ = schedule
+
+    with pytest.raises(ValidationError):
+        await process_batches(db_session, [
+            {'finished_product_id': paste.id, 'quantity_to_produce': 1, 'batch_reference': 'X'},
+            {'finished_product_id': paste.id, 'quantity_to_produce': 1, 'batch_reference': 'X'},
+        ], processed_by_id=user.id)
@@ -0,0 +1,107 @@
+"""
+Tests for the RBAC engine (app/permissions/engine.py).
+
+Tests:
+- Grants combine the global role, system roles, DB role permissions and channel roles
+- Cached grants are reused until a commit touches roles or the user
+- core.security.require_permission / require_admin decide from the grants
+"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import require_admin, require_permission
+from app.db.enums import UserRole as GlobalRole
+from app.db.models import (
+    Channel, ChannelRoleAssignment, PermissionModel, Role, RolePermission, User, UserRole,
+)
+from app.permissions.constants import Permission
+from app.permissions.engine import rbac
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    rbac.invalidate(broadcast=False)
+    yield
+    rbac.invalidate(broadcast=False)
+
+
+async def _user(session: AsyncSession, username: str, **kwargs) -> User:
+    user = User(username=username, email=f'{username}@example.com', hashed_password='x', is_active=True, **kwargs)
+    session.add(user)
+    await session.commit()
+    return user
+
+
+@pytest.mark.anyio
+async def test_grants_combine_all_sources(db_session: AsyncSession):
+    user = await _user(db_session, 'rbac_member', role=GlobalRole.member)
+    channel = Channel(name='rbac-general')
+    member_role = Role(name='user', scope='system')
+    moderator = Role(name='moderator', scope='channel')
+    custom = Role(name='auditor', scope='system')
+    audit = PermissionModel(name='audit.read', key='audit.read')
+    db_session.add_all([channel, member_role, moderator, custom, audit])
+    await db_session.flush()
+    db_session.add_all([
+        UserRole(user_id=user.id, role_id=member_role.id),
+        UserRole(user_id=user.id, role_id=custom.id),
+        RolePermission(role_id=custom.id, permission_id=audit.id),
+        ChannelRoleAssignment(user_id=user.id, channel_id=channel.id, role_id=moderator.id),
+    ])
+    await db_session.commit()
+
+    grants = await rbac.grants(db_session, user.id)
+    assert grants.role == 'member'
+    assert grants.role_allows('create_channels')
+    assert not grants.role_allows('ban_users')
+    assert grants.system_roles == frozenset({'user', 'auditor'})
+    assert grants.permission_keys == frozenset({'audit.read'})
+    assert grants.allows('audit.read')
+    assert grants.allows(Permission.CREATE_CHANNEL)
+    assert not grants.allows(Permission.DELETE_ANY_MESSAGE)
+    assert grants.allows(Permission.DELETE_ANY_MESSAGE, channel.id)
+    assert not grants.allows(Permission.DELETE_ANY_MESSAGE, channel.id + 1)
+
+    assert await rbac.grants(db_session, user.id + 1000) is None
+
+
+@pytest.mark.anyio
+async def test_grants_are_cached_until_commit(db_session: AsyncSession):
+    user = await _user(db_session, 'rbac_cached', role=GlobalRole.member)
+    first = await rbac.grants(db_session, user.id)
+    assert await rbac.grants(db_session, user.id) is first
+    assert not first.is_team_admin
+
+    user.role = GlobalRole.team_admin
+    await db_session.commit()
+    promoted = await rbac.grants(db_session, user.id)
+    assert promoted is not first
+    assert promoted.is_team_admin and not promoted.is_admin
+
+    await db_session.execute(update(User).where(User.id == user.id).values(is_system_admin=True))
+    await db_session.commit()
+    admin = await rbac.grants(db_session, user.id)
+    assert admin.is_admin
+    assert admin.allows(Permission.MANAGE_USERS)
+    assert admin.role_allows('system_settings')
+
+
+@pytest.mark.anyio
+async def test_security_helpers_use_grants(db_session: AsyncSession):
+    member = await _user(db_session, 'rbac_plain', role=GlobalRole.member)
+    banned = await _user(db_session, 'rbac_banned', role=GlobalRole.system_admin, is_banned=True)
+    admin = await _user(db_session, 'rbac_admin', role=GlobalRole.system_admin)
+
+    assert (await require_permission('view_users', db_session, {'user_id': member.id})).id == member.id
+    with pytest.raises(HTTPException) as exc:
+        await require_permission('ban_users', db_session, {'user_id': member.id})
+    assert exc.value.status_code == 403
+    with pytest.raises(HTTPException) as exc:
+        await require_admin(db_session, {'user_id': banned.id})
+    assert exc.value.detail == 'User is banned'
+    with pytest.raises(HTTPException) as exc:
+        await require_admin(db_session, {'user_id': member.id + 1000})
+    assert exc.value.status_code == 404
+    assert (await require_admin(db_session, {'user_id': admin.id})).id == admin.id
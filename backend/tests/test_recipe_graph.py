@@ -0,0 +1,113 @@
+"""
+Tests for the cached recipe graph (app/services/recipe_graph.py) and the
+what-if production calculator.
+
+Tests:
+- The graph is reused until recipes change; stock-only updates keep it
+- verify=True catches recipe edits that bypassed this process's sessions
+- Capacity per product honours waste rounding and names the limiting material
+- The calculator applies stock overrides to capacity and plan alike
+"""
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ProcessingRecipe, RawMaterial, User
+from app.services.inventory import create_inventory_item
+from app.services.processing import (
+    calculate_raw_material_requirements,
+    create_recipe,
+    production_calculator,
+    update_recipe,
+)
+from app.services.recipe_graph import RecipeInput, recipe_graph
+
+
+@pytest.fixture
+async def bakery(db_session: AsyncSession):
+    """Bread needs flour 2/unit and yeast 1/unit (+10% waste); cake needs flour 3/unit."""
+    user = User(username='baker', email='baker@example.com', hashed_password='x', is_active=True)
+    db_session.add(user)
+    await db_session.commit()
+    bread = await create_inventory_item(db_session, product_id=9201, product_name='Bread', initial_stock=0, created_by_id=user.id)
+    cake = await create_inventory_item(db_session, product_id=9202, product_name='Cake', initial_stock=0, created_by_id=user.id)
+    flour = RawMaterial(name='Flour', unit='kg', current_stock=100)
+    yeast = RawMaterial(name='Yeast', unit='g', current_stock=11)
+    db_session.add_all([flour, yeast])
+    await db_session.commit()
+    await create_recipe(db_session, finished_product_id=bread.id, raw_material_id=flour.id, quantity_required=2, unit='kg')
+    yeast_recipe = await create_recipe(db_session, finished_product_id=bread.id, raw_material_id=yeast.id,
+                                       quantity_required=1, unit='g', waste_percentage=10)
+    await create_recipe(db_session, finished_product_id=cake.id, raw_material_id=flour.id, quantity_required=3, unit='kg')
+    return bread, cake, flour, yeast, yeast_recipe
+
+
+def test_max_quantity_matches_requirement_formula():
+    edge = RecipeInput(recipe_id=1, raw_material_id=1, quantity_required=1, waste_percentage=10, unit='g')
+    for stock in range(0, 60):
+        quantity = edge.max_quantity(stock)
+        assert edge.required_for(quantity) <= stock or quantity == 0
+        assert edge.required_for(quantity + 1) > stock
+
+
+@pytest.mark.anyio
+async def test_graph_cached_until_recipes_change(db_session: AsyncSession, bakery):
+    bread, _, flour, _, yeast_recipe = bakery
+    graph = await recipe_graph.get(db_session)
+    assert await recipe_graph.get(db_session) is graph
+    assert [i.raw_material_id for i in graph.products[bread.id].inputs][0] == flour.id
+
+    await db_session.execute(update(RawMaterial).where(RawMaterial.id == flour.id).values(current_stock=40))
+    await db_session.commit()
+    assert await recipe_graph.get(db_session) is graph
+    requirements = await calculate_raw_material_requirements(db_session, bread.id, 10)
+    assert requirements[0]['available'] == 40
+
+    await update_recipe(db_session, yeast_recipe.id, quantity_required=2)
+    updated = await recipe_graph.get(db_session)
+    assert updated is not graph
+    assert updated.products[bread.id].inputs[1].quantity_required == 2
+
+
+@pytest.mark.anyio
+async def test_verify_catches_out_of_band_edits(db_session: AsyncSession, bakery):
+    bread, _, _, _, yeast_recipe = bakery
+    graph = await recipe_graph.get(db_session)
+    await db_session.commit()
+
+    # Another pod's edit: no local session hook fires
+    async with db_session.bind.begin() as conn:
+        await conn.execute(
+            update(ProcessingRecipe).where(ProcessingRecipe.id == yeast_recipe.id).values(quantity_required=5)
+        )
+    assert await recipe_graph.get(db_session) is graph
+    fresh = await recipe_graph.get(db_session, verify=True)
+    assert fresh.products[bread.id].inputs[1].quantity_required == 5
+
+
+@pytest.mark.anyio
+async def test_calculator_capacity_and_plan(db_session: AsyncSession, bakery):
+    bread, cake, flour, yeast, _ = bakery
+
+    result = await production_calculator(db_session)
+    capacity = {row['finished_product_id']: row for row in result['capacity']}
+    # Yeast: 11 g covers 10 loaves (10 + 10% waste = 11); flour would allow 50
+    assert capacity[bread.id]['max_quantity'] == 10
+    assert capacity[bread.id]['limiting_material']['name'] == 'Yeast'
+    assert capacity[cake.id]['max_quantity'] == 33
+    assert result['plan'] is None
+
+    result = await production_calculator(
+        db_session,
+        plan=[{'finished_product_id': bread.id, 'quantity_to_produce': 20},
+              {'finished_product_id': cake.id, 'quantity_to_produce': 10}],
+        stock_overrides={yeast.id: 100},
+    )
+    capacity = {row['finished_product_id']: row for row in result['capacity']}
+    assert capacity[bread.id]['max_quantity'] == 50
+    assert capacity[bread.id]['limiting_material']['raw_material_id'] == flour.id
+    materials = {m['raw_material_id']: m for m in result['plan']['materials']}
+    assert (materials[flour.id]['required'], materials[flour.id]['shortfall']) == (70, 0)
+    assert (materials[yeast.id]['required'], materials[yeast.id]['available']) == (22, 100)
+    assert result['plan']['feasible']
+    assert [s['overridden'] for s in result['stock']] == [False, True]
@@ -0,0 +1,87 @@
+"""
+Tests for the operational role directory (app/services/role_directory.py).
+
+Tests:
+- Lookups are served from one load until something changes
+- Commits touching roles or user activation invalidate it (ORM and bulk)
+- Round-robin and least-loaded assignee selection
+- Remote invalidations mark the directory stale
+"""
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.automation.order_triggers import OrderAutomationTriggers
+from app.core import cache_invalidation
+from app.db.models import User, UserOperationalRole
+from app.services.role_directory import role_directory
+
+
+async def _user(session: AsyncSession, username: str, *roles: str, is_active: bool = True) -> User:
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x", is_active=is_active)
+    session.add(user)
+    await session.flush()
+    for role in roles:
+        session.add(UserOperationalRole(user_id=user.id, role=role))
+    await session.commit()
+    return user
+
+
+@pytest.mark.anyio
+async def test_lookups_and_invalidation(db_session: AsyncSession):
+    f1 = await _user(db_session, "dir_foreman1", "foreman")
+    f2 = await _user(db_session, "dir_foreman2", "foreman", "delivery")
+    idle = await _user(db_session, "dir_inactive", "foreman", is_active=False)
+
+    assert await role_directory.users_for_role(db_session, "foreman") == [f1.id, f2.id]
+    assert await role_directory.users_for_role(db_session, "warehouse_staff") == [f1.id, f2.id]
+    assert await role_directory.users_for_roles(db_session, ["delivery", "foreman"]) == [f1.id, f2.id]
+    assert await role_directory.roles_for_user(db_session, idle.id) == {"foreman"}
+    version = role_directory.version
+
+    # Served from memory until a relevant commit
+    await role_directory.roles_for_user(db_session, f2.id)
+    assert role_directory.version == version
+
+    # Deactivation (ORM attribute change)
+    f1.is_active = False
+    await db_session.commit()
+    assert role_directory.is_stale
+    assert await role_directory.users_for_role(db_session, "foreman") == [f2.id]
+
+    # Bulk delete, as in assign_operational_role
+    await db_session.execute(delete(UserOperationalRole).where(UserOperationalRole.user_id == f2.id))
+    await db_session.commit()
+    assert await role_directory.users_for_role(db_session, "foreman") == []
+    assert await role_directory.roles_for_user(db_session, f2.id) == frozenset()
+    assert role_directory.version > version
+
+
+@pytest.mark.anyio
+async def test_round_robin_and_least_loaded(db_session: AsyncSession):
+    users = [await _user(db_session, f"dir_delivery{i}", "delivery") for i in range(3)]
+    ids = [u.id for u in users]
+
+    picks = [await OrderAutomationTriggers._find_user_by_role(db_session, "delivery_driver") for _ in range(4)]
+    assert sorted(picks[:3]) == ids
+    assert picks[3] == picks[0]
+
+    # The busy user is skipped; the idle ones alternate
+    loads = {ids[0]: 5, ids[1]: 0, ids[2]: 0}
+    first = await role_directory.pick_assignee(db_session, "delivery", loads=loads)
+    second = await role_directory.pick_assignee(db_session, "delivery", loads=loads)
+    assert {first, second} == {ids[1], ids[2]}
+
+    assert await role_directory.pick_assignee(db_session, "foreman") is None
+
+
+@pytest.mark.anyio
+async def test_remote_invalidation_marks_stale(db_session: AsyncSession):
+    await _user(db_session, "dir_agent", "agent")
+    await role_directory.ensure_loaded(db_session)
+    assert not role_directory.is_stale
+
+    assert not cache_invalidation.dispatch("presence", {"type": "presence_update"})
+    assert not role_directory.is_stale
+    assert cache_invalidation.dispatch("cache:role_directory", {"type": "cache_invalidated", "origin": "other-pod"})
+    assert role_directory.is_stale
@@ -0,0 +1,98 @@
+"""
+Tests for the indexed rule engine (app/automation/rule_engine.py).
+
+Tests:
+- Conditions compile once; malformed thresholds are rejected up front
+- Only the event's own rules are evaluated; counters track matches
+- Stored rules are picked up on commit and their edits hot-reload
+- Actions of matching rules run concurrently, failures counted per rule
+"""
+import asyncio
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.automation import rule_engine as rule_engine_module
+from app.automation.rule_engine import RuleEngine, compile_conditions, compile_rule, rule_engine
+from app.db.models import AutomationRule
+
+
+@pytest.fixture
+def recorded_actions(monkeypatch):
+    calls = []
+    both_started = asyncio.Event()
+
+    async def record(payload, db):
+        calls.append(('record', payload['_event'], payload.get('quantity')))
+        if payload.get('together'):
+            if len(calls) == 2:
+                both_started.set()
+            await asyncio.wait_for(both_started.wait(), 1)
+
+    async def explode(payload, db):
+        calls.append(('explode', payload['_event'], payload.get('quantity')))
+        if len(calls) == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), 1)
+        raise RuntimeError('boom')
+
+    monkeypatch.setitem(rule_engine_module._ACTION_REGISTRY, 'record', record)
+    monkeypatch.setitem(rule_engine_module._ACTION_REGISTRY, 'explode', explode)
+    return calls
+
+
+def test_compiled_conditions():
+    (above_five,) = compile_conditions({'quantity_gt': '5'})
+    assert above_five({'quantity': 6})
+    assert not above_five({'quantity': 5})
+    assert not above_five({'quantity': 'many'})
+    assert not above_five({})
+    with pytest.raises(ValueError):
+        compile_conditions({'quantity_gt': 'five'})
+    with pytest.raises(ValueError):
+        compile_rule({'event': 'sale:created', 'actions': ['no_such_action']})
+
+
+@pytest.mark.anyio
+async def test_only_event_rules_are_evaluated(db_session: AsyncSession, recorded_actions):
+    engine = RuleEngine()
+    engine.register_rule({'name': 'big_sale', 'event': 'sale:created',
+                          'conditions': {'quantity_gte': 10}, 'actions': ['record']})
+    engine.register_rule({'name': 'reversal', 'event': 'transaction:reversed', 'actions': ['record']})
+
+    await engine.process('sale:created', {'_event': 'sale:created', 'quantity': 3}, db_session)
+    await engine.process('sale:created', {'_event': 'sale:created', 'quantity': 12}, db_session)
+    stats = {r['name']: r for r in engine.stats()['rules']}
+    assert (stats['big_sale']['evaluations'], stats['big_sale']['matches']) == (2, 1)
+    assert stats['reversal']['evaluations'] == 0
+    assert recorded_actions == [('record', 'sale:created', 12)]
+
+
+@pytest.mark.anyio
+async def test_stored_rules_hot_reload_and_run_concurrently(db_session: AsyncSession, recorded_actions):
+    rule = AutomationRule(name='bulk_order', event='test.rule', conditions=json.dumps({'quantity_gt': 100}),
+                          actions=json.dumps(['record']))
+    db_session.add(rule)
+    await db_session.commit()
+    assert rule_engine.wants('test.rule')
+
+    await rule_engine.process('test.rule', {'_event': 'test.rule', 'quantity': 50}, db_session)
+    assert recorded_actions == []
+
+    # Edit: lower threshold and add a second, failing action; both must be
+    # running at once for either to finish
+    rule.conditions = json.dumps({'quantity_gt': 10})
+    rule.actions = json.dumps(['record', 'explode'])
+    await db_session.commit()
+    await rule_engine.process('test.rule', {'_event': 'test.rule', 'quantity': 50, 'together': True}, db_session)
+    assert sorted(recorded_actions) == [('explode', 'test.rule', 50), ('record', 'test.rule', 50)]
+    stats = {r['name']: r for r in rule_engine.stats()['rules']}
+    assert stats['bulk_order']['source'] == 'db'
+    assert (stats['bulk_order']['evaluations'], stats['bulk_order']['matches']) == (2, 1)
+    assert stats['bulk_order']['failures'] == 1
+
+    await db_session.delete(rule)
+    await db_session.commit()
+    await rule_engine.ensure_loaded(db_session)
+    assert not rule_engine.wants('test.rule')
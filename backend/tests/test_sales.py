@@ -22,7 +22,7 @@ async def test_agent_sale(client: AsyncClient, test_session, monkeypatch):
     import app.services.sales as sales_service
     captured = []
 
-    async def fake_emit(event_name, payload):
+    async def fake_emit(event_name, payload, session=None):
         captured.append((event_name, payload))
 
     monkeypatch.setattr(sales_service, 'emit_event', fake_emit)
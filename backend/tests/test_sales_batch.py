@@ -0,0 +1,84 @@
+"""
+Tests for batch sale recording (record_sales_batch).
+
+Tests:
+- Valid items are recorded with one ledger row each; stock moves by the aggregate
+- Per-item rejections (validation, unknown product, stock, reused keys) and
+  idempotent duplicates
+- Rollups are maintained for the batch
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Inventory, InventoryTransaction, Sale, SalesDailyRollup, User
+from app.services.inventory import create_inventory_item
+from app.services.sales import PermissionDeniedError, record_sales_batch
+
+
+@pytest.fixture
+async def batch_user(db_session: AsyncSession):
+    user = User(username='batch_user', email='batch@example.com', hashed_password='x', is_active=True)
+    db_session.add(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+    return user
+
+
+@pytest.mark.anyio
+async def test_batch_records_sales_and_reports_per_item(db_session: AsyncSession, batch_user: User):
+    await create_inventory_item(db_session, product_id=8001, initial_stock=10, created_by_id=batch_user.id)
+    await create_inventory_item(db_session, product_id=8002, initial_stock=5, created_by_id=batch_user.id)
+
+    results = await record_sales_batch(db_session, [
+        {'product_id': 8001, 'quantity': 4, 'unit_price': 10, 'sale_channel': 'field', 'idempotency_key': 'b-1'},
+        {'product_id': 8001, 'quantity': 3, 'unit_price': 10, 'sale_channel': 'field'},
+        {'product_id': 8002, 'quantity': 2, 'unit_price': 5, 'sale_channel': 'store'},
+        {'product_id': 8001, 'quantity': 4, 'unit_price': 10},  # only 3 left after the first two
+        {'product_id': 9999, 'quantity': 1, 'unit_price': 1},
+        {'product_id': 8002, 'quantity': 0, 'unit_price': 5},
+        {'product_id': 8001, 'quantity': 4, 'unit_price': 10, 'sale_channel': 'field', 'idempotency_key': 'b-1'},
+        {'product_id': 8001, 'quantity': 1, 'unit_price': 10, 'idempotency_key': 'b-1'},  # same key, other sale
+        {'quantity': 1},
+    ], sold_by_user_id=batch_user.id)
+
+    assert [r.status for r in results] == [
+        'created', 'created', 'created', 'rejected', 'rejected', 'rejected', 'duplicate', 'rejected', 'rejected',
+    ]
+    assert [r.error for r in results if r.status == 'rejected'] == [
+        'insufficient_stock', 'product_not_found', 'validation_error', 'idempotency_conflict', 'validation_error',
+    ]
+    assert results[6].sale_id == results[0].sale_id
+
+    stock = dict((await db_session.execute(
+        select(Inventory.product_id, Inventory.total_stock).execution_options(populate_existing=True)
+    )).all())
+    assert stock == {8001: 3, 8002: 3}
+
+    sale_ids = {r.sale_id for r in results if r.status == 'created'}
+    ledger = (await db_session.execute(
+        select(InventoryTransaction).where(InventoryTransaction.related_sale_id.in_(sale_ids))
+    )).scalars().all()
+    assert sorted(t.change for t in ledger) == [-4, -3, -2]
+
+    rollups = {r.sale_channel: r for r in (await db_session.execute(select(SalesDailyRollup))).scalars().all()}
+    assert rollups['field'].sale_count == 2
+    assert rollups['field'].total_amount == 70
+    assert rollups['store'].total_quantity == 2
+
+    # Replaying the sale yields a duplicate; the key with other values is a conflict
+    replay = await record_sales_batch(db_session, [
+        {'product_id': 8001, 'quantity': 4, 'unit_price': 10, 'sale_channel': 'field', 'idempotency_key': 'b-1'},
+        {'product_id': 8001, 'quantity': 2, 'unit_price': 10, 'sale_channel': 'field', 'idempotency_key': 'b-1'},
+    ], sold_by_user_id=batch_user.id)
+    assert [r.status for r in replay] == ['duplicate', 'rejected']
+    assert replay[0].sale_id == results[0].sale_id
+    assert replay[1].error == 'idempotency_conflict'
+    assert len((await db_session.execute(select(Sale))).scalars().all()) == 3
+
+
+@pytest.mark.anyio
+async def test_batch_blocks_forbidden_roles(db_session: AsyncSession, batch_user: User):
+    with pytest.raises(PermissionDeniedError):
+        await record_sales_batch(db_session, [{'product_id': 1, 'quantity': 1, 'unit_price': 1}],
+                                 sold_by_user_id=batch_user.id, caller_role='delivery')
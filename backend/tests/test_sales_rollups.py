@@ -0,0 +1,173 @@
+"""
+Tests for the daily reporting rollups.
+
+Tests:
+- record_sale / process_batch maintain rollups in the same transaction
+- Reversals subtract from the sale's bucket
+- Partial-day ranges read edges from raw rows
+- rebuild_rollups backfills; check_rollup_consistency detects and repairs drift
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.db.models import Sale, SalesDailyRollup, ProductionDailyRollup, RawMaterial, User
+from app.db.enums import SaleChannel
+from app.services.sales import record_sale, get_sales_summary, get_agent_performance
+from app.services.inventory import create_inventory_item
+from app.services.processing import create_recipe, process_batch, get_production_report, get_waste_report
+from app.services.rollups import (
+    aggregate_sales,
+    check_rollup_consistency,
+    rebuild_rollups,
+    reverse_sale_rollup,
+    split_range,
+)
+
+
+@pytest.fixture
+async def rollup_user(db_session: AsyncSession):
+    """Create a user for rollup tests."""
+    from app.core.security import get_password_hash
+    user = User(
+        username='rollup_user',
+        email='rollup@example.com',
+        hashed_password=get_password_hash('testpass'),
+        is_active=True,
+    )
+    db_session.add(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+    return user
+
+
+def test_split_range_edges():
+    start = datetime(2026, 1, 1, 10, 0)
+    end = datetime(2026, 1, 4, 6, 0)
+    day_from, day_to, edges = split_range(start, end)
+    assert day_from == datetime(2026, 1, 2).date()
+    assert day_to == datetime(2026, 1, 4).date()
+    assert edges == [
+        (start, datetime(2026, 1, 2), datetime(2026, 1, 1).date()),
+        (datetime(2026, 1, 4), end, datetime(2026, 1, 4).date()),
+    ]
+
+    # Range inside a single day is served entirely from one raw edge
+    day_from, day_to, edges = split_range(datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 9))
+    assert day_from > day_to
+    assert edges == [(datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 9), datetime(2026, 1, 1).date())]
+
+
+@pytest.mark.anyio
+async def test_record_sale_updates_rollup(db_session: AsyncSession, rollup_user: User):
+    await create_inventory_item(db_session, product_id=7001, initial_stock=100, created_by_id=rollup_user.id)
+
+    await record_sale(db_session, product_id=7001, quantity=5, unit_price=10, sold_by_user_id=rollup_user.id, sale_channel=SaleChannel.field.value)
+    await record_sale(db_session, product_id=7001, quantity=3, unit_price=10, sold_by_user_id=rollup_user.id, sale_channel=SaleChannel.field.value)
+    await record_sale(db_session, product_id=7001, quantity=2, unit_price=10, sold_by_user_id=rollup_user.id, sale_channel=SaleChannel.store.value)
+
+    rows = (await db_session.execute(select(SalesDailyRollup))).scalars().all()
+    by_channel = {r.sale_channel: r for r in rows}
+    assert by_channel['field'].sale_count == 2
+    assert by_channel['field'].total_quantity == 8
+    assert by_channel['store'].total_amount == 20
+
+    summary = await get_sales_summary(db_session)
+    assert summary['total_sales'] == 3
+    assert summary['total_quantity'] == 10
+    assert summary['total_amount'] == 100.0
+
+    agents = await get_agent_performance(db_session)
+    assert agents[0]['user_id'] == rollup_user.id
+    assert agents[0]['username'] == 'rollup_user'
+    assert agents[0]['total_quantity'] == 8
+
+
+@pytest.mark.anyio
+async def test_reversal_subtracts_from_rollup(db_session: AsyncSession, rollup_user: User):
+    await create_inventory_item(db_session, product_id=7002, initial_stock=100, created_by_id=rollup_user.id)
+    sale = await record_sale(db_session, product_id=7002, quantity=4, unit_price=5, sold_by_user_id=rollup_user.id, sale_channel=SaleChannel.field.value)
+    await record_sale(db_session, product_id=7002, quantity=1, unit_price=5, sold_by_user_id=rollup_user.id, sale_channel=SaleChannel.field.value)
+
+    sale.is_reversed = True
+    await reverse_sale_rollup(db_session, sale)
+    await db_session.commit()
+
+    summary = await get_sales_summary(db_session)
+    assert summary['total_sales'] == 1
+    assert summary['total_quantity'] == 1
+
+    report = await check_rollup_consistency(db_session)
+    assert report['consistent'] is True
+
+
+@pytest.mark.anyio
+async def test_partial_day_range_reads_raw_edges(db_session: AsyncSession, rollup_user: User):
+    await create_inventory_item(db_session, product_id=7003, initial_stock=100, created_by_id=rollup_user.id)
+    await record_sale(db_session, product_id=7003, quantity=2, unit_price=10, sold_by_user_id=rollup_user.id)
+
+    now = datetime.utcnow()
+    totals = await aggregate_sales(db_session, now - timedelta(hours=1), now + timedelta(hours=1))
+    assert totals[()]['total_quantity'] == 2
+
+    totals = await aggregate_sales(db_session, now + timedelta(minutes=1), now + timedelta(hours=1))
+    assert totals == {}
+
+
+@pytest.mark.anyio
+async def test_rebuild_and_consistency_repair(db_session: AsyncSession, rollup_user: User):
+    # Historical rows written without going through record_sale
+    day = datetime(2025, 3, 10, 12, 0)
+    db_session.add_all([
+        Sale(product_id=7004, quantity=2, unit_price=10, total_amount=20, sold_by_user_id=rollup_user.id, sale_channel=SaleChannel.store.value, created_at=day),
+        Sale(product_id=7004, quantity=3, unit_price=10, total_amount=30, sold_by_user_id=rollup_user.id, sale_channel=SaleChannel.store.value, created_at=day),
+    ])
+    await db_session.commit()
+
+    report = await check_rollup_consistency(db_session)
+    assert report['consistent'] is False
+    assert report['sales_mismatch_count'] == 1
+
+    counts = await rebuild_rollups(db_session)
+    assert counts['sales_rows'] == 1
+    summary = await get_sales_summary(db_session, start_date=datetime(2025, 3, 10), end_date=datetime(2025, 3, 11))
+    assert summary['total_quantity'] == 5
+    assert summary['total_amount'] == 50.0
+
+    # Drift a bucket and let the checker repair it
+    row = (await db_session.execute(select(SalesDailyRollup))).scalar_one()
+    row.total_quantity = 999
+    await db_session.commit()
+    report = await check_rollup_consistency(db_session, repair=True)
+    assert report['repaired'] is True
+    assert (await check_rollup_consistency(db_session))['consistent'] is True
+
+
+@pytest.mark.anyio
+async def test_process_batch_updates_production_rollup(db_session: AsyncSession, rollup_user: User):
+    product = await create_inventory_item(db_session, product_id=7005, product_name="Paste", initial_stock=0, created_by_id=rollup_user.id)
+    material = RawMaterial(name="Groundnuts", unit="kg", current_stock=1000)
+    db_session.add(material)
+    await db_session.commit()
+    await create_recipe(db_session, finished_product_id=product.id, raw_material_id=material.id, quantity_required=2, unit="kg")
+
+    await process_batch(db_session, finished_product_id=product.id, quantity_to_produce=10, processed_by_id=rollup_user.id, actual_waste_quantity=1)
+    await process_batch(db_session, finished_product_id=product.id, quantity_to_produce=5, processed_by_id=rollup_user.id)
+
+    row = (await db_session.execute(select(ProductionDailyRollup))).scalar_one()
+    assert row.batch_count == 2
+    assert row.total_produced == 15
+    assert row.waste_batch_count == 1
+
+    report = await get_production_report(db_session)
+    assert report['summary']['total_batches'] == 2
+    assert report['summary']['total_produced'] == 15
+    assert report['summary']['avg_yield_efficiency'] == 100
+    assert report['by_product'][0]['product_name'] == "Paste"
+
+    waste = await get_waste_report(db_session)
+    assert waste['total_waste'] == 1
+    assert waste['batches_with_waste'] == 1
+    assert len(waste['waste_entries']) == 1
@@ -0,0 +1,89 @@
+"""
+Tests for task listing (AutomationService.list_tasks_page and GET /api/automation/tasks).
+
+Tests:
+- Keyset pages walk the same rows, in the same order, as one large page
+- Total comes from the first page and is carried by the cursor
+- Slim view returns list columns only; bad cursors are rejected
+"""
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.automation.service import AutomationService
+from app.db.enums import AutomationTaskStatus, AutomationTaskType, OrderType
+from app.db.models import AutomationTask, Order, User
+
+
+async def _seed(session: AsyncSession, creator_id: int) -> None:
+    orders = []
+    for _ in range(2):
+        order = Order(order_type=OrderType.agent_restock, created_by_id=creator_id)
+        session.add(order)
+        orders.append(order)
+    await session.flush()
+    for i in range(7):
+        session.add(AutomationTask(
+            task_type=AutomationTaskType.restock,
+            title=f"listing task {i}",
+            description="details",
+            created_by_id=creator_id,
+            related_order_id=orders[i % 3].id if i % 3 < 2 else None,
+            status=AutomationTaskStatus.open,
+        ))
+    await session.commit()
+
+
+@pytest.mark.anyio
+async def test_keyset_pages_match_single_page(db_session: AsyncSession):
+    user = User(username="listing_user", email="listing@example.com", hashed_password="x", is_active=True)
+    db_session.add(user)
+    await db_session.commit()
+    await _seed(db_session, user.id)
+
+    everything = await AutomationService.list_tasks_page(db_session, limit=100)
+    assert everything.total == 7
+    assert everything.next_cursor is None
+
+    seen, cursor = [], None
+    while True:
+        page = await AutomationService.list_tasks_page(db_session, limit=3, cursor=cursor)
+        assert page.total == 7
+        seen.extend(t.id for t in page.tasks)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == [t.id for t in everything.tasks]
+
+    offset_page = await AutomationService.list_tasks_page(db_session, limit=3, offset=6)
+    assert [t.id for t in offset_page.tasks] == seen[6:]
+    assert (await AutomationService.list_tasks_page(db_session, limit=3, offset=50)).total == 7
+
+    with pytest.raises(ValueError):
+        await AutomationService.list_tasks_page(db_session, cursor="not-a-cursor")
+
+
+@pytest.mark.anyio
+async def test_list_endpoint_slim_view_and_cursor(
+    async_client_authenticated: tuple[AsyncClient, dict],
+    db_session: AsyncSession,
+):
+    client, user_data = async_client_authenticated
+    await _seed(db_session, user_data["user_id"])
+
+    resp = await client.get("/api/automation/tasks", params={"limit": 4, "view": "slim"})
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["total"] == 7
+    assert len(body["tasks"]) == 4
+    assert all(t["description"] is None and t["assignments"] == [] for t in body["tasks"])
+
+    resp = await client.get("/api/automation/tasks", params={"limit": 4, "cursor": body["next_cursor"]})
+    assert resp.status_code == 200, resp.text
+    rest = resp.json()
+    assert rest["total"] == 7
+    assert rest["next_cursor"] is None
+    assert [t["description"] for t in rest["tasks"]] == ["details"] * 3
+
+    resp = await client.get("/api/automation/tasks", params={"cursor": "###"})
+    assert resp.status_code == 400
@@ -0,0 +1,81 @@
+"""
+Tests for the user directory (app/services/user_directory.py).
+
+Tests:
+- Listing pages (offset and keyset) walk the same users with one total
+- Search matches substrings case-insensitively and LIKE wildcards literally
+- Mention autocomplete serves prefixes from memory and refreshes after commits
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User
+from app.services.user_directory import (
+    filter_criteria,
+    list_users_page,
+    mention_directory,
+    resolve_usernames,
+)
+
+
+async def _seed(session: AsyncSession) -> None:
+    session.add_all([
+        User(username='alice', email='alice@example.com', display_name='Alice Smith', hashed_password='x', is_active=True),
+        User(username='albert', email='albert@example.com', display_name='Bert', hashed_password='x', is_active=True),
+        User(username='bob_100', email='bob@example.com', display_name='Bobby', hashed_password='x', is_active=True),
+        User(username='bobX100', email='bobx@example.com', hashed_password='x', is_active=True),
+        User(username='carol', email='carol@example.com', hashed_password='x', is_active=False),
+    ])
+    await session.commit()
+
+
+@pytest.mark.anyio
+async def test_pages_search_and_total(db_session: AsyncSession):
+    await _seed(db_session)
+
+    everything = await list_users_page(db_session, filter_criteria(), limit=100)
+    assert everything.total == 5
+    assert everything.next_cursor is None
+
+    seen, cursor = [], None
+    while True:
+        page = await list_users_page(db_session, filter_criteria(), limit=2, cursor=cursor)
+        assert page.total == 5
+        seen.extend(u.id for u in page.users)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == [u.id for u in everything.users]
+    assert [u.id for u in (await list_users_page(db_session, filter_criteria(), limit=2, offset=2)).users] == seen[2:4]
+
+    smith = await list_users_page(db_session, filter_criteria(search='SMITH'))
+    assert [u.username for u in smith.users] == ['alice']
+    literal = await list_users_page(db_session, filter_criteria(search='b_1'))
+    assert [u.username for u in literal.users] == ['bob_100']
+    inactive = await list_users_page(db_session, filter_criteria(status='inactive'))
+    assert inactive.total == 1
+
+    with pytest.raises(ValueError):
+        await list_users_page(db_session, cursor='not-a-cursor')
+
+
+@pytest.mark.anyio
+async def test_mention_autocomplete_and_resolve(db_session: AsyncSession):
+    await _seed(db_session)
+    mention_directory.invalidate(broadcast=False)
+
+    names = [e.username for e in await mention_directory.autocomplete(db_session, '@Al')]
+    assert names == ['albert', 'alice']
+    # Display-name prefix matches come after username matches; inactive users are hidden
+    assert [e.username for e in await mention_directory.autocomplete(db_session, 'bo')] == ['bob_100', 'bobX100']
+    assert [e.username for e in await mention_directory.autocomplete(db_session, 'ber')] == ['albert']
+    assert await mention_directory.autocomplete(db_session, 'carol') == []
+
+    db_session.add(User(username='alfred', email='alfred@example.com', hashed_password='x', is_active=True))
+    await db_session.commit()
+    assert mention_directory.is_stale
+    names = [e.username for e in await mention_directory.autocomplete(db_session, 'al', limit=2)]
+    assert names == ['albert', 'alfred']
+
+    ids = await resolve_usernames(db_session, ['alice', 'nobody', 'carol'])
+    assert set(ids) == {'alice', 'carol'}
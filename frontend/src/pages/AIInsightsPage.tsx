@@ -335,7 +335,13 @@ export default function AIInsightsPage() {
   const runAnalysis = async () => {
     setRunningAnalysis(true)
     try {
-      await api.post('/api/ai/run')
+      const { data } = await api.post('/api/ai/run')
+      // Analysis runs as a background job - poll until it finishes
+      let job = data
+      while (job && !['completed', 'partial', 'error'].includes(job.status)) {
+        await new Promise(resolve => setTimeout(resolve, 1000))
+        job = (await api.get(`/api/ai/jobs/${data.job_id}`)).data
+      }
       // Refresh data after analysis
       await fetchData()
     } catch (err) {